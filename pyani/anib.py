@@ -81,25 +81,75 @@ qualifying matches contribute to the total aligned length, and total
 aligned sequence identity used to calculate ANI.
 """
 
+import gzip
+import hashlib
+import os
 import platform
 import re
+import shlex
 import shutil
 import subprocess
+import tempfile
 
+from array import array
 from logging import Logger
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple
-
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 
-from Bio import SeqIO  # type: ignore
-
 from . import pyani_config
 from . import pyani_files
 from . import pyani_jobs
+from . import run_multiprocessing as run_mp
+from .download import create_hash
 from .pyani_tools import ANIResults, BLASTcmds, BLASTexes, BLASTfunctions
 
 
+class BlastDBPaths(NamedTuple):
+
+    """Paths to the files in a BLAST database store entry."""
+
+    fragpath: Path  # fragmented genome (query in ANIb)
+    dbpath: Path  # BLAST+ database prefix for the whole genome (subject in ANIb)
+    lengthpath: Path  # NumPy array of fragment lengths (see get_fragment_lengths())
+
+
+# Bases written to each line of a fragment file, as by Bio.SeqIO
+FASTA_LINE_LENGTH = 60
+
+# Columns of BLAST tabular output read by parse_blast_tab(), with their
+# (0-based) positions and types, for BLAST+ (ANIb) and blastall (ANIblastall)
+BLAST_TAB_COLUMNS = {
+    "ANIb": {
+        "qseqid": (0, str),
+        "blast_alnlen": (2, np.int64),
+        "blast_mismatch": (3, np.int64),
+        "blast_pid": (4, np.float64),
+        "qlen": (6, np.int64),
+        "blast_gaps": (14, np.int64),
+    },
+    "ANIblastall": {
+        "qseqid": (0, str),
+        "blast_pid": (2, np.float64),
+        "blast_alnlen": (3, np.int64),
+        "blast_mismatch": (4, np.int64),
+        "blast_gaps": (5, np.int64),
+    },
+}  # type: Dict[str, Dict[str, Tuple[int, Any]]]
+
+
 def get_version(blast_exe: Path = pyani_config.BLASTN_DEFAULT) -> str:
     """Return BLAST+ blastn version as a string.
 
@@ -131,45 +181,97 @@ def get_version(blast_exe: Path = pyani_config.BLASTN_DEFAULT) -> str:
 
 # Divide input FASTA sequences into fragments
 def fragment_fasta_files(
-    infiles: List[Path], outdirname: Path, fragsize: int
+    infiles: List[Path],
+    outdirname: Path,
+    fragsize: int,
+    workers: Optional[int] = None,
 ) -> Tuple[List, Dict]:
     """Chop sequences of the passed files into fragments, return filenames.
 
     :param infiles:  collection of paths to each input sequence file
     :param outdirname:  Path, path to output directory
     :param fragsize:  Int, the size of sequence fragments
+    :param workers:  Int, number of worker processes to fragment files with
 
     Takes every sequence from every file in infiles, and splits them into
     consecutive fragments of length fragsize, (with any trailing sequences
     being included, even if shorter than fragsize), writing the resulting
     set of sequences to a file with the same name in the specified
-    output directory.
+    output directory. Files are fragmented in parallel, by a pool of worker
+    processes (see fragment_fasta_file()).
 
     All fragments are named consecutively and uniquely (within a file) as
     fragNNNNN. Sequence description fields are retained.
 
     Returns a tuple ``(filenames, fragment_lengths)`` where ``filenames`` is a
     list of paths to the fragment sequence files, and ``fragment_lengths`` is
-    a dictionary of sequence fragment lengths, keyed by the sequence files,
-    with values being a dictionary of fragment lengths, keyed by fragment
-    IDs.
-    """
-    outfnames = []
-    for fname in infiles:
-        outfname = outdirname / f"{fname.stem}-fragments{fname.suffix}"
-        outseqs = []
-        count = 0
-        for seq in SeqIO.parse(fname, "fasta"):
-            idx = 0
-            while idx < len(seq):
-                count += 1
-                newseq = seq[idx : idx + fragsize]
-                newseq.id = "frag%05d" % count
-                outseqs.append(newseq)
-                idx += fragsize
-        outfnames.append(outfname)
-        SeqIO.write(outseqs, outfname, "fasta")
-    return outfnames, get_fraglength_dict(outfnames)
+    a dictionary of arrays of sequence fragment lengths (see
+    get_fragment_lengths()), keyed by the stems of the sequence files.
+    """
+    outfnames = [
+        outdirname / f"{fname.stem}-fragments{fname.suffix}" for fname in infiles
+    ]
+    fraglengths = run_mp.multiprocessing_apply(
+        fragment_fasta_file,
+        [(inf, outf, fragsize) for inf, outf in zip(infiles, outfnames)],
+        workers=workers,
+    )
+    return outfnames, {inf.stem: _ for inf, _ in zip(infiles, fraglengths)}
+
+
+# Divide a single genome's sequences into fragments
+def fragment_fasta_file(inpath: Path, outpath: Path, fragsize: int) -> np.ndarray:
+    """Write consecutive fragments of a genome's sequences, return their lengths.
+
+    :param inpath:  Path, path to the input genome FASTA file
+    :param outpath:  Path, path to the output fragment FASTA file
+    :param fragsize:  Int, the size of sequence fragments
+
+    The input is streamed as bytes, and each fragment is written as soon as
+    its bases have been read, so that no more than one fragment's sequence is
+    held in memory. Fragments are named as by fragment_fasta_files(), and
+    written as Bio.SeqIO would write them: with the input sequence's
+    description in each header, and FASTA_LINE_LENGTH bases to a line.
+
+    Returns an array of fragment lengths (see get_fragment_lengths()).
+    """
+    fraglengths = array("q")
+    header, seq = b"", bytearray()
+    with open(inpath, "rb") as ifh, open(outpath, "wb") as ofh:
+        for line in ifh:
+            if line.startswith(b">"):
+                if seq:  # trailing fragment of the previous sequence
+                    fraglengths.append(len(seq))
+                    _write_fragment(ofh, len(fraglengths), header, seq)
+                    seq.clear()
+                header = line[1:].rstrip()
+                continue
+            seq += line.translate(None, b" \t\r\n")
+            while len(seq) >= fragsize:
+                fraglengths.append(fragsize)
+                _write_fragment(ofh, len(fraglengths), header, seq[:fragsize])
+                del seq[:fragsize]
+        if seq:
+            fraglengths.append(len(seq))
+            _write_fragment(ofh, len(fraglengths), header, seq)
+    return np.array(fraglengths, dtype=np.int64)
+
+
+def _write_fragment(ofh: BinaryIO, fragnum: int, header: bytes, seq: bytes) -> None:
+    """Write a single sequence fragment in FASTA format.
+
+    :param ofh:  BinaryIO, output fragment FASTA file
+    :param fragnum:  int, the fragment's number (from 1) in the file
+    :param header:  bytes, description of the fragment's input sequence
+    :param seq:  bytes, the fragment sequence
+    """
+    lines = [b">frag%05d %s" % (fragnum, header) if header else b">frag%05d" % fragnum]
+    lines.extend(
+        seq[idx : idx + FASTA_LINE_LENGTH]
+        for idx in range(0, len(seq), FASTA_LINE_LENGTH)
+    )
+    lines.append(b"")
+    ofh.write(b"\n".join(lines))
 
 
 # Get lengths of all sequences in all files
@@ -178,9 +280,9 @@ def get_fraglength_dict(fastafiles: List[Path]) -> Dict:
 
     :param fastafiles:  list of paths to FASTA input whole sequence files
 
-    Loops over input files and, for each, produces a dictionary with fragment
-    lengths, keyed by sequence ID. These are returned as a dictionary with
-    the keys being query IDs derived from filenames.
+    Loops over input files and, for each, produces an array of fragment
+    lengths (see get_fragment_lengths()). These are returned as a dictionary
+    with the keys being query IDs derived from filenames.
     """
     fraglength_dict = {}
     for filename in fastafiles:
@@ -190,35 +292,58 @@ def get_fraglength_dict(fastafiles: List[Path]) -> Dict:
 
 
 # Get lengths of all sequences in a file
-def get_fragment_lengths(fastafile: Path) -> Dict:
-    """Return dictionary of sequence fragment lengths, keyed by fragment ID.
+def get_fragment_lengths(fastafile: Path) -> np.ndarray:
+    """Return array of sequence fragment lengths, indexed by fragment number.
 
-    :param fastafile:
+    :param fastafile:  Path, path to a fragment FASTA file
 
-    Biopython's SeqIO module is used to parse all sequences in the FASTA
-    file.
+    Fragments are expected to be numbered consecutively from 1, in file
+    order, as they are by fragment_fasta_file(), so that the length of
+    fragment fragNNNNN is element NNNNN - 1 of the array. The file is read
+    as bytes, without parsing sequence records.
 
     NOTE: ambiguity symbols are not discounted.
     """
-    fraglengths = {}
-    for seq in SeqIO.parse(fastafile, "fasta"):
-        fraglengths[seq.id] = len(seq)
-    return fraglengths
+    fraglengths = array("q")
+    with open(fastafile, "rb") as ifh:
+        for line in ifh:
+            if line.startswith(b">"):
+                fraglengths.append(0)
+            elif fraglengths:
+                fraglengths[-1] += len(line.translate(None, b" \t\r\n"))
+    return np.array(fraglengths, dtype=np.int64)
 
 
 # Create dictionary of database building commands, keyed by dbname
 def build_db_jobs(infiles: List[Path], blastcmds: BLASTcmds) -> Dict:
     """Return dictionary of db-building commands, keyed by dbname.
 
-    :param infiles:
-    :param blastcmds:
+    :param infiles:  list of paths to input FASTA files
+    :param blastcmds:  BLASTcmds, builder of BLAST commands for the analysis
+
+    Each job runs formatdb_wrapper.py (see format_blastdb()), so that any
+    copying of input files happens when the jobs run, in parallel. Input
+    files whose database is current (see blastdb_is_current()) are given
+    no job.
     """
     dbjobdict = {}  # Dict of database construction jobs, keyed by filename
     # Create dictionary of database building jobs, keyed by db name
     # defining jobnum for later use as last job index used
+    version = None  # type: Optional[str]
     for idx, fname in enumerate(infiles):
-        dbjobdict[blastcmds.get_db_name(fname)] = pyani_jobs.Job(
-            f"{blastcmds.prefix}_db_{idx:06}", blastcmds.build_db_cmd(fname)
+        dbname = blastcmds.get_db_name(fname)
+        if get_blastdb_marker(dbname).is_file():
+            # Only look up the tool version if there are databases to check
+            version = version or get_blastdb_version(
+                blastcmds.exes.format_exe, blastcmds.mode
+            )
+            if blastdb_is_current(fname, dbname, version):
+                continue
+        dbjobdict[dbname] = pyani_jobs.Job(
+            f"{blastcmds.prefix}_db_{idx:06}",
+            construct_format_blastdb_cmdline(
+                fname, blastcmds.outdir, blastcmds.exes.format_exe, blastcmds.mode
+            ),
         )
     return dbjobdict
 
@@ -247,6 +372,7 @@ def make_blastcmd_builder(
             ),
             prefix,
             outdir,
+            mode,
         )
     else:
         blastcmds = BLASTcmds(
@@ -257,6 +383,7 @@ def make_blastcmd_builder(
             ),
             prefix,
             outdir,
+            mode,
         )
     return blastcmds
 
@@ -276,7 +403,8 @@ def make_job_graph(
 
     All items in the returned graph list are BLAST executable jobs that must
     be run *after* the corresponding database creation. The Job objects
-    corresponding to the database creation are contained as dependencies.
+    corresponding to the database creation are contained as dependencies,
+    unless the database is already current (see build_db_jobs()).
     How those jobs are scheduled depends on the scheduler (see
     run_multiprocessing.py, run_sge.py)
     """
@@ -304,12 +432,10 @@ def make_job_graph(
                     ),
                 ),
             ]
-            jobs[0].add_dependency(
-                dbjobdict[fname1.parent / fname1.name.replace("-fragments", "")]
-            )
-            jobs[1].add_dependency(
-                dbjobdict[fname2.parent / fname2.name.replace("-fragments", "")]
-            )
+            for job, fname in zip(jobs, (fname1, fname2)):
+                dbname = fname.parent / fname.name.replace("-fragments", "")
+                if dbname in dbjobdict:
+                    job.add_dependency(dbjobdict[dbname])
             joblist.extend(jobs)
 
     # Return the dependency graph
@@ -360,6 +486,232 @@ def construct_makeblastdb_cmd(
     )
 
 
+# Get path to a genome's entry in the BLAST database store
+def get_blastdb_entry(
+    storedir: Path, genome_hash: str, fragsize: int, blast_version: str
+) -> Path:
+    """Return path to the store directory for a genome's fragments and database.
+
+    :param storedir:  Path, path to the BLAST database store
+    :param genome_hash:  str, hash of the genome FASTA file
+    :param fragsize:  int, the size of sequence fragments
+    :param blast_version:  str, BLAST+ version (see get_version())
+
+    Entries are keyed by genome hash, fragment size and BLAST+ version, so
+    that each is built once, and reused by every later run with the same
+    genome and settings.
+    """
+    return Path(storedir) / blast_version / f"{genome_hash}_{fragsize}"
+
+
+def get_blastdb_marker(entry: Path) -> Path:
+    """Return path to the file marking a BLAST database store entry as complete.
+
+    :param entry:  Path, path to the store entry directory
+    """
+    return Path(str(entry) + ".complete")
+
+
+def get_blastdb_paths(entry: Path) -> BlastDBPaths:
+    """Return paths to the fragment, database and fragment length files of an entry.
+
+    :param entry:  Path, path to the store entry directory
+    """
+    entry = Path(entry)
+    return BlastDBPaths(
+        entry / "fragments.fna", entry / "genome", entry / "fraglengths.npy"
+    )
+
+
+# Generate a command line building a BLAST database store entry
+def construct_blastdb_cmdline(
+    genome: Path,
+    entry: Path,
+    fragsize: int,
+    blastdb_exe: Path = pyani_config.MAKEBLASTDB_DEFAULT,
+) -> str:
+    """Return blastdb_wrapper.py command building a BLAST database store entry.
+
+    :param genome:  Path, path to the genome FASTA file
+    :param entry:  Path, path to the store entry directory
+    :param fragsize:  int, the size of sequence fragments
+    :param blastdb_exe:  Path, path to the makeblastdb executable
+
+    See build_blastdb().
+    """
+    return (
+        f"blastdb_wrapper.py --fragsize {fragsize} --makeblastdb_exe {blastdb_exe} "
+        f"{genome} {entry}"
+    )
+
+
+# Build a BLAST database store entry
+def build_blastdb(
+    genome: Path,
+    entry: Path,
+    fragsize: int,
+    blastdb_exe: Path = pyani_config.MAKEBLASTDB_DEFAULT,
+) -> Path:
+    """Write a genome's fragments and BLAST+ database to a store entry.
+
+    :param genome:  Path, path to the genome FASTA file
+    :param entry:  Path, path to the store entry directory
+    :param fragsize:  int, the size of sequence fragments
+    :param blastdb_exe:  Path, path to the makeblastdb executable
+
+    The fragments (see fragment_fasta_file()), their lengths, and the
+    makeblastdb database for the whole genome are written to a temporary
+    directory alongside the entry, which is then moved into place. A marker
+    file (see get_blastdb_marker()) is written last, so that an entry left
+    incomplete by a killed job is never used, and is rebuilt. If the marker
+    file already exists, the entry is not built again. Returns the path to
+    the marker file.
+
+    Raises subprocess.CalledProcessError if makeblastdb fails.
+    """
+    entry, marker = Path(entry), get_blastdb_marker(entry)
+    if marker.is_file():
+        return marker
+    entry.parent.mkdir(exist_ok=True, parents=True)
+    tmpdir = Path(tempfile.mkdtemp(prefix="pyani_blastdb_", dir=entry.parent))
+    try:
+        paths = get_blastdb_paths(tmpdir)
+        fraglengths = fragment_fasta_file(Path(genome), paths.fragpath, fragsize)
+        np.save(paths.lengthpath, fraglengths)
+        subprocess.run(
+            [
+                str(blastdb_exe),
+                "-dbtype",
+                "nucl",
+                "-in",
+                str(genome),
+                "-title",
+                Path(genome).stem,
+                "-out",
+                str(paths.dbpath),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            shell=False,
+        )
+        shutil.rmtree(entry, ignore_errors=True)
+        tmpdir.replace(entry)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    marker.touch()
+    return marker
+
+
+# Get path to the BLAST database store entry for a set of genomes
+def get_combined_blastdb_entry(
+    storedir: Path, genome_hashes: Iterable[str], blast_version: str
+) -> Path:
+    """Return path to the store directory for a combined multi-genome database.
+
+    :param storedir:  Path, path to the BLAST database store
+    :param genome_hashes:  hashes of the genome FASTA files in the database
+    :param blast_version:  str, BLAST+ version (see get_version())
+
+    Entries are keyed by a digest of the (sorted) genome hashes, so that the
+    same set of genomes always uses the same entry.
+    """
+    digest = hashlib.md5(" ".join(sorted(genome_hashes)).encode()).hexdigest()
+    return Path(storedir) / blast_version / f"combined_{digest}"
+
+
+def get_combined_blastdb_path(entry: Path) -> Path:
+    """Return path to the BLAST+ database prefix of a combined store entry.
+
+    :param entry:  Path, path to the store entry directory
+    """
+    return Path(entry) / "genomes"
+
+
+def get_combined_subject(sseqid: str) -> str:
+    """Return the hash of the genome a combined database sequence is from.
+
+    :param sseqid:  str, subject sequence ID reported by blastn
+
+    Sequences in a combined database are named lcl|<genome hash>_<N> (see
+    build_combined_blastdb()); blastn may report them with or without the
+    lcl| prefix.
+    """
+    return sseqid.split("|")[-1].rsplit("_", 1)[0]
+
+
+# Build a BLAST database store entry for the sequences of several genomes
+def build_combined_blastdb(
+    genomes: Dict[str, Path],
+    entry: Path,
+    blastdb_exe: Path = pyani_config.MAKEBLASTDB_DEFAULT,
+) -> int:
+    """Write a single BLAST+ database of several genomes to a store entry.
+
+    :param genomes:  Dict, paths to genome FASTA files, keyed by genome hash
+    :param entry:  Path, path to the store entry directory
+    :param blastdb_exe:  Path, path to the makeblastdb executable
+
+    The sequences of all genomes are written to a single FASTA file, the
+    Nth sequence of each genome being renamed lcl|<genome hash>_<N> (with
+    its original header kept as the description), so that blastn hits can
+    be assigned to their subject genome (see get_combined_subject()). The
+    database is built and moved into place as by build_blastdb(), and the
+    number of sequences it holds is written to the marker file. If the
+    marker file already exists, the entry is not built again. Returns the
+    number of sequences in the database.
+
+    Raises subprocess.CalledProcessError if makeblastdb fails.
+    """
+    entry, marker = Path(entry), get_blastdb_marker(entry)
+    if marker.is_file():
+        return int(marker.read_text())
+    entry.parent.mkdir(exist_ok=True, parents=True)
+    tmpdir = Path(tempfile.mkdtemp(prefix="pyani_blastdb_", dir=entry.parent))
+    try:
+        dbpath = get_combined_blastdb_path(tmpdir)
+        fastapath = dbpath.with_suffix(".fna")
+        nseqs = 0
+        with fastapath.open("wb") as ofh:
+            for genome_hash, genome in sorted(genomes.items()):
+                seqnum = 0
+                with open(genome, "rb") as ifh:
+                    for line in ifh:
+                        if line.startswith(b">"):
+                            seqnum += 1
+                            line = b">lcl|%s_%d %s" % (
+                                genome_hash.encode(),
+                                seqnum,
+                                line[1:],
+                            )
+                        ofh.write(line)
+                nseqs += seqnum
+        subprocess.run(
+            [
+                str(blastdb_exe),
+                "-dbtype",
+                "nucl",
+                "-parse_seqids",
+                "-in",
+                str(fastapath),
+                "-title",
+                entry.name,
+                "-out",
+                str(dbpath),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            shell=False,
+        )
+        shutil.rmtree(entry, ignore_errors=True)
+        tmpdir.replace(entry)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    marker.write_text(f"{nseqs}\n")
+    return nseqs
+
+
 # Generate single makeblastdb command line
 def construct_formatdb_cmd(
     filename: Path, outdir: Path, blastdb_exe: Path = pyani_config.FORMATDB_DEFAULT
@@ -369,12 +721,160 @@ def construct_formatdb_cmd(
     :param filename:  Path, input filename
     :param outdir:  Path, path to output directory
     :param blastdb_exe:  Path, path to the formatdb executable
+
+    formatdb writes the database alongside its input, so the command expects
+    the input file to be linked or copied into outdir before it is run (see
+    format_blastdb()).
     """
     newfilename = outdir / filename.name
-    shutil.copy(filename, newfilename)
     return (f"{blastdb_exe} -p F -i {newfilename} -t {filename.stem}", newfilename)
 
 
+# Get version of the BLAST database formatting tool
+def get_blastdb_version(
+    blastdb_exe: Path = pyani_config.MAKEBLASTDB_DEFAULT, mode: str = "ANIb"
+) -> str:
+    """Return makeblastdb or formatdb version as a string.
+
+    :param blastdb_exe:  path to the makeblastdb (ANIb) or formatdb
+        (ANIblastall) executable
+    :param mode:  str, ANIb analysis type (ANIb or ANIblastall)
+
+    We expect makeblastdb -version to report, for example, "makeblastdb:
+    2.9.0+" and formatdb (which has no version option, so reports its usage
+    when run with -) to report "formatdb 2.2.26   arguments:". As for
+    get_version(), the version is concatenated with the OS name.
+    """
+    cmdline = [str(blastdb_exe), "-version" if mode == "ANIb" else "-"]
+    result = subprocess.run(
+        cmdline,
+        shell=False,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=False,
+    )
+    match = re.search(r"[0-9]+\.[0-9\.]*\+?", str(result.stdout, "utf-8"))
+    return f"{platform.system()}_{match.group() if match else 'unknown'}"
+
+
+def get_blastdb_signature(genome: Path, version: str) -> str:
+    """Return the record of the input to a database in its marker file.
+
+    :param genome:  Path, path to the input FASTA file
+    :param version:  str, database formatting tool version (see
+        get_blastdb_version())
+    """
+    return f"{create_hash(genome)}\t{version}\n"
+
+
+def blastdb_is_current(genome: Path, dbname: Path, version: str) -> bool:
+    """Return True if a database was built from this genome by this tool version.
+
+    :param genome:  Path, path to the input FASTA file
+    :param dbname:  Path, path to the database (see construct_makeblastdb_cmd()
+        and construct_formatdb_cmd())
+    :param version:  str, database formatting tool version (see
+        get_blastdb_version())
+
+    The database's marker file (see get_blastdb_marker()) is written by
+    format_blastdb() once the database is complete, and records the hash of
+    the input genome and the version of the tool.
+    """
+    marker = get_blastdb_marker(dbname)
+    return marker.is_file() and (
+        marker.read_text() == get_blastdb_signature(genome, version)
+    )
+
+
+def link_or_copy(source: Path, dest: Path) -> None:
+    """Make dest a hardlink to source, or else a symlink or, failing both, a copy.
+
+    :param source:  Path, path to the existing file
+    :param dest:  Path, path to the new file, replaced if it exists
+
+    Hardlinks cannot cross filesystems, and neither kind of link may be
+    supported by the filesystem, or permitted for the user.
+    """
+    source, dest = Path(source), Path(dest)
+    if dest.is_symlink() or dest.exists():
+        dest.unlink()
+    try:
+        os.link(source, dest)
+    except OSError:
+        try:
+            dest.symlink_to(source.resolve())
+        except OSError:
+            shutil.copyfile(source, dest)
+
+
+# Generate a command line formatting a BLAST database in an output directory
+def construct_format_blastdb_cmdline(
+    genome: Path,
+    outdir: Path,
+    blastdb_exe: Path = pyani_config.MAKEBLASTDB_DEFAULT,
+    mode: str = "ANIb",
+) -> str:
+    """Return formatdb_wrapper.py command building a genome's BLAST database.
+
+    :param genome:  Path, path to the genome FASTA file
+    :param outdir:  Path, path to the output directory
+    :param blastdb_exe:  Path, path to the makeblastdb or formatdb executable
+    :param mode:  str, ANIb analysis type (ANIb or ANIblastall)
+
+    See format_blastdb().
+    """
+    return (
+        f"formatdb_wrapper.py --mode {mode} --format_exe {blastdb_exe} "
+        f"{genome} {outdir}"
+    )
+
+
+# Build a BLAST database for a genome in an output directory
+def format_blastdb(
+    genome: Path,
+    outdir: Path,
+    blastdb_exe: Path = pyani_config.MAKEBLASTDB_DEFAULT,
+    mode: str = "ANIb",
+) -> Path:
+    """Build a genome's makeblastdb (ANIb) or formatdb (ANIblastall) database.
+
+    :param genome:  Path, path to the genome FASTA file
+    :param outdir:  Path, path to the output directory
+    :param blastdb_exe:  Path, path to the makeblastdb or formatdb executable
+    :param mode:  str, ANIb analysis type (ANIb or ANIblastall)
+
+    The database is built by the command from construct_makeblastdb_cmd() or
+    construct_formatdb_cmd(). For formatdb, the genome is first linked into
+    outdir (see link_or_copy()). Once the database is built, its marker file
+    records the genome hash and tool version (see blastdb_is_current()); if
+    the database is already current, it is not built again. Returns the path
+    to the database.
+
+    Raises subprocess.CalledProcessError if the tool fails.
+    """
+    if mode == "ANIb":
+        cmdline, dbname = construct_makeblastdb_cmd(Path(genome), outdir, blastdb_exe)
+    else:
+        cmdline, dbname = construct_formatdb_cmd(Path(genome), outdir, blastdb_exe)
+    version = get_blastdb_version(blastdb_exe, mode)
+    if blastdb_is_current(genome, dbname, version):
+        return dbname
+    marker = get_blastdb_marker(dbname)
+    if marker.is_file():
+        marker.unlink()
+    if mode != "ANIb":
+        link_or_copy(genome, dbname)
+    subprocess.run(
+        shlex.split(cmdline),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+        shell=False,
+    )
+    marker.write_text(get_blastdb_signature(genome, version))
+    return dbname
+
+
 # Generate list of BLASTN command lines from passed filenames
 def generate_blastn_commands(
     filenames: List[Path],
@@ -422,6 +922,9 @@ def construct_blastn_cmdline(
     fname2: Path,
     outdir: Path,
     blastn_exe: Path = pyani_config.BLASTN_DEFAULT,
+    outfname: Optional[Path] = None,
+    max_target_seqs: int = 1,
+    threads: int = 1,
 ) -> str:
     """Return a single blastn command.
 
@@ -429,14 +932,23 @@ def construct_blastn_cmdline(
     :param fname2:
     :param outdir:
     :param blastn_exe:  str, path to blastn executable
+    :param outfname:  path to the output file; by default, this is named
+        for the query fragment file and the database, in outdir
+    :param max_target_seqs:  int, number of subject sequences for which hits
+        are reported for each query fragment
+    :param threads:  int, number of threads for blastn to use
     """
-    prefix = outdir / f"{fname1.stem.replace('-fragments', '')}_vs_{fname2.stem}"
+    if outfname is None:
+        prefix = outdir / f"{fname1.stem.replace('-fragments', '')}_vs_{fname2.stem}"
+        outfname = Path(f"{prefix}.blast_tab")
+    threadopt = f"-num_threads {threads} " if threads > 1 else ""
     return (
-        f"{blastn_exe} -out {prefix}.blast_tab -query {fname1} -db {fname2} "
-        "-xdrop_gap_final 150 -dust no -evalue 1e-15 -max_target_seqs 1 -outfmt "
+        f"{blastn_exe} -out {outfname} -query {fname1} -db {fname2} "
+        "-xdrop_gap_final 150 -dust no -evalue 1e-15 "
+        f"-max_target_seqs {max_target_seqs} -outfmt "
         "'6 qseqid sseqid length mismatch pident nident qlen slen "
         "qstart qend sstart send positive ppos gaps' "
-        "-task blastn"
+        f"{threadopt}-task blastn"
     )
 
 
@@ -468,6 +980,8 @@ def process_blast(
     fraglengths: Dict,
     mode: str = "ANIb",
     logger: Optional[Logger] = None,
+    workers: Optional[int] = None,
+    write_dataframe: bool = False,
 ) -> ANIResults:
     """Return tuple of ANIb results for .blast_tab files in the output dir.
 
@@ -477,6 +991,9 @@ def process_blast(
         needed for BLASTALL output
     :param mode:  str, analysis type (ANIb or ANIblastall)
     :param logger:  a logger for messages
+    :param workers:  int, number of worker processes parsing .blast_tab files
+    :param write_dataframe:  bool, write the best hits from each .blast_tab
+        file to a .blast_tab.dataframe file (see parse_blast_tab())
 
     Returns the following pandas dataframes in an ANIResults object;
     query sequences are rows, subject sequences are columns:
@@ -486,6 +1003,8 @@ def process_blast(
     - alignment_coverage - non-symmetrical: coverage of query
     - similarity_errors - non-symmetrical: count of similarity errors
 
+    The .blast_tab files are parsed in parallel by a pool of worker processes.
+
     May throw a ZeroDivisionError if one or more BLAST runs failed, or a
     very distant sequence was included in the analysis.
     """
@@ -500,6 +1019,7 @@ def process_blast(
 
     # Process .blast_tab files assuming that the filename format holds:
     # org1_vs_org2.blast_tab:
+    comparisons = []  # type: List[Tuple[str, str, Path]]
     for blastfile in blastfiles:
         qname, sname = blastfile.stem.split("_vs_")
 
@@ -521,7 +1041,23 @@ def process_blast(
                     blastfile,
                 )
             continue
-        resultvals = parse_blast_tab(blastfile, fraglengths, mode)
+        comparisons.append((qname, sname, blastfile))
+
+    # Only the query's fragment lengths are sent to the worker parsing a file
+    parsed = run_mp.multiprocessing_apply(
+        parse_blast_tab,
+        [
+            (
+                blastfile,
+                {qname: fraglengths[qname]} if mode == "ANIblastall" else {},
+                mode,
+                write_dataframe,
+            )
+            for qname, _, blastfile in comparisons
+        ],
+        workers=workers,
+    )
+    for (qname, sname, _), resultvals in zip(comparisons, parsed):
         query_cover = float(resultvals[0]) / org_lengths[qname]
 
         # Populate dataframes: when assigning data, we need to note that
@@ -534,16 +1070,51 @@ def process_blast(
     return results
 
 
+# Read selected columns of BLAST tabular output
+def read_blast_tab(filename: Path, columns: Dict) -> pd.DataFrame:
+    """Return dataframe of the named columns of a BLAST tabular output file.
+
+    :param filename:  Path, path to .blast_tab file (optionally gzip-compressed)
+    :param columns:  Dict, (0-based position, type) of each column to read,
+        keyed by column name (see BLAST_TAB_COLUMNS)
+    """
+    # We may receive an empty BLASTN output file, if there are no significant
+    # regions of homology. This causes pandas to throw an error on CSV import.
+    # To get past this, we create an empty dataframe with the appropriate
+    # columns.
+    try:
+        data = pd.read_csv(
+            filename,
+            header=None,
+            sep="\t",
+            usecols=[_[0] for _ in columns.values()],
+            dtype={_[0]: _[1] for _ in columns.values()},
+        )
+        data.columns = [
+            name for name, _ in sorted(columns.items(), key=lambda _: _[1][0])
+        ]
+    except pd.errors.EmptyDataError:
+        data = pd.DataFrame(
+            {name: pd.Series(dtype=dtype) for name, (_, dtype) in columns.items()}
+        )
+    return data
+
+
 # Parse BLASTALL output to get total alignment length and mismatches
 def parse_blast_tab(
-    filename: Path, fraglengths: Dict, mode: str = "ANIb"
-) -> Tuple[int, int, int]:
+    filename: Path,
+    fraglengths: Dict,
+    mode: str = "ANIb",
+    write_dataframe: bool = False,
+) -> Tuple[int, int, float]:
     """Return (alignment length, similarity errors, mean_pid) tuple.
 
     :param filename:  Path, path to .blast_tab file
     :param fraglengths:  Optional[Dict], dictionary of fragment lengths for each
         genome.
     :param mode:  str, analysis type (ANIb or ANIblastall)
+    :param write_dataframe:  bool, write the best hits to a
+        .blast_tab.dataframe file alongside the .blast_tab file
 
     Calculate the alignment length and total number of similarity errors (as
     we would with ANIm), as well as the Goris et al.-defined mean identity
@@ -555,68 +1126,33 @@ def parse_blast_tab(
     sequence identity (recalculated to an identity along the entire sequence)
     over an alignable region of at least 70% of their length.
     '''
+
+    Only the columns in BLAST_TAB_COLUMNS are read, with fixed types. The
+    .blast_tab.dataframe file, if written, holds these columns and those
+    calculated from them, for the best hit of each query fragment.
     """
-    # Assuming that the filename format holds org1_vs_org2.blast_tab:
-    qname = filename.stem.split("_vs_")[0]
-    # Load output as dataframe
+    data = read_blast_tab(filename, BLAST_TAB_COLUMNS[mode])
+    qids = data["qseqid"].to_numpy()
+    alnlen = data["blast_alnlen"].to_numpy()
+    mismatch = data["blast_mismatch"].to_numpy()
+    gaps = data["blast_gaps"].to_numpy()
+    # Fragment lengths are only reported by BLAST+, so are looked up for
+    # BLASTALL (fragment fragNNNNN has length fraglengths[qname][NNNNN - 1])
     if mode == "ANIblastall":
-        qfraglengths = fraglengths[qname]
-        columns = [
-            "sid",
-            "blast_pid",
-            "blast_alnlen",
-            "blast_mismatch",
-            "blast_gaps",
-            "q_start",
-            "q_end",
-            "s_start",
-            "s_end",
-            "e_Value",
-            "bit_score",
-        ]
+        # Assuming that the filename format holds org1_vs_org2.blast_tab:
+        qname = filename.stem.split("_vs_")[0]
+        fragnums = data["qseqid"].str[4:].astype(np.int64).to_numpy()
+        qlen = fraglengths[qname][fragnums - 1]
     else:
-        columns = [
-            "sbjct_id",
-            "blast_alnlen",
-            "blast_mismatch",
-            "blast_pid",
-            "blast_identities",
-            "qlen",
-            "slen",
-            "q_start",
-            "q_end",
-            "s_start",
-            "s_end",
-            "blast_pos",
-            "ppos",
-            "blast_gaps",
-        ]
-    # We may receive an empty BLASTN output file, if there are no significant
-    # regions of homology. This causes pandas to throw an error on CSV import.
-    # To get past this, we create an empty dataframe with the appropriate
-    # columns.
-    try:
-        data = pd.read_csv(filename, header=None, sep="\t", index_col=0)
-        data.columns = columns
-    except pd.io.common.EmptyDataError:
-        data = pd.DataFrame(columns=columns)
-    # Add new column for fragment length, only for BLASTALL
-    if mode == "ANIblastall":
-        data["qlen"] = pd.Series(
-            [qfraglengths[idx] for idx in data.index], index=data.index
-        )
-    # Add new columns for recalculated alignment length, proportion, and
-    # percentage identity
-    data["ani_alnlen"] = data["blast_alnlen"] - data["blast_gaps"]
-    data["ani_alnids"] = data["ani_alnlen"] - data["blast_mismatch"]
-    data["ani_coverage"] = data["ani_alnlen"] / data["qlen"]
-    data["ani_pid"] = data["ani_alnids"] / data["qlen"]
-    # Filter rows on 'ani_coverage' > 0.7, 'ani_pid' > 0.3
-    filtered = data[(data["ani_coverage"] > 0.7) & (data["ani_pid"] > 0.3)]
-    # Dedupe query hits, so we only take the best hit
-    filtered = filtered.groupby(filtered.index).first()
-    # Replace NaNs with zero
-    filtered = filtered.fillna(value=0)  # Needed if no matches
+        qlen = data["qlen"].to_numpy()
+    # Recalculate alignment length, and identities
+    ani_alnlen = alnlen - gaps
+    ani_alnids = ani_alnlen - mismatch
+    # Filter hits on 'ani_coverage' > 0.7, 'ani_pid' > 0.3, and keep only the
+    # first (best) remaining hit for each query fragment. BLAST reports the
+    # hits for a query in order of score.
+    hits = np.flatnonzero((ani_alnlen / qlen > 0.7) & (ani_alnids / qlen > 0.3))
+    hits = hits[~pd.Series(qids[hits]).duplicated().to_numpy()]
     # The ANI value is then the mean percentage identity.
     # We report total alignment length and the number of similarity errors
     # (mismatches and gaps), as for ANIm
@@ -625,12 +1161,137 @@ def parse_blast_tab(
     # development indicated that a handful of fragments are differentially
     # filtered out in JSpecies and this script. This is often on the basis
     # of rounding differences (e.g. coverage being close to 70%).
-    # NOTE: If there are no hits, then ani_pid will be nan - we replace this
-    # with zero if that happens
-    ani_pid = filtered["blast_pid"].mean()
-    if pd.isnull(ani_pid):  # Happens if there are no matches in ANIb
-        ani_pid = 0
-    aln_length = filtered["ani_alnlen"].sum()
-    sim_errors = filtered["blast_mismatch"].sum() + filtered["blast_gaps"].sum()
-    filtered.to_csv(Path(filename).with_suffix(".blast_tab.dataframe"), sep="\t")
+    # NOTE: If there are no hits, then the mean identity is reported as zero
+    ani_pid = float(data["blast_pid"].to_numpy()[hits].mean()) if len(hits) else 0.0
+    aln_length = int(ani_alnlen[hits].sum())
+    sim_errors = int(mismatch[hits].sum() + gaps[hits].sum())
+    if write_dataframe:
+        filtered = data.iloc[hits].set_index("qseqid")
+        filtered["qlen"] = qlen[hits]
+        filtered["ani_alnlen"] = ani_alnlen[hits]
+        filtered["ani_alnids"] = ani_alnids[hits]
+        filtered["ani_coverage"] = ani_alnlen[hits] / qlen[hits]
+        filtered["ani_pid"] = ani_alnids[hits] / qlen[hits]
+        filtered.to_csv(Path(filename).with_suffix(".blast_tab.dataframe"), sep="\t")
     return aln_length, sim_errors, ani_pid
+
+
+# Parse blastn output against a combined database into per-genome results
+def parse_combined_blast_tab(filename: Path) -> Dict[str, Tuple[int, int, float]]:
+    """Return (alignment length, similarity errors, mean_pid) for each subject.
+
+    :param filename:  Path, path to blastn output against a combined database
+
+    Hits are assigned to subject genomes by their subject sequence IDs (see
+    build_combined_blastdb()), filtered as by parse_blast_tab(), and the
+    best hit to each subject genome kept for each query fragment. Returns
+    result tuples keyed by subject genome hash; genomes with no qualifying
+    hits are absent.
+    """
+    data = read_blast_tab(filename, dict(BLAST_TAB_COLUMNS["ANIb"], sseqid=(1, str)))
+    data["subject"] = data["sseqid"].map(get_combined_subject)
+    data["ani_alnlen"] = data["blast_alnlen"] - data["blast_gaps"]
+    data["sim_errors"] = data["blast_mismatch"] + data["blast_gaps"]
+    ani_alnids = data["ani_alnlen"] - data["blast_mismatch"]
+    # Filter hits as for a single subject genome, then keep the first (best)
+    # remaining hit to each subject genome for each query fragment
+    data = data[
+        (data["ani_alnlen"] / data["qlen"] > 0.7) & (ani_alnids / data["qlen"] > 0.3)
+    ].drop_duplicates(["subject", "qseqid"])
+    totals = data.groupby("subject").agg(
+        ani_alnlen=("ani_alnlen", "sum"),
+        sim_errors=("sim_errors", "sum"),
+        blast_pid=("blast_pid", "mean"),
+    )
+    return {
+        subject: (int(row.ani_alnlen), int(row.sim_errors), float(row.blast_pid))
+        for subject, row in totals.iterrows()
+    }
+
+
+# Sum qualifying best hits from BLAST+ tabular output, as it is read
+def summarise_blast_tab(
+    lines: Iterable[bytes], archive: Optional[BinaryIO] = None
+) -> Tuple[int, int, float]:
+    """Return (alignment length, similarity errors, mean_pid) for BLAST+ hits.
+
+    :param lines:  iterable of lines of ANIb BLAST+ tabular output, as bytes
+    :param archive:  optional binary file to which every line is also written
+
+    Hits are filtered and the best hit kept for each query fragment, as by
+    parse_blast_tab() in ANIb mode, but a line at a time, so that the output
+    of a running blastn process can be summarised without being held in
+    memory or written to disk. Only the percentage identities of qualifying
+    hits are kept, to calculate their mean.
+    """
+    columns = {name: pos for name, (pos, _) in BLAST_TAB_COLUMNS["ANIb"].items()}
+    seen = set()  # query fragments with a qualifying (best) hit
+    aln_length, sim_errors = 0, 0
+    pids = array("d")
+    for line in lines:
+        if archive is not None:
+            archive.write(line)
+        fields = line.split(b"\t")
+        if len(fields) < 2 or fields[columns["qseqid"]] in seen:
+            continue
+        qlen = int(fields[columns["qlen"]])
+        mismatch = int(fields[columns["blast_mismatch"]])
+        gaps = int(fields[columns["blast_gaps"]])
+        ani_alnlen = int(fields[columns["blast_alnlen"]]) - gaps
+        ani_alnids = ani_alnlen - mismatch
+        if ani_alnlen / qlen > 0.7 and ani_alnids / qlen > 0.3:
+            seen.add(fields[columns["qseqid"]])
+            aln_length += ani_alnlen
+            sim_errors += mismatch + gaps
+            pids.append(float(fields[columns["blast_pid"]]))
+    # The mean is calculated as by parse_blast_tab(), for identical results
+    ani_pid = float(np.frombuffer(pids, dtype=np.float64).mean()) if pids else 0.0
+    return aln_length, sim_errors, ani_pid
+
+
+# Run blastn for a query against a database, returning only the ANIb results
+def summarise_blastn_comparison(
+    fname1: Path,
+    fname2: Path,
+    blastn_exe: Path = pyani_config.BLASTN_DEFAULT,
+    archive: Optional[Path] = None,
+    threads: int = 1,
+) -> Tuple[int, int, float]:
+    """Return (alignment length, similarity errors, mean_pid) from blastn.
+
+    :param fname1:  path to query fragment FASTA file
+    :param fname2:  path to subject BLAST+ database
+    :param blastn_exe:  str, path to blastn executable
+    :param archive:  optional path for a gzip-compressed copy of the hits
+    :param threads:  int, number of threads for blastn to use
+
+    blastn is run as by construct_blastn_cmdline(), but writes its output to
+    a pipe, which is summarised as it is read (see summarise_blast_tab()),
+    so no .blast_tab file is written. If archive is given, the output is
+    also written there, and can be read by parse_blast_tab().
+
+    Raises subprocess.CalledProcessError if blastn fails.
+    """
+    cmd = shlex.split(
+        construct_blastn_cmdline(
+            Path(fname1), Path(fname2), Path(), blastn_exe, threads=threads
+        )
+    )
+    idx = cmd.index("-out")
+    del cmd[idx : idx + 2]  # blastn writes to stdout by default
+    with tempfile.TemporaryFile() as errfh:
+        with subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=errfh, shell=False
+        ) as proc:
+            ofh = gzip.open(archive, "wb") if archive is not None else None
+            try:
+                result = summarise_blast_tab(proc.stdout, ofh)
+            finally:
+                if ofh is not None:
+                    ofh.close()
+        if proc.returncode:
+            errfh.seek(0)
+            raise subprocess.CalledProcessError(
+                proc.returncode, cmd, stderr=errfh.read()
+            )
+    return result
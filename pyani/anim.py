@@ -52,14 +52,20 @@ counts, average nucleotide identity (ANI) percentages, and minimum aligned
 percentage (of whole genome) for each pairwise comparison.
 """
 
+import gzip
+import heapq
 import platform
 import re
 import subprocess
+import tempfile
 
 from logging import Logger
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
+from . import PyaniException
+from . import manifest
+from . import nucmer
 from . import pyani_config
 from . import pyani_files
 from . import pyani_jobs
@@ -67,6 +73,11 @@ from . import pyani_jobs
 from .pyani_tools import ANIResults
 
 
+class PyaniANImException(PyaniException):
+
+    """Exception raised when ANIm comparisons cannot be constructed or run."""
+
+
 # Get a list of FASTA files from the input directory
 def get_fasta_files(dirname: Path = Path(".")) -> Iterable:
     """Return iterable of FASTA files in the passed directory.
@@ -85,24 +96,121 @@ def get_version(nucmer_exe: Path = pyani_config.NUCMER_DEFAULT) -> str:
 
     :param nucmer_exe:  path to NUCmer executable
 
-    We expect NUCmer to return a string on STDERR as
+    We expect MUMmer3's NUCmer to return a string on STDERR as
 
     .. code-block:: bash
 
-        $ nucmer
+        $ nucmer -V
         NUCmer (NUCleotide MUMmer) version 3.1
 
-    we concatenate this with the OS name.
+    and MUMmer4's NUCmer to return only the package version on STDOUT, as
+
+    .. code-block:: bash
+
+        $ nucmer -V
+        4.0.0rc1
+
+    we concatenate this with the OS name. The two versions of NUCmer can
+    be told apart by the version number (see is_mummer4()).
     """
     cmdline = [nucmer_exe, "-V"]  # type: List
     result = subprocess.run(
         cmdline, shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
     )
     match = re.search(r"(?<=version\s)[0-9\.]*", str(result.stderr, "utf-8"))
-    version = match.group()  # type: ignore
+    if match is None:  # MUMmer4
+        match = re.search(r"^\s*([0-9][0-9\.]*\w*)", str(result.stdout, "utf-8"))
+    version = match.group().strip()  # type: ignore
     return f"{platform.system()}_{version}"
 
 
+# Identify MUMmer4 NUCmer from its version string
+def is_mummer4(nucmer_version: str) -> bool:
+    """Return True if the passed NUCmer version is from MUMmer4 or later.
+
+    :param nucmer_version:  NUCmer version, as returned by get_version()
+
+    Only MUMmer4's NUCmer can use several threads (see construct_nucmer_cmdline()).
+    """
+    match = re.search(r"_(\d+)\.", nucmer_version)
+    return match is not None and int(match.group(1)) >= 4
+
+
+# Get NUCmer options for the number of threads to use
+def get_thread_options(threads: int = 1) -> List[str]:
+    """Return MUMmer4 NUCmer options to use the passed number of threads.
+
+    :param threads:  number of threads for NUCmer to use
+
+    No options are returned for a single thread, so that commands remain
+    valid for MUMmer3's NUCmer.
+    """
+    return ["--threads", str(threads)] if threads > 1 else []
+
+
+# Get the path to the marker file written once a NUCmer index is complete
+def get_index_marker(index: Path) -> Path:
+    """Return path to the file marking a saved NUCmer index as complete.
+
+    :param index:  prefix of the saved MUMmer4 NUCmer reference index
+    """
+    return Path(str(index) + ".complete")
+
+
+# Generate a command line saving a reference genome's NUCmer index
+def construct_nucmer_index_cmdline(
+    reference: Path, index: Path, nucmer_exe: Path = pyani_config.NUCMER_DEFAULT
+) -> str:
+    """Return nucmer_index_wrapper.py command saving a reference genome's index.
+
+    :param reference:  path to reference FASTA file
+    :param index:  prefix for the saved index files
+    :param nucmer_exe:  location of MUMmer4's nucmer binary
+
+    See build_nucmer_index().
+    """
+    return f"nucmer_index_wrapper.py --nucmer_exe {nucmer_exe} {reference} {index}"
+
+
+# Build and save a reference genome's NUCmer index
+def build_nucmer_index(
+    reference: Path, index: Path, nucmer_exe: Path = pyani_config.NUCMER_DEFAULT
+) -> Path:
+    """Save the MUMmer4 NUCmer suffix array index for a reference genome.
+
+    :param reference:  path to reference FASTA file
+    :param index:  prefix for the saved index files
+    :param nucmer_exe:  location of MUMmer4's nucmer binary
+
+    The index is saved with NUCmer's --save option to a temporary directory
+    alongside the final location, and the files are then moved into place,
+    with the passed prefix. A marker file (see get_index_marker()) is written
+    last, so that an index left incomplete by a killed job is never used. If
+    the marker file already exists, the index is not built again. Comparisons
+    load the index with construct_nucmer_cmdline()'s index option, instead
+    of building it again. Returns the path to the marker file.
+
+    Raises subprocess.CalledProcessError if NUCmer fails.
+    """
+    index, marker = Path(index), get_index_marker(index)
+    if marker.is_file():
+        return marker
+    index.parent.mkdir(exist_ok=True, parents=True)
+    with tempfile.TemporaryDirectory(prefix="pyani_index_", dir=index.parent) as tmpdir:
+        tmpprefix = Path(tmpdir) / "index"
+        subprocess.run(
+            [str(nucmer_exe), "--save", str(tmpprefix), str(reference)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            shell=False,
+        )
+        for fname in Path(tmpdir).iterdir():
+            fname.replace(str(index) + fname.name[len(tmpprefix.name) :])
+    marker.touch()
+    return marker
+
+
 # Generate list of Job objects, one per NUCmer run
 def generate_nucmer_jobs(
     filenames: List[Path],
@@ -111,6 +219,8 @@ def generate_nucmer_jobs(
     filter_exe: Path = pyani_config.FILTER_DEFAULT,
     maxmatch: bool = False,
     jobprefix: str = "ANINUCmer",
+    native_filter: bool = False,
+    batchsize: int = 0,
 ):
     """Return list of Jobs describing NUCmer command-lines for ANIm.
 
@@ -120,16 +230,32 @@ def generate_nucmer_jobs(
     :param filter_exe:
     :param maxmatch:  Boolean flag indicating to use NUCmer's -maxmatch option
     :param jobprefix:
+    :param native_filter:  Boolean flag indicating to filter NUCmer output
+        in-process, in the same job as NUCmer, rather than with delta-filter
+    :param batchsize:  maximum number of query genomes to align against each
+        reference genome in a single NUCmer run (no batching if less than 2)
 
     Loop over all FASTA files, generating Jobs describing NUCmer command lines
-    for each pairwise comparison.
+    for each pairwise comparison. If native_filter is True, there is a single
+    job per comparison; otherwise each delta-filter job depends on its NUCmer
+    job. When batching, each NUCmer job covers several comparisons, and there
+    is a delta-filter job for each comparison, depending on the batch job.
     """
     ncmds, fcmds = generate_nucmer_commands(
-        filenames, outdir, nucmer_exe, filter_exe, maxmatch
+        filenames, outdir, nucmer_exe, filter_exe, maxmatch, native_filter, batchsize
     )
     joblist = []
     for idx, ncmd in enumerate(ncmds):
         njob = pyani_jobs.Job(f"{jobprefix}_{idx:06d}-n", ncmd)
+        if native_filter:
+            joblist.append(njob)
+            continue
+        if batchsize > 1:
+            for fidx, fcmd in enumerate(fcmds[idx]):
+                fjob = pyani_jobs.Job(f"{jobprefix}_{idx:06d}_{fidx:06d}-f", fcmd)
+                fjob.add_dependency(njob)
+                joblist.append(fjob)
+            continue
         fjob = pyani_jobs.Job(f"{jobprefix}_{idx:06d}-f", fcmds[idx])
         fjob.add_dependency(njob)
         joblist.append(fjob)
@@ -144,6 +270,8 @@ def generate_nucmer_commands(
     nucmer_exe: Path = pyani_config.NUCMER_DEFAULT,
     filter_exe: Path = pyani_config.FILTER_DEFAULT,
     maxmatch: bool = False,
+    native_filter: bool = False,
+    batchsize: int = 0,
 ) -> Tuple[List, List]:
     """Return list of NUCmer command-lines for ANIm.
 
@@ -151,23 +279,54 @@ def generate_nucmer_commands(
     :param outdir:  path to output directory
     :param nucmer_exe:  location of the nucmer binary
     :param maxmatch:  Boolean flag indicating to use NUCmer's -maxmatch option
+    :param native_filter:  Boolean flag indicating to filter NUCmer output
+        in-process
+    :param batchsize:  maximum number of query genomes to align against each
+        reference genome in a single NUCmer run (no batching if less than 2)
 
     The first element returned is a list of NUCmer commands, and the
     second a corresponding list of delta_filter_wrapper.py commands.
     The NUCmer commands should each be run before the corresponding
-    delta-filter command.
+    delta-filter command. If native_filter is True, each NUCmer command
+    also writes the filtered output, and the delta-filter commands are None.
+
+    If batchsize is 2 or more, each NUCmer command is a batch command (see
+    construct_nucmer_batch_cmdline()), and the corresponding element of the
+    second list is the list of delta-filter commands for that batch. Batches
+    require maxmatch, and PyaniANImException is raised without it.
 
     TODO: This return value needs to be reworked as a collection.
 
     Loop over all FASTA files generating NUCmer command lines for each
     pairwise comparison.
     """
-    nucmer_cmdlines, delta_filter_cmdlines = [], []
+    nucmer_cmdlines, delta_filter_cmdlines = [], []  # type: List, List
     filenames = sorted(filenames)  # enforce ordering of filenames
     for idx, fname1 in enumerate(filenames[:-1]):
+        if batchsize > 1:
+            others = filenames[idx + 1 :]
+            for bidx in range(0, len(others), batchsize):
+                ncmd, dcmds = construct_nucmer_batch_cmdline(
+                    fname1,
+                    others[bidx : bidx + batchsize],
+                    outdir,
+                    nucmer_exe,
+                    filter_exe,
+                    maxmatch,
+                    native_filter,
+                )
+                nucmer_cmdlines.append(ncmd)
+                delta_filter_cmdlines.append(dcmds)
+            continue
         for fname2 in filenames[idx + 1 :]:
             ncmd, dcmd = construct_nucmer_cmdline(
-                fname1, fname2, outdir, nucmer_exe, filter_exe, maxmatch
+                fname1,
+                fname2,
+                outdir,
+                nucmer_exe,
+                filter_exe,
+                maxmatch,
+                native_filter,
             )
             nucmer_cmdlines.append(ncmd)
             delta_filter_cmdlines.append(dcmd)
@@ -183,7 +342,11 @@ def construct_nucmer_cmdline(
     nucmer_exe: Path = pyani_config.NUCMER_DEFAULT,
     filter_exe: Path = pyani_config.FILTER_DEFAULT,
     maxmatch: bool = False,
-) -> Tuple[str, str]:
+    native_filter: bool = False,
+    compress: bool = False,
+    threads: int = 1,
+    index: Optional[Path] = None,
+) -> Tuple[str, Optional[str]]:
     """Return a tuple of corresponding NUCmer and delta-filter commands.
 
     :param fname1:  path to query FASTA file
@@ -193,6 +356,17 @@ def construct_nucmer_cmdline(
     :param filter_exe:
     :param maxmatch:  Boolean flag indicating whether to use NUCmer's -maxmatch
     option. If not, the -mum option is used instead
+    :param native_filter:  Boolean flag indicating to filter NUCmer output
+    in-process. If so, the NUCmer command is wrapped by nucmer_filter_wrapper.py
+    to write both .delta and .filter output, and no delta-filter command is
+    returned
+    :param compress:  Boolean flag indicating to gzip-compress the .delta and
+    .filter output once filtering is complete; the filtered output is written
+    to .filter.gz
+    :param threads:  number of threads for NUCmer to use; more than one
+    requires MUMmer4's NUCmer (see is_mummer4())
+    :param index:  prefix of the saved MUMmer4 NUCmer index for fname1, to be
+    loaded rather than building the index again (see build_nucmer_index())
 
     The split into a tuple was made necessary by changes to SGE/OGE.
     The delta-filter command must now be run as a dependency of the NUCmer
@@ -211,18 +385,421 @@ def construct_nucmer_cmdline(
         mode = "--maxmatch"
     else:
         mode = "--mum"
-    nucmercmd = "{0} {1} -p {2} {3} {4}".format(
-        nucmer_exe, mode, outprefix, fname1, fname2
+    nucmercmd = " ".join(
+        [str(nucmer_exe), mode]
+        + get_thread_options(threads)
+        + ([] if index is None else ["--load", str(index)])
+        + ["-p", str(outprefix), str(fname1), str(fname2)]
     )
+    if native_filter:
+        if compress:
+            return (f"nucmer_filter_wrapper.py --compress {nucmercmd}", None)
+        return (f"nucmer_filter_wrapper.py {nucmercmd}", None)
+    return (nucmercmd, construct_filter_cmdline(outprefix, filter_exe, compress))
+
+
+# Get the paths to the output files NUCmer and filtering may write for a prefix
+def get_nucmer_outputs(outprefix: Path) -> List[Path]:
+    """Return paths to the .delta and .filter files, or compressed copies, for a prefix.
+
+    :param outprefix:  path to NUCmer output, without .delta suffix
+    """
+    suffixes = (".delta", ".delta.gz", ".filter", ".filter.gz")
+    return [Path(str(outprefix) + _) for _ in suffixes]
+
+
+# Generate single delta-filter command line for a NUCmer output prefix
+def construct_filter_cmdline(
+    outprefix: Path,
+    filter_exe: Path = pyani_config.FILTER_DEFAULT,
+    compress: bool = False,
+) -> str:
+    """Return delta_filter_wrapper.py command filtering output with a prefix.
+
+    :param outprefix:  path to NUCmer output, without .delta suffix
+    :param filter_exe:  location of the delta-filter binary
+    :param compress:  Boolean flag indicating to write gzip-compressed
+    .filter.gz output, and then compress the .delta file
+    """
     # There's a subtle pathlib.Path issue, here. We must use string concatenation to add suffixes
     # to the outprefix files, as using path.with_suffix() instead can replace part of the filestem
     # in those cases where there is a period in the stem (this occurs frequently as it is part
     # of the NCBI notation for genome assembly versions)
-    filtercmd = (
+    suffix = ".filter.gz" if compress else ".filter"
+    return (
         f"delta_filter_wrapper.py {filter_exe} -1 {str(outprefix) + '.delta'} "
-        f"{str(outprefix) + '.filter'}"
+        f"{str(outprefix) + suffix}"
     )
-    return (nucmercmd, filtercmd)
+
+
+# Generate a single NUCmer command line aligning several queries to one reference
+def construct_nucmer_batch_cmdline(
+    fname1: Path,
+    fnames2: List[Path],
+    outdir: Path = Path("."),
+    nucmer_exe: Path = pyani_config.NUCMER_DEFAULT,
+    filter_exe: Path = pyani_config.FILTER_DEFAULT,
+    maxmatch: bool = False,
+    native_filter: bool = False,
+    compress: bool = False,
+    threads: int = 1,
+) -> Tuple[str, List[Optional[str]]]:
+    """Return a batched NUCmer command, and corresponding delta-filter commands.
+
+    :param fname1:  path to reference FASTA file
+    :param fnames2:  paths to query FASTA files
+    :param outdir:  path to output directory
+    :param nucmer_exe:
+    :param filter_exe:
+    :param maxmatch:  Boolean flag indicating whether to use NUCmer's -maxmatch
+    option. If not, the -mum option is used instead
+    :param native_filter:  Boolean flag indicating to filter NUCmer output
+    in-process. If so, no delta-filter commands are returned
+    :param compress:  Boolean flag indicating to gzip-compress the .delta and
+    .filter output for each pair once filtering is complete
+    :param threads:  number of threads for NUCmer to use (MUMmer4 only)
+
+    The batch command runs nucmer_batch_wrapper.py, which aligns all query
+    files against the reference in a single NUCmer run (see
+    run_nucmer_batch()), and writes the same .delta (and, if native_filter
+    is True, .filter) files as construct_nucmer_cmdline() would for each
+    pair. A delta-filter command is returned for each of these pairs.
+
+    With the -mum option, NUCmer anchors would have to be unique in the whole
+    batch of query sequences, so results could differ from those of pairwise
+    NUCmer runs. Batches therefore require maxmatch, and PyaniANImException is
+    raised without it.
+    """
+    if not maxmatch:
+        raise PyaniANImException("Cannot batch NUCmer query genomes without maxmatch")
+
+    # Cast path strings to pathlib.Path for safety
+    fname1, fnames2 = Path(fname1), [Path(_) for _ in fnames2]
+
+    options = []
+    if maxmatch:
+        options.append("--maxmatch")
+    if native_filter:
+        options.append("--native_filter")
+        if compress:
+            options.append("--compress")
+    options.extend(get_thread_options(threads))
+    batchcmd = " ".join(
+        ["nucmer_batch_wrapper.py"]
+        + options
+        + [f"--nucmer_exe {nucmer_exe} --outdir {outdir} {fname1}"]
+        + [str(_) for _ in fnames2]
+    )
+
+    outsubdir = outdir / pyani_config.ALIGNDIR["ANIm"]
+    filtercmds = [
+        None
+        if native_filter
+        else construct_filter_cmdline(
+            outsubdir / f"{fname1.stem}_vs_{fname2.stem}", filter_exe, compress
+        )
+        for fname2 in fnames2
+    ]  # type: List[Optional[str]]
+    return (batchcmd, filtercmds)
+
+
+# Concatenate query FASTA files, tagging each sequence with its file's index
+def write_query_batch(queries: List[Path], outfname: Path) -> Path:
+    """Write the sequences in the passed FASTA files to a single tagged file.
+
+    :param queries:  paths to query FASTA files
+    :param outfname:  path to the output multi-FASTA file
+
+    Each sequence ID is prefixed with the index of its file in queries (see
+    nucmer.BATCH_TAG), so that NUCmer output can be split by query file.
+    """
+    with outfname.open("wb") as ofh:
+        for idx, query in enumerate(queries):
+            tag = nucmer.BATCH_TAG.format(idx).encode()
+            with Path(query).open("rb") as ifh:
+                for line in ifh:
+                    if line.startswith(b">"):
+                        line = b">" + tag + line[1:]
+                    ofh.write(line)
+    return outfname
+
+
+# Run a single NUCmer batch, and split its output into per-pair .delta files
+def run_nucmer_batch(
+    reference: Path,
+    queries: List[Path],
+    outdir: Path = Path("."),
+    nucmer_exe: Path = pyani_config.NUCMER_DEFAULT,
+    maxmatch: bool = False,
+    native_filter: bool = False,
+    compress: bool = False,
+    threads: int = 1,
+) -> List[Path]:
+    """Align several query files against one reference in a single NUCmer run.
+
+    :param reference:  path to reference FASTA file
+    :param queries:  paths to query FASTA files
+    :param outdir:  path to output directory
+    :param nucmer_exe:  location of the nucmer binary
+    :param maxmatch:  Boolean flag indicating to use NUCmer's -maxmatch option
+    :param native_filter:  Boolean flag indicating to also write the filtered
+        output for each pair in-process
+    :param compress:  Boolean flag indicating, with native_filter, to write
+        gzip-compressed .filter.gz and .delta.gz files for each pair
+    :param threads:  number of threads for NUCmer to use (MUMmer4 only)
+
+    The query files are concatenated into a temporary multi-FASTA file, with
+    tagged sequence IDs, and aligned against the reference, so the reference
+    index is built once per batch instead of once per pair. The combined
+    .delta output is split by query file into the same .delta files that
+    construct_nucmer_cmdline() would produce. Returns the paths to the .delta
+    files (or .filter files, if native_filter is True), in the order of
+    queries.
+
+    Raises PyaniANImException if maxmatch is False, as anchor matches must
+    not be required to be unique in the whole batch (see
+    construct_nucmer_batch_cmdline()), and subprocess.CalledProcessError if
+    NUCmer fails.
+    """
+    if not maxmatch:
+        raise PyaniANImException("Cannot batch NUCmer query genomes without maxmatch")
+
+    reference, queries = Path(reference), [Path(_) for _ in queries]
+    outsubdir = outdir / pyani_config.ALIGNDIR["ANIm"]
+    outprefixes = [outsubdir / f"{reference.stem}_vs_{_.stem}" for _ in queries]
+    mode = "--maxmatch" if maxmatch else "--mum"
+
+    with tempfile.TemporaryDirectory(prefix="pyani_batch_", dir=outsubdir) as tmpdir:
+        batchfile = write_query_batch(queries, Path(tmpdir) / "queries.fna")
+        batchprefix = Path(tmpdir) / "batch"
+        subprocess.run(
+            [str(nucmer_exe), mode]
+            + get_thread_options(threads)
+            + ["-p", str(batchprefix), str(reference), str(batchfile)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            shell=False,
+        )
+        outfnames = nucmer.split_delta(
+            Path(str(batchprefix) + ".delta"),
+            [Path(str(_) + ".delta") for _ in outprefixes],
+            queries,
+        )
+
+    if native_filter:
+        suffix = ".filter.gz" if compress else ".filter"
+        outfnames = [
+            nucmer.filter_delta(_, Path(str(prefix) + suffix))
+            for _, prefix in zip(outfnames, outprefixes)
+        ]
+        if compress:
+            for prefix in outprefixes:
+                nucmer.compress_delta(Path(str(prefix) + ".delta"))
+    return outfnames
+
+
+# Get the ID and length of each sequence in a FASTA file
+def get_sequence_lengths(fname: Path) -> List[Tuple[bytes, int]]:
+    """Return (sequence ID, length) for each sequence in a FASTA file, in order.
+
+    :param fname:  path to FASTA file
+    """
+    lengths = []  # type: List[Tuple[bytes, int]]
+    with Path(fname).open("rb") as ifh:
+        for line in ifh:
+            if line.startswith(b">"):
+                lengths.append((line[1:].split()[0], 0))
+            elif lengths:
+                lengths[-1] = (lengths[-1][0], lengths[-1][1] + len(line.strip()))
+    return lengths
+
+
+# Split a large query FASTA file into chunks of whole sequences
+def write_query_chunks(query: Path, outdir: Path, chunksize: int) -> List[Path]:
+    """Write the sequences of a query FASTA file to balanced chunk files.
+
+    :param query:  path to query FASTA file
+    :param outdir:  path to directory for the chunk files
+    :param chunksize:  target total sequence length of each chunk
+
+    If the query is longer than chunksize, its sequences are divided between
+    as many chunks as are needed for each to hold about chunksize bases (but
+    no more chunks than there are sequences). Sequences are never split, so
+    each chunk aligns exactly as it would as part of the whole query, with
+    NUCmer's --maxmatch option. Each sequence is placed in turn, longest
+    first, in the chunk with the least sequence so far, to balance the
+    chunks. Returns the paths to the chunk files, named for the query file
+    and the chunk's index, or an empty list if the query is not split.
+    """
+    query = Path(query)
+    lengths = get_sequence_lengths(query)
+    nchunks = min(-(-sum(_[1] for _ in lengths) // chunksize), len(lengths))
+    if nchunks < 2:
+        return []
+
+    # Assign each sequence to the currently smallest chunk, longest first
+    heap = [(0, idx) for idx in range(nchunks)]
+    assignment = {}  # type: Dict[bytes, int]
+    for seqid, length in sorted(lengths, key=lambda _: -_[1]):
+        total, idx = heapq.heappop(heap)
+        assignment[seqid] = idx
+        heapq.heappush(heap, (total + length, idx))
+
+    # Write each sequence, in the order of the query file, to its chunk
+    outdir.mkdir(exist_ok=True, parents=True)
+    chunks = [outdir / f"{query.stem}_chunk{_:03d}.fna" for _ in range(nchunks)]
+    handles = [_.open("wb") for _ in chunks]
+    try:
+        with query.open("rb") as ifh:
+            ofh = handles[0]
+            for line in ifh:
+                if line.startswith(b">"):
+                    ofh = handles[assignment[line[1:].split()[0]]]
+                ofh.write(line)
+    finally:
+        for handle in handles:
+            handle.close()
+    return chunks
+
+
+# Generate NUCmer command lines aligning each chunk of a query to a reference
+def construct_nucmer_split_cmdlines(
+    fname1: Path,
+    fname2: Path,
+    chunks: List[Path],
+    outdir: Path = Path("."),
+    nucmer_exe: Path = pyani_config.NUCMER_DEFAULT,
+    filter_exe: Path = pyani_config.FILTER_DEFAULT,
+    maxmatch: bool = False,
+    native_filter: bool = False,
+    compress: bool = False,
+    threads: int = 1,
+    index: Optional[Path] = None,
+) -> Tuple[List[str], str]:
+    """Return NUCmer commands for each chunk of a query, and a merging command.
+
+    :param fname1:  path to reference FASTA file
+    :param fname2:  path to query FASTA file
+    :param chunks:  paths to chunks of the query (see write_query_chunks())
+    :param outdir:  path to output directory
+    :param nucmer_exe:
+    :param filter_exe:
+    :param maxmatch:  Boolean flag indicating whether to use NUCmer's -maxmatch
+    option. If not, the -mum option is used instead
+    :param native_filter:  Boolean flag indicating to filter the merged output
+    in-process, rather than with delta-filter
+    :param compress:  Boolean flag indicating to gzip-compress the merged
+    .delta and .filter output once filtering is complete
+    :param threads:  number of threads for NUCmer to use (MUMmer4 only)
+    :param index:  prefix of the saved MUMmer4 NUCmer index for fname1, to be
+    loaded by each NUCmer command (see build_nucmer_index())
+
+    Each chunk is aligned against the reference by its own NUCmer command,
+    so that the chunks can run in parallel. The merging command runs
+    nucmer_merge_wrapper.py, which must run once all the NUCmer commands are
+    complete. It merges their output into the .delta file that
+    construct_nucmer_cmdline() would produce for the whole query, and filters
+    it (see merge_nucmer_chunks()).
+
+    With the -mum option, NUCmer anchors must be unique in the query, and
+    would only be unique in each chunk, so results could differ from those
+    of a single NUCmer run. Splitting therefore requires maxmatch, and
+    PyaniANImException is raised without it.
+    """
+    if not maxmatch:
+        raise PyaniANImException("Cannot split NUCmer query genomes without maxmatch")
+
+    # Cast path strings to pathlib.Path for safety
+    fname1, fname2 = Path(fname1), Path(fname2)
+
+    nucmercmds = [
+        construct_nucmer_cmdline(
+            fname1,
+            chunk,
+            outdir,
+            nucmer_exe,
+            maxmatch=True,
+            threads=threads,
+            index=index,
+        )[0]
+        for chunk in chunks
+    ]
+    options = ["--native_filter"] if native_filter else [f"--filter_exe {filter_exe}"]
+    if compress:
+        options.append("--compress")
+    mergecmd = " ".join(
+        ["nucmer_merge_wrapper.py"]
+        + options
+        + [f"--outdir {outdir} {fname1} {fname2}"]
+        + [str(_) for _ in chunks]
+    )
+    return (nucmercmds, mergecmd)
+
+
+# Merge NUCmer output for chunks of a query, and filter it
+def merge_nucmer_chunks(
+    reference: Path,
+    query: Path,
+    chunks: List[Path],
+    outdir: Path = Path("."),
+    filter_exe: Path = pyani_config.FILTER_DEFAULT,
+    native_filter: bool = False,
+    compress: bool = False,
+) -> Path:
+    """Merge NUCmer output for each chunk of a query into one filtered comparison.
+
+    :param reference:  path to reference FASTA file
+    :param query:  path to query FASTA file
+    :param chunks:  paths to the chunks of the query that were aligned
+    :param outdir:  path to output directory
+    :param filter_exe:  location of the delta-filter binary
+    :param native_filter:  Boolean flag indicating to filter the merged
+        output in-process, rather than with delta-filter
+    :param compress:  Boolean flag indicating to write gzip-compressed
+        .filter.gz and .delta.gz files
+
+    The .delta file for each chunk (see construct_nucmer_split_cmdlines())
+    is merged into the .delta file that construct_nucmer_cmdline() would
+    produce for the whole query (see nucmer.merge_delta()), and the chunk
+    output is removed. The merged output is then filtered as a single
+    comparison, as delta-filter -1 must see all alignments of each sequence.
+    Returns the path to the filtered output.
+
+    Raises subprocess.CalledProcessError if delta-filter fails.
+    """
+    reference, query = Path(reference), Path(query)
+    outsubdir = outdir / pyani_config.ALIGNDIR["ANIm"]
+    outprefix = str(outsubdir / f"{reference.stem}_vs_{query.stem}")
+    chunkfnames = [
+        outsubdir / f"{reference.stem}_vs_{Path(_).stem}.delta" for _ in chunks
+    ]
+
+    deltafname = nucmer.merge_delta(
+        chunkfnames,
+        Path(outprefix + ".delta"),
+        query,
+        [_[0] for _ in get_sequence_lengths(query)],
+    )
+    for fname in chunkfnames:
+        fname.unlink()
+
+    filterfname = Path(outprefix + (".filter.gz" if compress else ".filter"))
+    if native_filter:
+        nucmer.filter_delta(deltafname, filterfname)
+    else:
+        with nucmer.open_delta(filterfname, "wb") as ofh:
+            result = subprocess.run(
+                [str(filter_exe), "-1", str(deltafname)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+                shell=False,
+            )
+            ofh.write(result.stdout)
+    if compress:
+        nucmer.compress_delta(deltafname)
+    return filterfname
 
 
 # Parse NUCmer delta file to get total alignment length and total sim_errors
@@ -270,29 +847,125 @@ def parse_delta(filename: Path) -> Tuple[int, int]:
 
     A is the reference and has length 11. There are two insertions (positive delta),
     and one deletion (negative delta). Alignment length is then 11 + 1 = 12.
+
+    The file is streamed in blocks by ``nucmer.summarise_delta()``, so memory use
+    does not grow with the size of the .delta file. Only alignment region
+    headers and deletion lines contribute to the totals. Gzip-compressed files
+    are decompressed as they are read (see ``nucmer.open_delta()``).
     """
-    in_aln, aln_length, sim_errors = False, 0, 0
-    for line in [_.strip().split() for _ in filename.open("r").readlines()]:
-        if line[0] == "NUCMER" or line[0].startswith(">"):  # Skip headers
-            continue
-        # Lines with seven columns are alignment region headers:
-        if len(line) == 7:
-            aln_length += abs(int(line[1]) - int(line[0])) + 1  # reference length
-            sim_errors += int(line[4])  # count of non-identities and indels
-            in_aln = True
-        # Lines with a single column (following a header) report numbers of symbols
-        # until next insertion (+ve) or deletion (-ve) in the reference; one line per
-        # insertion/deletion; the alignment always ends with 0
-        if in_aln and line[0].startswith("0"):
-            in_aln = False
-        elif in_aln:
-            # Add one to the alignment length for each reference insertion; subtract
-            # one for each deletion
-            val = int(line[0])
-            if val < 1:  # deletion in reference
-                aln_length += 1
-            elif val == 0:  # ends the alignment entry
-                in_aln = False
+    with nucmer.open_delta(filename, "rb") as ifh:
+        return nucmer.summarise_delta(ifh)
+
+
+# Parse NUCmer delta file to get alignment totals, and bases covered on each genome
+def parse_delta_coverage(filename: Path) -> Tuple[int, int, int, int]:
+    """Return alignment length, similarity errors and covered bases from a .delta.
+
+    :param filename:  Path, path to the input .delta file
+
+    Returns (alignment length, similarity errors, reference covered bases,
+    query covered bases). The first two values are as for ``parse_delta()``.
+    Covered bases are the lengths of the union of aligned regions on the
+    reference (first) and query (second) genomes, so that bases in more than
+    one alignment, e.g. with NUCmer's --maxmatch option, are counted once.
+    All values are calculated in a single pass through the file (see
+    ``nucmer.DeltaCoverage``).
+    """
+    coverage = nucmer.DeltaCoverage()
+    with nucmer.open_delta(filename, "rb") as ifh:
+        aln_length, sim_errors = nucmer.summarise_delta(ifh, coverage=coverage)
+    return (aln_length, sim_errors) + coverage.covered()
+
+
+# Run NUCmer on a pair of files, returning only the alignment length and errors
+def summarise_nucmer_comparison(
+    fname1: Path,
+    fname2: Path,
+    nucmer_exe: Path = pyani_config.NUCMER_DEFAULT,
+    filter_exe: Path = pyani_config.FILTER_DEFAULT,
+    maxmatch: bool = False,
+    nofilter: bool = False,
+    native_filter: bool = False,
+    archive: Optional[Path] = None,
+    coverage: bool = False,
+    threads: int = 1,
+) -> Tuple[int, ...]:
+    """Return (alignment length, similarity errors) from NUCmer on a pair of files.
+
+    :param fname1:  path to query FASTA file
+    :param fname2:  path to subject FASTA file
+    :param nucmer_exe:  location of the nucmer binary
+    :param filter_exe:  location of the delta-filter binary
+    :param maxmatch:  Boolean flag indicating to use NUCmer's -maxmatch option
+    :param nofilter:  Boolean flag indicating not to filter for 1:1 matches
+    :param native_filter:  Boolean flag indicating to filter for 1:1 matches
+        in-process, rather than with delta-filter
+    :param archive:  optional path for a gzip-compressed copy of the alignment
+    :param coverage:  Boolean flag indicating to also return the bases covered
+        on each genome, as for ``parse_delta_coverage()``
+    :param threads:  number of threads for NUCmer to use (MUMmer4 only)
+
+    NUCmer writes its .delta output to a temporary directory (honouring the
+    TMPDIR environment variable, so node-local scratch space can be used).
+    The output is filtered there by delta-filter (or, if native_filter is
+    True, by the in-process one-to-one filter as it is read), and summed as
+    in ``parse_delta()``. The temporary directory is then removed, so no
+    .delta or .filter files are left in the output directory. If archive is
+    given, the (filtered) alignment is also written there, and added to the
+    manifest of completed output in its directory.
+
+    Raises subprocess.CalledProcessError if NUCmer or delta-filter fails.
+    """
+    fname1, fname2 = Path(fname1), Path(fname2)
+    mode = "--maxmatch" if maxmatch else "--mum"
+    with tempfile.TemporaryDirectory(prefix="pyani_nucmer_") as tmpdir:
+        outprefix = Path(tmpdir) / f"{fname1.stem}_vs_{fname2.stem}"
+        subprocess.run(
+            [str(nucmer_exe), mode]
+            + get_thread_options(threads)
+            + ["-p", str(outprefix), str(fname1), str(fname2)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            shell=False,
+        )
+
+        outfname = Path(str(outprefix) + ".delta")
+        if not (nofilter or native_filter):
+            deltafname, outfname = outfname, Path(str(outprefix) + ".filter")
+            with outfname.open("wb") as ofh:
+                subprocess.run(
+                    [str(filter_exe), "-1", str(deltafname)],
+                    stdout=ofh,
+                    stderr=subprocess.PIPE,
+                    check=True,
+                    shell=False,
+                )
+
+        aln_length, sim_errors = 0, 0
+        covered = nucmer.DeltaCoverage() if coverage else None
+        with outfname.open("rb") as ifh:
+            if native_filter and not nofilter:
+                blocks = nucmer.iter_filtered_delta(ifh)
+            else:
+                blocks = nucmer.iter_delta_blocks(ifh)
+            ofh = gzip.open(archive, "wb") if archive is not None else None
+            try:
+                for block in blocks:
+                    if ofh is not None:
+                        ofh.write(block)
+                    block_length, block_errors = nucmer.summarise_delta_block(block)
+                    aln_length += block_length
+                    sim_errors += block_errors
+                    if covered is not None:
+                        covered.update(block)
+            finally:
+                if ofh is not None:
+                    ofh.close()
+    if archive is not None:
+        manifest.record_output(archive)
+    if covered is not None:
+        return (aln_length, sim_errors) + covered.covered()
     return aln_length, sim_errors
 
 
@@ -317,8 +990,13 @@ def process_deltadir(
     very distant sequence was included in the analysis.
     """
     # Process directory to identify input files - as of v0.2.4 we use the
-    # .filter files that result from delta-filter (1:1 alignments)
-    deltafiles = pyani_files.get_input_files(delta_dir, ".filter")
+    # .filter files that result from delta-filter (1:1 alignments), which
+    # may be gzip-compressed
+    deltafiles = pyani_files.get_input_files(delta_dir, ".filter") + [
+        fname
+        for fname in pyani_files.get_input_files(delta_dir, ".gz")
+        if Path(fname.stem).suffix == ".filter"
+    ]
 
     # Hold data in ANIResults object
     results = ANIResults(list(org_lengths.keys()), "ANIm")
@@ -330,7 +1008,7 @@ def process_deltadir(
     # Process .delta files assuming that the filename format holds:
     # org1_vs_org2.delta
     for deltafile in deltafiles:
-        qname, sname = deltafile.stem.split("_vs_")
+        qname, sname = deltafile.name.split(".filter")[0].split("_vs_")
 
         # We may have .delta files from other analyses in the same directory
         # If this occurs, we raise a warning, and skip the .delta file
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2016-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Code to implement the alignment-free sketch-based ANI (ANIsketch) method.
+
+Each genome is represented by a FracMinHash sketch: the set of hashes of its
+canonical k-mers that fall below a fixed fraction (1/scaled) of the hash
+space. Sketches of different genomes built with the same k-mer size and
+scale factor can be compared directly, to estimate the Jaccard index and
+containment of the genomes' k-mer sets, and from these, their average
+nucleotide identity (ANI).
+
+Sketches are built with NumPy: sequences are 2-bit encoded, canonical k-mers
+(the lesser of each k-mer and its reverse complement) are packed into 64-bit
+integers (so k may be at most 31), and hashed with the SplitMix64 finaliser.
+
+Sketches may be cached on disk, keyed by the MD5 hash of the genome file
+(``Genome.genome_hash``), so that each genome is sketched only once.
+"""
+
+import os
+
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from Bio import SeqIO  # type: ignore
+
+
+# Default k-mer size and FracMinHash scale factor
+KSIZE = 21
+SCALED = 1000
+
+# ANI estimators: from the Jaccard index (as Mash), or from the greater of
+# the two containments (as FracMinHash containment ANI)
+ESTIMATORS = ("jaccard", "containment")
+
+# Number of sequence positions to hash at a time; bounds memory use for
+# long sequences
+CHUNKSIZE = 1 << 22
+
+# Lookup table for 2-bit nucleotide encoding; other symbols are 4 (invalid)
+NT_CODES = np.full(256, 4, dtype=np.uint8)
+for _idx, _nt in enumerate(b"ACGT"):
+    NT_CODES[_nt] = _idx
+    NT_CODES[ord(chr(_nt).lower())] = _idx
+
+
+class Sketch(NamedTuple):
+
+    """FracMinHash sketch of a genome's canonical k-mers."""
+
+    hashes: np.ndarray  # sorted, unique uint64 hash values
+    ksize: int
+    scaled: int
+
+
+class SketchComparison(NamedTuple):
+
+    """Estimates from the comparison of two sketches."""
+
+    intersection: int  # number of hashes shared by both sketches
+    jaccard: float
+    containment_query: float  # fraction of query hashes in subject
+    containment_subject: float  # fraction of subject hashes in query
+    identity: float  # estimated ANI, as a fraction
+
+
+def hash_kmers(seq: bytes, ksize: int = KSIZE) -> np.ndarray:
+    """Return hash of each canonical k-mer in the passed sequence.
+
+    :param seq:  nucleotide sequence, as bytes
+    :param ksize:  k-mer size (at most 31)
+
+    K-mers containing symbols other than ACGT are skipped. Hash values may
+    be repeated, and are returned in order of position.
+    """
+    if not 0 < ksize < 32:
+        raise ValueError(f"k-mer size must be between 1 and 31 (not {ksize})")
+    codes = NT_CODES[np.frombuffer(seq, dtype=np.uint8)]
+    nkmers = len(codes) - ksize + 1
+    if nkmers < 1:
+        return np.zeros(0, dtype=np.uint64)
+
+    # Windows containing any invalid symbol are excluded
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = (invalid[ksize:] - invalid[:-ksize]) == 0
+    codes = np.where(codes == 4, 0, codes).astype(np.uint64)
+
+    # Pack the k-mer starting at each position, and its reverse complement
+    forward = np.zeros(nkmers, dtype=np.uint64)
+    reverse = np.zeros(nkmers, dtype=np.uint64)
+    for offset in range(ksize):
+        window = codes[offset : offset + nkmers]
+        forward = (forward << np.uint64(2)) | window
+        reverse |= (np.uint64(3) - window) << np.uint64(2 * offset)
+    return mix64(np.minimum(forward, reverse)[valid])
+
+
+def mix64(values: np.ndarray) -> np.ndarray:
+    """Return SplitMix64 finaliser hash of each passed uint64 value."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def iter_chunks(seq: bytes, ksize: int, chunksize: int = CHUNKSIZE) -> Iterator[bytes]:
+    """Yield overlapping chunks of the passed sequence, covering every k-mer.
+
+    :param seq:  nucleotide sequence
+    :param ksize:  k-mer size
+    :param chunksize:  number of k-mer start positions in each chunk
+    """
+    for start in range(0, max(len(seq) - ksize + 1, 1), chunksize):
+        yield seq[start : start + chunksize + ksize - 1]
+
+
+def sketch_sequences(
+    seqs: Iterator[bytes],
+    ksize: int = KSIZE,
+    scaled: int = SCALED,
+    chunksize: int = CHUNKSIZE,
+) -> Sketch:
+    """Return FracMinHash sketch of the canonical k-mers in the passed sequences.
+
+    :param seqs:  iterable of nucleotide sequences, as bytes
+    :param ksize:  k-mer size (at most 31)
+    :param scaled:  scale factor; approximately one in scaled k-mers is kept
+    :param chunksize:  number of k-mer start positions to hash at a time
+    """
+    max_hash = np.uint64((2 ** 64 - 1) // scaled)
+    hashes = [np.zeros(0, dtype=np.uint64)]
+    for seq in seqs:
+        for chunk in iter_chunks(seq, ksize, chunksize):
+            chunk_hashes = hash_kmers(chunk, ksize)
+            hashes.append(np.unique(chunk_hashes[chunk_hashes <= max_hash]))
+    return Sketch(np.unique(np.concatenate(hashes)), ksize, scaled)
+
+
+def sketch_genome(filename: Path, ksize: int = KSIZE, scaled: int = SCALED) -> Sketch:
+    """Return FracMinHash sketch of the sequences in the passed FASTA file.
+
+    :param filename:  path to FASTA genome file
+    :param ksize:  k-mer size (at most 31)
+    :param scaled:  scale factor; approximately one in scaled k-mers is kept
+    """
+    return sketch_sequences(
+        (bytes(rec.seq) for rec in SeqIO.parse(str(filename), "fasta")),
+        ksize,
+        scaled,
+    )
+
+
+def get_sketch_path(
+    sketchdir: Path, genome_hash: str, ksize: int = KSIZE, scaled: int = SCALED
+) -> Path:
+    """Return path to the cached sketch for a genome, with the passed parameters.
+
+    :param sketchdir:  path to sketch cache directory
+    :param genome_hash:  MD5 hash of the genome file
+    :param ksize:  k-mer size
+    :param scaled:  scale factor
+    """
+    return sketchdir / f"{genome_hash}_k{ksize}_scaled{scaled}.npy"
+
+
+def load_or_build_sketch(
+    filename: Path,
+    genome_hash: str,
+    sketchdir: Optional[Path] = None,
+    ksize: int = KSIZE,
+    scaled: int = SCALED,
+) -> Sketch:
+    """Return sketch of the passed genome, from the cache if possible.
+
+    :param filename:  path to FASTA genome file
+    :param genome_hash:  MD5 hash of the genome file
+    :param sketchdir:  path to sketch cache directory (no caching if None)
+    :param ksize:  k-mer size (at most 31)
+    :param scaled:  scale factor
+
+    Newly-built sketches are written to the cache directory. The cache file
+    is written under a temporary name, unique to this process, and then
+    renamed, so that concurrent processes never read a partially-written
+    sketch.
+    """
+    if sketchdir is None:
+        return sketch_genome(filename, ksize, scaled)
+
+    sketchpath = get_sketch_path(sketchdir, genome_hash, ksize, scaled)
+    if sketchpath.is_file():
+        return Sketch(np.load(sketchpath), ksize, scaled)
+
+    sketch = sketch_genome(filename, ksize, scaled)
+    tmppath = sketchpath.with_name(f"{sketchpath.name}.{os.getpid()}.tmp")
+    with tmppath.open("wb") as ofh:
+        np.save(ofh, sketch.hashes)
+    tmppath.replace(sketchpath)
+    return sketch
+
+
+def compare_sketches(
+    query: Sketch, subject: Sketch, estimator: str = "jaccard"
+) -> SketchComparison:
+    """Return estimated Jaccard index, containments and ANI for two sketches.
+
+    :param query:  Sketch of query genome
+    :param subject:  Sketch of subject genome
+    :param estimator:  ANI estimator, one of ESTIMATORS
+
+    With the "jaccard" estimator, ANI is estimated from the Jaccard index J
+    as 1 - D, where D = -ln(2J / (1 + J)) / k is the Mash distance. With the
+    "containment" estimator, ANI is estimated as C^(1/k), where C is the
+    greater of the two containments. Genomes with no shared hashes are given
+    an ANI of zero.
+    """
+    if (query.ksize, query.scaled) != (subject.ksize, subject.scaled):
+        raise ValueError("Sketches must have the same k-mer size and scale factor")
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown ANI estimator: {estimator}")
+
+    intersection = len(np.intersect1d(query.hashes, subject.hashes, assume_unique=True))
+    union = len(query.hashes) + len(subject.hashes) - intersection
+    jaccard = intersection / union if union else 0.0
+    cont_query = intersection / len(query.hashes) if len(query.hashes) else 0.0
+    cont_subject = intersection / len(subject.hashes) if len(subject.hashes) else 0.0
+
+    if not intersection:
+        identity = 0.0
+    elif estimator == "jaccard":
+        identity = 1 + np.log(2 * jaccard / (1 + jaccard)) / query.ksize
+    else:
+        identity = max(cont_query, cont_subject) ** (1 / query.ksize)
+    return SketchComparison(
+        intersection, jaccard, cont_query, cont_subject, max(float(identity), 0.0)
+    )
+
+
+def estimate_alignment(
+    comparison: SketchComparison, scaled: int = SCALED
+) -> Tuple[int, int]:
+    """Return (aligned length, similarity errors) estimated from a comparison.
+
+    :param comparison:  SketchComparison of two genomes
+    :param scaled:  scale factor of the compared sketches
+
+    Each shared hash represents, on average, scaled shared k-mer positions,
+    so the aligned length is estimated as intersection * scaled; errors are
+    estimated as the non-identical fraction of that length. These are
+    approximations, given for consistency with alignment-based methods.
+    """
+    aln_length = comparison.intersection * scaled
+    return aln_length, int(round(aln_length * (1 - comparison.identity)))
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2016-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Code to cache pairwise comparison results, for reuse between runs.
+
+The pyani database only allows reuse of comparisons within that database,
+and recovery mode only reuses output in a single output directory. This
+module provides a persistent cache of comparison results that can be shared
+between runs, output directories and databases.
+
+Each cache entry is keyed on the MD5 hashes of the query and subject genome
+files, and the program, program version and settings used for the
+comparison. An entry holds the summary values for the comparison (alignment
+length and similarity errors) and, optionally, a gzip-compressed copy of the
+(filtered) alignment output. Entries are stored under the SHA-256 digest of
+their key, as:
+
+    <cachedir>/<digest[:2]>/<digest>.json  - summary values and key
+    <cachedir>/<digest[:2]>/<digest>.gz    - compressed alignment (optional)
+
+The modification time of each entry's .json file records when it was last
+used, and the cache is pruned to a maximum size by removing the least
+recently used entries first. Files are written under temporary names and
+then renamed, so that processes sharing a cache never see a partial entry.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from . import PyaniException
+
+
+# Default maximum cache size (bytes)
+CACHE_SIZE = 10 * 1024 ** 3
+
+# Multipliers for size suffixes accepted by parse_size()
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+class PyaniCacheException(PyaniException):
+
+    """Exception raised when using the comparison cache fails."""
+
+
+class CacheKey(NamedTuple):
+
+    """Identifies a pairwise comparison result in the cache."""
+
+    query_hash: str
+    subject_hash: str
+    program: str
+    version: str
+    maxmatch: Optional[bool] = None
+    fragsize: Optional[int] = None
+
+    @property
+    def digest(self) -> str:
+        """Return SHA-256 hex digest identifying this key."""
+        return hashlib.sha256(
+            "\t".join(str(_) for _ in self).encode("utf-8")
+        ).hexdigest()
+
+
+class CacheEntry(NamedTuple):
+
+    """Summary values for a cached pairwise comparison."""
+
+    aln_length: int
+    sim_errs: int
+
+
+class CacheUsage(NamedTuple):
+
+    """Summary of comparison cache contents."""
+
+    entries: int  # number of cached comparisons
+    alignments: int  # number of cached comparisons with alignment output
+    size: int  # total size of cache files (bytes)
+    programs: Dict[Tuple[str, str], int]  # entry count by (program, version)
+
+
+def parse_size(size: str) -> int:
+    """Return size in bytes from a string such as '500M' or '10G'.
+
+    :param size:  integer, optionally followed by one of K, M, G or T
+        (binary multiples; a trailing 'B' or 'iB' is allowed)
+    """
+    match = re.match(r"^\s*(\d+)\s*([KMGT]?)(I?B)?\s*$", str(size).upper())
+    if match is None:
+        raise ValueError(f"Could not interpret size: {size}")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2)]
+
+
+def format_size(size: int) -> str:
+    """Return human-readable string for a size in bytes."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+
+class ComparisonCache:
+
+    """Persistent, size-limited cache of pairwise comparison results."""
+
+    def __init__(self, cachedir: Path, maxsize: Optional[int] = CACHE_SIZE) -> None:
+        """Instantiate cache in the passed directory.
+
+        :param cachedir:  path to cache directory (created if necessary)
+        :param maxsize:  maximum total size of cache files, in bytes, that
+            prune() reduces the cache to (no limit if None)
+        """
+        self.cachedir = Path(cachedir)
+        self.maxsize = maxsize
+        try:
+            self.cachedir.mkdir(parents=True, exist_ok=True)
+        except OSError as exc:
+            raise PyaniCacheException(
+                f"Could not create cache directory {cachedir}"
+            ) from exc
+
+    def _entry_paths(self, key: CacheKey) -> Tuple[Path, Path]:
+        """Return paths to summary and alignment files for the passed key."""
+        digest = key.digest
+        entrydir = self.cachedir / digest[:2]
+        return entrydir / f"{digest}.json", entrydir / f"{digest}.gz"
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Return cached summary values for the passed key, or None if absent.
+
+        :param key:  CacheKey identifying the comparison
+
+        A successful lookup marks the entry as recently used.
+        """
+        summarypath = self._entry_paths(key)[0]
+        try:
+            with summarypath.open("r") as ifh:
+                data = json.load(ifh)
+            os.utime(summarypath)
+        except (OSError, ValueError):  # missing, evicted, or unreadable entry
+            return None
+        return CacheEntry(data["aln_length"], data["sim_errs"])
+
+    def get_alignment(self, key: CacheKey, outfname: Path) -> bool:
+        """Write cached alignment output for the passed key to outfname.
+
+        :param key:  CacheKey identifying the comparison
+        :param outfname:  path to write alignment; if it ends in .gz, the
+            compressed alignment is copied, otherwise it is decompressed
+
+        Returns True if the alignment was written, and False if the entry
+        has no cached alignment.
+        """
+        alnpath = self._entry_paths(key)[1]
+        outfname = Path(outfname)
+        try:
+            if outfname.suffix == ".gz":
+                shutil.copyfile(alnpath, outfname)
+            else:
+                with gzip.open(alnpath, "rb") as ifh, outfname.open("wb") as ofh:
+                    shutil.copyfileobj(ifh, ofh)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(
+        self,
+        key: CacheKey,
+        aln_length: int,
+        sim_errs: int,
+        alignment: Optional[Path] = None,
+    ) -> None:
+        """Add summary values, and optionally alignment output, to the cache.
+
+        :param key:  CacheKey identifying the comparison
+        :param aln_length:  total alignment length for the comparison
+        :param sim_errs:  total similarity errors for the comparison
+        :param alignment:  path to alignment output; if it ends in .gz it is
+            assumed to be compressed already, otherwise it is compressed
+
+        If no alignment is given, any alignment already cached for the key is
+        removed, so that the entry never holds output from an earlier run.
+        """
+        summarypath, alnpath = self._entry_paths(key)
+        summarypath.parent.mkdir(exist_ok=True)
+        tmpsuffix = f".{os.getpid()}.tmp"
+
+        # The alignment is written first, so that an entry's summary file
+        # only ever exists once its alignment is complete
+        if alignment is not None:
+            alignment = Path(alignment)
+            tmppath = alnpath.with_name(alnpath.name + tmpsuffix)
+            if alignment.suffix == ".gz":
+                shutil.copyfile(alignment, tmppath)
+            else:
+                with alignment.open("rb") as ifh, gzip.open(tmppath, "wb") as ofh:
+                    shutil.copyfileobj(ifh, ofh)
+            tmppath.replace(alnpath)
+        else:
+            try:
+                alnpath.unlink()
+            except FileNotFoundError:
+                pass
+
+        data = dict(key._asdict(), aln_length=aln_length, sim_errs=sim_errs)
+        data["alignment"] = alignment is not None
+        tmppath = summarypath.with_name(summarypath.name + tmpsuffix)
+        with tmppath.open("w") as ofh:
+            json.dump(data, ofh)
+        tmppath.replace(summarypath)
+
+    def list_entries(self) -> List[Tuple[float, int, Path]]:
+        """Return (last used time, size, summary path) for each cache entry.
+
+        Sizes include the entry's alignment file, if there is one.
+        """
+        entries = []
+        for entrydir in self.cachedir.iterdir():
+            if not entrydir.is_dir():
+                continue
+            for summarypath in entrydir.glob("*.json"):
+                try:
+                    stat = summarypath.stat()
+                except FileNotFoundError:  # removed by another process
+                    continue
+                size = stat.st_size
+                alnpath = summarypath.with_suffix(".gz")
+                if alnpath.is_file():
+                    size += alnpath.stat().st_size
+                entries.append((stat.st_mtime, size, summarypath))
+        return entries
+
+    def usage(self) -> CacheUsage:
+        """Return summary of cache contents."""
+        entries, alignments, size = 0, 0, 0
+        programs = {}  # type: Dict[Tuple[str, str], int]
+        for _, entrysize, summarypath in self.list_entries():
+            try:
+                with summarypath.open("r") as ifh:
+                    data = json.load(ifh)
+            except (OSError, ValueError):
+                continue
+            entries += 1
+            alignments += int(data.get("alignment", False))
+            size += entrysize
+            program = (data["program"], data["version"])
+            programs[program] = programs.get(program, 0) + 1
+        return CacheUsage(entries, alignments, size, programs)
+
+    def prune(self, maxsize: Optional[int] = None) -> List[Path]:
+        """Remove least recently used entries until the cache fits in maxsize.
+
+        :param maxsize:  maximum total size of cache files, in bytes (if
+            None, the cache's own maximum size is used)
+
+        Returns the summary paths of removed entries.
+        """
+        if maxsize is None:
+            maxsize = self.maxsize
+        if maxsize is None:
+            return []
+
+        entries = sorted(self.list_entries())
+        size = sum(_[1] for _ in entries)
+        removed = []
+        for _, entrysize, summarypath in entries:
+            if size <= maxsize:
+                break
+            self.remove(summarypath)
+            size -= entrysize
+            removed.append(summarypath)
+        return removed
+
+    def clear(self) -> List[Path]:
+        """Remove all entries from the cache, returning their summary paths."""
+        return self.prune(0)
+
+    @staticmethod
+    def remove(summarypath: Path) -> None:
+        """Remove the cache entry with the passed summary path."""
+        for fpath in (summarypath, summarypath.with_suffix(".gz")):
+            try:
+                fpath.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2016-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Code to share the cores available to a run between jobs and their threads.
+
+Worker processes, and the threads of multithreaded tools run by each job
+(MUMmer4 nucmer --threads, blastn -num_threads), draw on the same cores. A
+CoreBudget holds the number of cores available to a run, and is consulted
+when jobs are built and run:
+
+- allocate() chooses the number of threads for each job from the sizes of
+  all the jobs in the run, so that many similar jobs each run on a single
+  thread, several at once, while a few large jobs (e.g. all that remain
+  once smaller jobs are done, or fewer jobs than cores) are given the cores
+  that would otherwise be idle.
+- get_workers() returns the number of jobs with given thread counts that a
+  fixed-size worker pool can run at once, without exceeding the budget.
+
+run_multiprocessing.run_dependency_graph() starts jobs (largest first)
+only while the threads of the running jobs fit in the budget.
+"""
+
+import multiprocessing
+import os
+
+from typing import List, Optional, Sequence
+
+
+def get_available_cores() -> int:
+    """Return the number of cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))  # type: ignore
+    except AttributeError:  # not available on all platforms
+        return multiprocessing.cpu_count()
+
+
+class CoreBudget:
+
+    """Number of cores available to a run, shared by its jobs and their threads."""
+
+    def __init__(self, cores: Optional[int] = None) -> None:
+        """Instantiate a CoreBudget.
+
+        :param cores:  int, number of cores available to the run (e.g. from
+            --workers); if not set, all available cores
+        """
+        self.cores = max(1, cores or get_available_cores())
+
+    def allocate(self, sizes: Sequence[float], max_threads: int = 1) -> List[int]:
+        """Return the number of threads for each job, from the job sizes.
+
+        :param sizes:  size (e.g. total sequence length) of each job in the run
+        :param max_threads:  int, most threads to give any one job; if less
+            than one, a job may be given every core
+
+        Each job is given the number of cores its share of the total size
+        of all jobs would occupy, between one thread and max_threads.
+        """
+        limit = self.cores if max_threads < 1 else min(max_threads, self.cores)
+        total = float(sum(sizes))
+        if limit == 1 or not sizes:
+            return [1] * len(sizes)
+        if not total:  # no sizes known, so jobs share cores evenly
+            sizes, total = [1] * len(sizes), float(len(sizes))
+        return [min(limit, max(1, int(self.cores * _ / total))) for _ in sizes]
+
+    def get_workers(self, threads: Sequence[int]) -> int:
+        """Return the number of jobs that a worker pool can run at once.
+
+        :param threads:  number of threads used by each job
+
+        As each worker in a pool may run any job, the pool is sized for the
+        job using the most threads.
+        """
+        return max(1, self.cores // max(threads, default=1))
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2016-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Code to keep a manifest of completed comparison output files.
+
+Recovery mode reuses comparison output from an earlier run that may have
+been killed partway through, so output files in the output directory may
+be incomplete. Each job that completes an output file therefore appends an
+entry for the file to a manifest in the same directory, recording its size
+and MD5 checksum. The entry is written only once the file is complete, so
+it also serves as the file's completion marker.
+
+The manifest is a text file with one JSON object per line:
+
+    {"name": "<file name>", "size": <bytes>, "md5": "<hex digest>"}
+
+Entries are only ever appended, each with a single write to a file opened
+in append mode, so that jobs finishing at the same time do not interleave
+their entries. If a file appears more than once, its last entry is used.
+Entries that cannot be parsed (e.g. the last line, if a job was killed as it
+wrote it) are ignored.
+"""
+
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from . import PyaniException
+
+
+# Name of the manifest file, in the directory holding the output files
+MANIFEST_NAME = "manifest.jsonl"
+
+# Size of the blocks (in bytes) read when calculating checksums
+MANIFEST_BLOCKSIZE = 1 << 20
+
+
+class PyaniManifestException(PyaniException):
+
+    """Exception raised when an output file cannot be added to a manifest."""
+
+
+class ManifestEntry(NamedTuple):
+
+    """Size and checksum of a completed output file."""
+
+    name: str
+    size: int
+    md5: str
+
+
+def get_manifest_path(dirpath: Path) -> Path:
+    """Return path to the manifest of output files in the passed directory.
+
+    :param dirpath:  path to directory holding output files
+    """
+    return Path(dirpath) / MANIFEST_NAME
+
+
+def get_checksum(fname: Path) -> str:
+    """Return MD5 hex digest of the passed file.
+
+    :param fname:  path to file
+    """
+    digest = hashlib.md5()  # nosec
+    with Path(fname).open("rb") as ifh:
+        for block in iter(lambda: ifh.read(MANIFEST_BLOCKSIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def record_output(fname: Path) -> ManifestEntry:
+    """Add a completed output file to the manifest in its directory.
+
+    :param fname:  path to the completed output file
+
+    The file's entry is appended to the manifest with a single write, and
+    flushed to disk, before returning the entry.
+    """
+    fname = Path(fname)
+    try:
+        entry = ManifestEntry(fname.name, fname.stat().st_size, get_checksum(fname))
+    except OSError as exc:
+        raise PyaniManifestException(f"Cannot add {fname} to manifest") from exc
+    line = (json.dumps(entry._asdict()) + "\n").encode("utf-8")
+    fd = os.open(
+        get_manifest_path(fname.parent), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+    )
+    try:
+        os.write(fd, line)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return entry
+
+
+def record_outputs(fnames: Iterable[Path]) -> None:
+    """Add each of the passed completed output files that exists to its manifest.
+
+    :param fnames:  paths to completed output files
+
+    Files that do not exist (e.g. a .delta file that was replaced by a
+    compressed copy) are skipped.
+    """
+    for fname in fnames:
+        if Path(fname).is_file():
+            record_output(fname)
+
+
+def read_manifest(dirpath: Path) -> Optional[Dict[str, ManifestEntry]]:
+    """Return manifest entries for output files in the passed directory.
+
+    :param dirpath:  path to directory holding output files
+
+    Entries are keyed by file name, and later entries for a file replace
+    earlier ones. Returns None if there is no manifest in the directory.
+    """
+    manifest = get_manifest_path(dirpath)
+    if not manifest.is_file():
+        return None
+    entries = {}  # type: Dict[str, ManifestEntry]
+    with manifest.open("rb") as ifh:
+        for line in ifh:
+            try:
+                entry = ManifestEntry(**json.loads(line))
+            except (ValueError, TypeError):  # incomplete or malformed entry
+                continue
+            entries[entry.name] = entry
+    return entries
+
+
+def verify_output(fname: Path, entry: ManifestEntry, checksum: bool = True) -> bool:
+    """Return True if the passed file matches its manifest entry.
+
+    :param fname:  path to output file
+    :param entry:  manifest entry for the file
+    :param checksum:  Boolean flag indicating to compare the file's checksum,
+        as well as its size
+
+    Files that are missing, truncated or changed since their entry was
+    written do not match.
+    """
+    try:
+        if Path(fname).stat().st_size != entry.size:
+            return False
+    except FileNotFoundError:
+        return False
+    return not checksum or get_checksum(fname) == entry.md5
+
+
+def collect_completed_output(dirpath: Path, suffix: str) -> Optional[List[Path]]:
+    """Return completed output files in the passed directory, from its manifest.
+
+    :param dirpath:  path to directory holding output files
+    :param suffix:  suffix of the output files to collect; gzip-compressed
+        files, with an additional .gz suffix, are also collected
+
+    Only files with a manifest entry, whose size and checksum match that
+    entry, are returned, so that files left incomplete by killed jobs are not
+    reused. Returns None if there is no manifest in the directory.
+    """
+    entries = read_manifest(dirpath)
+    if entries is None:
+        return None
+    return [
+        Path(dirpath) / name
+        for name, entry in entries.items()
+        if (name.endswith(suffix) or name.endswith(suffix + ".gz"))
+        and verify_output(Path(dirpath) / name, entry)
+    ]
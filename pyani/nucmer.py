@@ -38,10 +38,818 @@
 # THE SOFTWARE.
 """Code for handling NUCmer output files."""
 
+import gzip
+import heapq
 import os
+import re
+import shutil
 
+from array import array
+from operator import attrgetter, itemgetter
 from pathlib import Path
-from typing import List, Optional, TextIO
+from typing import (
+    IO,
+    Any,
+    AnyStr,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+import numpy as np  # type: ignore
+
+
+# Size of the blocks (in bytes/characters) read when streaming a .delta file
+DELTA_BLOCKSIZE = 1 << 20
+
+# Alignment region header lines in a .delta file have seven integer columns:
+# refstart refend qrystart qryend errors simerrors stops. We capture the
+# reference start/end coordinates and the error count.
+DELTA_ALN_HEADER = re.compile(rb"^(\d+) (\d+) \d+ \d+ (\d+) \d+ \d+\r?$", re.M)
+
+# Comparison header lines in a .delta file, capturing the reference and
+# query sequence IDs
+DELTA_CMP_HEADER = re.compile(rb"^>(\S+) (\S+) \d+ \d+\r?$", re.M)
+
+# Start of each comparison header line in a .delta file
+DELTA_CMP_START = re.compile(rb"^>", re.M)
+
+# Alignment region header lines, capturing all four start/end coordinates
+DELTA_ALN_COORDS = re.compile(rb"^(\d+) (\d+) (\d+) (\d+) \d+ \d+ \d+\r?$", re.M)
+
+# Number of alignment regions DeltaCoverage collects before merging them
+COVERAGE_BUFFERSIZE = 1 << 18
+
+# Prefix given to query sequence IDs when several query files are aligned in
+# a single NUCmer run; formatted with the index of the sequence's query file
+BATCH_TAG = "pyani{:d}:"
+BATCH_TAG_PATTERN = re.compile(rb"pyani(\d+):")
+
+# Leading bytes of a gzip-compressed file
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_delta(filename: Path, mode: str = "rb") -> IO:
+    """Return handle to a .delta or .filter file, which may be gzip-compressed.
+
+    :param filename:  path to the .delta or .filter file
+    :param mode:  one of "r", "rb", "w" or "wb"; "r" and "w" are text mode
+
+    When reading, gzip-compressed files are recognised by their leading
+    bytes, whatever their name, and decompressed transparently. When
+    writing, output is gzip-compressed if the filename ends in ".gz".
+    """
+    filename = Path(filename)
+    if mode.startswith("r"):
+        with filename.open("rb") as ifh:
+            compressed = ifh.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    else:
+        compressed = filename.suffix == ".gz"
+    if compressed:
+        return gzip.open(filename, mode if mode.endswith("b") else mode + "t")
+    return filename.open(mode)
+
+
+def compress_delta(filename: Path) -> Path:
+    """Replace a .delta or .filter file with a gzip-compressed copy.
+
+    :param filename:  path to the uncompressed file
+
+    The compressed file is written alongside the input, with ".gz" appended
+    to its name, and the input file is removed. Returns the path to the
+    compressed file.
+    """
+    filename = Path(filename)
+    outfname = Path(str(filename) + ".gz")
+    with filename.open("rb") as ifh, gzip.open(outfname, "wb") as ofh:
+        shutil.copyfileobj(ifh, ofh)
+    filename.unlink()
+    return outfname
+
+
+def iter_delta_blocks(
+    handle: IO[AnyStr], blocksize: int = DELTA_BLOCKSIZE
+) -> Iterator[AnyStr]:
+    """Yield blocks of complete lines read from the passed filehandle.
+
+    :param handle:  open .delta/.filter filehandle (text or binary mode)
+    :param blocksize:  number of bytes/characters to read at a time
+
+    Each yielded block ends with a complete line, so that no line is split
+    between blocks. Only one block is held in memory at a time.
+    """
+    remainder = handle.read(0)  # empty str or bytes, depending on handle mode
+    newline = "\n" if isinstance(remainder, str) else b"\n"
+    while True:
+        block = handle.read(blocksize)
+        if not block:
+            break
+        block = remainder + block
+        cut = block.rfind(newline) + 1
+        if not cut:  # no complete line in this block; keep reading
+            remainder = block
+            continue
+        remainder = block[cut:]
+        yield block[:cut]
+    if remainder:
+        yield remainder
+
+
+def summarise_delta(
+    handle: BinaryIO,
+    blocksize: int = DELTA_BLOCKSIZE,
+    coverage: Optional["DeltaCoverage"] = None,
+) -> Tuple[int, int]:
+    """Return (alignment length, similarity errors) from a binary .delta filehandle.
+
+    :param handle:  .delta/.filter file, opened in binary mode
+    :param blocksize:  number of bytes to read at a time
+    :param coverage:  optional DeltaCoverage, updated with each block read
+
+    The file is read in blocks, and only the alignment region headers and
+    deletion lines contribute to the totals, so memory use is independent of
+    the size of the file. See ``anim.parse_delta()`` for a description of the
+    values returned. If coverage is given, aligned regions are collected in
+    the same pass.
+    """
+    # Skip the two metadata lines (input file paths, and program name)
+    handle.readline()
+    handle.readline()
+
+    aln_length, sim_errors = 0, 0
+    for block in iter_delta_blocks(handle, blocksize):
+        block_length, block_errors = summarise_delta_block(block)
+        aln_length += block_length
+        sim_errors += block_errors
+        if coverage is not None:
+            coverage.update(block)
+    return aln_length, sim_errors
+
+
+def summarise_delta_block(block: bytes) -> Tuple[int, int]:
+    """Return (alignment length, similarity errors) for a block of .delta lines.
+
+    :param block:  complete lines from the body of a .delta file, as bytes
+
+    The .delta file metadata and comparison header lines do not contribute
+    to the totals, so any block of complete lines may be passed.
+    """
+    aln_length, sim_errors = 0, 0
+    for refstart, refend, errors in DELTA_ALN_HEADER.findall(block):
+        aln_length += abs(int(refend) - int(refstart)) + 1
+        sim_errors += int(errors)
+    # Each negative indel value is a deletion in the reference, which adds
+    # one symbol to the alignment length
+    aln_length += (b"\n" + block).count(b"\n-")
+    return aln_length, sim_errors
+
+
+def merge_intervals(
+    seqids: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the union of closed intervals on each sequence, as arrays.
+
+    :param seqids:  integer index of the sequence for each interval
+    :param starts:  start coordinate of each interval
+    :param ends:  end coordinate of each interval (inclusive, >= start)
+
+    Returns (seqids, starts, ends) arrays of disjoint intervals, sorted by
+    sequence and start. Overlapping and adjacent intervals are merged.
+    """
+    if not len(starts):
+        return seqids, starts, ends
+    order = np.lexsort((starts, seqids))
+    seqids, starts, ends = seqids[order], starts[order], ends[order]
+
+    # The furthest end reached by any interval so far, within each sequence.
+    # Offsetting the coordinates of each sequence past the end of the one
+    # before stops the running maximum carrying over between sequences.
+    offset = seqids * (int(ends.max()) + 2)
+    reach = np.maximum.accumulate(ends + offset) - offset
+
+    # A merged interval begins at the first interval on each sequence, and
+    # at each interval starting beyond the reach of those before it
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = (seqids[1:] != seqids[:-1]) | (starts[1:] > reach[:-1] + 1)
+    idx = np.flatnonzero(first)
+    last = np.append(idx[1:] - 1, len(starts) - 1)
+    return seqids[idx], starts[idx], reach[last]
+
+
+class DeltaCoverage:
+
+    """Counts bases covered by alignments, from blocks of .delta file lines.
+
+    The reference and query coordinates of each alignment region are
+    collected per sequence, and merged into their union with
+    ``merge_intervals()``, so that bases covered by several alignments
+    (e.g. with NUCmer's --maxmatch option) are counted once. Coordinates are
+    held as text until COVERAGE_BUFFERSIZE regions have been collected, then
+    converted and merged as arrays, so memory use depends on the number of
+    disjoint covered regions rather than the number of alignments.
+    """
+
+    def __init__(self, buffersize: int = COVERAGE_BUFFERSIZE) -> None:
+        """Instantiate DeltaCoverage object.
+
+        :param buffersize:  number of alignment regions to collect before merging
+        """
+        self._buffersize = buffersize
+        self._seqindex = ({}, {})  # type: Tuple[Dict[bytes, int], Dict[bytes, int]]
+        self._comparisons = ([], [])  # type: Tuple[List[int], List[int]]
+        self._counts = []  # type: List[int]
+        self._coords = []  # type: List[Tuple[bytes, ...]]
+        empty = np.zeros(0, dtype=np.int64)
+        self._intervals = [(empty, empty, empty), (empty, empty, empty)]
+
+    def update(self, block: bytes) -> None:
+        """Collect the alignment regions in a block of .delta file lines.
+
+        :param block:  complete lines from a .delta file, as bytes
+
+        Blocks must be passed in file order, as alignment regions belong to
+        the most recent comparison header.
+        """
+        parts = DELTA_CMP_HEADER.split(block)
+        self._add_regions(parts[0])
+        for idx in range(1, len(parts), 3):
+            for seqindex, comparisons, seqid in zip(
+                self._seqindex, self._comparisons, parts[idx : idx + 2]
+            ):
+                comparisons.append(seqindex.setdefault(seqid, len(seqindex)))
+            self._counts.append(0)
+            self._add_regions(parts[idx + 2])
+        if len(self._coords) >= self._buffersize:
+            self._merge()
+
+    def _add_regions(self, body: bytes) -> None:
+        """Collect alignment region coordinates for the current comparison."""
+        coords = DELTA_ALN_COORDS.findall(body)
+        if coords and self._counts:
+            self._coords.extend(coords)
+            self._counts[-1] += len(coords)
+
+    def _merge(self) -> None:
+        """Merge collected alignment regions into the covered intervals."""
+        if not self._coords:
+            return
+        coords = np.array(self._coords).astype(np.int64)
+        comparisons = np.repeat(np.arange(len(self._counts)), self._counts)
+        for side, (seqids, starts, ends) in enumerate(self._intervals):
+            cols = coords[:, 2 * side : 2 * side + 2]
+            self._intervals[side] = merge_intervals(
+                np.concatenate(
+                    (seqids, np.array(self._comparisons[side])[comparisons])
+                ),
+                np.concatenate((starts, cols.min(axis=1))),
+                np.concatenate((ends, cols.max(axis=1))),
+            )
+        self._coords = []
+        self._counts = [0] * len(self._counts)
+
+    def covered(self) -> Tuple[int, int]:
+        """Return (reference, query) counts of bases covered by an alignment."""
+        self._merge()
+        return tuple(  # type: ignore
+            int((ends - starts + 1).sum()) for _, starts, ends in self._intervals
+        )
+
+
+class DeltaRecord(NamedTuple):
+
+    """Location and score of a single alignment region in a .delta file.
+
+    Only the values required for one-to-one filtering are held; the
+    alignment itself is copied from the source file by byte offset.
+    """
+
+    comparison: int  # index of the comparison (">" header) in the file
+    refseq: bytes
+    qryseq: bytes
+    refstart: int  # coordinates are stored on the forward strand
+    refend: int
+    qrystart: int
+    qryend: int
+    identity: float  # percentage identity, at delta-filter's (single) precision
+    offset: int  # position of the alignment in the file
+    size: int  # number of bytes in the alignment (header and indels)
+
+
+def read_delta_records(handle: BinaryIO) -> Tuple[List[bytes], List[DeltaRecord]]:
+    """Return comparison headers and alignment records from a binary .delta file.
+
+    :param handle:  .delta file, opened in binary mode
+
+    Returns a tuple of the raw ">" header lines for each comparison, and a
+    DeltaRecord for each alignment region in the file.
+    """
+    handle.readline()
+    handle.readline()
+    offset = handle.tell()
+
+    headers = []  # type: List[bytes]
+    records = []  # type: List[DeltaRecord]
+    refseq, qryseq = b"", b""
+    aln = None  # type: Optional[List[int]]
+    deletions, alnoffset = 0, 0
+    for line in handle:
+        fields = line.split()
+        if line.startswith(b">"):
+            headers.append(line)
+            refseq, qryseq = fields[0][1:], fields[1]
+        elif len(fields) == 7:
+            aln = [int(_) for _ in fields[:5]]
+            deletions, alnoffset = 0, offset
+        elif fields and aln is not None:
+            if fields[0].startswith(b"-"):
+                deletions += 1
+            elif fields[0] == b"0":
+                refstart, refend, qrystart, qryend, errors = aln
+                # MUMmer calculates identity in single precision
+                alnlen = np.float32(abs(refend - refstart) + 1 + deletions)
+                identity = np.float32(
+                    float((alnlen - np.float32(errors)) / alnlen) * 100.0
+                )
+                records.append(
+                    DeltaRecord(
+                        len(headers) - 1,
+                        refseq,
+                        qryseq,
+                        min(refstart, refend),
+                        max(refstart, refend),
+                        min(qrystart, qryend),
+                        max(qrystart, qryend),
+                        float(identity),
+                        alnoffset,
+                        offset + len(line) - alnoffset,
+                    )
+                )
+                aln = None
+        offset += len(line)
+    return headers, records
+
+
+class _GlibcRandom:
+
+    """Reproduces the sequence of the C library rand() function, as in glibc.
+
+    delta-filter picks at random between equally good chains of alignments,
+    with an unseeded rand(), so its choices are reproducible on glibc systems.
+    """
+
+    RAND_MAX = 2 ** 31 - 1
+
+    def __init__(self, seed: int = 1) -> None:
+        """Initialise the generator state, as srand(seed)."""
+        state = [seed]
+        for idx in range(1, 31):
+            state.append((16807 * state[idx - 1]) % 2147483647)
+        state += state[:3]
+        self._state = state
+        for _ in range(310):
+            self._next()
+
+    def _next(self) -> int:
+        """Return the next value from the additive feedback generator."""
+        value = (self._state[-31] + self._state[-3]) & 0xFFFFFFFF
+        self._state.append(value)
+        del self._state[0]
+        return value
+
+    def rand(self) -> int:
+        """Return the next value of rand()."""
+        return self._next() >> 1
+
+
+def _cxx_sort(items: List, less: Callable[[Any, Any], bool]) -> List:
+    """Return items sorted as by the C++ std::sort() algorithm in libstdc++.
+
+    :param items:  list of items to sort
+    :param less:  function returning True if its first argument sorts first
+
+    std::sort() is not stable, and the order in which delta-filter considers
+    alignments that tie on start position and score depends on it. This
+    reproduces that order: an introsort (median-of-three quicksort, falling
+    back to heapsort), leaving ranges of at most 16 items for a final
+    insertion sort.
+    """
+    items = list(items)
+    threshold = 16
+
+    def adjust_heap(first: int, hole: int, length: int, value: Any) -> None:
+        top, child = hole, hole
+        while child < (length - 1) // 2:
+            child = 2 * (child + 1)
+            if less(items[first + child], items[first + child - 1]):
+                child -= 1
+            items[first + hole] = items[first + child]
+            hole = child
+        if not length & 1 and child == (length - 2) // 2:
+            child = 2 * (child + 1)
+            items[first + hole] = items[first + child - 1]
+            hole = child - 1
+        parent = (hole - 1) // 2
+        while hole > top and less(items[first + parent], value):
+            items[first + hole] = items[first + parent]
+            hole, parent = parent, (parent - 1) // 2
+        items[first + hole] = value
+
+    def heap_sort(first: int, last: int) -> None:
+        length = last - first
+        for parent in range((length - 2) // 2, -1, -1):
+            adjust_heap(first, parent, length, items[first + parent])
+        while last - first > 1:
+            last -= 1
+            value, items[last] = items[last], items[first]
+            adjust_heap(first, 0, last - first, value)
+
+    def introsort(first: int, last: int, depth: int) -> None:
+        while last - first > threshold:
+            if not depth:
+                heap_sort(first, last)
+                return
+            depth -= 1
+            # Move the median of the second, middle and last items to the start
+            mid = first + (last - first) // 2
+            first_, mid_, last_ = items[first + 1], items[mid], items[last - 1]
+            if less(first_, mid_):
+                if less(mid_, last_):
+                    median = mid
+                elif less(first_, last_):
+                    median = last - 1
+                else:
+                    median = first + 1
+            elif less(first_, last_):
+                median = first + 1
+            elif less(mid_, last_):
+                median = last - 1
+            else:
+                median = mid
+            items[first], items[median] = items[median], items[first]
+            # Partition the remaining items about the pivot
+            pivot, left, right = items[first], first + 1, last
+            while True:
+                while less(items[left], pivot):
+                    left += 1
+                right -= 1
+                while less(pivot, items[right]):
+                    right -= 1
+                if left >= right:
+                    break
+                items[left], items[right] = items[right], items[left]
+                left += 1
+            introsort(left, last, depth)
+            last = left
+
+    def insertion_sort(first: int, last: int) -> None:
+        for idx in range(first + 1, last):
+            value = items[idx]
+            if less(value, items[first]):
+                items[first + 1 : idx + 1] = items[first:idx]
+                items[first] = value
+                continue
+            jdx = idx
+            while less(value, items[jdx - 1]):
+                items[jdx] = items[jdx - 1]
+                jdx -= 1
+            items[jdx] = value
+
+    if len(items) > 1:
+        introsort(0, len(items), 2 * (len(items).bit_length() - 1))
+        # Items beyond the first range are guarded by those before them, so
+        # the whole list can be finished by insertion sort
+        insertion_sort(0, len(items))
+    return items
+
+
+def _lis_chains(
+    records: List[DeltaRecord],
+    reference: bool,
+    rng: _GlibcRandom,
+    maxolap: float = 100.0,
+) -> Set[int]:
+    """Return indices of the records in the best chain of alignments on each sequence.
+
+    :param records:  alignment records to be filtered
+    :param reference:  chain on reference (True) or query (False) coordinates
+    :param rng:  random number generator shared by all chains in the file
+    :param maxolap:  maximum overlap of chained alignments, as a percentage
+        of either alignment's length
+
+    This follows the weighted longest increasing subsequence (LIS) used by
+    MUMmer's ``delta-filter -r`` (reference) and ``-q`` (query) options. All
+    alignments on each sequence are chained, whichever sequence they align
+    to. Each alignment scores its length, less any overlap with its
+    predecessor in the chain, weighted by the square of its identity. Where
+    chains tie on score, the one whose alignments are closest together is
+    preferred. Where alternative chains are equally good, one is picked at
+    random, in the same sequence as delta-filter.
+
+    Chains are found in a single sweep over the alignments, in order of start
+    position. Once an alignment and its predecessor end before the current
+    start position, the alignment can only precede later alignments without
+    overlap, so only the best-scoring of these "settled" chains is kept;
+    alignments that are still open are held in a heap, by the end of their
+    chain, and scored individually. As in delta-filter, the sweep is repeated
+    over the remaining alignments, after removing each chosen chain, only for
+    as long as chains tie with the best.
+    """
+    if reference:
+        getseq = attrgetter("refseq")
+        getcoords = attrgetter("refstart", "refend")
+    else:
+        getseq = attrgetter("qryseq")
+        getcoords = attrgetter("qrystart", "qryend")
+
+    groups = {}  # type: Dict[bytes, List[int]]
+    for idx, record in enumerate(records):
+        groups.setdefault(getseq(record), []).append(idx)
+
+    kept = set()  # type: Set[int]
+    for _, group in sorted(groups.items()):
+        # Weights and scores are truncated as by delta-filter
+        identities = np.array([records[_].identity for _ in group], dtype=np.float32)
+        weights = (identities.astype(np.float64) / 100.0).astype(np.float32) ** 2.0
+        coords = np.array([getcoords(records[_]) for _ in group], dtype=np.int64)
+        lengths = coords[:, 1] - coords[:, 0] + 1
+        scores = (lengths * weights).astype(np.int64).tolist()
+
+        # Sort by start position, and then by descending score. The order of
+        # alignments tying on both depends on delta-filter's sort algorithm,
+        # so this is only reproduced where there are ties
+        starts = coords[:, 0].tolist()
+        keys = [(start, -score) for start, score in zip(starts, scores)]
+        order = sorted(range(len(group)), key=keys.__getitem__)
+        if any(keys[_a] == keys[_b] for _a, _b in zip(order, order[1:])):
+            order = _cxx_sort(
+                range(len(group)),
+                lambda _a, _b: starts[_a] < starts[_b]
+                or (starts[_a] == starts[_b] and scores[_a] > scores[_b]),
+            )
+        group = [group[_] for _ in order]
+        starts = [starts[_] for _ in order]
+        ends = coords[order, 1].tolist()
+        lengths = lengths[order].tolist()
+        weights = weights[order].tolist()
+        scores = [scores[_] for _ in order]
+        refstarts, refends, qrystarts, qryends = zip(
+            *[
+                attrgetter("refstart", "refend", "qrystart", "qryend")(records[_])
+                for _ in group
+            ]
+        )
+
+        def distance(jdx: int, idx: int) -> int:
+            """Return the distance between two alignments, on both sequences."""
+            return (
+                abs(refends[jdx] - refstarts[idx])
+                if refstarts[jdx] < refstarts[idx]
+                else abs(refends[idx] - refstarts[jdx])
+            ) + (
+                abs(qryends[jdx] - qrystarts[idx])
+                if qrystarts[jdx] < qrystarts[idx]
+                else abs(qryends[idx] - qrystarts[jdx])
+            )
+
+        nrecords = len(group)
+        used = [False] * nrecords
+        best = []  # type: List[int]
+        chainscores = scores[:]
+        diffs = [0] * nrecords
+        previous = [-1] * nrecords
+        while True:
+            settled, topsettled = [], -1  # type: List[int], int
+            active = []  # type: List[Tuple[int, int]]
+            for idx in range(nrecords):
+                if used[idx]:
+                    continue
+                start = starts[idx]
+                while active and active[0][0] < start:
+                    jdx = heapq.heappop(active)[1]
+                    if chainscores[jdx] > topsettled:
+                        settled, topsettled = [jdx], chainscores[jdx]
+                    elif chainscores[jdx] == topsettled:
+                        settled.append(jdx)
+                chainscores[idx], diffs[idx], previous[idx] = scores[idx], 0, -1
+
+                # Score of extending each open chain with this alignment. A
+                # chain cannot be extended if the alignment before its last
+                # also reaches this one, or if the overlap is too long
+                top, ties = -1, []  # type: int, List[int]
+                for _, jdx in active:
+                    olap = ends[jdx] - start + 1
+                    prev = previous[jdx]
+                    if olap <= 0 or (prev >= 0 and ends[prev] >= start):
+                        continue
+                    if (
+                        float(np.float32(olap) / np.float32(lengths[idx])) * 100.0
+                        > maxolap
+                        or float(np.float32(olap) / np.float32(lengths[jdx])) * 100.0
+                        > maxolap
+                    ):
+                        continue
+                    score = chainscores[jdx] + int((lengths[idx] - olap) * weights[idx])
+                    if score > top:
+                        top, ties = score, [jdx]
+                    elif score == top:
+                        ties.append(jdx)
+                if settled:
+                    score = topsettled + scores[idx]
+                    if score > top:
+                        top, ties = score, settled
+                    elif score == top:
+                        ties = settled + ties
+                if top <= chainscores[idx]:
+                    heapq.heappush(active, (ends[idx], idx))
+                    continue
+
+                # Of equal chains, extend the one whose alignments are
+                # closest together, on both sequences
+                jdx = min(ties, key=lambda _: (diffs[_] + distance(_, idx), _))
+                chainscores[idx] = top
+                diffs[idx] = diffs[jdx] + distance(jdx, idx)
+                previous[idx] = jdx
+                heapq.heappush(active, (max(ends[idx], ends[jdx]), idx))
+
+            free = [_ for _ in range(nrecords) if not used[_]]
+            if not free:
+                break
+            idx = max(free, key=lambda _: (chainscores[_], -diffs[_], -_))
+            if best and chainscores[idx] < chainscores[best[0]]:
+                break
+            best.append(idx)
+            while idx != -1:
+                used[idx] = True
+                idx = previous[idx]
+
+        # Pick at random between the chains that are also closest together
+        nequal = 1
+        while nequal < len(best) and diffs[best[nequal]] == diffs[best[0]]:
+            nequal += 1
+        idx = best[int(nequal * rng.rand() / (rng.RAND_MAX + 1.0))]
+        while idx != -1:
+            kept.add(group[idx])
+            idx = previous[idx]
+    return kept
+
+
+def iter_filtered_delta(handle: BinaryIO) -> Iterator[bytes]:
+    """Yield the one-to-one filtered contents of a binary .delta filehandle.
+
+    :param handle:  .delta file, opened in binary mode
+
+    The metadata lines are yielded first, then each surviving alignment (with
+    its comparison header, where that changes) as a block of complete lines.
+    See ``filter_delta()`` for a description of the filter.
+    """
+    metadata = handle.readline() + handle.readline()
+    handle.seek(0)
+    headers, records = read_delta_records(handle)
+    rng = _GlibcRandom()
+    reference = _lis_chains(records, reference=True, rng=rng)
+    indices = reference & _lis_chains(records, reference=False, rng=rng)
+    kept = sorted((records[_] for _ in indices), key=attrgetter("qryseq", "offset"))
+
+    yield metadata
+    comparison = -1
+    for record in kept:
+        handle.seek(record.offset)
+        alignment = handle.read(record.size)
+        if record.comparison != comparison:
+            comparison = record.comparison
+            alignment = headers[comparison] + alignment
+        yield alignment
+
+
+def filter_delta(infname: Path, outfname: Path) -> Path:
+    """Write the one-to-one alignments in a .delta file to a .filter file.
+
+    :param infname:  path to the nucmer .delta file
+    :param outfname:  path to the filtered .filter output file
+
+    This is a native equivalent of ``delta-filter -1``: the best colinear
+    chain of alignments is chosen independently on each reference sequence
+    and on each query sequence, and only alignments in both chains are kept,
+    so that every query and reference position is covered by at most one
+    alignment. Surviving alignments are copied from the input file beneath
+    their comparison headers, grouped by query sequence as delta-filter
+    writes them, so that the output is identical to that of delta-filter.
+
+    Either file may be gzip-compressed (see ``open_delta()``).
+    """
+    with open_delta(infname, "rb") as ifh, open_delta(outfname, "wb") as ofh:
+        ofh.writelines(iter_filtered_delta(ifh))
+    return outfname
+
+
+def split_delta(
+    infname: Path, outfnames: List[Path], queries: List[Path]
+) -> List[Path]:
+    """Split a .delta file from a batch of tagged queries into one file per query.
+
+    :param infname:  path to .delta file with query sequence IDs tagged by
+        BATCH_TAG
+    :param outfnames:  paths to output .delta files, one per query file
+    :param queries:  paths to the query FASTA files, in order of tag index
+
+    Each comparison is written, with the tag removed from its query sequence
+    ID, to the output file for its query. The metadata line of each output
+    file names the corresponding query file, so each output is what NUCmer
+    would have written for that reference and query alone. Every output file
+    is written, even if no comparisons involve its query. Any file may be
+    gzip-compressed (see ``open_delta()``).
+    """
+    with open_delta(infname, "rb") as ifh:
+        reference = ifh.readline().split()[0]
+        program = ifh.readline()
+        handles = [open_delta(_, "wb") for _ in outfnames]
+        try:
+            for handle, query in zip(handles, queries):
+                handle.write(reference + b" " + bytes(query) + b"\n" + program)
+            ofh = None  # type: Optional[BinaryIO]
+            for line in ifh:
+                if line.startswith(b">"):
+                    refid, qryid, lengths = line.split(b" ", 2)
+                    match = BATCH_TAG_PATTERN.match(qryid)
+                    if match is None:
+                        raise ValueError(f"Untagged query sequence in {infname}")
+                    ofh = handles[int(match.group(1))]
+                    line = b" ".join([refid, qryid[match.end() :], lengths])
+                if ofh is not None:
+                    ofh.write(line)
+        finally:
+            for handle in handles:
+                handle.close()
+    return outfnames
+
+
+def _iter_query_groups(
+    handle: BinaryIO, order: Dict[bytes, int]
+) -> Iterator[Tuple[int, List[bytes]]]:
+    """Yield (query index, lines) for each run of comparisons with one query sequence.
+
+    :param handle:  .delta file opened in binary mode, after its metadata lines
+    :param order:  index of each query sequence ID in the query FASTA file
+    """
+    qidx, lines = -1, []  # type: int, List[bytes]
+    for line in handle:
+        if line.startswith(b">"):
+            idx = order[line.split(b" ", 2)[1]]
+            if idx != qidx and lines:
+                yield qidx, lines
+                lines = []
+            qidx = idx
+        lines.append(line)
+    if lines:
+        yield qidx, lines
+
+
+def merge_delta(
+    infnames: List[Path], outfname: Path, query: Path, queryids: List[bytes]
+) -> Path:
+    """Merge .delta files for chunks of a query into a single .delta file.
+
+    :param infnames:  paths to .delta files, each from aligning one chunk of
+        the query's sequences against the same reference
+    :param outfname:  path to output .delta file
+    :param query:  path to the (unsplit) query FASTA file
+    :param queryids:  query sequence IDs, in their order in the query file
+
+    NUCmer writes comparisons grouped by query sequence, in the order of the
+    query file. The comparisons from each chunk are merged into that order,
+    and the metadata line names the unsplit query file, so the output is
+    what NUCmer would have written for the whole query, if each query
+    sequence is in only one chunk. Only one query sequence's comparisons
+    are held in memory for each input file. Any file may be gzip-compressed
+    (see ``open_delta()``).
+    """
+    order = {seqid: idx for idx, seqid in enumerate(queryids)}
+    handles = [open_delta(_, "rb") for _ in infnames]
+    try:
+        reference, program = b"", b""
+        for handle in handles:
+            reference = handle.readline().split()[0]
+            program = handle.readline()
+        with open_delta(outfname, "wb") as ofh:
+            ofh.write(reference + b" " + bytes(Path(query)) + b"\n" + program)
+            for _, lines in heapq.merge(
+                *[_iter_query_groups(_, order) for _ in handles], key=itemgetter(0)
+            ):
+                ofh.writelines(lines)
+    finally:
+        for handle in handles:
+            handle.close()
+    return outfname
 
 
 class DeltaData:
@@ -63,28 +871,42 @@ class DeltaData:
     - program: name of the MUMmer program that produced the output
     - query: path to the query sequence file
     - subject: path to the subject sequence file
+
+    When read from the path to an uncompressed file, only the byte offset of
+    each comparison is indexed, and each comparison is parsed when it is
+    used, so that the whole file need not be held in memory.
     """
 
-    def __init__(self, name: str, handle: TextIO = None) -> None:
+    __slots__ = ("name", "_metadata", "_comparisons")
+
+    def __init__(self, name: str, handle: Union[TextIO, Path, str] = None) -> None:
         """Initialise DeltaData object.
 
         :param name:
-        :param handle:
+        :param handle:  text mode filehandle, or path to (optionally
+            gzip-compressed) .delta file
         """
         self.name = name
         self._metadata = None  # type: Optional[DeltaMetadata]
-        self._comparisons = []  # type: List[DeltaComparison]
+        self._comparisons = []  # type: Sequence[DeltaComparison]
         if handle is not None:
             self.from_delta(handle)
 
-    def from_delta(self, handle: TextIO) -> None:
-        """Populate the object from the passed .delta or .filter filehandle."""
-        parser = DeltaIterator(handle)
-        for element in parser:
+    def from_delta(self, handle: Union[TextIO, Path, str]) -> None:
+        """Populate the object from the passed .delta or .filter filehandle or path."""
+        if isinstance(handle, (Path, str)):
+            with open_delta(handle, "rb") as ifh:
+                compressed = isinstance(ifh, gzip.GzipFile)
+            if not compressed:
+                self._metadata, self._comparisons = index_delta(handle)
+                return
+        comparisons = []  # type: List[DeltaComparison]
+        for element in DeltaIterator(handle):
             if isinstance(element, DeltaMetadata):
                 self._metadata = element
             if isinstance(element, DeltaComparison):
-                self._comparisons.append(element)
+                comparisons.append(element)
+        self._comparisons = comparisons
 
     @property
     def comparisons(self):
@@ -117,8 +939,10 @@ class DeltaData:
         # that was used.
         if not isinstance(other, DeltaData):
             return False
-        return (self.program == other.program) and (
-            self._comparisons == other._comparisons
+        return (
+            (self.program == other.program)
+            and (len(self._comparisons) == len(other._comparisons))
+            and all(_ == __ for _, __ in zip(self._comparisons, other._comparisons))
         )
 
     def __len__(self):
@@ -136,6 +960,8 @@ class DeltaHeader:
 
     """Represents a single sequence comparison header from a MUMmer .delta file."""
 
+    __slots__ = ("reference", "query", "referencelen", "querylen")
+
     def __init__(
         self, reference: Path, query: Path, reflen: int, querylen: int
     ) -> None:
@@ -171,6 +997,17 @@ class DeltaAlignment:
 
     """Represents a single alignment region and scores for a pairwise comparison."""
 
+    __slots__ = (
+        "refstart",
+        "refend",
+        "querystart",
+        "queryend",
+        "errs",
+        "simerrs",
+        "stops",
+        "indels",
+    )
+
     def __init__(
         self,
         refstart: int,
@@ -180,6 +1017,7 @@ class DeltaAlignment:
         errs: int,
         simerrs: int,
         stops: int,
+        indels: Optional[array] = None,
     ) -> None:
         """Initialise DeltaAlignment object.
 
@@ -190,6 +1028,7 @@ class DeltaAlignment:
         :param errs:
         :param simerrs:
         :param stops:
+        :param indels:  array('i') of indel positions, ending with 0
         """
         self.refstart = int(refstart)
         self.refend = int(refend)
@@ -198,7 +1037,7 @@ class DeltaAlignment:
         self.errs = int(errs)
         self.simerrs = int(simerrs)
         self.stops = int(stops)
-        self.indels = []  # type: List[str]
+        self.indels = array("i") if indels is None else indels
 
     def __lt__(self, other):
         return (self.refstart, self.refend, self.querystart, self.queryend) < (
@@ -235,9 +1074,11 @@ class DeltaMetadata:
 
     """Represents the metadata header for a MUMmer .delta file."""
 
+    __slots__ = ("reference", "query", "program")
+
     def __init__(self) -> None:
         """Initialise DeltaMetadata object."""
-        self.reference = None  #  type: Optional[Path]
+        self.reference = None  #  type: Optional[Path]
         self.query = None  # type: Optional[Path]
         self.program = None  # type: Optional[str]
 
@@ -256,96 +1097,243 @@ class DeltaMetadata:
 
 class DeltaComparison:
 
-    """Represents a comparison between two sequences in a .delta file."""
+    """Represents a comparison between two sequences in a .delta file.
 
-    def __init__(self, header: DeltaHeader, alignments: List[DeltaAlignment]) -> None:
+    Alignments are held in compact arrays, rather than as one object each:
+    the seven values of each alignment's header line in one array, and the
+    indels of all alignments, end to end, in another. DeltaAlignment objects
+    are only created when the alignments attribute is used.
+    """
+
+    __slots__ = ("header", "_values", "_indels", "_offsets")
+
+    def __init__(
+        self, header: DeltaHeader, alignments: Iterable[DeltaAlignment] = ()
+    ) -> None:
         """Initialise DeltaComparison object.
 
         :param header:
         :param alignments:
         """
         self.header = header
-        self.alignments = alignments
+        self._values = array("q")  # seven header values per alignment
+        self._indels = array("i")  # indels of all alignments
+        self._offsets = array("q", [0])  # start of each alignment's indels
+        for aln in alignments:
+            self.add_alignment(aln)
 
     def add_alignment(self, aln: DeltaAlignment) -> None:
         """Add passed alignment to this object.
 
         :param aln:  DeltaAlignment object
         """
-        self.alignments.append(aln)
+        self._values.extend(
+            (
+                aln.refstart,
+                aln.refend,
+                aln.querystart,
+                aln.queryend,
+                aln.errs,
+                aln.simerrs,
+                aln.stops,
+            )
+        )
+        self._indels.extend(aln.indels)
+        self._offsets.append(len(self._indels))
+
+    @property
+    def alignments(self) -> List[DeltaAlignment]:
+        """Alignments in the comparison, as DeltaAlignment objects."""
+        return [
+            DeltaAlignment(
+                *self._values[7 * idx : 7 * idx + 7],
+                self._indels[self._offsets[idx] : self._offsets[idx + 1]],
+            )
+            for idx in range(len(self))
+        ]
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """Array of (refstart, refend, querystart, queryend) for each alignment."""
+        return np.array(self._values, dtype=np.int64).reshape(-1, 7)[:, :4]
 
     def __eq__(self, other):
         if not isinstance(other, DeltaComparison):
             return False
-        return (self.header == other.header) and (
-            sorted(self.alignments) == sorted(other.alignments)
+        if self.header != other.header or len(self) != len(other):
+            return False
+        coords, othercoords = self.coordinates, other.coordinates
+        return np.array_equal(
+            coords[np.lexsort(coords.T[::-1])],
+            othercoords[np.lexsort(othercoords.T[::-1])],
         )
 
     def __len__(self):
-        return len(self.alignments)
+        return len(self._offsets) - 1
 
     def __str__(self):
         outstr = os.linesep.join([str(self.header)] + [str(_) for _ in self.alignments])
         return outstr
 
 
+def iter_delta_comparisons(lines: Iterable[str]) -> Iterator[DeltaComparison]:
+    """Yield a DeltaComparison for each comparison in lines of a .delta file.
+
+    :param lines:  lines of a .delta file, following its two metadata lines
+
+    Alignment values and indels are added directly to each comparison's
+    arrays. Each alignment is added once its terminating zero is read.
+    """
+    comparison = None  # type: Optional[DeltaComparison]
+    values = indels = offsets = None  # type: Any
+    pending = []  # type: List[int]
+    for line in lines:
+        # If we're at the start of a new comparison, return the previous one
+        if line.startswith(">"):
+            if comparison is not None:
+                yield comparison
+            comparison = DeltaComparison(DeltaHeader(*(line[1:].split())))
+            values = comparison._values
+            indels = comparison._indels
+            offsets = comparison._offsets
+            continue
+        # Populate the current pairwise alignment with each individual alignment
+        alndata = line.split()
+        if not alndata:
+            continue
+        if len(alndata) > 1:  # alignment header
+            pending = [int(_) for _ in alndata]
+            continue
+        indel = int(alndata[0])
+        indels.append(indel)
+        if not indel:
+            values.extend(pending)
+            offsets.append(len(indels))
+    # Return the final comparison at the end of the file
+    if comparison is not None:
+        yield comparison
+
+
+class DeltaIndex(Sequence):
+
+    """Comparisons in an uncompressed .delta file, parsed as they are used.
+
+    Only the byte offset of each comparison in the file is held, and each
+    DeltaComparison is parsed from the file when it is indexed, or when the
+    comparisons are iterated over. Iteration reads the file once, in order.
+    """
+
+    def __init__(self, filename: Path, offsets: List[int], size: int) -> None:
+        """Instantiate index of comparisons in the passed file.
+
+        :param filename:  path to uncompressed .delta file
+        :param offsets:  byte offset of each comparison header line
+        :param size:  size of the file, in bytes
+        """
+        self._filename = Path(filename)
+        self._offsets = array("q", offsets)
+        self._offsets.append(size)
+
+    def _parse(self, data: bytes) -> DeltaComparison:
+        """Return the DeltaComparison in the passed bytes from the file."""
+        return next(iter_delta_comparisons(data.decode().splitlines()))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[_] for _ in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("comparison index out of range")
+        with self._filename.open("rb") as ifh:
+            ifh.seek(self._offsets[idx])
+            return self._parse(ifh.read(self._offsets[idx + 1] - self._offsets[idx]))
+
+    def __iter__(self):
+        with self._filename.open("rb") as ifh:
+            ifh.seek(self._offsets[0])
+            for start, end in zip(self._offsets[:-1], self._offsets[1:]):
+                yield self._parse(ifh.read(end - start))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+def index_delta(filename: Path) -> Tuple[DeltaMetadata, DeltaIndex]:
+    """Return metadata and an index of comparisons for an uncompressed .delta file.
+
+    :param filename:  path to uncompressed .delta file
+
+    The file is read once, in blocks, to find the byte offset of each
+    comparison header line.
+    """
+    metadata = DeltaMetadata()
+    offsets = []  # type: List[int]
+    with Path(filename).open("rb") as ifh:
+        metadata.reference, metadata.query = ifh.readline().decode().split()
+        metadata.program = ifh.readline().decode().strip()
+        position = ifh.tell()
+        for block in iter_delta_blocks(ifh):
+            offsets.extend(
+                position + _.start() for _ in DELTA_CMP_START.finditer(block)
+            )
+            position += len(block)
+    return metadata, DeltaIndex(filename, offsets, position)
+
+
 class DeltaIterator:
 
     """Iterator for MUMmer .delta files.
 
-    Returns a stream of DeltaMetadata, DeltaComparison and DeltaAlignment
-    objects when iterated over a filehandle
+    Returns a stream of DeltaMetadata and DeltaComparison objects when
+    iterated over a filehandle, or over the path to a .delta file. Files
+    named by path may be gzip-compressed (see ``open_delta()``), and are
+    closed once iteration is complete.
 
     The .delta file structure and format is described at
     http://mummer.sourceforge.net/manual/#nucmeroutput
     """
 
-    def __init__(self, handle: TextIO) -> None:
-        """Instantiate DeltaIterator object with the passed filehandle.
+    def __init__(
+        self, handle: Union[TextIO, Path, str], blocksize: int = DELTA_BLOCKSIZE
+    ) -> None:
+        """Instantiate DeltaIterator object with the passed filehandle or path.
 
-        :param handle:
+        :param handle:  text mode filehandle, or path to .delta file
+        :param blocksize:  number of characters to read from the file at a time
         """
         self._handle = handle
-        self._metadata = None  # metadata for a .delta file
-        self._header = None  # header information for a pairwise comparison
-        self._comparison = None  # current comparison region
+        self._blocksize = blocksize
+        self._elements = self._parse()
 
     def __iter__(self):
-        """Iterate over elements of the .delta file as DeltaHeader and DeltaAlignment objects."""
-        return iter(self.__next__, None)
+        """Iterate over elements of the .delta file as DeltaMetadata and DeltaComparison objects."""
+        return self
 
     def __next__(self):
         """Parse the next element from the .delta file."""
+        return next(self._elements)
+
+    def _parse(self) -> Iterator:
+        """Generate DeltaMetadata and DeltaComparison objects from the .delta file."""
+        if isinstance(self._handle, (Path, str)):
+            with open_delta(self._handle, "r") as handle:
+                yield from self._parse_handle(handle)
+        else:
+            yield from self._parse_handle(self._handle)
+
+    def _parse_handle(self, handle: TextIO) -> Iterator:
+        """Generate DeltaMetadata and DeltaComparison objects from a filehandle."""
         # Parse .delta file metadata
-        if self._metadata is None:
-            self._metadata = DeltaMetadata()
-            self._metadata.reference, self._metadata.query = (
-                self._handle.readline().strip().split()
-            )
-            self._metadata.program = self._handle.readline().strip()
-            return self._metadata
-
-        # Parse remaining lines into a DeltaHeader for each comparison, and corresponding
-        # DeltaAlignments
-        line = self._handle.readline()
-        while line:
-            # If we're at the start of an alignment, create a new DeltaAlignment
-            if line.startswith(">"):
-                if self._comparison is not None:
-                    return self._comparison
-                self._header = DeltaHeader(*(line[1:].split()))
-                self._comparison = DeltaComparison(self._header, [])
-            # Populate the current pairwise alignment with each individual alignment
-            else:
-                alndata = line.rstrip().split()
-                if len(alndata) > 1:  # alignment header
-                    alignment = DeltaAlignment(*alndata)
-                elif alndata[0] == "0":
-                    alignment.indels.append(alndata[0])
-                    self._comparison.add_alignment(alignment)
-                else:
-                    alignment.indels.append(alndata[0])
-            # Get the next line and return the final comparison if we're at the end of file
-            line = self._handle.readline()
-            if not line:
-                return self._comparison
+        metadata = DeltaMetadata()
+        metadata.reference, metadata.query = handle.readline().strip().split()
+        metadata.program = handle.readline().strip()
+        yield metadata
+
+        # Parse remaining lines into a DeltaComparison for each comparison.
+        # The file is streamed in blocks of complete lines.
+        yield from iter_delta_comparisons(
+            line
+            for block in iter_delta_blocks(handle, self._blocksize)
+            for line in block.splitlines()
+        )
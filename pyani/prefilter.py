@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2016-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Code to prefilter pairwise genome comparisons using cheap similarity scores.
+
+Alignment-based ANI methods are expensive, and most pairs of genomes in a
+large, diverse collection are far below any identity threshold of interest.
+This module scores every pair of genomes with an inexpensive
+alignment-free statistic, so that only pairs whose score reaches a cutoff
+need be aligned.
+
+Available prefilter methods are:
+
+- tetra: Pearson correlation of tetranucleotide frequency Z-scores (TETRA)
+"""
+
+from logging import Logger
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from . import PyaniException
+from . import tetra
+
+
+# Prefilter methods, and the default score cutoff for each
+PREFILTER_METHODS = ("tetra",)
+PREFILTER_CUTOFFS = {"tetra": 0.9}
+
+
+class PyaniPrefilterException(PyaniException):
+
+    """Exception raised when prefiltering comparisons fails."""
+
+
+class PrefilterResult(NamedTuple):
+
+    """Comparisons to be run, and comparisons skipped, after prefiltering."""
+
+    to_run: List[Tuple]
+    skipped: List[Tuple]
+
+
+def score_tetra(comparisons: List[Tuple]) -> List[float]:
+    """Return TETRA correlation for each passed (Genome, Genome) comparison.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+
+    TETRA Z-scores are calculated once per genome, and the correlations
+    obtained for blocks of genomes at a time (see
+    tetra.iter_correlation_blocks()). Tetranucleotides not observed in a
+    genome are given a Z-score of zero.
+    """
+    genomes = {}  # type: Dict[int, Path]
+    for query, subject in comparisons:
+        genomes[query.genome_id] = Path(query.path)
+        genomes[subject.genome_id] = Path(subject.path)
+    genome_ids = sorted(genomes)
+    zmatrix = tetra.get_zscore_matrix(
+        {_: tetra.calculate_tetra_zscore(genomes[_]) for _ in genome_ids},
+        genome_ids,
+        fill=0.0,
+    )
+
+    index = {genome_id: idx for idx, genome_id in enumerate(genome_ids)}
+    queries = np.array([index[query.genome_id] for query, _ in comparisons])
+    subjects = np.array([index[subject.genome_id] for _, subject in comparisons])
+    scores = np.zeros(len(comparisons))
+    for start, block in tetra.iter_correlation_blocks(zmatrix):
+        inblock = (queries >= start) & (queries < start + len(block))
+        scores[inblock] = block[queries[inblock] - start, subjects[inblock]]
+    return [float(_) for _ in scores]
+
+
+def score_comparisons(comparisons: List[Tuple], method: str = "tetra") -> List[float]:
+    """Return prefilter score for each passed (Genome, Genome) comparison.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param method:  prefilter method, one of PREFILTER_METHODS
+
+    Higher scores indicate more similar genomes.
+    """
+    if method == "tetra":
+        return score_tetra(comparisons)
+    raise PyaniPrefilterException(f"Unknown prefilter method: {method}")
+
+
+def prefilter_comparisons(
+    comparisons: List[Tuple],
+    method: str = "tetra",
+    cutoff: Optional[float] = None,
+    logger: Optional[Logger] = None,
+) -> PrefilterResult:
+    """Split (Genome, Genome) comparisons into those to run, and those to skip.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param method:  prefilter method, one of PREFILTER_METHODS
+    :param cutoff:  minimum score for a comparison to be run (if None, the
+        default for the method in PREFILTER_CUTOFFS is used)
+    :param logger:  a logger module logger (optional)
+
+    Comparisons are kept, in their original order, if their prefilter score
+    is at least the cutoff.
+    """
+    if not comparisons:
+        return PrefilterResult([], [])
+    if cutoff is None:
+        cutoff = PREFILTER_CUTOFFS[method]
+
+    result = PrefilterResult([], [])
+    for comparison, score in zip(comparisons, score_comparisons(comparisons, method)):
+        if logger:
+            logger.debug(
+                "\t%s vs %s: %s score %.4f",
+                comparison[0].description,
+                comparison[1].description,
+                method,
+                score,
+            )
+        if score >= cutoff:
+            result.to_run.append(comparison)
+        else:
+            result.skipped.append(comparison)
+    return result
@@ -93,6 +93,10 @@ MPL_CBAR = "Spectral"
 # Parameters for analyses
 FRAGSIZE = 1020  # Default ANIb fragment size
 
+# Result ingestion parameters
+PARSE_CHUNKSIZE = 64  # Output files sent to each parsing worker at a time
+INSERT_CHUNKSIZE = 10000  # Comparison results inserted into the database at a time
+
 # SGE/OGE scheduler parameters
 SGE_WAIT = 0.01  # Base unit of time (s) to wait between polling SGE
 
@@ -186,6 +186,9 @@ def collect_existing_output(dirpath: Path, program: str, args: Namespace) -> Lis
     :param dirpath:  Path, path to existing output directory
     :param program:  str, name of program to use for comparisons
     :param args:  Namespace, command-line arguments for the run
+
+    Gzip-compressed output files (with an additional .gz suffix) are also
+    collected.
     """
     # Obtain collection of expected output files already present in directory
     if program == "nucmer":
@@ -195,5 +198,10 @@ def collect_existing_output(dirpath: Path, program: str, args: Namespace) -> Lis
             suffix = ".filter"
     elif program == "blastn":
         suffix = ".blast_tab"
-    existingfiles = [fname for fname in dirpath.iterdir() if fname.suffix == suffix]
+    existingfiles = [
+        fname
+        for fname in dirpath.iterdir()
+        if fname.suffix == suffix
+        or (fname.suffix == ".gz" and Path(fname.stem).suffix == suffix)
+    ]
     return existingfiles
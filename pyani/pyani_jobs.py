@@ -77,16 +77,20 @@ class Job(object):
 
     """Individual job to be run, with list of dependencies."""
 
-    def __init__(self, name: str, command: str, queue: Optional[str] = None) -> None:
+    def __init__(
+        self, name: str, command: str, queue: Optional[str] = None, threads: int = 1
+    ) -> None:
         """Instantiate a Job object.
 
         :param name:           String describing the job (uniquely)
         :param command:        String, the valid shell command to run the job
         :param queue:          String, the SGE queue under which the job shall run
+        :param threads:        Int, number of threads the command runs with
         """
         self.name = name  # Unique name for the job
         self.queue = queue  # The SGE queue to run the job under
         self.command = command  # Command line to run for this job
+        self.threads = threads  # Cores used by the command (see core_budget.py)
         self.script = command
         self.scriptPath = None  # type: Optional[Any]
         self.dependencies = []  # type: List[Any]
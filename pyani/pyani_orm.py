@@ -48,7 +48,7 @@ from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 
-from sqlalchemy import and_  # type: ignore
+from sqlalchemy import and_, bindparam, literal, select  # type: ignore
 from sqlalchemy import UniqueConstraint, create_engine, Table
 from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Float, Boolean
 from sqlalchemy.ext.declarative import declarative_base  # type: ignore
@@ -143,7 +143,7 @@ class BlastDB(Base):
 
     - fragpath      path to fragmented genome (query in ANIb)
     - dbpath        path to source genome database (subject in ANIb)
-    - fragsizes     JSONified dict of fragment sizes
+    - fragsizes     JSONified list of fragment sizes, in fragment number order
     - dbcmd         command used to generate database
     """
 
@@ -163,15 +163,15 @@ class BlastDB(Base):
     def __str__(self) -> str:
         """Return string representation of BlastDB table row."""
         return str(
-            "BlastDB: {}, Run ID: {}, Label ID: {}, Label: {}, Class: {}".format(
-                self.genome_id, self.run_id, self.label_id, self.label, self.class_label
+            "BlastDB: {}, Genome ID: {}, Run ID: {}, Database: {}".format(
+                self.blastdb_id, self.genome_id, self.run_id, self.dbpath
             )
         )
 
     def __repr__(self) -> str:
         """Return string representation of BlastDB table object."""
         return "<BlastDB(key=({}, {}, {}))>".format(
-            self.label_id, self.run_id, self.genome_id
+            self.blastdb_id, self.run_id, self.genome_id
         )
 
 
@@ -440,6 +440,45 @@ def filter_existing_comparisons(
     return comparisons_to_run
 
 
+def add_comparisons(session, run, comparisons: List[Dict[str, Any]]) -> None:
+    """Add comparison results to the database in bulk, and associate them with run.
+
+    :param session:       live SQLAlchemy session of pyani database
+    :param run:           Run object describing parent pyani run
+    :param comparisons:   list of dicts of Comparison column values, keyed by
+                          column name (excluding comparison_id)
+
+    Rows are inserted with one executemany statement for each of the comparisons
+    and runs_comparisons tables, rather than as one ORM object at a time.
+    Comparison IDs are assigned by the database, and each new row is linked
+    to the run by selecting its ID on the columns of the Comparison unique
+    constraint, so that concurrent processes adding comparisons to the same
+    database cannot be given the same IDs. The session is committed once all
+    rows are added.
+    """
+    if not comparisons:
+        return
+    session.execute(Comparison.__table__.insert(), comparisons)
+
+    # NULL-safe matching is needed, as fragsize and maxmatch may be NULL
+    columns = ("query_id", "subject_id", "program", "version", "fragsize", "maxmatch")
+    match = select(
+        [Comparison.comparison_id, literal(run.run_id)]
+    ).where(
+        and_(
+            *[
+                getattr(Comparison, _).isnot_distinct_from(bindparam(f"b_{_}"))
+                for _ in columns
+            ]
+        )
+    )
+    session.execute(
+        runcomparison.insert().from_select(["comparison_id", "run_id"], match),
+        [{f"b_{_}": comparison[_] for _ in columns} for comparison in comparisons],
+    )
+    session.commit()
+
+
 def add_run(session, method, cmdline, date, status, name):
     """Create a new Run and add it to the session.
 
@@ -466,6 +505,40 @@ def add_run(session, method, cmdline, date, status, name):
     return run
 
 
+def add_blastdb(session, genome, run, fragpath, dbpath, fragsizes, dbcmd):
+    """Create a new BlastDB for a genome and run, and add it to the session.
+
+    :param session:      live SQLAlchemy session of pyani database
+    :param genome:       Genome object for the fragmented genome
+    :param run:          Run object describing the parent pyani run
+    :param fragpath:     path to the fragmented genome (query in ANIb)
+    :param dbpath:       path to the genome's BLAST database (subject in ANIb)
+    :param fragsizes:    JSONified list of fragment sizes, in fragment number order
+    :param dbcmd:        command used to generate the fragments and database
+
+    Creates a new BlastDB object with the passed parameters, and returns it.
+    """
+    try:
+        blastdb = BlastDB(
+            genome=genome,
+            run=run,
+            fragpath=str(fragpath),
+            dbpath=str(dbpath),
+            fragsizes=fragsizes,
+            dbcmd=dbcmd,
+        )
+    except Exception:
+        raise PyaniORMException(
+            f"Could not create BLAST database record with command line: {dbcmd}"
+        )
+    try:
+        session.add(blastdb)
+        session.commit()
+    except Exception:
+        raise PyaniORMException(f"Could not add BLAST database {dbpath} to database")
+    return blastdb
+
+
 def add_run_genomes(
     session, run, indir: Path, classpath: Path, labelpath: Path
 ) -> List:
@@ -588,9 +661,22 @@ def update_comparison_matrices(session, run) -> None:
     for genome in run.genomes.all():
         df_alnlength.loc[genome.genome_id, genome.genome_id] = genome.length
 
-    # Loop over all comparisons for the run and fill in result matrices
+    # Loop over all comparisons for the run and fill in result matrices.
+    # Comparisons skipped by a prefilter have no alignment, so are given zero
+    # identity and coverage, as the plotting and classification code expects
+    # every cell to be filled
     for cmp in run.comparisons.all():
         qid, sid = cmp.query_id, cmp.subject_id
+        if cmp.identity is None:
+            for dfm in (
+                df_identity,
+                df_coverage,
+                df_alnlength,
+                df_simerrors,
+                df_hadamard,
+            ):
+                dfm.loc[qid, sid] = dfm.loc[sid, qid] = 0
+            continue
         df_identity.loc[qid, sid] = cmp.identity
         df_identity.loc[sid, qid] = cmp.identity
         df_coverage.loc[qid, sid] = cmp.cov_query
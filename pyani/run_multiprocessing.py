@@ -45,13 +45,19 @@ Python's multiprocessing module to distribute command-line jobs.
 import multiprocessing
 import subprocess
 import sys
+import time
 
 from logging import Logger
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from .core_budget import CoreBudget
 from .pyani_jobs import Job
 
 
+# Interval (in seconds) between checks for finished multithreaded jobs
+THREADED_POLL_INTERVAL = 0.1
+
+
 # Run a job dependency graph with multiprocessing
 def run_dependency_graph(
     jobgraph, workers: Optional[int] = None, logger: Optional[Logger] = None
@@ -65,10 +71,15 @@ def run_dependency_graph(
     The strategy here is to loop over each job in the list of jobs (jobgraph),
     and create/populate a series of Sets of commands, to be run in
     reverse order with multiprocessing_run as asynchronous pools.
+
+    If any job in a set runs with more than one thread, the set is instead
+    run by multiprocessing_run_threaded(), with workers as the number of
+    cores shared by the jobs' threads.
     """
     cmdsets = []  # type: List
+    threads = {}  # type: Dict[str, int]
     for job in jobgraph:
-        cmdsets = populate_cmdsets(job, cmdsets, depth=1)
+        cmdsets = populate_cmdsets(job, cmdsets, depth=1, threads=threads)
 
     # Put command sets in reverse order, and submit to multiprocessing_run
     cmdsets.reverse()
@@ -78,18 +89,27 @@ def run_dependency_graph(
             logger.info("Command pool now running:")
             for cmd in cmdset:
                 logger.info(cmd)
-        cumretval += multiprocessing_run(cmdset, workers)
+        if any(threads[_] > 1 for _ in cmdset):
+            cumretval += multiprocessing_run_threaded(
+                {_: threads[_] for _ in cmdset}, workers
+            )
+        else:
+            cumretval += multiprocessing_run(cmdset, workers)
         if logger:  # Try to be informative, if the logger module is being used
             logger.info("Command pool done.")
     return cumretval
 
 
-def populate_cmdsets(job: Job, cmdsets: List, depth: int) -> List:
+def populate_cmdsets(
+    job: Job, cmdsets: List, depth: int, threads: Optional[Dict[str, int]] = None
+) -> List:
     """Create list of jobsets at different depths of dependency tree.
 
     :param job:
     :param cmdsets:
     :param depth:
+    :param threads:  optional dictionary, updated with the number of threads
+        used by each command (see Job.threads)
 
     This is a recursive function (is there something quicker in the itertools
     module?) that descends each 'root' job in turn, populating each
@@ -97,6 +117,8 @@ def populate_cmdsets(job: Job, cmdsets: List, depth: int) -> List:
     if len(cmdsets) < depth:
         cmdsets.append(set())
     cmdsets[depth - 1].add(job.command)
+    if threads is not None:
+        threads[job.command] = max(threads.get(job.command, 1), job.threads)
 
     # Return now if there are no dependencies
     # (I think I can remove this check/return)
@@ -105,7 +127,7 @@ def populate_cmdsets(job: Job, cmdsets: List, depth: int) -> List:
 
     # There are dependencies, so add these to the command sets
     for j in job.dependencies:
-        cmdsets = populate_cmdsets(j, cmdsets, depth + 1)
+        cmdsets = populate_cmdsets(j, cmdsets, depth + 1, threads)
     return cmdsets
 
 
@@ -139,3 +161,88 @@ def multiprocessing_run(cmdlines: List, workers: Optional[int] = None) -> int:
     pool.close()
     pool.join()
     return sum([r.get().returncode for r in results])
+
+
+# Run a set of multithreaded command lines within a budget of cores
+def multiprocessing_run_threaded(
+    cmdlines: Dict[str, int], workers: Optional[int] = None
+) -> int:
+    """Run passed command-line jobs, keeping their total threads within budget.
+
+    :param cmdlines:  dict, number of threads used by each command line
+    :param workers:  int, number of cores shared by the jobs' threads; if not
+        set, all available cores (see core_budget.CoreBudget)
+
+    Jobs are started in order of their thread counts, largest first, and
+    only while the threads of all running jobs fit in the budget, so that
+    the largest jobs do not run alone at the end. A job using more threads
+    than there are cores runs on its own.
+
+    Returns the sum of exit codes from each job that was run, as for
+    multiprocessing_run().
+    """
+    budget = CoreBudget(workers)
+    pending = sorted(cmdlines, key=lambda _: cmdlines[_], reverse=True)
+    running = {}  # type: Dict[subprocess.Popen, int]
+    cumretval = 0
+    while pending or running:
+        for cline in list(pending):
+            needed = min(cmdlines[cline], budget.cores)
+            if running and sum(running.values()) + needed > budget.cores:
+                continue
+            proc = subprocess.Popen(
+                str(cline),
+                shell=sys.platform != "win32",
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            running[proc] = needed
+            pending.remove(cline)
+        time.sleep(THREADED_POLL_INTERVAL)
+        for proc in [_ for _ in running if _.poll() is not None]:
+            cumretval += proc.returncode
+            del running[proc]
+    return cumretval
+
+
+# Apply a function to sets of arguments using multiprocessing
+def multiprocessing_apply(
+    func: Callable, argsets: List[Tuple], workers: Optional[int] = None
+) -> List[Any]:
+    """Distributes calls to the passed function using multiprocessing.
+
+    :param func:  callable, module-level function to apply in each worker
+    :param argsets:  iterable, tuples of positional arguments for func
+    :param workers:  int, number of workers to use for multiprocessing
+
+    Returns the value returned by each call, in the order of argsets. Any
+    exception raised in a worker is re-raised here.
+    """
+    pool = multiprocessing.Pool(processes=workers)
+    results = [pool.apply_async(func, args) for args in argsets]
+    pool.close()
+    pool.join()
+    return [r.get() for r in results]
+
+
+# Map a function over arguments using multiprocessing, yielding results in order
+def multiprocessing_imap(
+    func: Callable,
+    args: Iterable[Any],
+    workers: Optional[int] = None,
+    chunksize: int = 1,
+) -> Iterator[Any]:
+    """Yield results of calling the passed function on each argument, in order.
+
+    :param func:  callable, module-level function of one argument
+    :param args:  iterable, argument for each call to func
+    :param workers:  int, number of workers to use for multiprocessing
+    :param chunksize:  int, number of arguments sent to a worker at a time
+
+    Results are yielded as soon as they, and all results before them, are
+    available, so that the caller can process them while later calls run.
+    Any exception raised in a worker is re-raised here. The worker pool is
+    terminated if the generator is closed before it is exhausted.
+    """
+    with multiprocessing.Pool(processes=workers) as pool:
+        yield from pool.imap(func, args, chunksize)
@@ -138,6 +138,7 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 from pyani import (
@@ -321,6 +322,15 @@ def parse_cmdline(argv: Optional[List] = None) -> Namespace:
         help="Number of worker processes for multiprocessing "
         "(default zero, meaning use all available cores)",
     )
+    parser.add_argument(
+        "--tetra_cache",
+        dest="tetra_cache",
+        action="store",
+        default=None,
+        type=Path,
+        help="Directory of TETRA Z-scores, keyed by genome hash, that are "
+        "reused by, and added to by, each run",
+    )
     parser.add_argument(
         "--SGEgroupsize",
         dest="sgegroupsize",
@@ -580,11 +590,16 @@ def calculate_anim(
 
 
 # Calculate TETRA for input
-def calculate_tetra(infiles: List[Path]) -> pd.DataFrame:
+def calculate_tetra(
+    infiles: List[Path],
+    workers: Optional[int] = None,
+    cachedir: Optional[Path] = None,
+) -> pd.DataFrame:
     """Calculate TETRA for files in input directory.
 
-    :param logger:  logging object
     :param infiles:  list, paths to each input file
+    :param workers:  int, number of worker processes calculating Z-scores
+    :param cachedir:  Path, directory of TETRA Z-scores to reuse and add to
 
     Calculates TETRA correlation scores, as described in:
 
@@ -603,10 +618,9 @@ def calculate_tetra(infiles: List[Path]) -> pd.DataFrame:
     logger.info("Running TETRA.")
     # First, find Z-scores
     logger.info("Calculating TETRA Z-scores for each sequence.")
-    tetra_zscores = {}
-    for filename in infiles:
-        logger.info("Calculating TETRA Z-scores for %s", filename)
-        tetra_zscores[filename.stem] = tetra.calculate_tetra_zscore(filename)
+    if cachedir is not None:
+        logger.info("Reusing and caching TETRA Z-scores in %s", cachedir)
+    tetra_zscores = tetra.calculate_tetra_zscores(infiles, workers, cachedir)
     # Then calculate Pearson correlation between Z-scores for each sequence
     logger.info("Calculating TETRA correlation scores.")
     tetra_correlations = tetra.calculate_correlations(tetra_zscores)
@@ -628,15 +642,45 @@ def make_sequence_fragments(
     for ANIb methods), and writes BLAST databases of these fragments,
     and fragment lengths of sequences, to local files.
     """
-    fragfiles, fraglengths = anib.fragment_fasta_files(infiles, blastdir, args.fragsize)
-    # Export fragment lengths as JSON, in case we re-run with --skip_blastn
-    fragpath = blastdir / "fraglengths.json"
+    fragfiles, fraglengths = anib.fragment_fasta_files(
+        infiles, blastdir, args.fragsize, args.workers
+    )
+    # Export fragment lengths as NumPy arrays, in case we re-run with --skip_blastn
+    fragpath = blastdir / "fraglengths.npz"
     logger.info(f"Writing cache of fragment lengths to {fragpath}")
-    with open(fragpath, "w") as ofh:
-        json.dump(fraglengths, ofh)
+    np.savez(fragpath, **fraglengths)
     return fragfiles, fraglengths
 
 
+def load_fragment_lengths(logger: Logger, blastdir: Path) -> Dict:
+    """Return fragment sizes cached by make_sequence_fragments().
+
+    :param logger:  logging object
+    :param blastdir:  path of directory holding BLASTN databases of fragments
+
+    Output directories written by earlier versions of pyani hold fragment
+    lengths in fraglengths.json, as dictionaries keyed by fragment ID. If
+    there is no fraglengths.npz file, these are loaded instead, and converted
+    to arrays indexed by fragment number (see anib.get_fragment_lengths()).
+    """
+    fragpath = blastdir / "fraglengths.npz"
+    if fragpath.is_file():
+        logger.info(f"Loading sequence fragments from {fragpath}")
+        with np.load(fragpath) as fragdata:
+            return dict(fragdata)
+
+    jsonpath = blastdir / "fraglengths.json"
+    logger.warning(f"No {fragpath}: loading sequence fragments from {jsonpath}")
+    with open(jsonpath, "r") as ifh:
+        fragdata = json.load(ifh)
+    fraglengths = {}
+    for qname, lengths in fragdata.items():
+        fraglengths[qname] = np.zeros(len(lengths), dtype=np.int64)
+        for fragid, length in lengths.items():
+            fraglengths[qname][int(fragid[len("frag") :]) - 1] = length
+    return fraglengths
+
+
 def run_blast(
     args: Namespace, logger: Logger, infiles: List[Path], blastdir: Path
 ) -> Tuple:
@@ -651,6 +695,7 @@ def run_blast(
     return values of the BLAST tool subprocesses, and the fragment sizes for
     each input file
     """
+    cumval = 0
     if not args.skip_blastn:
         logger.info("Fragmenting input files, and writing to %s", args.outdirname)
         fragfiles, fraglengths = make_sequence_fragments(
@@ -679,12 +724,9 @@ def run_blast(
             raise SystemError(1)
     else:
         logger.warning("Skipping BLASTN runs (as instructed)!")
-        # Import fragment lengths from JSON
+        # Import fragment lengths from the previous run
         if args.method == "ANIblastall":
-            fragpath = blastdir / "fraglengths.json"
-            logger.info(f"Loading sequence fragments from {fragpath}")
-            with open(fragpath, "rU") as ifh:
-                fraglengths = json.load(ifh)
+            fraglengths = load_fragment_lengths(logger, blastdir)
         else:
             fraglengths = dict()
 
@@ -742,7 +784,12 @@ def unified_anib(
     logger.info("Processing pairwise %s BLAST output.", args.method)
     try:
         data = anib.process_blast(
-            blastdir, org_lengths, fraglengths=fraglengths, mode=args.method
+            blastdir,
+            org_lengths,
+            fraglengths=fraglengths,
+            mode=args.method,
+            logger=logger,
+            workers=args.workers,
         )
     except ZeroDivisionError:
         logger.error("One or more BLAST output files has a problem.")
@@ -995,7 +1042,7 @@ def run_main(argsin: Optional[Namespace] = None) -> int:
         # and write out corresponding results.
         logger.info("Carrying out %s analysis", args.method)
         if args.method == "TETRA":
-            results = method_function(infiles)
+            results = method_function(infiles, args.workers, args.tetra_cache)
         else:
             results = method_function(args, infiles, org_lengths)
         write(args, results)
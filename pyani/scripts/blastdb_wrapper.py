@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Wrapper building a genome's entry in the ANIb BLAST database store.
+
+ANIb queries the fragments of each genome against a BLAST+ database of each
+other genome. The fragments, their lengths, and the database are kept in a
+store entry, keyed by genome hash, fragment size and BLAST+ version, so that
+they are built once and reused by later runs. A marker file,
+<entry>.complete, is written once the entry is complete. If the marker file
+already exists, nothing is done. See pyani.anib.build_blastdb().
+
+For example, the command
+
+blastdb_wrapper.py --fragsize 1020 --makeblastdb_exe makeblastdb <genome> <entry>
+
+builds the entry, which the comparisons
+
+blastn -query <qry1_entry>/fragments.fna -db <entry>/genome ...
+blastn -query <qry2_entry>/fragments.fna -db <entry>/genome ...
+
+then use as their database.
+"""
+
+import sys
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import pyani_config
+from pyani.anib import build_blastdb
+
+
+def run_main(argv: Optional[List[str]] = None) -> int:
+    """Run main process for blastdb_wrapper.py."""
+    # Parse command-line
+    parser = ArgumentParser(prog="blastdb_wrapper.py")
+    parser.add_argument("genome", type=Path)
+    parser.add_argument("entry", type=Path)
+    parser.add_argument("--fragsize", type=int, default=pyani_config.FRAGSIZE)
+    parser.add_argument(
+        "--makeblastdb_exe", type=Path, default=pyani_config.MAKEBLASTDB_DEFAULT
+    )
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Build the store entry, if it does not already exist
+    build_blastdb(args.genome, args.entry, args.fragsize, args.makeblastdb_exe)
+
+    # Exit
+    return 0
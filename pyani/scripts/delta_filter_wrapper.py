@@ -58,36 +58,62 @@ becomes
 
 delta_filter_wrapper.py delta-filter [options] <delta file> <filtered delta file>
 
+Output from delta-filter is written directly to the named file, rather
+than being held in memory. If the output file name ends in .gz, the
+output is gzip-compressed as it is written, and the input .delta file is
+also replaced by a gzip-compressed copy once filtering is complete.
+
+Once filtering is complete, the .delta and filtered output files are added
+to the manifest of completed output in their directory (see
+pyani.manifest), so that recovery mode can reuse them.
+
 This wrapper is not very robust, but will be improved in later
-versions of pyani.
+versions of pyani. The nucmer_filter_wrapper.py script avoids the need
+for delta-filter altogether, by filtering nucmer output in-process.
 """
 
 import shlex
+import shutil
 import subprocess
 import sys
 
+from pathlib import Path
+
+from pyani.manifest import record_outputs
+from pyani.nucmer import compress_delta, open_delta
+
 
 def run_main() -> int:
     """Run main process for delta_filter_wrapper.py."""
     # Parse command-line
     df_exe = sys.argv[1]
     args = sys.argv[2:-1]
-    outfname = sys.argv[-1]
+    outfname = Path(sys.argv[-1])
 
     sys.stdout.write("script called with %s" % sys.argv)
 
     # Run delta-filter, routing output to the named file
     cmd = [shlex.quote(df_exe)] + [shlex.quote(_) for _ in args]
-    with open(outfname, "w") as ofh:
-        ofh.write(
+    if outfname.suffix != ".gz":
+        with outfname.open("wb") as ofh:
             subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                shell=False,
-            ).stdout.decode("utf-8")
+                cmd, stdout=ofh, stderr=subprocess.PIPE, check=True, shell=False
+            )
+        record_outputs([Path(args[-1]), outfname])
+        return 0
+
+    # Compress output as it is written, then compress the input .delta file
+    with open_delta(outfname, "wb") as ofh:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False
         )
+        shutil.copyfileobj(proc.stdout, ofh)
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+    record_outputs([compress_delta(Path(args[-1])), outfname])
 
     # Exit
     return 0
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Wrapper building a genome's BLAST database in an ANIb output directory.
+
+average_nucleotide_identity.py queries the fragments of each genome against
+a BLAST database of each other genome, built in the output directory by
+makeblastdb (ANIb) or formatdb (ANIblastall). As formatdb writes the
+database alongside its input, the genome is first linked (or, failing that,
+copied) into the output directory. A marker file, <database>.complete,
+records the genome hash and tool version once the database is built. If
+the marker file matches, nothing is done. See pyani.anib.format_blastdb().
+
+For example, the command
+
+formatdb_wrapper.py --mode ANIblastall --format_exe formatdb <genome> <outdir>
+
+links <genome> into <outdir>, then runs
+
+formatdb -p F -i <outdir>/<genome name> -t <genome stem>
+"""
+
+import sys
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import pyani_config
+from pyani.anib import format_blastdb
+
+
+def run_main(argv: Optional[List[str]] = None) -> int:
+    """Run main process for formatdb_wrapper.py."""
+    # Parse command-line
+    parser = ArgumentParser(prog="formatdb_wrapper.py")
+    parser.add_argument("genome", type=Path)
+    parser.add_argument("outdir", type=Path)
+    parser.add_argument("--mode", choices=["ANIb", "ANIblastall"], default="ANIb")
+    parser.add_argument("--format_exe", type=Path, default=None)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if args.format_exe is None:
+        args.format_exe = (
+            pyani_config.MAKEBLASTDB_DEFAULT
+            if args.mode == "ANIb"
+            else pyani_config.FORMATDB_DEFAULT
+        )
+
+    # Build the database, if it is not already current
+    format_blastdb(args.genome, args.outdir, args.format_exe, args.mode)
+
+    # Exit
+    return 0
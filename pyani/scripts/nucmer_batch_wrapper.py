@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Wrapper running NUCmer for one reference and a batch of query genomes.
+
+All query FASTA files are aligned against the reference in a single NUCmer
+run, so that the reference index is built only once for the batch. The
+combined output is then split into a .delta file for each reference/query
+pair, named as for a pairwise NUCmer run, in the nucmer_output
+subdirectory of the output directory. See pyani.anim.run_nucmer_batch().
+
+For example, the commands
+
+nucmer --mum -p <outdir>/nucmer_output/<ref>_vs_<qry1> <ref> <qry1>
+nucmer --mum -p <outdir>/nucmer_output/<ref>_vs_<qry2> <ref> <qry2>
+
+become
+
+nucmer_batch_wrapper.py --nucmer_exe nucmer --outdir <outdir> <ref> <qry1> <qry2>
+
+With --native_filter, the one-to-one filtered .filter file for each pair is
+also written, as by nucmer_filter_wrapper.py, and with --compress as well,
+the .filter and .delta files are gzip-compressed. With MUMmer4's NUCmer,
+--threads sets the number of threads NUCmer uses.
+
+Once the batch is complete, the output files for each pair are added to the
+manifest of completed output in their directory (see pyani.manifest), so
+that recovery mode can reuse them.
+"""
+
+import sys
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import pyani_config
+from pyani.anim import get_nucmer_outputs, run_nucmer_batch
+from pyani.manifest import record_outputs
+
+
+def run_main(argv: Optional[List[str]] = None) -> int:
+    """Run main process for nucmer_batch_wrapper.py."""
+    # Parse command-line
+    parser = ArgumentParser(prog="nucmer_batch_wrapper.py")
+    parser.add_argument("reference", type=Path)
+    parser.add_argument("queries", type=Path, nargs="+")
+    parser.add_argument("--outdir", type=Path, default=Path("."))
+    parser.add_argument("--nucmer_exe", type=Path, default=pyani_config.NUCMER_DEFAULT)
+    parser.add_argument("--maxmatch", action="store_true", default=False)
+    parser.add_argument("--native_filter", action="store_true", default=False)
+    parser.add_argument("--compress", action="store_true", default=False)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Run NUCmer on the batch, writing output for each reference/query pair
+    run_nucmer_batch(
+        args.reference,
+        args.queries,
+        args.outdir,
+        args.nucmer_exe,
+        args.maxmatch,
+        args.native_filter,
+        args.compress,
+        args.threads,
+    )
+    outsubdir = args.outdir / pyani_config.ALIGNDIR["ANIm"]
+    for query in args.queries:
+        record_outputs(
+            get_nucmer_outputs(outsubdir / f"{args.reference.stem}_vs_{query.stem}")
+        )
+
+    # Exit
+    return 0
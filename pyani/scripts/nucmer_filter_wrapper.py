@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Wrapper running NUCmer and one-to-one delta filtering as a single job.
+
+The first argument is the path to nucmer, and all remaining arguments
+are passed through to it unchanged. Once nucmer completes, the .delta
+file named by its -p output prefix is filtered in-process with
+pyani.nucmer.filter_delta(), the equivalent of delta-filter -1, and
+written alongside it with the .filter extension.
+
+For example, the pair of commands
+
+nucmer --mum -p <prefix> <query> <subject>
+delta_filter_wrapper.py delta-filter -1 <prefix>.delta <prefix>.filter
+
+becomes
+
+nucmer_filter_wrapper.py nucmer --mum -p <prefix> <query> <subject>
+
+so that each ANIm comparison requires a single process launch and a single
+scheduler job, rather than two.
+
+If the first argument is --compress, it is not passed to nucmer. Instead,
+the .filter file is written gzip-compressed, as <prefix>.filter.gz, and
+the .delta file is replaced by a compressed copy, <prefix>.delta.gz.
+
+Once filtering is complete, the .delta and .filter output files are added
+to the manifest of completed output in their directory (see
+pyani.manifest), so that recovery mode can reuse them.
+"""
+
+import subprocess
+import sys
+
+from pathlib import Path
+
+from pyani.manifest import record_outputs
+from pyani.nucmer import compress_delta, filter_delta
+
+
+def run_main() -> int:
+    """Run main process for nucmer_filter_wrapper.py."""
+    # Parse command-line; the output prefix follows the -p option
+    cmd = sys.argv[1:]
+    compress = cmd[0] == "--compress"
+    if compress:
+        cmd = cmd[1:]
+    outprefix = cmd[cmd.index("-p") + 1]
+
+    # Run nucmer, then filter its output natively
+    subprocess.run(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, shell=False
+    )
+    if compress:
+        outfname = filter_delta(
+            Path(outprefix + ".delta"), Path(outprefix + ".filter.gz")
+        )
+        record_outputs([compress_delta(Path(outprefix + ".delta")), outfname])
+    else:
+        outfname = filter_delta(Path(outprefix + ".delta"), Path(outprefix + ".filter"))
+        record_outputs([Path(outprefix + ".delta"), outfname])
+
+    # Exit
+    return 0
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Wrapper saving a reference genome's MUMmer4 NUCmer index.
+
+MUMmer4's NUCmer can save the suffix array index it builds for a reference
+genome, and load it in later runs, so that the index is built once for all
+comparisons against that reference. The index is saved with the passed
+prefix, and a marker file, <index>.complete, is written once it is complete.
+If the marker file already exists, nothing is done. See
+pyani.anim.build_nucmer_index().
+
+For example, the command
+
+nucmer_index_wrapper.py --nucmer_exe nucmer <ref> <index>
+
+builds the index, which the comparisons
+
+nucmer --mum --load <index> -p <outdir>/nucmer_output/<ref>_vs_<qry1> <ref> <qry1>
+nucmer --mum --load <index> -p <outdir>/nucmer_output/<ref>_vs_<qry2> <ref> <qry2>
+
+then load.
+"""
+
+import sys
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import pyani_config
+from pyani.anim import build_nucmer_index
+
+
+def run_main(argv: Optional[List[str]] = None) -> int:
+    """Run main process for nucmer_index_wrapper.py."""
+    # Parse command-line
+    parser = ArgumentParser(prog="nucmer_index_wrapper.py")
+    parser.add_argument("reference", type=Path)
+    parser.add_argument("index", type=Path)
+    parser.add_argument("--nucmer_exe", type=Path, default=pyani_config.NUCMER_DEFAULT)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Build and save the index, if it does not already exist
+    build_nucmer_index(args.reference, args.index, args.nucmer_exe)
+
+    # Exit
+    return 0
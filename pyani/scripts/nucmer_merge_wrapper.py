@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G1 1XQ
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Wrapper merging NUCmer output for chunks of a query genome, and filtering it.
+
+Large query genomes may be split into chunks of whole sequences, each
+aligned against the reference in its own NUCmer job, so that a single
+comparison can use several cores (see pyani.anim.write_query_chunks()).
+Once those jobs are complete, this merges their output into the .delta
+file that a single NUCmer run would have written, in the nucmer_output
+subdirectory of the output directory, and filters it as one comparison.
+See pyani.anim.merge_nucmer_chunks().
+
+For example, with query chunks <qry>_chunk000.fna and <qry>_chunk001.fna,
+and <prefix> standing for <outdir>/nucmer_output/<ref>_vs_<qry>, the commands
+
+nucmer --maxmatch -p <prefix>_chunk000 <ref> <qry>_chunk000.fna
+nucmer --maxmatch -p <prefix>_chunk001 <ref> <qry>_chunk001.fna
+
+are followed by
+
+nucmer_merge_wrapper.py --outdir <outdir> <ref> <qry> <qry>_chunk00[01].fna
+
+which writes <prefix>.delta and <prefix>.filter. With
+--native_filter, the output is filtered in-process, rather than with
+delta-filter, and with --compress, the .filter and .delta files are
+gzip-compressed. The merged .delta and .filter files are then added to the
+manifest of completed output in their directory (see pyani.manifest), so
+that recovery mode can reuse them.
+"""
+
+import sys
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import pyani_config
+from pyani.anim import get_nucmer_outputs, merge_nucmer_chunks
+from pyani.manifest import record_outputs
+
+
+def run_main(argv: Optional[List[str]] = None) -> int:
+    """Run main process for nucmer_merge_wrapper.py."""
+    # Parse command-line
+    parser = ArgumentParser(prog="nucmer_merge_wrapper.py")
+    parser.add_argument("reference", type=Path)
+    parser.add_argument("query", type=Path)
+    parser.add_argument("chunks", type=Path, nargs="+")
+    parser.add_argument("--outdir", type=Path, default=Path("."))
+    parser.add_argument("--filter_exe", type=Path, default=pyani_config.FILTER_DEFAULT)
+    parser.add_argument("--native_filter", action="store_true", default=False)
+    parser.add_argument("--compress", action="store_true", default=False)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Merge the output for each chunk, and filter the merged comparison
+    merge_nucmer_chunks(
+        args.reference,
+        args.query,
+        args.chunks,
+        args.outdir,
+        args.filter_exe,
+        args.native_filter,
+        args.compress,
+    )
+    outsubdir = args.outdir / pyani_config.ALIGNDIR["ANIm"]
+    record_outputs(
+        get_nucmer_outputs(outsubdir / f"{args.reference.stem}_vs_{args.query.stem}")
+    )
+
+    # Exit
+    return 0
@@ -50,6 +50,7 @@ from pyani.scripts.parsers import (
     anim_parser,
     anib_parser,
     aniblastall_parser,
+    anisketch_parser,
     report_parser,
     plot_parser,
     classify_parser,
@@ -57,6 +58,7 @@ from pyani.scripts.parsers import (
     common_parser,
     run_common_parser,
     listdeps_parser,
+    cache_parser,
 )
 
 
@@ -80,12 +82,16 @@ def parse_cmdline(argv: Optional[List] = None) -> Namespace:
         conduct ANIb analysis
     - aniblastall
         conduct ANIblastall analysis
+    - anisketch
+        conduct alignment-free, sketch-based ANI analysis
     - report
         generate output describing analyses, genomes, and results
     - plot
         generate graphical output describing results
     - classify
         produce graph-based classification of genomes on the basis of ANI analysis
+    - cache
+        report on, and prune, a cache of comparison results
     """
     # Main parent parser
     parser_main = ArgumentParser(
@@ -113,10 +119,12 @@ def parse_cmdline(argv: Optional[List] = None) -> Namespace:
     aniblastall_parser.build(
         subparsers, parents=[parser_common, parser_scheduler, parser_run_common]
     )
+    anisketch_parser.build(subparsers, parents=[parser_common, parser_run_common])
     report_parser.build(subparsers, parents=[parser_common])
     plot_parser.build(subparsers, parents=[parser_common])
     classify_parser.build(subparsers, parents=[parser_common])
     listdeps_parser.build(subparsers, parents=[parser_common])
+    cache_parser.build(subparsers, parents=[parser_common])
 
     # Parse arguments
     # The list comprehension is to allow PosixPaths to be defined and passed in testing
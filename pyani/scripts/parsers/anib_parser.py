@@ -109,4 +109,45 @@ def build(
         default=pyani_config.FRAGSIZE,
         help="blastn query fragment size",
     )
+    parser.add_argument(
+        "--blastdb_dir",
+        dest="blastdb_dir",
+        action="store",
+        default=None,
+        type=Path,
+        help="path to a store of genome fragments and BLAST databases shared "
+        + "between runs; if not set, blastdbs alongside the pyani database",
+    )
+    parser.add_argument(
+        "--streaming",
+        dest="streaming",
+        action="store_true",
+        default=False,
+        help="summarise blastn output as it is produced, without writing "
+        + ".blast_tab files (multiprocessing only)",
+    )
+    parser.add_argument(
+        "--archive",
+        dest="archive",
+        action="store_true",
+        default=False,
+        help="with --streaming, keep a gzip-compressed copy of each blastn output",
+    )
+    parser.add_argument(
+        "--combined_db",
+        dest="combined_db",
+        action="store_true",
+        default=False,
+        help="run one blastn job per genome, against a single database of all "
+        + "genomes",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        action="store",
+        default=1,
+        type=int,
+        help="most threads for each blastn job; with multiprocessing, threads "
+        + "are shared out from the --workers cores by job size (0: no limit)",
+    )
     parser.set_defaults(func=subcommands.subcmd_anib)
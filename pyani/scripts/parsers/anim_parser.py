@@ -42,7 +42,7 @@ from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, _SubParsersA
 from pathlib import Path
 from typing import List, Optional
 
-from pyani import pyani_config
+from pyani import cache, prefilter, pyani_config
 from pyani.scripts import subcommands
 
 
@@ -111,4 +111,115 @@ def build(
         default=False,
         help="do not use delta-filter for 1:1 NUCmer matches",
     )
+    parser.add_argument(
+        "--native_filter",
+        dest="native_filter",
+        action="store_true",
+        default=False,
+        help="filter 1:1 NUCmer matches in-process, in the same job as NUCmer "
+        + "(usually slower than delta-filter)",
+    )
+    parser.add_argument(
+        "--streaming",
+        dest="streaming",
+        action="store_true",
+        default=False,
+        help="run NUCmer in temporary scratch space, returning only results "
+        + "(multiprocessing only)",
+    )
+    parser.add_argument(
+        "--archive",
+        dest="archive",
+        action="store_true",
+        default=False,
+        help="with --streaming, keep a gzip-compressed copy of each alignment",
+    )
+    parser.add_argument(
+        "--batchsize",
+        dest="batchsize",
+        action="store",
+        default=0,
+        type=int,
+        help="align up to this many query genomes against each reference "
+        + "genome in a single NUCmer run (requires --maxmatch)",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        action="store",
+        default=1,
+        type=int,
+        help="most threads for each NUCmer job (MUMmer4 only); with "
+        + "multiprocessing, threads are shared out from the --workers cores by "
+        + "job size (0: no limit)",
+    )
+    parser.add_argument(
+        "--reuse_index",
+        dest="reuse_index",
+        action="store_true",
+        default=False,
+        help="save each reference genome's NUCmer index once, and load it in "
+        + "every comparison against that genome (MUMmer4 and multiprocessing only)",
+    )
+    parser.add_argument(
+        "--split_size",
+        dest="split_size",
+        action="store",
+        default=0,
+        type=int,
+        help="split NUCmer query genomes longer than this many bases into "
+        + "chunks of whole sequences, aligned in parallel (requires --maxmatch)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        dest="prefilter",
+        action="store",
+        default=None,
+        choices=prefilter.PREFILTER_METHODS,
+        help="only run NUCmer for genome pairs whose score with this "
+        + "alignment-free method reaches --prefilter_cutoff",
+    )
+    parser.add_argument(
+        "--prefilter_cutoff",
+        dest="prefilter_cutoff",
+        action="store",
+        default=None,
+        type=float,
+        help="minimum prefilter score for a genome pair to be aligned; "
+        + "None uses the default for the method %s" % prefilter.PREFILTER_CUTOFFS,
+    )
+    parser.add_argument(
+        "--compress",
+        dest="compress",
+        action="store_true",
+        default=False,
+        help="gzip-compress NUCmer .delta and .filter output as each job completes",
+    )
+    parser.add_argument(
+        "--union_coverage",
+        dest="union_coverage",
+        action="store_true",
+        default=False,
+        help="calculate coverage from the union of aligned regions, so that "
+        + "bases in overlapping alignments are counted once",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        "--cache-dir",
+        dest="cache_dir",
+        action="store",
+        default=None,
+        type=Path,
+        help="path to a comparison cache shared between runs and databases; "
+        + "cached results are reused, and new results added",
+    )
+    parser.add_argument(
+        "--cache_size",
+        dest="cache_size",
+        action="store",
+        default=cache.CACHE_SIZE,
+        type=cache.parse_size,
+        help="maximum comparison cache size, in bytes or with a K, M, G or "
+        + "T suffix; least recently used entries are removed beyond this",
+    )
     parser.set_defaults(func=subcommands.subcmd_anim)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2016-2019
+# (c) University of Strathclyde 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2016-2019 The James Hutton Institute
+# Copyright (c) 2019-2020 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Provides parser for anisketch subcommand."""
+
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, _SubParsersAction
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import anisketch
+from pyani.scripts import subcommands
+
+
+def build(
+    subps: _SubParsersAction, parents: Optional[List[ArgumentParser]] = None
+) -> None:
+    """Return a command-line parser for the anisketch subcommand.
+
+    :param subps:  collection of subparsers in main parser
+    :param parents:  parsers from which arguments are inherited
+    """
+    parser = subps.add_parser(
+        "anisketch", parents=parents, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    # Required positional arguments: input directory
+    parser.add_argument(
+        action="store",
+        dest="indir",
+        default=None,
+        type=Path,
+        help="input genome directory",
+    )
+    # Optional arguments
+    parser.add_argument(
+        "--dbpath",
+        action="store",
+        dest="dbpath",
+        default=Path(".pyani/pyanidb"),
+        type=Path,
+        help="path to pyani database",
+    )
+    parser.add_argument(
+        "--ksize",
+        dest="ksize",
+        action="store",
+        default=anisketch.KSIZE,
+        type=int,
+        help="k-mer size (at most 31)",
+    )
+    parser.add_argument(
+        "--scaled",
+        dest="scaled",
+        action="store",
+        default=anisketch.SCALED,
+        type=int,
+        help="FracMinHash scale factor: sketch one in this many k-mers",
+    )
+    parser.add_argument(
+        "--estimator",
+        dest="estimator",
+        action="store",
+        default="jaccard",
+        choices=anisketch.ESTIMATORS,
+        help="estimate ANI from Jaccard index or maximum containment",
+    )
+    parser.add_argument(
+        "--sketchdir",
+        dest="sketchdir",
+        action="store",
+        default=None,
+        type=Path,
+        help="path to genome sketch cache; if not given, a 'sketches' "
+        + "directory alongside the database is used",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        action="store",
+        default=None,
+        type=int,
+        help="Number of worker processes for building sketches "
+        "(default zero, meaning use all available cores)",
+    )
+    parser.set_defaults(func=subcommands.subcmd_anisketch)
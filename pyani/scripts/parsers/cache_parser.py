@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# (c) University of Strathclyde 2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# Cathedral Street,
+# Glasgow,
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2020 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Provides parser for listdepsp subcommand."""
+"""Provides parser for cache subcommand."""
+
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, _SubParsersAction
+from pathlib import Path
+from typing import List, Optional
+
+from pyani import cache
+from pyani.scripts import subcommands
+
+
+def build(
+    subps: _SubParsersAction, parents: Optional[List[ArgumentParser]] = None
+) -> None:
+    """Return a command-line parser for the cache subcommand.
+
+    :param subps:  collection of subparsers in main parser
+    :param parents:  parsers from which arguments are inherited
+
+    pyani cache reports the contents of a comparison cache and, optionally,
+    removes least recently used entries to fit a maximum size.
+    """
+    parser = subps.add_parser(
+        "cache", parents=parents, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    # Required arguments: cache directory
+    parser.add_argument(
+        "--cache_dir",
+        "--cache-dir",
+        dest="cache_dir",
+        action="store",
+        required=True,
+        type=Path,
+        help="path to comparison cache",
+    )
+    # Optional arguments
+    parser.add_argument(
+        "--prune",
+        dest="prune",
+        action="store_true",
+        default=False,
+        help="remove least recently used entries until the cache fits --cache_size",
+    )
+    parser.add_argument(
+        "--cache_size",
+        dest="cache_size",
+        action="store",
+        default=cache.CACHE_SIZE,
+        type=cache.parse_size,
+        help="maximum comparison cache size for --prune, in bytes or with a "
+        + "K, M, G or T suffix",
+    )
+    parser.add_argument(
+        "--clear",
+        dest="clear",
+        action="store_true",
+        default=False,
+        help="remove all entries from the cache",
+    )
+    parser.set_defaults(func=subcommands.subcmd_cache)
@@ -41,6 +41,8 @@
 from .subcmd_anib import subcmd_anib
 from .subcmd_aniblastall import subcmd_aniblastall
 from .subcmd_anim import subcmd_anim
+from .subcmd_anisketch import subcmd_anisketch
+from .subcmd_cache import subcmd_cache
 from .subcmd_classify import subcmd_classify
 from .subcmd_createdb import subcmd_createdb
 from .subcmd_download import subcmd_download
@@ -40,22 +40,34 @@
 """Provides the anib subcommand for pyani."""
 
 import datetime
+import functools
 import json
 import logging
-import os
+import subprocess
 
 from argparse import Namespace
 from itertools import permutations
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np  # type: ignore
 
-from Bio import SeqIO
 from tqdm import tqdm
 
-from pyani import anib
+from pyani import (
+    PyaniException,
+    anib,
+    pyani_config,
+    pyani_jobs,
+    run_sge,
+    run_multiprocessing as run_mp,
+)
+from pyani.core_budget import CoreBudget
 from pyani.pyani_files import collect_existing_output
 from pyani.pyani_orm import (
     PyaniORMException,
+    add_blastdb,
+    add_comparisons,
     add_run,
     add_run_genomes,
     filter_existing_comparisons,
@@ -65,6 +77,30 @@ from pyani.pyani_orm import (
 from pyani.pyani_tools import termcolor
 
 
+# Convenience struct describing a pairwise comparison job for the SQLAlchemy
+# implementation
+class ComparisonJob(NamedTuple):
+
+    """Pairwise comparison job for the SQLAlchemy implementation."""
+
+    query: str
+    subject: str
+    blastcmd: str
+    outfile: Path
+    job: Optional[pyani_jobs.Job]
+
+
+# Convenience struct describing a genome's entry in the BLAST database store
+class BlastDBJob(NamedTuple):
+
+    """BLAST database store entry for a genome, and the job building it."""
+
+    genome: Any
+    entry: Path
+    dbcmd: str
+    job: Optional[pyani_jobs.Job]
+
+
 def subcmd_anib(args: Namespace) -> None:
     """Perform ANIb on all genome files in an input directory.
 
@@ -81,6 +117,12 @@ def subcmd_anib(args: Namespace) -> None:
     is then used to query each set of fragments against each BLAST+ database,
     in turn.
 
+    Fragments and databases are kept in a persistent store (see
+    get_blastdb_dir()), keyed by genome hash, fragment size and BLAST+
+    version, and recorded in the BlastDB table. They are built only for
+    genomes not already in the store, so later runs with the same genomes
+    skip fragmenting and database construction.
+
     For each query, the BLAST+ .tab output is parsed to obtain alignment length,
     identity and similarity error count. Alignments below a threshold are not
     included in the calculation (this introduces systematic bias with respect to
@@ -91,18 +133,32 @@ def subcmd_anib(args: Namespace) -> None:
     """
     logger = logging.getLogger(__name__)
 
-    logger.info(
-        termcolor("Running ANIm analysis", "red")
-    )  # announce that we're starting
+    # Announce the analysis
+    logger.info(termcolor("Running ANIb analysis", bold=True))
 
     # Get BLAST+ version - this will be used in the database entries
     blastn_version = anib.get_version(args.blastn_exe)
     logger.info(termcolor("BLAST+ blastn version: %s", "cyan"), blastn_version)
 
+    # Streamed output can only be passed back to us by multiprocessing workers
+    if args.streaming and args.scheduler != "multiprocessing":
+        logger.error("Streaming blastn output requires the multiprocessing scheduler")
+        raise PyaniException("Cannot stream blastn output with %s" % args.scheduler)
+
+    # Searching a combined database changes the E-values, and so possibly the
+    # hits, reported for each fragment, so its results are kept distinct in the
+    # database. BLAST+ store entries are still keyed by the BLAST+ version.
+    comparison_version = blastn_version
+    if args.combined_db:
+        comparison_version = f"{blastn_version}_combined"
+        logger.info("Querying each genome against a combined BLAST database")
+        if args.streaming:
+            logger.warning("Combined BLAST database: ignoring --streaming")
+
     # Use provided name, or make new one for this analysis
     start_time = datetime.datetime.now()
     name = args.name or "_".join(["ANIb", start_time.isoformat()])
-    logger.info("Analysis name: %s", name)
+    logger.info(termcolor("Analysis name: %s", "cyan"), name)
 
     # Connect to existing database (which may be "clean" or have old analyses)
     logger.debug("Connecting to database %s", args.dbpath)
@@ -137,62 +193,42 @@ def subcmd_anib(args: Namespace) -> None:
             session, run, args.indir, args.classes, args.labels
         )
     except PyaniORMException:
-        logger.error(
-            "Could not add genomes to database for run %s (exiting)", run, exc_info=True
-        )
+        logger.error("Could not add genomes to database for run %s (exiting)", run)
+        raise SystemExit(1)
     logger.debug("\t...added genome IDs: %s", genome_ids)
 
-    # Get list of genomes for this analysis from the database
-    logger.info("Compiling genomes for comparison")
-    genomes = run.genomes.all()
-    logger.debug("\tCollected %s genomes for this run", len(genomes))
-
-    # Create output directories. We create the main parent directory (args.outdir), but
-    # also subdirectories for the BLAST databases,
-    logger.debug("Creating output directory %s", args.outdir)
+    # Create output directory for BLAST+ output
+    blastdir = args.outdir / pyani_config.ALIGNDIR["ANIb"]
+    logger.debug("Creating output directory %s", blastdir)
     try:
-        os.makedirs(args.outdir, exist_ok=True)
+        blastdir.mkdir(exist_ok=True, parents=True)
     except IOError:
         logger.error(
-            f"Could not create output directory {args.outdir} (exiting)", exc_info=True
+            "Could not create output directory %s (exiting)", blastdir, exc_info=True
         )
         raise SystemError(1)
-    fragdir = Path(str(args.outdir)) / "fragments"
-    blastdbdir = Path(str(args.outdir)) / "blastdbs"
-    logger.debug("\t...creating subdirectories")
-    os.makedirs(fragdir, exist_ok=True)
-    os.makedirs(blastdbdir, exist_ok=True)
-
-    # Create a new sequence fragment file and a new BLAST+ database for each input genome,
-    # and add this data to the database as a row in BlastDB
-    logger.info("Creating input sequence fragment files")
-    for genome in genomes:
-        fragpath, fraglengths = fragment_fasta_file(
-            Path(str(genome.path)), Path(str(fragdir)), args.fragsize
-        )
-        print(fragpath, len(fraglengths))
-        # blastdb = add_blastdb(
-        #     session, genome, run, fragpath, dbpath, fraglengths, dbcmd
-        # )
 
-    raise NotImplementedError
+    # Get list of genomes for this analysis from the database
+    logger.info("Compiling genomes for comparison")
+    genomes = run.genomes.all()
+    logger.debug("\tCollected %s genomes for this run", len(genomes))
 
     # Generate all pair permutations of genome IDs as a list of (Genome, Genome) tuples
     logger.info(
         "Compiling pairwise comparisons (this can take time for large datasets)..."
     )
     comparisons = list(permutations(tqdm(genomes, disable=args.disable_tqdm), 2))
-    logger.info(f"\t...total parwise comparisons to be performed: {len(comparisons)}")
+    logger.info("\t...total parwise comparisons to be performed: %s", len(comparisons))
 
     # Check for existing comparisons; if one has already been done (for the same
     # software package, version, and setting) we add the comparison to this run,
     # but remove it from the list of comparisons to be performed
     logger.info("Checking database for existing comparison data...")
     comparisons_to_run = filter_existing_comparisons(
-        session, run, comparisons, "blastn", blastn_version, args.fragsize, None
+        session, run, comparisons, "blastn", comparison_version, args.fragsize, None
     )
     logger.info(
-        f"\t...after check, still need to run {len(comparisons_to_run)} comparisons"
+        "\t...after check, still need to run %s comparisons", len(comparisons_to_run)
     )
 
     # If there are no comparisons to run, update the Run matrices and exit
@@ -215,86 +251,566 @@ def subcmd_anib(args: Namespace) -> None:
     if args.recovery:
         logger.warning("Entering recovery mode...")
         logger.debug(
-            "\tIn this mode, existing comparison output from %s is reused", args.outdir
+            "\tIn this mode, existing comparison output from %s is reused", blastdir
         )
-        existingfiles = collect_existing_output(args.outdir, "blastn", args)
+        existingfiles = collect_existing_output(blastdir, "blastn", args)
         logger.debug(
             "\tIdentified %s existing output files for reuse", len(existingfiles)
         )
     else:
-        existingfiles = None
-        logger.debug(f"\tIdentified no existing output files")
-
-    # Split the input genome files into contiguous fragments of the specified size,
-    # as described in Goris et al. We create a new directory to hold sequence
-    # fragments, away from the main genomes
-    logger.info("Splitting input genome files into %snt fragments...", args.fragsize)
-    fragdir = Path(args.outdir) / "fragments"
-    os.makedirs(fragdir, exist_ok=True)
-    fragfiles, fraglens = anib.fragment_fasta_files(
-        [Path(str(_.path)) for _ in genomes],
-        Path(args.outdir) / "fragments",
-        args.fragsize,
-    )
-    logger.debug("...wrote %s fragment files to %s", len(fragfiles), fragdir)
+        existingfiles = list()
+        logger.debug("\tIdentified no existing output files")
 
-    # Create list of BLASTN jobs for each comparison still to be performed
+    # Create list of BLASTN jobs for each comparison still to be performed,
+    # depending on jobs building any fragments and databases not in the store
     logger.info("Creating blastn jobs for ANIb...")
-    joblist = generate_joblist(
-        comparisons_to_run, existingfiles, fragfiles, fraglens, args
+    logger.debug("Using BLAST database store %s", get_blastdb_dir(args))
+    dbjobs = {}  # type: Dict[str, BlastDBJob]
+    if args.combined_db:
+        joblist = generate_combined_joblist(
+            comparisons_to_run, genomes, existingfiles, dbjobs, blastn_version, args
+        )
+    else:
+        joblist = generate_joblist(
+            comparisons_to_run, existingfiles, dbjobs, blastn_version, args
+        )
+    logger.debug(
+        "Generated %s jobs, %s comparisons", len(joblist), len(comparisons_to_run)
+    )
+    logger.info(
+        "\t...%s of %s BLAST databases need to be built",
+        len([_ for _ in dbjobs.values() if _.job is not None]),
+        len(dbjobs),
     )
-    logger.debug(f"...created %s blastn jobs", len(joblist))
 
-    raise NotImplementedError
+    # Pass jobs to the appropriate scheduler. Jobs recovered from existing
+    # output have nothing to run, and comparisons against a combined database
+    # share a job for each query genome. When streaming, the workers return
+    # results directly, rather than writing output files
+    jobs_to_run = list({_.job.name: _ for _ in joblist if _.job is not None}.values())
+    logger.debug("Passing %s jobs to %s...", len(jobs_to_run), args.scheduler)
+    results = {}  # type: Dict[Path, Tuple[int, int, float]]
+    if not jobs_to_run:
+        logger.info("No blastn jobs to run")
+    elif args.streaming and not args.combined_db:
+        results.update(run_anib_streaming(jobs_to_run, dbjobs, args))
+    else:
+        run_anib_jobs(jobs_to_run, args)
+    logger.info("...jobs complete")
+
+    # Output against a combined database is split into per-comparison results
+    if args.combined_db:
+        results.update(collect_combined_results(joblist, args))
+
+    # Record the fragments and database used for each genome in this run
+    logger.info("Adding BLAST databases to database...")
+    update_blastdbs(dbjobs, run, session)
+
+    # Process output and add results to database
+    # This requires us to drop out of threading/multiprocessing: Python's SQLite3
+    # interface doesn't allow sharing connections and cursors
+    logger.info("Adding comparison results to database...")
+    update_comparison_results(
+        joblist, run, session, comparison_version, args, results
+    )
+    update_comparison_matrices(session, run)
+    logger.info("...database updated.")
+
+
+def get_blastdb_dir(args: Namespace) -> Path:
+    """Return path to the store of genome fragments and BLAST databases.
+
+    :param args:  Namespace of command-line arguments for the run
+
+    The store is args.blastdb_dir, if set, and otherwise sits alongside the
+    pyani database, so that it is shared by every run using that database.
+    """
+    if args.blastdb_dir:
+        return args.blastdb_dir
+    return args.dbpath.parent / "blastdbs"
+
+
+def get_output_filename(query, subject, args: Namespace) -> Path:
+    """Return path to the blastn output file for a comparison.
+
+    :param query:  Genome ORM object for the query (fragmented) genome
+    :param subject:  Genome ORM object for the subject (database) genome
+    :param args:  Namespace of command-line arguments for the run
+    """
+    return (
+        args.outdir
+        / pyani_config.ALIGNDIR["ANIb"]
+        / f"{Path(query.path).stem}_vs_{Path(subject.path).stem}.blast_tab"
+    )
+
+
+def get_blastdb_job(
+    genome, dbjobs: Dict[str, BlastDBJob], blastn_version: str, args: Namespace
+) -> BlastDBJob:
+    """Return a genome's BLAST database store entry, and the job building it.
+
+    :param genome:  Genome ORM object
+    :param dbjobs:  store entries and jobs building them, keyed by genome
+        hash; updated with the entry for this genome, so each is built once
+    :param blastn_version:  version of BLAST+ used for the comparisons
+    :param args:  Namespace of command-line arguments for the run
+
+    The genome's entry in the current store is used if it is complete.
+    Otherwise, a complete entry for the same genome, fragment size and BLAST+
+    version recorded in the BlastDB table by an earlier run is used, even if
+    it is in another store. If there is none, a job is returned to build the
+    entry in the current store.
+    """
+    if genome.genome_hash in dbjobs:
+        return dbjobs[genome.genome_hash]
+
+    # Entries recorded in the BlastDB table by earlier runs may be in other
+    # stores, and are used if the current store has no complete entry
+    entry = anib.get_blastdb_entry(
+        get_blastdb_dir(args), genome.genome_hash, args.fragsize, blastn_version
+    )
+    if not anib.get_blastdb_marker(entry).is_file():
+        key = entry.parts[-2:]
+        for blastdb in genome.blastdbs.all():
+            recorded = Path(blastdb.dbpath).parent
+            marker = anib.get_blastdb_marker(recorded)
+            if recorded.parts[-2:] == key and marker.is_file():
+                entry = recorded
+                break
+    dbcmd = anib.construct_blastdb_cmdline(
+        genome.path, entry, args.fragsize, args.format_exe
+    )
+    job = None  # type: Optional[pyani_jobs.Job]
+    if not anib.get_blastdb_marker(entry).is_file():
+        job = pyani_jobs.Job("%s_%06d-d" % (args.jobprefix, len(dbjobs)), dbcmd)
+    dbjobs[genome.genome_hash] = BlastDBJob(genome, entry, dbcmd, job)
+    return dbjobs[genome.genome_hash]
 
 
 def generate_joblist(
-    comparisons: List,
-    existingfiles: List,
-    fragfiles: List,
-    fraglens: List,
+    comparisons: List[Tuple],
+    existingfiles: List[Path],
+    dbjobs: Dict[str, BlastDBJob],
+    blastn_version: str,
     args: Namespace,
-) -> NotImplementedError:
+) -> List[ComparisonJob]:
     """Return list of ComparisonJobs.
 
-    :param comparisons:  list of (Genome, Genome) tuples for which comparisons are needed
+    :param comparisons:  list of (Genome, Genome) tuples for which comparisons
+        are needed
     :param existingfiles:  list of pre-existing BLASTN+ outputs
-    :param fragfiles:
-    :param fraglens:
+    :param dbjobs:  BLAST database store entries and jobs building them,
+        keyed by genome hash; updated with the entries used by the jobs
+    :param blastn_version:  version of BLAST+ used for the comparisons
     :param args:  Namespace, command-line arguments
+
+    Each blastn job queries the fragments of the first genome of a comparison
+    against the database of the second, and depends on the jobs building
+    either, if they are not already in the store (see get_blastdb_job()).
+    The number of threads each job uses is chosen by get_blastn_threads().
+
+    In recovery mode, comparisons with existing output are given a
+    ComparisonJob for that output, with no job to run, so that their results
+    are still added to the database.
     """
-    # logger = logging.getLogger(__name__)
-    raise NotImplementedError
+    logger = logging.getLogger(__name__)
+
+    existing = {
+        (_.name[:-3] if _.suffix == ".gz" else _.name): _ for _ in existingfiles
+    }
+    threads = get_blastn_threads(comparisons, args)
+    joblist = []  # will hold ComparisonJob structs
+    for idx, (query, subject) in enumerate(
+        tqdm(comparisons, disable=args.disable_tqdm)
+    ):
+        outfname = get_output_filename(query, subject, args)
+        logger.debug("Expected output file for db: %s", outfname)
+
+        # Comparisons with existing output are not run again in recovery mode
+        if args.recovery and outfname.name in existing:
+            logger.debug("Recovering output from %s, not building job", outfname)
+            joblist.append(
+                ComparisonJob(query, subject, "", existing[outfname.name], None)
+            )
+            continue
+
+        qentry = get_blastdb_job(query, dbjobs, blastn_version, args)
+        sentry = get_blastdb_job(subject, dbjobs, blastn_version, args)
+        nthreads = threads[(query.genome_hash, subject.genome_hash)]
+        blastcmd = anib.construct_blastn_cmdline(
+            anib.get_blastdb_paths(qentry.entry).fragpath,
+            anib.get_blastdb_paths(sentry.entry).dbpath,
+            outfname.parent,
+            args.blastn_exe,
+            outfname,
+            threads=nthreads,
+        )
+        logger.debug("Command to run:\n\t%s", blastcmd)
 
+        job = pyani_jobs.Job(
+            "%s_%06d-b" % (args.jobprefix, idx), blastcmd, threads=nthreads
+        )
+        for dbjob in (qentry.job, sentry.job):
+            if dbjob is not None:
+                job.add_dependency(dbjob)
+        joblist.append(ComparisonJob(query, subject, blastcmd, outfname, job))
+    return joblist
 
-def fragment_fasta_file(inpath: Path, outdir: Path, fragsize: int) -> Tuple[Path, str]:
-    """Return path to fragmented sequence file and JSON of fragment lengths.
 
-    :param inpath:  Path to genome file
-    :param outdir:  Path to directory to hold fragmented files
-    :param fragsize:  size of genome fragments
+def get_combined_output_filename(query, args: Namespace) -> Path:
+    """Return path to the blastn output for a genome against a combined database.
 
-    Returns a tuple of ``(path, json)`` where ``path`` is the path to the fragment
-    file and ``json`` is a JSON-ified dictionary of fragment lengths, keyed by
-    fragment sequence ID.
+    :param query:  Genome ORM object for the query (fragmented) genome
+    :param args:  Namespace of command-line arguments for the run
     """
-    # Generate fragments for the input sequence, looping over each contig/
-    # chromosome in the input file and breaking into sections of length
-    # fragsize
-    sizedict = {}
-    outseqs = []
-    count = 0
-    for seq in SeqIO.parse(inpath, "fasta"):
-        idx = 0
-        while idx < len(seq):
-            count += 1
-            newseq = seq[idx : idx + fragsize]
-            newseq.id = f"frag{count:05d}"
-            outseqs.append(newseq)
-            sizedict[newseq.id] = len(newseq)
-            idx += fragsize
-
-    # Write fragments to output file
-    fragpath = outdir / f"{inpath.stem}-fragments.fasta"
-    SeqIO.write(outseqs, fragpath, "fasta")
-    return fragpath, json.dumps(sizedict)
+    return (
+        args.outdir
+        / pyani_config.ALIGNDIR["ANIb"]
+        / f"{Path(query.path).stem}_vs_combined.blast_tab"
+    )
+
+
+def generate_combined_joblist(
+    comparisons: List[Tuple],
+    genomes: List,
+    existingfiles: List[Path],
+    dbjobs: Dict[str, BlastDBJob],
+    blastn_version: str,
+    args: Namespace,
+) -> List[ComparisonJob]:
+    """Return list of ComparisonJobs querying each genome against all others.
+
+    :param comparisons:  list of (Genome, Genome) tuples for which comparisons
+        are needed
+    :param genomes:  list of Genome ORM objects in the run, all of which are
+        in the combined database
+    :param existingfiles:  list of pre-existing BLASTN+ outputs
+    :param dbjobs:  BLAST database store entries and jobs building them,
+        keyed by genome hash; updated with the entries used by the jobs
+    :param blastn_version:  version of BLAST+ used for the comparisons
+    :param args:  Namespace, command-line arguments
+
+    The combined database of the run's genomes is built first, if it is not
+    already in the store (see anib.build_combined_blastdb()). A single
+    blastn job then queries the fragments of each query genome against it,
+    depending on the job building the query genome's store entry, and is
+    shared by every ComparisonJob for that query genome. The output file of
+    each ComparisonJob is that expected for a single comparison (see
+    get_output_filename()), and identifies the comparison's results (see
+    collect_combined_results()). Hits to the query genome itself are ignored.
+
+    In recovery mode, query genomes with existing output are given no job.
+    The number of threads each job uses is chosen by get_blastn_threads().
+    """
+    logger = logging.getLogger(__name__)
+
+    entry = anib.get_combined_blastdb_entry(
+        get_blastdb_dir(args), [_.genome_hash for _ in genomes], blastn_version
+    )
+    logger.info("Building combined BLAST database %s", entry)
+    nseqs = anib.build_combined_blastdb(
+        {_.genome_hash: Path(_.path) for _ in genomes}, entry, args.format_exe
+    )
+    logger.debug("\t...combined database holds %s sequences", nseqs)
+
+    existing = {
+        (_.name[:-3] if _.suffix == ".gz" else _.name): _ for _ in existingfiles
+    }
+    threads = get_blastn_threads(comparisons, args)
+    jobs = {}  # type: Dict[str, Tuple[str, Optional[pyani_jobs.Job]]]
+    joblist = []  # will hold ComparisonJob structs
+    for query, subject in tqdm(comparisons, disable=args.disable_tqdm):
+        if query.genome_hash not in jobs:
+            outfname = get_combined_output_filename(query, args)
+            if args.recovery and outfname.name in existing:
+                logger.debug("Recovering output from %s, not building job", outfname)
+                jobs[query.genome_hash] = ("", None)
+            else:
+                qentry = get_blastdb_job(query, dbjobs, blastn_version, args)
+                nthreads = threads[(query.genome_hash, subject.genome_hash)]
+                blastcmd = anib.construct_blastn_cmdline(
+                    anib.get_blastdb_paths(qentry.entry).fragpath,
+                    anib.get_combined_blastdb_path(entry),
+                    outfname.parent,
+                    args.blastn_exe,
+                    outfname,
+                    max_target_seqs=nseqs,
+                    threads=nthreads,
+                )
+                logger.debug("Command to run:\n\t%s", blastcmd)
+                job = pyani_jobs.Job(
+                    "%s_%06d-c" % (args.jobprefix, len(jobs)),
+                    blastcmd,
+                    threads=nthreads,
+                )
+                if qentry.job is not None:
+                    job.add_dependency(qentry.job)
+                jobs[query.genome_hash] = (blastcmd, job)
+        blastcmd, job = jobs[query.genome_hash]
+        joblist.append(
+            ComparisonJob(
+                query, subject, blastcmd, get_output_filename(query, subject, args), job
+            )
+        )
+    return joblist
+
+
+def collect_combined_results(
+    joblist: List[ComparisonJob], args: Namespace
+) -> Dict[Path, Tuple[int, int, float]]:
+    """Return results for comparisons against a combined BLAST database.
+
+    :param joblist:           list of ComparisonJob namedtuples
+    :param args:              command-line arguments for the run
+
+    The blastn output for each query genome (see generate_combined_joblist())
+    is parsed once, by a pool of worker processes, and split by subject genome
+    (see anib.parse_combined_blast_tab()). Returns a dictionary of (alignment
+    length, similarity errors, mean identity) tuples, keyed by the output file
+    of each ComparisonJob. Subject genomes with no qualifying hits have no
+    alignment.
+    """
+    logger = logging.getLogger(__name__)
+
+    # Recovered output may be gzip-compressed
+    outfiles = {}  # type: Dict[str, Path]
+    for job in joblist:
+        outfname = get_combined_output_filename(job.query, args)
+        if not outfname.is_file() and Path(str(outfname) + ".gz").is_file():
+            outfname = Path(str(outfname) + ".gz")
+        outfiles[job.query.genome_hash] = outfname
+    logger.info("Parsing %s combined database output files", len(outfiles))
+    parsed = dict(
+        zip(
+            outfiles,
+            run_mp.multiprocessing_apply(
+                anib.parse_combined_blast_tab,
+                [(_,) for _ in outfiles.values()],
+                workers=args.workers,
+            ),
+        )
+    )
+    return {
+        job.outfile: parsed[job.query.genome_hash].get(
+            job.subject.genome_hash, (0, 0, 0.0)
+        )
+        for job in joblist
+    }
+
+
+def get_blastn_threads(
+    comparisons: List[Tuple], args: Namespace
+) -> Dict[Tuple[str, str], int]:
+    """Return number of threads for each comparison's blastn job to use.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param args:  Namespace of command-line arguments for the run
+
+    With multiprocessing, threads are allocated from a budget of args.workers
+    cores (or all available cores) in proportion to the size of each job, up
+    to args.threads for any one job, or every core if args.threads is zero
+    (see core_budget.CoreBudget.allocate()). A job's size is the product of
+    its genome lengths or, with args.combined_db, where each query genome has
+    a single job against the same database, the query genome's length. With
+    SGE, each job uses args.threads threads (one, if args.threads is zero).
+
+    Returns thread counts keyed by the hashes of each comparison's genomes.
+    """
+    keys = [(query.genome_hash, subject.genome_hash) for query, subject in comparisons]
+    if args.threads == 1:
+        return dict.fromkeys(keys, 1)
+    if args.scheduler != "multiprocessing":
+        return dict.fromkeys(keys, max(1, args.threads))
+    budget = CoreBudget(args.workers)
+    if args.combined_db:
+        queries = {query.genome_hash: query.length for query, _ in comparisons}
+        threads = dict(
+            zip(queries, budget.allocate(list(queries.values()), args.threads))
+        )
+        return {key: threads[key[0]] for key in keys}
+    sizes = [query.length * subject.length for query, subject in comparisons]
+    return dict(zip(keys, budget.allocate(sizes, args.threads)))
+
+
+def run_anib_jobs(joblist: List[ComparisonJob], args: Namespace) -> None:
+    """Pass ANIb blastn jobs to the scheduler.
+
+    :param joblist:           list of ComparisonJob namedtuples
+    :param args:              command-line arguments for the run
+    """
+    logger = logging.getLogger(__name__)
+
+    if args.scheduler == "multiprocessing":
+        logger.info("Running jobs with multiprocessing")
+        if not args.workers:
+            logger.debug("(using maximum number of worker threads)")
+        else:
+            logger.debug("(using %d worker threads, if available)", args.workers)
+        cumval = run_mp.run_dependency_graph(
+            [_.job for _ in joblist], workers=args.workers
+        )
+        if cumval > 0:
+            logger.error(
+                "At least one blastn comparison failed. Please investigate (exiting)"
+            )
+            raise PyaniException("Multiprocessing run failed in ANIb")
+        logger.info("Multiprocessing run completed without error")
+    else:
+        logger.info("Running jobs with SGE")
+        logger.debug("Setting jobarray group size to %d", args.sgegroupsize)
+        run_sge.run_dependency_graph(
+            [_.job for _ in joblist],
+            jgprefix=args.jobprefix,
+            sgegroupsize=args.sgegroupsize,
+            sgeargs=args.sgeargs,
+        )
+
+
+def run_anib_streaming(
+    joblist: List[ComparisonJob], dbjobs: Dict[str, BlastDBJob], args: Namespace
+) -> Dict[Path, Tuple[int, int, float]]:
+    """Run ANIb comparisons in worker processes, returning summarised output.
+
+    :param joblist:           list of ComparisonJob namedtuples
+    :param dbjobs:            BLAST database store entries used by the jobs,
+                              keyed by genome hash
+    :param args:              command-line arguments for the run
+
+    Any fragments and BLAST databases missing from the store are built first.
+    Each worker then runs blastn, and filters and sums its output as it is
+    read (see anib.summarise_blastn_comparison()). Returns a dictionary of
+    (alignment length, similarity errors, mean identity) tuples, keyed by the
+    expected output file for each job. If args.archive is set, the output of
+    each comparison is kept as a gzip-compressed file alongside the expected
+    output file. Each comparison uses the number of threads chosen by
+    get_blastn_threads(), and the pool runs as many at once as fit in the
+    budget of args.workers cores (see core_budget.CoreBudget.get_workers()).
+    """
+    logger = logging.getLogger(__name__)
+
+    dbjobs_to_run = [_.job for _ in dbjobs.values() if _.job is not None]
+    if dbjobs_to_run:
+        logger.info("Building %s BLAST databases", len(dbjobs_to_run))
+        if run_mp.run_dependency_graph(dbjobs_to_run, workers=args.workers):
+            logger.error(
+                "At least one BLAST database build failed. Please investigate (exiting)"
+            )
+            raise PyaniException("Multiprocessing run failed in ANIb")
+
+    logger.info("Running jobs with multiprocessing, streaming blastn output")
+    threads = get_blastn_threads([(_.query, _.subject) for _ in joblist], args)
+    argsets = [
+        (
+            anib.get_blastdb_paths(dbjobs[job.query.genome_hash].entry).fragpath,
+            anib.get_blastdb_paths(dbjobs[job.subject.genome_hash].entry).dbpath,
+            args.blastn_exe,
+            Path(str(job.outfile) + ".gz") if args.archive else None,
+            threads[(job.query.genome_hash, job.subject.genome_hash)],
+        )
+        for job in joblist
+    ]
+    try:
+        results = run_mp.multiprocessing_apply(
+            anib.summarise_blastn_comparison,
+            argsets,
+            workers=CoreBudget(args.workers).get_workers(list(threads.values())),
+        )
+    except subprocess.CalledProcessError:
+        logger.error(
+            "At least one blastn comparison failed. Please investigate (exiting)",
+            exc_info=True,
+        )
+        raise PyaniException("Multiprocessing run failed in ANIb")
+    logger.info("Multiprocessing run completed without error")
+    return {job.outfile: result for job, result in zip(joblist, results)}
+
+
+def update_blastdbs(dbjobs: Dict[str, BlastDBJob], run, session) -> None:
+    """Update the BlastDB table with the store entries used by the run.
+
+    :param dbjobs:   BLAST database store entries, keyed by genome hash
+    :param run:      Run ORM object for the current ANIb run
+    :param session:  active pyanidb session via ORM
+    """
+    for dbjob in dbjobs.values():
+        paths = anib.get_blastdb_paths(dbjob.entry)
+        add_blastdb(
+            session,
+            dbjob.genome,
+            run,
+            paths.fragpath,
+            paths.dbpath,
+            json.dumps(np.load(paths.lengthpath).tolist()),
+            dbjob.dbcmd,
+        )
+
+
+def update_comparison_results(
+    joblist: List[ComparisonJob],
+    run,
+    session,
+    blastn_version: str,
+    args: Namespace,
+    results: Optional[Dict[Path, Tuple[int, int, float]]] = None,
+) -> None:
+    """Update the Comparison table with the completed result set.
+
+    :param joblist:         list of ComparisonJob namedtuples
+    :param run:             Run ORM object for the current ANIb run
+    :param session:         active pyanidb session via ORM
+    :param blastn_version:  version of BLAST+ used for the comparison
+    :param args:            command-line arguments for this run
+    :param results:         optional (alignment length, similarity errors,
+                            mean identity) tuples keyed by job output file,
+                            from streamed comparisons; other output files
+                            are parsed
+
+    The Comparison table stores individual comparison results, one per row.
+
+    Output files are parsed by a pool of worker processes, and results are
+    streamed back in job order. These are added to the database in bulk,
+    pyani_config.INSERT_CHUNKSIZE rows at a time, as parsing continues.
+    """
+    logger = logging.getLogger(__name__)
+
+    # Parse output files that don't already have results, in parallel
+    results = dict(results or {})
+    outfiles = [job.outfile for job in joblist if job.outfile not in results]
+    logger.info("Parsing %s comparison output files", len(outfiles))
+    parsed = run_mp.multiprocessing_imap(
+        functools.partial(anib.parse_blast_tab, fraglengths={}, mode="ANIb"),
+        outfiles,
+        workers=args.workers,
+        chunksize=pyani_config.PARSE_CHUNKSIZE,
+    )
+
+    # Add individual results to Comparison table
+    rows = []  # type: List[Dict]
+    for job in tqdm(joblist, disable=args.disable_tqdm):
+        logger.debug("\t%s vs %s", job.query.description, job.subject.description)
+        if job.outfile not in results:
+            results[job.outfile] = next(parsed)
+        aln_length, sim_errs, pid = results[job.outfile]
+        rows.append(
+            {
+                "query_id": job.query.genome_id,
+                "subject_id": job.subject.genome_id,
+                "aln_length": int(aln_length),
+                "sim_errs": int(sim_errs),
+                "identity": 0.01 * float(pid),
+                "cov_query": float(aln_length) / job.query.length,
+                "cov_subject": float(aln_length) / job.subject.length,
+                "program": "blastn",
+                "version": blastn_version,
+                "fragsize": args.fragsize,
+                "maxmatch": None,
+            }
+        )
+        if len(rows) == pyani_config.INSERT_CHUNKSIZE:
+            logger.debug("Committing %s results to database", len(rows))
+            add_comparisons(session, run, rows)
+            rows = []
+
+    # Populate db with remaining results
+    logger.debug("Committing %s results to database", len(rows))
+    add_comparisons(session, run, rows)
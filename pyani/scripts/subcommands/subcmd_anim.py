@@ -41,26 +41,33 @@
 
 import datetime
 import logging
+import shutil
+import subprocess
 
 from argparse import Namespace
 from itertools import combinations
 from pathlib import Path
-from typing import List, NamedTuple, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from tqdm import tqdm
 
 from pyani import (
     PyaniException,
     anim,
+    cache,
+    manifest,
+    prefilter,
     pyani_config,
     pyani_jobs,
     run_sge,
     run_multiprocessing as run_mp,
 )
+from pyani.core_budget import CoreBudget
 from pyani.pyani_files import collect_existing_output
 from pyani.pyani_orm import (
     Comparison,
     PyaniORMException,
+    add_comparisons,
     add_run,
     add_run_genomes,
     filter_existing_comparisons,
@@ -78,7 +85,7 @@ class ComparisonJob(NamedTuple):
 
     query: str
     subject: str
-    filtercmd: str
+    filtercmd: Optional[str]
     nucmercmd: str
     outfile: Path
     job: pyani_jobs.Job
@@ -153,10 +160,12 @@ def subcmd_anim(args: Namespace) -> None:
     The calculated values are deposited in the SQLite3 database being used for
     the analysis.
 
-    For each pairwise comparison the NUCmer output is stored in the output
-    directory for long enough to extract summary information, but for each run
-    the output is gzip compressed. Once all runs are complete, the outputs
-    for each comparison are concatenated into a single gzip archive.
+    For each pairwise comparison the NUCmer .delta output, and its filtered
+    .filter output, are kept in the output directory, and summary information
+    is extracted from them once all comparisons are complete. If args.compress
+    is set, each comparison's output files are gzip-compressed as soon as its
+    filtering is complete. If args.streaming is set, no output is kept unless
+    args.archive is also set.
     """
     # Create logger
     logger = logging.getLogger(__name__)
@@ -168,6 +177,65 @@ def subcmd_anim(args: Namespace) -> None:
     nucmer_version = anim.get_version(args.nucmer_exe)
     logger.info(termcolor("MUMMer nucmer version: %s", "cyan"), nucmer_version)
 
+    # Only MUMmer4's nucmer can use several threads for each comparison
+    if args.threads != 1 and not anim.is_mummer4(nucmer_version):
+        logger.warning(
+            "NUCmer %s is single-threaded: ignoring --threads", nucmer_version
+        )
+        args.threads = 1
+
+    # Streamed output can only be passed back to us by multiprocessing workers
+    if args.streaming and args.scheduler != "multiprocessing":
+        logger.error("Streaming NUCmer output requires the multiprocessing scheduler")
+        raise PyaniException("Cannot stream NUCmer output with %s" % args.scheduler)
+
+    # Batched query genomes only give the same alignments as pairwise NUCmer
+    # runs if anchor matches need not be unique (in the whole batch)
+    if args.batchsize > 1 and not args.maxmatch:
+        logger.error("Batching NUCmer query genomes requires --maxmatch")
+        raise PyaniException("Cannot batch NUCmer query genomes without --maxmatch")
+    if args.batchsize > 1 and args.streaming:
+        logger.warning("Streaming NUCmer output: ignoring --batchsize")
+    if args.compress and args.streaming:
+        logger.warning("Streaming NUCmer output: ignoring --compress")
+
+    # Splitting query genomes gives the same alignments as a single NUCmer
+    # run only if anchor matches need not be unique (in the whole query)
+    if args.split_size and not args.maxmatch:
+        logger.error("Splitting NUCmer query genomes requires --maxmatch")
+        raise PyaniException("Cannot split NUCmer query genomes without --maxmatch")
+    if args.split_size and args.streaming:
+        logger.warning("Streaming NUCmer output: ignoring --split_size")
+    elif args.split_size and args.batchsize > 1:
+        logger.warning("Batching NUCmer query genomes: ignoring --split_size")
+
+    # Saved reference indices can only be loaded by MUMmer4's nucmer, and only
+    # the multiprocessing scheduler runs jobs depending on index-building jobs
+    if args.reuse_index and not anim.is_mummer4(nucmer_version):
+        logger.warning(
+            "NUCmer %s cannot save indices: ignoring --reuse_index", nucmer_version
+        )
+        args.reuse_index = False
+    elif args.reuse_index and args.scheduler != "multiprocessing":
+        logger.warning(
+            "Reusing NUCmer indices requires multiprocessing: ignoring --reuse_index"
+        )
+        args.reuse_index = False
+    elif args.reuse_index and (args.streaming or args.batchsize > 1):
+        logger.warning("Streaming or batching NUCmer jobs: ignoring --reuse_index")
+        args.reuse_index = False
+    if args.reuse_index:
+        logger.info("Reusing saved NUCmer reference indices in %s", get_index_dir(args))
+
+    if args.native_filter and not args.nofilter:
+        logger.info("Filtering NUCmer output in-process (not with delta-filter)")
+
+    # Coverage of the union of aligned regions can differ from coverage of the
+    # summed alignment lengths, so these results are kept distinct
+    if args.union_coverage:
+        nucmer_version = f"{nucmer_version}_union-coverage"
+        logger.info("Calculating coverage from the union of aligned regions")
+
     # Use the provided name or make one for the analysis
     start_time = datetime.datetime.now()
     name = args.name or "_".join(["ANIm", start_time.isoformat()])
@@ -250,6 +318,18 @@ def subcmd_anim(args: Namespace) -> None:
         "\t...after check, still need to run %s comparisons", len(comparisons_to_run)
     )
 
+    # If requested, use a cheap similarity score to skip comparisons between
+    # clearly-unrelated genomes; these are recorded as skipped in the database
+    if args.prefilter and comparisons_to_run:
+        logger.info("Prefiltering comparisons with %s...", args.prefilter)
+        comparisons_to_run = skip_prefiltered_comparisons(
+            comparisons_to_run, run, session, nucmer_version, args
+        )
+        logger.info(
+            "\t...after prefilter, still need to run %s comparisons",
+            len(comparisons_to_run),
+        )
+
     # If there are no comparisons to run, update the Run matrices and exit
     # from this function
     if not comparisons_to_run:
@@ -263,6 +343,20 @@ def subcmd_anim(args: Namespace) -> None:
         update_comparison_matrices(session, run)
         return
 
+    # If a comparison cache is in use, comparisons with cached results need
+    # not be run: their results are added to the database with the new ones
+    cachedjobs, results = [], {}  # type: List[ComparisonJob], Dict
+    if args.cache_dir:
+        logger.info("Checking cache %s for existing comparison data...", args.cache_dir)
+        anim_cache = cache.ComparisonCache(args.cache_dir, args.cache_size)
+        comparisons_to_run, cachedjobs, results = get_cached_comparisons(
+            comparisons_to_run, anim_cache, nucmer_version, args
+        )
+        logger.info(
+            "\t...after check, still need to run %s comparisons",
+            len(comparisons_to_run),
+        )
+
     # If we are in recovery mode, we are salvaging output from a previous
     # run, and do not necessarily need to rerun all the jobs. In this case,
     # we prepare a list of output files we want to recover from the results
@@ -272,7 +366,14 @@ def subcmd_anim(args: Namespace) -> None:
         logger.debug(
             "\tIn this mode, existing comparison output from %s is reused", deltadir
         )
-        existingfiles = collect_existing_output(deltadir, "nucmer", args)
+        # Only output recorded as complete in the manifest is reused, but
+        # output from versions of pyani without a manifest is reused unchecked
+        existingfiles = manifest.collect_completed_output(
+            deltadir, ".delta" if args.nofilter else ".filter"
+        )
+        if existingfiles is None:
+            logger.warning("\tNo manifest in %s: output will not be checked", deltadir)
+            existingfiles = collect_existing_output(deltadir, "nucmer", args)
         logger.debug(
             "\tIdentified %s existing output files for reuse", len(existingfiles)
         )
@@ -287,19 +388,272 @@ def subcmd_anim(args: Namespace) -> None:
         "Generated %s jobs, %s comparisons", len(joblist), len(comparisons_to_run)
     )
 
-    # Pass jobs to appropriate scheduler
-    logger.debug("Passing %s jobs to %s...", len(joblist), args.scheduler)
-    run_anim_jobs(joblist, args)
+    # Pass jobs to appropriate scheduler. When streaming, the workers return
+    # alignment lengths and errors directly, rather than writing output files.
+    # Jobs recovered from existing output have nothing to run
+    jobs_to_run = [_ for _ in joblist if _.job is not None]
+    logger.debug("Passing %s jobs to %s...", len(jobs_to_run), args.scheduler)
+    if not jobs_to_run:
+        logger.info("No NUCmer jobs to run")
+    elif args.streaming:
+        results.update(run_anim_streaming(jobs_to_run, args))
+    else:
+        run_anim_jobs(jobs_to_run, args)
     logger.info("...jobs complete")
 
+    # Chunks of split query genomes are no longer needed once jobs are complete
+    shutil.rmtree(get_chunk_dir(args), ignore_errors=True)
+
     # Process output and add results to database
     # This requires us to drop out of threading/multiprocessing: Python's SQLite3
     # interface doesn't allow sharing connections and cursors
     logger.info("Adding comparison results to database...")
-    update_comparison_results(joblist, run, session, nucmer_version, args)
+    results = update_comparison_results(
+        joblist + cachedjobs, run, session, nucmer_version, args, results
+    )
     update_comparison_matrices(session, run)
     logger.info("...database updated.")
 
+    # Add new results to the comparison cache, and keep it within its quota
+    if args.cache_dir:
+        logger.info("Adding comparison results to cache %s...", args.cache_dir)
+        cache_comparison_results(joblist, results, anim_cache, nucmer_version, args)
+        removed = anim_cache.prune()
+        logger.info("...removed %s least recently used cache entries", len(removed))
+
+
+def skip_prefiltered_comparisons(
+    comparisons: List[Tuple], run, session, nucmer_version: str, args: Namespace,
+) -> List[Tuple]:
+    """Return comparisons passing the prefilter, recording the others as skipped.
+
+    :param comparisons:     list of (Genome, Genome) tuples
+    :param run:             Run ORM object for the current ANIm run
+    :param session:         active pyanidb session via ORM
+    :param nucmer_version:  version of nucmer used for the comparison
+    :param args:            command-line arguments for this run
+
+    Skipped comparisons are added to the Comparison table with no alignment
+    results, and a version string naming the prefilter method and cutoff, so
+    that they are never mistaken for NUCmer results, and are reused only by
+    runs with the same prefilter settings.
+    """
+    logger = logging.getLogger(__name__)
+
+    cutoff = args.prefilter_cutoff
+    if cutoff is None:
+        cutoff = prefilter.PREFILTER_CUTOFFS[args.prefilter]
+    result = prefilter.prefilter_comparisons(
+        comparisons, args.prefilter, cutoff, logger
+    )
+    logger.info(
+        "\t...%s comparisons scored below %s cutoff %s",
+        len(result.skipped),
+        args.prefilter,
+        cutoff,
+    )
+
+    # Associate existing records of skipped comparisons with this run, and
+    # record the remainder
+    skip_version = f"{nucmer_version}_skipped-{args.prefilter}-{cutoff}"
+    for query, subject in filter_existing_comparisons(
+        session, run, result.skipped, "nucmer", skip_version, None, args.maxmatch
+    ):
+        run.comparisons.append(
+            Comparison(
+                query=query,
+                subject=subject,
+                program="nucmer",
+                version=skip_version,
+                fragsize=None,
+                maxmatch=args.maxmatch,
+            )
+        )
+    session.commit()
+    return result.to_run
+
+
+def get_output_filename(query, subject, args: Namespace) -> Path:
+    """Return path to the final NUCmer output file for a comparison.
+
+    :param query:  Genome ORM object for the query genome
+    :param subject:  Genome ORM object for the subject genome
+    :param args:  Namespace of command-line arguments for the run
+    """
+    outprefix = (
+        args.outdir
+        / pyani_config.ALIGNDIR["ANIm"]
+        / f"{Path(query.path).stem}_vs_{Path(subject.path).stem}"
+    )
+    suffix = ".delta" if args.nofilter else ".filter"
+    if args.compress and not args.streaming:
+        suffix += ".gz"
+    return Path(str(outprefix) + suffix)
+
+
+def get_chunk_dir(args: Namespace) -> Path:
+    """Return path to the directory holding chunks of split query genomes.
+
+    :param args:  Namespace of command-line arguments for the run
+    """
+    return args.outdir / pyani_config.ALIGNDIR["ANIm"] / "query_chunks"
+
+
+def get_index_dir(args: Namespace) -> Path:
+    """Return path to the directory holding saved NUCmer reference indices.
+
+    :param args:  Namespace of command-line arguments for the run
+
+    Indices are kept in the comparison cache, if one is in use, so that they
+    are shared between runs, and otherwise in the output directory.
+    """
+    if args.cache_dir:
+        return args.cache_dir / "nucmer_index"
+    return args.outdir / pyani_config.ALIGNDIR["ANIm"] / "nucmer_index"
+
+
+def get_index_job(
+    genome, indexjobs: Dict[Path, Optional[pyani_jobs.Job]], args: Namespace
+) -> Tuple[Path, Optional[pyani_jobs.Job]]:
+    """Return prefix of a genome's saved NUCmer index, and the job saving it.
+
+    :param genome:  Genome ORM object for the NUCmer reference genome
+    :param indexjobs:  jobs saving indices, keyed by index prefix; updated
+        with the job for this genome, so each index is saved by one job
+    :param args:  Namespace of command-line arguments for the run
+
+    Indices are keyed by genome hash. No job is returned for an index that
+    was completely saved by an earlier run.
+    """
+    index = get_index_dir(args) / genome.genome_hash
+    if index not in indexjobs:
+        if anim.get_index_marker(index).is_file():
+            indexjobs[index] = None
+        else:
+            indexjobs[index] = pyani_jobs.Job(
+                "%s_%06d-i" % (args.jobprefix, len(indexjobs)),
+                anim.construct_nucmer_index_cmdline(
+                    genome.path, index, args.nucmer_exe
+                ),
+            )
+    return index, indexjobs[index]
+
+
+def get_cache_key(
+    query, subject, nucmer_version: str, args: Namespace
+) -> cache.CacheKey:
+    """Return key for a comparison in the comparison cache.
+
+    :param query:  Genome ORM object for the query genome
+    :param subject:  Genome ORM object for the subject genome
+    :param nucmer_version:  version of nucmer used for the comparison
+    :param args:  Namespace of command-line arguments for the run
+
+    Unfiltered and filtered NUCmer output give different results, but are
+    not distinguished in the database, so unfiltered results are cached
+    under a distinct version.
+    """
+    if args.nofilter:
+        nucmer_version = f"{nucmer_version}_nofilter"
+    return cache.CacheKey(
+        query.genome_hash, subject.genome_hash, "nucmer", nucmer_version, args.maxmatch
+    )
+
+
+def get_cached_comparisons(
+    comparisons: List[Tuple],
+    anim_cache: cache.ComparisonCache,
+    nucmer_version: str,
+    args: Namespace,
+) -> Tuple[List[Tuple], List[ComparisonJob], Dict[Path, Tuple[int, int]]]:
+    """Split comparisons into those to run, and those with cached results.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param anim_cache:  ComparisonCache holding earlier results
+    :param nucmer_version:  version of nucmer used for the comparison
+    :param args:  Namespace of command-line arguments for the run
+
+    Returns the comparisons still to be run, a ComparisonJob (with no job
+    to run) for each cached comparison, and the cached (alignment length,
+    similarity errors) results keyed by output file. Cached alignments are
+    restored to the output directory, where a run would have written them.
+    """
+    logger = logging.getLogger(__name__)
+
+    to_run, cachedjobs, results = [], [], {}
+    for query, subject in tqdm(comparisons, disable=args.disable_tqdm):
+        key = get_cache_key(query, subject, nucmer_version, args)
+        entry = anim_cache.get(key)
+        if entry is None:
+            to_run.append((query, subject))
+            continue
+        outfname = get_output_filename(query, subject, args)
+
+        # Covered bases are not cached, so are recalculated from the cached
+        # alignment, restored to where a run would have written it
+        if args.union_coverage:
+            if args.streaming or not anim_cache.get_alignment(key, outfname):
+                to_run.append((query, subject))
+                continue
+            logger.debug("Using cached alignment for %s", outfname)
+            cachedjobs.append(ComparisonJob(query, subject, None, "", outfname, None))
+            continue
+
+        logger.debug("Using cached result for %s", outfname)
+        if not args.streaming:
+            anim_cache.get_alignment(key, outfname)
+        elif args.archive:
+            anim_cache.get_alignment(key, Path(str(outfname) + ".gz"))
+        cachedjobs.append(ComparisonJob(query, subject, None, "", outfname, None))
+        results[outfname] = tuple(entry)
+    return to_run, cachedjobs, results
+
+
+def cache_comparison_results(
+    joblist: List[ComparisonJob],
+    results: Dict[Path, Tuple[int, ...]],
+    anim_cache: cache.ComparisonCache,
+    nucmer_version: str,
+    args: Namespace,
+) -> None:
+    """Add results, and alignment output where available, to the comparison cache.
+
+    :param joblist:  list of ComparisonJob namedtuples that were run
+    :param results:  (alignment length, similarity errors) tuples, keyed by
+        job output file
+    :param anim_cache:  ComparisonCache to be updated
+    :param nucmer_version:  version of nucmer used for the comparison
+    :param args:  Namespace of command-line arguments for the run
+    """
+    for job in tqdm(joblist, disable=args.disable_tqdm):
+        if not args.streaming:
+            alignment = job.outfile  # type: Optional[Path]
+        elif args.archive:
+            alignment = Path(str(job.outfile) + ".gz")
+        else:
+            alignment = None
+        anim_cache.put(
+            get_cache_key(job.query, job.subject, nucmer_version, args),
+            *results[job.outfile][:2],
+            alignment=alignment,
+        )
+
+
+def get_existing_output(
+    outfname: Path, existingfiles: Dict[str, Path]
+) -> Optional[Path]:
+    """Return path to existing output for the expected output file, if any.
+
+    :param outfname:  path to the expected NUCmer output file
+    :param existingfiles:  pre-existing nucmer output files, keyed by file
+        name without any .gz suffix
+
+    Output is recovered whether or not it was gzip-compressed, as it is read
+    transparently either way.
+    """
+    name = outfname.name[:-3] if outfname.suffix == ".gz" else outfname.name
+    return existingfiles.get(name)
+
 
 def generate_joblist(
     comparisons: List[Tuple], existingfiles: List[Path], args: Namespace,
@@ -309,13 +663,62 @@ def generate_joblist(
     :param comparisons:  list of (Genome, Genome) tuples
     :param existingfiles:  list of pre-existing nucmer output files
     :param args:  Namespace of command-line arguments for the run
+
+    In recovery mode, comparisons with existing output are given a
+    ComparisonJob for that output, with no job to run, so that their results
+    are still added to the database.
+
+    If args.split_size is set, the second (NUCmer query) genome of each
+    comparison is split into chunks when it is longer than args.split_size
+    (see anim.write_query_chunks()), and the comparison is run as one NUCmer
+    job per chunk, followed by a job merging and filtering their output.
+    Each genome is split once, and its chunks shared between comparisons.
+
+    If args.reuse_index is set, the NUCmer index of the first (NUCmer
+    reference) genome of each comparison is saved by a job on which the
+    comparison's NUCmer jobs depend, and is loaded by each of them, rather
+    than rebuilt (see get_index_job()).
+
+    The number of threads used by each comparison's NUCmer jobs is chosen
+    by get_nucmer_threads().
     """
     logger = logging.getLogger(__name__)
 
+    existing = {
+        (_.name[:-3] if _.suffix == ".gz" else _.name): _ for _ in existingfiles
+    }  # type: Dict[str, Path]
+    if args.batchsize > 1 and not args.streaming:
+        return generate_batch_joblist(comparisons, existing, args)
+
+    threads = get_nucmer_threads(comparisons, args)
+
     joblist = []  # will hold ComparisonJob structs
+    chunks = {}  # type: Dict[str, List[Path]]
+    indexjobs = {}  # type: Dict[Path, Optional[pyani_jobs.Job]]
     for idx, (query, subject) in enumerate(
         tqdm(comparisons, disable=args.disable_tqdm)
     ):
+        outfname = get_output_filename(query, subject, args)
+        logger.debug("Expected output file for db: %s", outfname)
+
+        # If we're in recovery mode, we don't want to repeat a computational
+        # comparison that already exists, so we check whether the ultimate
+        # output is in the set of existing files and, if not, we add the jobs
+        # The comparisons collections always gets updated, so that results are
+        # added to the database whether they come from recovery mode or are run
+        # in this call of the script.
+        recovered = get_existing_output(outfname, existing) if args.recovery else None
+        if recovered is not None:
+            logger.debug("Recovering output from %s, not building job", recovered)
+            joblist.append(ComparisonJob(query, subject, None, "", recovered, None))
+            continue
+
+        # NUCmer jobs may load a saved index for the NUCmer reference genome
+        index, indexjob = None, None  # type: Optional[Path], Optional[pyani_jobs.Job]
+        if args.reuse_index:
+            index, indexjob = get_index_job(query, indexjobs, args)
+
+        nthreads = threads[(query.path, subject.path)]
         ncmd, dcmd = anim.construct_nucmer_cmdline(
             query.path,
             subject.path,
@@ -323,34 +726,202 @@ def generate_joblist(
             args.nucmer_exe,
             args.filter_exe,
             args.maxmatch,
+            args.native_filter,
+            args.compress and not args.streaming,
+            nthreads,
+            index,
         )
         logger.debug("Commands to run:\n\t%s\n\t%s", ncmd, dcmd)
-        outprefix = ncmd.split()[3]  # prefix for NUCmer output
-        if args.nofilter:
-            outfname = Path(outprefix + ".delta")
-        else:
-            outfname = Path(outprefix + ".filter")
-        logger.debug("Expected output file for db: %s", outfname)
 
-        # If we're in recovery mode, we don't want to repeat a computational
-        # comparison that already exists, so we check whether the ultimate
-        # output is in the set of existing files and, if not, we add the jobs
-        # TODO: something faster than a list search (dict or set?)
-        # The comparisons collections always gets updated, so that results are
-        # added to the database whether they come from recovery mode or are run
-        # in this call of the script.
-        if args.recovery and outfname.name in existingfiles:
-            logger.debug("Recovering output from %s, not building job", outfname)
-        else:
-            logger.debug("Building job")
-            # Build jobs
-            njob = pyani_jobs.Job("%s_%06d-n" % (args.jobprefix, idx), ncmd)
-            fjob = pyani_jobs.Job("%s_%06d-f" % (args.jobprefix, idx), dcmd)
-            fjob.add_dependency(njob)
-            joblist.append(ComparisonJob(query, subject, dcmd, ncmd, outfname, fjob))
+        logger.debug("Building job")
+        # Large NUCmer query genomes are aligned in chunks, by several jobs
+        if args.split_size and not args.streaming:
+            if subject.path not in chunks:
+                chunks[subject.path] = anim.write_query_chunks(
+                    Path(subject.path), get_chunk_dir(args), args.split_size
+                )
+            if chunks[subject.path]:
+                joblist.append(
+                    generate_split_job(
+                        query,
+                        subject,
+                        chunks[subject.path],
+                        outfname,
+                        idx,
+                        args,
+                        index,
+                        indexjob,
+                        nthreads,
+                    )
+                )
+                continue
+        # Build jobs
+        njob = pyani_jobs.Job(
+            "%s_%06d-n" % (args.jobprefix, idx), ncmd, threads=nthreads
+        )
+        if indexjob is not None:
+            njob.add_dependency(indexjob)
+        if args.native_filter:  # NUCmer job also writes the .filter file
+            joblist.append(ComparisonJob(query, subject, dcmd, ncmd, outfname, njob))
+            continue
+        fjob = pyani_jobs.Job("%s_%06d-f" % (args.jobprefix, idx), dcmd)
+        fjob.add_dependency(njob)
+        joblist.append(ComparisonJob(query, subject, dcmd, ncmd, outfname, fjob))
     return joblist
 
 
+def generate_split_job(
+    query,
+    subject,
+    chunks: List[Path],
+    outfname: Path,
+    idx: int,
+    args: Namespace,
+    index: Optional[Path] = None,
+    indexjob: Optional[pyani_jobs.Job] = None,
+    threads: int = 1,
+) -> ComparisonJob:
+    """Return ComparisonJob aligning chunks of the subject genome in separate jobs.
+
+    :param query:  Genome ORM object for the query (NUCmer reference) genome
+    :param subject:  Genome ORM object for the subject (NUCmer query) genome
+    :param chunks:  paths to the chunks of the subject genome
+    :param outfname:  path to the expected output file for the comparison
+    :param idx:  index of the comparison, used to name its jobs
+    :param args:  Namespace of command-line arguments for the run
+    :param index:  prefix of the saved NUCmer index of the query genome, to
+        be loaded by each NUCmer job
+    :param indexjob:  job saving the index, on which each NUCmer job depends
+    :param threads:  number of threads for each NUCmer job to use
+
+    The ComparisonJob's job merges and filters the NUCmer output for all
+    chunks, and depends on a NUCmer job for each chunk.
+    """
+    logger = logging.getLogger(__name__)
+
+    ncmds, mcmd = anim.construct_nucmer_split_cmdlines(
+        query.path,
+        subject.path,
+        chunks,
+        args.outdir,
+        args.nucmer_exe,
+        args.filter_exe,
+        args.maxmatch,
+        args.native_filter,
+        args.compress,
+        threads,
+        index,
+    )
+    logger.debug("Commands to run:\n\t%s\n\t%s", "\n\t".join(ncmds), mcmd)
+    mjob = pyani_jobs.Job("%s_%06d-m" % (args.jobprefix, idx), mcmd)
+    for cidx, ncmd in enumerate(ncmds):
+        njob = pyani_jobs.Job(
+            "%s_%06d_%06d-n" % (args.jobprefix, idx, cidx), ncmd, threads=threads
+        )
+        if indexjob is not None:
+            njob.add_dependency(indexjob)
+        mjob.add_dependency(njob)
+    return ComparisonJob(query, subject, None, mcmd, outfname, mjob)
+
+
+def generate_batch_joblist(
+    comparisons: List[Tuple], existingfiles: Dict[str, Path], args: Namespace,
+) -> List[ComparisonJob]:
+    """Return list of ComparisonJobs, batching comparisons against each genome.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param existingfiles:  pre-existing nucmer output files, keyed by file
+        name without any .gz suffix
+    :param args:  Namespace of command-line arguments for the run
+
+    Comparisons are grouped by their first (reference) genome, and up to
+    args.batchsize second genomes are aligned against it in a single NUCmer
+    job. Each ComparisonJob's job is the delta-filter job for that pair, which
+    depends on the batch job or, if args.native_filter is set, the batch job
+    itself, which is shared between the comparisons in the batch.
+    """
+    logger = logging.getLogger(__name__)
+
+    # Group comparisons still to be run by reference genome, retaining order
+    joblist = []  # will hold ComparisonJob structs
+    batches = {}  # type: Dict[Path, List]
+    for query, subject in comparisons:
+        outfname = get_output_filename(query, subject, args)
+        if args.recovery:
+            recovered = get_existing_output(outfname, existingfiles)
+            if recovered is not None:
+                logger.debug("Recovering output from %s, not building job", recovered)
+                joblist.append(ComparisonJob(query, subject, None, "", recovered, None))
+                continue
+        batches.setdefault(query.path, []).append((query, subject, outfname))
+
+    threads = get_nucmer_threads(
+        [_[:2] for members in batches.values() for _ in members], args
+    )
+    idx = 0
+    for members in tqdm(batches.values(), disable=args.disable_tqdm):
+        for bidx in range(0, len(members), args.batchsize):
+            batch = members[bidx : bidx + args.batchsize]
+            nthreads = max(threads[(_[0].path, _[1].path)] for _ in batch)
+            ncmd, dcmds = anim.construct_nucmer_batch_cmdline(
+                batch[0][0].path,
+                [_[1].path for _ in batch],
+                args.outdir,
+                args.nucmer_exe,
+                args.filter_exe,
+                args.maxmatch,
+                args.native_filter,
+                args.compress,
+                nthreads,
+            )
+            logger.debug("Batch command to run:\n\t%s", ncmd)
+            njob = pyani_jobs.Job(
+                "%s_%06d-n" % (args.jobprefix, idx), ncmd, threads=nthreads
+            )
+            for fidx, ((query, subject, outfname), dcmd) in enumerate(
+                zip(batch, dcmds)
+            ):
+                if args.native_filter:  # batch job also writes the .filter files
+                    job = njob
+                else:
+                    job = pyani_jobs.Job(
+                        "%s_%06d_%06d-f" % (args.jobprefix, idx, fidx), dcmd
+                    )
+                    job.add_dependency(njob)
+                joblist.append(ComparisonJob(query, subject, dcmd, ncmd, outfname, job))
+            idx += 1
+    return joblist
+
+
+def get_nucmer_threads(
+    comparisons: List[Tuple], args: Namespace
+) -> Dict[Tuple[str, str], int]:
+    """Return number of threads for each comparison's NUCmer jobs to use.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param args:  Namespace of command-line arguments for the run
+
+    With multiprocessing, threads (MUMmer4 only) are allocated from a budget
+    of args.workers cores (or all available cores) in proportion to the
+    total length of each comparison's genomes, up to args.threads for any
+    one comparison, or every core if args.threads is zero (see
+    core_budget.CoreBudget.allocate()). With SGE, each comparison uses
+    args.threads threads (one, if args.threads is zero).
+
+    Returns thread counts keyed by the paths of each comparison's genomes.
+    """
+    keys = [(query.path, subject.path) for query, subject in comparisons]
+    if args.threads == 1:
+        return dict.fromkeys(keys, 1)
+    if args.scheduler != "multiprocessing":
+        return dict.fromkeys(keys, max(1, args.threads))
+    threads = CoreBudget(args.workers).allocate(
+        [query.length + subject.length for query, subject in comparisons],
+        args.threads,
+    )
+    return dict(zip(keys, threads))
+
+
 def run_anim_jobs(joblist: List[ComparisonJob], args: Namespace) -> None:
     """Pass ANIm nucmer jobs to the scheduler.
 
@@ -385,9 +956,70 @@ def run_anim_jobs(joblist: List[ComparisonJob], args: Namespace) -> None:
         )
 
 
+def run_anim_streaming(
+    joblist: List[ComparisonJob], args: Namespace
+) -> Dict[Path, Tuple[int, ...]]:
+    """Run ANIm comparisons in worker processes, returning summarised output.
+
+    :param joblist:           list of ComparisonJob namedtuples
+    :param args:              command-line arguments for the run
+
+    Each worker runs NUCmer in temporary scratch space, filters its output
+    with delta-filter (or in-process, if args.native_filter is set), and sums
+    it (see anim.summarise_nucmer_comparison()). Returns a dictionary of
+    (alignment length, similarity errors) tuples, keyed by the expected
+    output file for each job. If args.archive is set, the (filtered)
+    alignment for each comparison is kept as a gzip-compressed file alongside
+    the expected output file. If args.union_coverage is set, the bases
+    covered on each genome are appended to each tuple.
+
+    Each comparison uses the number of threads chosen by get_nucmer_threads(),
+    and the pool runs as many at once as fit in the budget of args.workers
+    cores (see core_budget.CoreBudget.get_workers()).
+    """
+    logger = logging.getLogger(__name__)
+
+    logger.info("Running jobs with multiprocessing, streaming NUCmer output")
+    threads = get_nucmer_threads([(_.query, _.subject) for _ in joblist], args)
+    argsets = [
+        (
+            job.query.path,
+            job.subject.path,
+            args.nucmer_exe,
+            args.filter_exe,
+            args.maxmatch,
+            args.nofilter,
+            args.native_filter,
+            Path(str(job.outfile) + ".gz") if args.archive else None,
+            args.union_coverage,
+            threads[(job.query.path, job.subject.path)],
+        )
+        for job in joblist
+    ]
+    try:
+        results = run_mp.multiprocessing_apply(
+            anim.summarise_nucmer_comparison,
+            argsets,
+            workers=CoreBudget(args.workers).get_workers(list(threads.values())),
+        )
+    except subprocess.CalledProcessError:
+        logger.error(
+            "At least one NUCmer comparison failed. Please investigate (exiting)",
+            exc_info=True,
+        )
+        raise PyaniException("Multiprocessing run failed in ANIm")
+    logger.info("Multiprocessing run completed without error")
+    return {job.outfile: result for job, result in zip(joblist, results)}
+
+
 def update_comparison_results(
-    joblist: List[ComparisonJob], run, session, nucmer_version: str, args: Namespace,
-) -> None:
+    joblist: List[ComparisonJob],
+    run,
+    session,
+    nucmer_version: str,
+    args: Namespace,
+    results: Optional[Dict[Path, Tuple[int, ...]]] = None,
+) -> Dict[Path, Tuple[int, ...]]:
     """Update the Comparison table with the completed result set.
 
     :param joblist:         list of ComparisonJob namedtuples
@@ -395,37 +1027,77 @@ def update_comparison_results(
     :param session:         active pyanidb session via ORM
     :param nucmer_version:  version of nucmer used for the comparison
     :param args:            command-line arguments for this run
+    :param results:         optional (alignment length, similarity errors)
+                            tuples keyed by job output file, from streamed
+                            comparisons; other output files are parsed
 
     The Comparison table stores individual comparison results, one per row.
+
+    Output files are parsed by a pool of worker processes, and results are
+    streamed back in job order. These are added to the database in bulk,
+    pyani_config.INSERT_CHUNKSIZE rows at a time, as parsing continues.
+
+    If args.union_coverage is set, output files are parsed with
+    anim.parse_delta_coverage(), and coverage is calculated from the bases
+    covered on each genome, which follow the alignment length and similarity
+    errors in each result tuple.
+
+    Returns (alignment length, similarity errors) tuples for every job,
+    keyed by job output file.
     """
     logger = logging.getLogger(__name__)
 
+    # Parse output files that don't already have results, in parallel
+    results = dict(results or {})
+    outfiles = [job.outfile for job in joblist if job.outfile not in results]
+    logger.info("Parsing %s comparison output files", len(outfiles))
+    parsed = run_mp.multiprocessing_imap(
+        anim.parse_delta_coverage if args.union_coverage else anim.parse_delta,
+        outfiles,
+        workers=args.workers,
+        chunksize=pyani_config.PARSE_CHUNKSIZE,
+    )
+
     # Add individual results to Comparison table
+    rows = []  # type: List[Dict]
     for job in tqdm(joblist, disable=args.disable_tqdm):
         logger.debug("\t%s vs %s", job.query.description, job.subject.description)
-        aln_length, sim_errs = anim.parse_delta(job.outfile)
-        qcov = aln_length / job.query.length
-        scov = aln_length / job.subject.length
+        if job.outfile not in results:
+            results[job.outfile] = next(parsed)
+        aln_length, sim_errs = results[job.outfile][:2]
+
+        # The query genome is the NUCmer reference, and the subject its query
+        if args.union_coverage:
+            qcovered, scovered = results[job.outfile][2:]
+        else:
+            qcovered, scovered = aln_length, aln_length
+        qcov = qcovered / job.query.length
+        scov = scovered / job.subject.length
         try:
             pid = 1 - sim_errs / aln_length
         except ZeroDivisionError:  # aln_length was zero (no alignment)
             pid = 0
-        run.comparisons.append(
-            Comparison(
-                query=job.query,
-                subject=job.subject,
-                aln_length=aln_length,
-                sim_errs=sim_errs,
-                identity=pid,
-                cov_query=qcov,
-                cov_subject=scov,
-                program="nucmer",
-                version=nucmer_version,
-                fragsize=None,
-                maxmatch=args.maxmatch,
-            )
+        rows.append(
+            {
+                "query_id": job.query.genome_id,
+                "subject_id": job.subject.genome_id,
+                "aln_length": aln_length,
+                "sim_errs": sim_errs,
+                "identity": pid,
+                "cov_query": qcov,
+                "cov_subject": scov,
+                "program": "nucmer",
+                "version": nucmer_version,
+                "fragsize": None,
+                "maxmatch": args.maxmatch,
+            }
         )
-
-    # Populate db
-    logger.debug("Committing results to database")
-    session.commit()
+        if len(rows) == pyani_config.INSERT_CHUNKSIZE:
+            logger.debug("Committing %s results to database", len(rows))
+            add_comparisons(session, run, rows)
+            rows = []
+
+    # Populate db with remaining results
+    logger.debug("Committing %s results to database", len(rows))
+    add_comparisons(session, run, rows)
+    return results
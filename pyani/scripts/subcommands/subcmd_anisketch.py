@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) University of Strathclyde 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# 161 Cathedral Street,
+# Glasgow,
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# Copyright (c) 2019-2020 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Provides the anisketch subcommand for pyani."""
+
+import datetime
+import logging
+
+from argparse import Namespace
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from tqdm import tqdm
+
+from pyani import (
+    PyaniException,
+    __version__,
+    anisketch,
+    pyani_config,
+    run_multiprocessing as run_mp,
+)
+from pyani.pyani_orm import (
+    PyaniORMException,
+    add_comparisons,
+    add_run,
+    add_run_genomes,
+    filter_existing_comparisons,
+    get_session,
+    update_comparison_matrices,
+)
+from pyani.pyani_tools import termcolor
+
+
+def subcmd_anisketch(args: Namespace) -> None:
+    """Estimate ANI from k-mer sketches for all genome files in an input directory.
+
+    :param args:  Namespace, command-line arguments
+
+    A FracMinHash sketch of canonical k-mers is built for each genome with
+    NumPy (see pyani.anisketch), or loaded from the sketch cache, where it
+    is stored under the genome's MD5 hash. Every pair of sketches is then
+    compared, to estimate the Jaccard index and containments of the genomes'
+    k-mer sets, and from these the average nucleotide identity (ANI).
+
+    For each pairwise comparison, the estimated ANI is stored as identity,
+    the containment of each genome in the other as its coverage, and
+    alignment length and similarity errors are approximated from the number
+    of shared sketch hashes. These are deposited in the SQLite3 database, in
+    the same form as alignment-based results, together with the summary
+    matrices for the run.
+    """
+    # Create logger
+    logger = logging.getLogger(__name__)
+
+    # Announce the analysis
+    logger.info(termcolor("Running ANIsketch analysis", bold=True))
+
+    # The sketch parameters and ANI estimator identify comparable results
+    version = f"{__version__}_k{args.ksize}_scaled{args.scaled}_{args.estimator}"
+    logger.info(termcolor("ANIsketch version: %s", "cyan"), version)
+    if not 0 < args.ksize < 32:
+        logger.error("k-mer size must be between 1 and 31 (exiting)")
+        raise PyaniException("Invalid k-mer size %s" % args.ksize)
+
+    # Use the provided name or make one for the analysis
+    start_time = datetime.datetime.now()
+    name = args.name or "_".join(["ANIsketch", start_time.isoformat()])
+    logger.info(termcolor("Analysis name: %s", "cyan"), name)
+
+    # Get connection to existing database. This may or may not have data
+    logger.debug("Connecting to database %s", args.dbpath)
+    try:
+        session = get_session(args.dbpath)
+    except Exception:
+        logger.error(
+            "Could not connect to database %s (exiting)", args.dbpath, exc_info=True
+        )
+        raise SystemExit(1)
+
+    # Add information about this run to the database
+    logger.debug("Adding run info to database %s...", args.dbpath)
+    try:
+        run = add_run(
+            session,
+            method="ANIsketch",
+            cmdline=args.cmdline,
+            date=start_time,
+            status="started",
+            name=name,
+        )
+    except PyaniORMException:
+        logger.error(
+            "Could not add run %s to the database (exiting)", run, exc_info=True
+        )
+        raise SystemExit(1)
+    logger.debug("...added run ID: %s to the database", run)
+
+    # Identify input files for comparison, and populate the database
+    logger.debug("Adding genomes for run %s to database...", run)
+    try:
+        genome_ids = add_run_genomes(
+            session, run, args.indir, args.classes, args.labels
+        )
+    except PyaniORMException:
+        logger.error("Could not add genomes to database for run %s (exiting)", run)
+        raise SystemExit(1)
+    logger.debug("\t...added genome IDs: %s", genome_ids)
+
+    # Generate all pair combinations of genome IDs as a list of (Genome, Genome) tuples
+    logger.info("Compiling genomes for comparison")
+    genomes = run.genomes.all()
+    comparisons = list(combinations(genomes, 2))
+    logger.info("\t...total pairwise comparisons to be performed: %s", len(comparisons))
+
+    # Check for existing comparisons; if one has been done (for the same
+    # sketch parameters) we add the comparison to this run, but remove it
+    # from the list of comparisons to be performed
+    logger.info("Checking database for existing comparison data...")
+    comparisons_to_run = filter_existing_comparisons(
+        session, run, comparisons, "anisketch", version, None, None
+    )
+    logger.info(
+        "\t...after check, still need to run %s comparisons", len(comparisons_to_run)
+    )
+
+    # Build (or load) a sketch for each genome still to be compared
+    if comparisons_to_run:
+        sketches = build_sketches(comparisons_to_run, args)
+        logger.info("Comparing genome sketches...")
+        update_comparison_results(
+            comparisons_to_run, sketches, run, session, version, args
+        )
+    else:
+        logger.info(
+            termcolor(
+                "All comparison results present in database (skipping comparisons)",
+                "magenta",
+            )
+        )
+
+    # Update the summary matrices for the run
+    logger.info("Updating summary matrices with comparison results")
+    update_comparison_matrices(session, run)
+    logger.info("...database updated.")
+
+
+def build_sketches(
+    comparisons: List[Tuple], args: Namespace
+) -> Dict[int, anisketch.Sketch]:
+    """Return sketches of each genome in the passed comparisons, keyed by genome ID.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param args:  Namespace of command-line arguments for the run
+
+    Sketches are loaded from the cache directory where available, and
+    otherwise built and cached, using a pool of worker processes.
+    """
+    logger = logging.getLogger(__name__)
+
+    sketchdir = args.sketchdir
+    if sketchdir is None:
+        sketchdir = args.dbpath.parent / "sketches"
+    logger.debug("Using sketch cache %s", sketchdir)
+    sketchdir.mkdir(exist_ok=True, parents=True)
+
+    genomes = {}
+    for query, subject in comparisons:
+        genomes[query.genome_id] = query
+        genomes[subject.genome_id] = subject
+    logger.info("Building sketches for %s genomes", len(genomes))
+    argsets = [
+        (Path(_.path), _.genome_hash, sketchdir, args.ksize, args.scaled)
+        for _ in genomes.values()
+    ]
+    sketches = run_mp.multiprocessing_apply(
+        anisketch.load_or_build_sketch, argsets, workers=args.workers
+    )
+    return dict(zip(genomes, sketches))
+
+
+def update_comparison_results(
+    comparisons: List[Tuple],
+    sketches: Dict[int, anisketch.Sketch],
+    run,
+    session,
+    version: str,
+    args: Namespace,
+) -> None:
+    """Add results of comparing the sketches of each pair of genomes to the run.
+
+    :param comparisons:  list of (Genome, Genome) tuples
+    :param sketches:  genome sketches, keyed by genome ID
+    :param run:  Run ORM object for the current ANIsketch run
+    :param session:  active pyanidb session via ORM
+    :param version:  version string identifying the sketch parameters
+    :param args:  Namespace of command-line arguments for the run
+    """
+    rows = []  # type: List[Dict]
+    for query, subject in tqdm(comparisons, disable=args.disable_tqdm):
+        result = anisketch.compare_sketches(
+            sketches[query.genome_id], sketches[subject.genome_id], args.estimator
+        )
+        aln_length, sim_errs = anisketch.estimate_alignment(result, args.scaled)
+        rows.append(
+            {
+                "query_id": query.genome_id,
+                "subject_id": subject.genome_id,
+                "aln_length": aln_length,
+                "sim_errs": sim_errs,
+                "identity": result.identity,
+                "cov_query": result.containment_query,
+                "cov_subject": result.containment_subject,
+                "program": "anisketch",
+                "version": version,
+                "fragsize": None,
+                "maxmatch": None,
+            }
+        )
+        if len(rows) == pyani_config.INSERT_CHUNKSIZE:
+            add_comparisons(session, run, rows)
+            rows = []
+    add_comparisons(session, run, rows)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of Strathclyde 2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute for Pharmacy and Biomedical Sciences,
+# 161 Cathedral Street,
+# Glasgow,
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2020 University of Strathclyde
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Provides the cache subcommand for pyani."""
+
+import logging
+import sys
+
+from argparse import Namespace
+
+from pyani.cache import ComparisonCache, PyaniCacheException, format_size
+
+
+def subcmd_cache(args: Namespace) -> int:
+    """Report comparison cache usage, and prune or clear the cache.
+
+    :param args:  Namespace, received command-line arguments
+    """
+    logger = logging.getLogger(__name__)
+
+    # Adding this handler means we bypass the default logging
+    # formatter, and write straight to the terminal as stdout
+    if not args.verbose:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setLevel(logging.INFO)
+        logger.addHandler(handler)
+
+    if not args.cache_dir.is_dir():
+        logger.error("Comparison cache %s does not exist (exiting)", args.cache_dir)
+        raise PyaniCacheException(f"No comparison cache at {args.cache_dir}")
+    comparison_cache = ComparisonCache(args.cache_dir, args.cache_size)
+
+    # Remove entries, if requested, before reporting what remains
+    if args.clear:
+        logger.info("Clearing comparison cache %s", args.cache_dir)
+        removed = comparison_cache.clear()
+        logger.info("\tRemoved %s entries", len(removed))
+    elif args.prune:
+        logger.info(
+            "Pruning comparison cache %s to %s",
+            args.cache_dir,
+            format_size(args.cache_size),
+        )
+        removed = comparison_cache.prune()
+        logger.info("\tRemoved %s least recently used entries", len(removed))
+
+    usage = comparison_cache.usage()
+    logger.info("Comparison cache %s", args.cache_dir)
+    logger.info("\tEntries: %s (%s with alignments)", usage.entries, usage.alignments)
+    logger.info(
+        "\tSize: %s (maximum %s)",
+        format_size(usage.size),
+        format_size(args.cache_size),
+    )
+    for (program, version), count in sorted(usage.programs.items()):
+        logger.info("\t%s %s: %s entries", program, version, count)
+    return 0
@@ -51,27 +51,82 @@ assignment of genomic fragments. Env. Microbiol. 6(9): 938-947.
 doi:10.1111/j.1462-2920.2004.00624.x
 """
 
-import collections
-import math
+import itertools
+import os
 
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 
 from Bio import SeqIO  # type: ignore
 
+from . import run_multiprocessing as run_mp
+from .download import create_hash
+
+
+# Tetranucleotides, in the order of their 2-bit codes (A=0, C=1, G=2, T=3),
+# which is also their sorted order
+TETRANUCLEOTIDES = tuple("".join(_) for _ in itertools.product("ACGT", repeat=4))
+
+# 2-bit code for each byte of a sequence, with ambiguity symbols coded as 4.
+# Bio.Seq complements U as A, so U is read as T when the reverse strand is
+# counted (see count_kmers())
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+BASE_CODES[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = [0, 1, 2, 3, 0, 1, 2, 3]
+REVERSE_BASE_CODES = BASE_CODES.copy()
+REVERSE_BASE_CODES[np.frombuffer(b"Uu", dtype=np.uint8)] = 3
+
+# Number of rows of TETRA correlations calculated at once
+CORRELATION_BLOCKSIZE = 2048
+
+
+class KmerCounts(NamedTuple):
+
+    """Counts of di-, tri- and tetranucleotides, indexed by 2-bit code."""
+
+    di: np.ndarray
+    tri: np.ndarray
+    tetra: np.ndarray
+
 
 # Calculate tetranucleotide Z-score for a set of input sequences
-def calculate_tetra_zscores(infilenames: Iterable) -> Dict[str, Dict[str, float]]:
+def calculate_tetra_zscores(
+    infilenames: Iterable,
+    workers: Optional[int] = None,
+    cachedir: Optional[Path] = None,
+) -> Dict[str, Dict[str, float]]:
     """Return dictionary of TETRA Z-scores for each input file.
 
     :param infilenames:  iterable of paths to input sequence files
+    :param workers:  int, number of worker processes calculating Z-scores
+    :param cachedir:  Path, directory of Z-score vectors to reuse and add to
+        (see get_tetra_zscore_vector())
+
+    Z-scores for the input files are calculated in parallel, by a pool of
+    worker processes.
     """
-    org_tetraz = {}  # type: Dict[str, Dict[str, float]]
-    for filename in infilenames:
-        org_tetraz[filename.stem] = calculate_tetra_zscore(filename)
-    return org_tetraz
+    infilenames = list(infilenames)
+    vectors = run_mp.multiprocessing_apply(
+        get_tetra_zscore_vector,
+        [(filename, cachedir) for filename in infilenames],
+        workers=workers,
+    )
+    return {
+        filename.stem: get_zscore_dict(vector)
+        for filename, vector in zip(infilenames, vectors)
+    }
 
 
 # Calculate tetranucleotide Z-score for a single sequence file
@@ -80,63 +135,180 @@ def calculate_tetra_zscore(filename: Path) -> Dict[str, float]:
 
     :param filename:  path to sequence file
 
-    Calculates mono-, di-, tri- and tetranucleotide frequencies
-    for each sequence, on each strand, and follows Teeling et al. (2004)
-    in calculating a corresponding Z-score for each observed
-    tetranucleotide frequency, dependent on the mono-, di- and tri-
-    nucleotide frequencies for that input sequence.
+    Calculates di-, tri- and tetranucleotide frequencies for each
+    sequence, on each strand (see count_kmers()), and follows Teeling et
+    al. (2004) in calculating a corresponding Z-score for each observed
+    tetranucleotide frequency, dependent on the di- and trinucleotide
+    frequencies for that input sequence.
+    """
+    return get_zscore_dict(get_tetra_zscore_vector(filename))
+
+
+def get_zscore_dict(vector: np.ndarray) -> Dict[str, float]:
+    """Return Z-scores of observed tetranucleotides, keyed by tetranucleotide.
+
+    :param vector:  array of Z-scores, indexed by 2-bit code, with NaN for
+        tetranucleotides not observed (see get_tetra_zscores())
+    """
+    return {
+        TETRANUCLEOTIDES[idx]: float(vector[idx])
+        for idx in np.flatnonzero(~np.isnan(vector))
+    }
+
+
+def get_zscore_cache_path(cachedir: Path, genome_hash: str) -> Path:
+    """Return path to the cached Z-score vector for a genome.
+
+    :param cachedir:  Path, directory of cached Z-score vectors
+    :param genome_hash:  str, MD5 hash of the genome FASTA file
+
+    As in the comparison cache (see cache.ComparisonCache), files are held
+    in subdirectories named for the first two characters of their key, so
+    the two caches may share a directory.
+    """
+    return Path(cachedir) / genome_hash[:2] / f"{genome_hash}.tetra.npy"
+
+
+# Calculate, or load, the tetranucleotide Z-scores for a single sequence file
+def get_tetra_zscore_vector(
+    filename: Path, cachedir: Optional[Path] = None
+) -> np.ndarray:
+    """Return array of TETRA Z-scores for the sequence in the passed file.
+
+    :param filename:  path to sequence file
+    :param cachedir:  Path, directory of Z-score vectors to reuse and add to
+
+    Z-scores are indexed by 2-bit code, with NaN for tetranucleotides not
+    observed (see get_tetra_zscores()). If cachedir is given, Z-scores are
+    loaded from, or else saved to, a NumPy .npy file named for the MD5 hash
+    of the sequence file (see get_zscore_cache_path()), so that they are
+    reused by any later run with the same genome. Files are written under
+    temporary names and then renamed, so that processes sharing a cache
+    never see a partial file.
+    """
+    if cachedir is not None:
+        cachepath = get_zscore_cache_path(cachedir, create_hash(filename))
+        try:
+            vector = np.load(cachepath)
+            if vector.shape == (len(TETRANUCLEOTIDES),):
+                return vector
+        except (OSError, ValueError):  # missing or unreadable vector
+            pass
+    counts = count_kmers(str(rec.seq) for rec in SeqIO.parse(filename, "fasta"))
+    vector = get_tetra_zscores(counts)
+    if cachedir is not None:
+        cachepath.parent.mkdir(parents=True, exist_ok=True)
+        tmppath = cachepath.with_name(f"{cachepath.name}.{os.getpid()}.tmp")
+        with tmppath.open("wb") as ofh:
+            np.save(ofh, vector)
+        tmppath.replace(cachepath)
+    return vector
+
+
+def get_tetra_zscores(counts: KmerCounts) -> np.ndarray:
+    """Return array of Z-scores for each tetranucleotide, indexed by 2-bit code.
+
+    :param counts:  KmerCounts, k-mer counts on both strands of a genome
+
+    Z-scores of tetranucleotides that were not observed are NaN. The
+    arithmetic is carried out in the same order as in the original
+    per-tetranucleotide implementation, so that results are identical.
     """
-    # For the Teeling et al. method, the Z-scores require us to count
-    # mono, di, tri and tetranucleotide sequences - these are stored
-    # (in order) in the counts tuple
-    counts = (
-        collections.defaultdict(int),
-        collections.defaultdict(int),
-        collections.defaultdict(int),
-        collections.defaultdict(int),
-    )  # type: Tuple
-    for rec in SeqIO.parse(filename, "fasta"):
-        for seq in [str(rec.seq).upper(), str(rec.seq.reverse_complement()).upper()]:
-            # The Teeling et al. algorithm requires us to consider
-            # both strand orientations, so monocounts are easy
-            for base in ("G", "C", "T", "A"):
-                counts[0][base] += seq.count(base)
-            # For di, tri and tetranucleotide counts, loop over the
-            # sequence and its reverse complement, until near the end:
-            for i in range(len(seq[:-4])):
-                din, tri, tetra = seq[i : i + 2], seq[i : i + 3], seq[i : i + 4]
-                counts[1][str(din)] += 1
-                counts[2][str(tri)] += 1
-                counts[3][str(tetra)] += 1
-            # Then clean up the straggling bit at the end:
-            counts[2][str(seq[-4:-1])] += 1
-            counts[2][str(seq[-3:])] += 1
-            counts[1][str(seq[-4:-2])] += 1
-            counts[1][str(seq[-3:-1])] += 1
-            counts[1][str(seq[-2:])] += 1
+    observed = np.flatnonzero(counts.tetra)
+    # Counts of the first and last trinucleotide, and the central
+    # dinucleotide, of each observed tetranucleotide
+    pre = counts.tri[observed >> 2]
+    suf = counts.tri[observed & 63]
+    den = counts.di[(observed >> 2) & 15]
     # Following Teeling (2004), calculate expected frequencies for each
-    # tetranucleotide; we ignore ambiguity symbols
-    tetra_exp = {}
-    for tet in [tetn for tetn in counts[3] if tetra_clean(tetn)]:
-        tetra_exp[tet] = (
-            1.0 * counts[2][tet[:3]] * counts[2][tet[1:]] / counts[1][tet[1:3]]
+    # tetranucleotide, then approximate the std dev and Z-score
+    exp = 1.0 * pre * suf / den
+    sd = np.sqrt(exp * (den - pre) * (den - suf) / (den * den))
+    zscores = np.full(256, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # A zero in the estimation of variance gives 1/den^2 as the Z-score
+        zscores[observed] = np.where(
+            sd == 0, 1 / (den * den), (counts.tetra[observed] - exp) / sd
         )
-    # Following Teeling (2004) we approximate the std dev and Z-score for each
-    # tetranucleotide
-    tetra_sd = {}
-    tetra_z = {}
-    for tet, exp in list(tetra_exp.items()):
-        den = counts[1][tet[1:3]]
-        tetra_sd[tet] = math.sqrt(
-            exp * (den - counts[2][tet[:3]]) * (den - counts[2][tet[1:]]) / (den * den)
-        )
-        try:
-            tetra_z[tet] = (counts[3][tet] - exp) / tetra_sd[tet]
-        except ZeroDivisionError:
-            # To record if we hit a zero in the estimation of variance
-            # zeroes = [k for k, v in list(tetra_sd.items()) if v == 0]
-            tetra_z[tet] = 1 / (counts[1][tet[1:3]] * counts[1][tet[1:3]])
-    return tetra_z
+    return zscores
+
+
+def count_kmers(seqs: Iterable[str]) -> KmerCounts:
+    """Return di-, tri- and tetranucleotide counts on both strands of sequences.
+
+    :param seqs:  iterable of nucleotide sequences
+
+    Sequences are encoded as arrays of 2-bit codes (see BASE_CODES), and
+    all k-mers are counted in a single pass (see _count_strand()). Counts
+    on the reverse strand are then the counts of each k-mer's reverse
+    complement on the forward strand (see get_reverse_complement_index()).
+
+    As in the original implementation, the last tetranucleotide on each
+    strand of each sequence is not counted.
+    """
+    seqbytes = [_.encode() for _ in seqs]
+    lengths = np.array([len(_) for _ in seqbytes], dtype=np.intp)
+    starts = np.concatenate(([0], np.cumsum(lengths[:-1] + 1))).astype(np.intp)
+    # Sequences are joined by a spacer, which is coded as ambiguous
+    data = np.frombuffer(b"-".join(seqbytes), dtype=np.uint8)
+    fwd = _count_strand(BASE_CODES[data], starts, lengths)
+    rev = fwd
+    if np.isin(data, np.frombuffer(b"Uu", dtype=np.uint8)).any():
+        rev = _count_strand(REVERSE_BASE_CODES[data], starts, lengths)
+    (fwdcounts, _, fwdlast), (revcounts, revfirst, _) = fwd, rev
+    return KmerCounts(
+        fwdcounts.di + revcounts.di[get_reverse_complement_index(2)],
+        fwdcounts.tri + revcounts.tri[get_reverse_complement_index(3)],
+        fwdcounts.tetra
+        - fwdlast
+        + (revcounts.tetra - revfirst)[get_reverse_complement_index(4)],
+    )
+
+
+def _count_strand(
+    codes: np.ndarray, starts: np.ndarray, lengths: np.ndarray
+) -> Tuple[KmerCounts, np.ndarray, np.ndarray]:
+    """Return k-mer counts, and counts of first and last tetranucleotides.
+
+    :param codes:  array of 2-bit codes of the concatenated sequences
+    :param starts:  array of the offset of each sequence in codes
+    :param lengths:  array of the length of each sequence
+
+    Each k-mer is given a rolling integer code, and windows containing an
+    ambiguity symbol are masked before the codes are counted with
+    np.bincount.
+    """
+    ambiguous = codes > 3
+    nambiguous = np.concatenate(([0], np.cumsum(ambiguous)))
+    bases = np.where(ambiguous, 0, codes).astype(np.intp)
+    kmers, counts = bases, []  # type: np.ndarray, List[np.ndarray]
+    for kmer in (2, 3, 4):
+        kmers = kmers[:-1] * 4 + bases[kmer - 1 :]
+        clean = nambiguous[kmer:] == nambiguous[:-kmer]
+        counts.append(np.bincount(kmers[clean], minlength=4 ** kmer))
+    # The first and last tetranucleotide windows of each sequence
+    firsts = starts[lengths >= 4]
+    lasts = firsts + lengths[lengths >= 4] - 4
+    return (
+        KmerCounts(*counts),
+        np.bincount(kmers[firsts[clean[firsts]]], minlength=256),
+        np.bincount(kmers[lasts[clean[lasts]]], minlength=256),
+    )
+
+
+def get_reverse_complement_index(kmer: int) -> np.ndarray:
+    """Return array of the 2-bit code of the reverse complement of each k-mer.
+
+    :param kmer:  int, k-mer length
+
+    Indexing an array of k-mer counts on one strand with this array gives
+    the counts on the other strand.
+    """
+    codes, index = np.arange(4 ** kmer), np.zeros(4 ** kmer, dtype=np.intp)
+    for _ in range(kmer):
+        index = index * 4 + 3 - codes % 4
+        codes //= 4
+    return index
 
 
 # Returns true if the passed string contains only A, C, G or T
@@ -153,40 +325,88 @@ def tetra_clean(instr: str) -> bool:
     return True
 
 
+# Stack Z-scores for each sequence into a matrix, in a fixed tetranucleotide order
+def get_zscore_matrix(
+    tetra_z: Dict[Any, Dict[str, float]],
+    orgs: Sequence[Any],
+    fill: Optional[float] = None,
+) -> np.ndarray:
+    """Return matrix of TETRA Z-scores, with a row for each sequence ID.
+
+    :param tetra_z:  dict, Z-scores, keyed by sequence ID
+    :param orgs:  sequence IDs, in row order
+    :param fill:  Z-score for tetranucleotides not observed in a sequence;
+        if None, all sequences must have Z-scores for the same
+        tetranucleotides
+
+    Columns are the tetranucleotides observed in any sequence, in the order
+    of TETRANUCLEOTIDES. Raises AssertionError if fill is None and the
+    sequences have Z-scores for different tetranucleotides.
+    """
+    zmatrix = np.full((len(orgs), len(TETRANUCLEOTIDES)), np.nan)
+    column = {tet: idx for idx, tet in enumerate(TETRANUCLEOTIDES)}
+    for row, org in enumerate(orgs):
+        zmatrix[row, [column[_] for _ in tetra_z[org]]] = list(tetra_z[org].values())
+    missing = np.isnan(zmatrix)
+    zmatrix = zmatrix[:, ~missing.all(axis=0)]
+    if fill is None:
+        if np.isnan(zmatrix).any():
+            raise AssertionError("Z-scores are not for the same tetranucleotides")
+    else:
+        zmatrix[np.isnan(zmatrix)] = fill
+    return zmatrix
+
+
+# Calculate Pearson's correlation coefficients for blocks of rows of a matrix
+def iter_correlation_blocks(
+    zmatrix: np.ndarray, blocksize: int = CORRELATION_BLOCKSIZE
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield the correlations of blocks of rows of a Z-score matrix with every row.
+
+    :param zmatrix:  array, Z-scores, one row per sequence (see
+        get_zscore_matrix())
+    :param blocksize:  int, number of rows in each block
+
+    Each row is standardised (centred, and scaled to unit length), so that
+    the dot product of two rows is their Pearson correlation coefficient,
+    and the correlations for a block of rows are a single matrix product.
+    Only one block of blocksize x N correlations is held at a time.
+
+    Yields (index of the block's first row, block of correlations) tuples.
+    """
+    zmatrix = zmatrix - zmatrix.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zmatrix /= np.linalg.norm(zmatrix, axis=1, keepdims=True)
+    for start in range(0, len(zmatrix), blocksize):
+        yield start, zmatrix[start : start + blocksize] @ zmatrix.T
+
+
 # Calculate Pearson's correlation coefficient from the Z-scores for each
-# tetranucleotide. If we're forcing rpy2, might as well use that, though...
-def calculate_correlations(tetra_z: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+# tetranucleotide
+def calculate_correlations(
+    tetra_z: Dict[str, Dict[str, float]], blocksize: int = CORRELATION_BLOCKSIZE
+) -> pd.DataFrame:
     """Return dataframe of Pearson correlation coefficients.
 
     :param tetra_z:  dict, Z-scores, keyed by sequence ID
+    :param blocksize:  int, number of rows of correlations to calculate at once
+        (see iter_correlation_blocks())
 
     Calculates Pearson correlation coefficient from Z scores for each
-    tetranucleotide. This is done longhand here, which is fast enough,
-    but for robustness we might want to do something else... (TODO).
+    tetranucleotide, for all pairs of sequences at once, from a matrix of
+    Z-scores (see get_zscore_matrix()).
 
     Note that we report a correlation by this method, rather than a
     percentage identity.
     """
     orgs = sorted(tetra_z.keys())
-    correlations = pd.DataFrame(index=orgs, columns=orgs, dtype=float).fillna(1.0)
-    for idx, org1 in enumerate(orgs[:-1]):
-        for org2 in orgs[idx + 1 :]:
-            if not sorted(tetra_z[org1].keys()) == sorted(tetra_z[org2].keys()):
-                raise AssertionError()
-            tets = sorted(tetra_z[org1].keys())
-            zscores = [
-                [tetra_z[org1][t] for t in tets],
-                [tetra_z[org2][t] for t in tets],
-            ]
-            zmeans = [sum(zscore) / len(zscore) for zscore in zscores]
-            zdiffs = [
-                [z - zmeans[0] for z in zscores[0]],
-                [z - zmeans[1] for z in zscores[1]],
-            ]
-            diffprods = sum(
-                [zdiffs[0][i] * zdiffs[1][i] for i in range(len(zdiffs[0]))]
-            )
-            zdiffs2 = [sum([z * z for z in zdiffs[0]]), sum([z * z for z in zdiffs[1]])]
-            correlations[org1][org2] = diffprods / math.sqrt(zdiffs2[0] * zdiffs2[1])
-            correlations[org2][org1] = correlations[org1][org2]
-    return correlations
+    correlations = np.ones((len(orgs), len(orgs)))
+    for start, block in iter_correlation_blocks(
+        get_zscore_matrix(tetra_z, orgs), blocksize
+    ):
+        correlations[start : start + len(block)] = block
+    # Report symmetrical correlations, and a diagonal of exactly 1
+    lower = np.tril_indices(len(orgs), -1)
+    correlations[lower] = correlations.T[lower]
+    np.fill_diagonal(correlations, 1.0)
+    return pd.DataFrame(correlations, index=orgs, columns=orgs)
@@ -95,7 +95,13 @@ setuptools.setup(
         "console_scripts": [
             "pyani = pyani.scripts.pyani_script:run_main",
             "average_nucleotide_identity.py = pyani.scripts.average_nucleotide_identity:run_main",
+            "blastdb_wrapper.py = pyani.scripts.blastdb_wrapper:run_main",
             "delta_filter_wrapper.py = pyani.scripts.delta_filter_wrapper:run_main",
+            "formatdb_wrapper.py = pyani.scripts.formatdb_wrapper:run_main",
+            "nucmer_batch_wrapper.py = pyani.scripts.nucmer_batch_wrapper:run_main",
+            "nucmer_filter_wrapper.py = pyani.scripts.nucmer_filter_wrapper:run_main",
+            "nucmer_index_wrapper.py = pyani.scripts.nucmer_index_wrapper:run_main",
+            "nucmer_merge_wrapper.py = pyani.scripts.nucmer_merge_wrapper:run_main",
             "genbank_get_genomes_by_taxon.py = pyani.scripts.genbank_get_genomes_by_taxon:run_main",
         ]
     },
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Benchmark streaming .delta parsing against the pre-0.3 readlines() parser.
+
+This is not part of the test suite. Run it from the repository root with:
+
+python tests/benchmark_delta_parsing.py [ncomparisons] [nalignments]
+
+A synthetic .delta file with the passed numbers of comparisons and
+alignments per comparison is written to a temporary directory, and parsed
+with each implementation in turn.
+"""
+
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+from pyani.anim import parse_delta
+
+from tools import parse_delta_readlines, write_synthetic_delta
+
+
+def run_main() -> int:
+    """Run the benchmark, and report timings for each parser."""
+    ncomparisons = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    nalignments = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        deltafile = write_synthetic_delta(
+            Path(tmpdir) / "synthetic.delta", ncomparisons, nalignments
+        )
+        print(f"{deltafile.stat().st_size} bytes")
+        results = []
+        for parser in (parse_delta_readlines, parse_delta):
+            start = time.perf_counter()
+            results.append(parser(deltafile))
+            print(f"{parser.__name__}: {time.perf_counter() - start:.3f}s")
+    if results[0] != results[1]:
+        print(f"Results differ: {results}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_main())
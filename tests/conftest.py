@@ -48,7 +48,7 @@ from typing import Dict, List, NamedTuple, Tuple
 import pandas as pd
 import pytest
 
-from pyani import download
+from pyani import download, pyani_orm
 from pyani.download import ASMIDs, DLStatus, get_ncbi_esummary
 from pyani.pyani_config import (
     BLASTALL_DEFAULT,
@@ -195,6 +195,16 @@ def path_fna_all(dir_seq):
     return [_ for _ in dir_seq.iterdir() if _.is_file() and _.suffix == ".fna"]
 
 
+@pytest.fixture
+def pyani_session(tmp_path):
+    """Session connected to an empty pyani database."""
+    dbpath = tmp_path / "pyanidb"
+    pyani_orm.create_db(dbpath)
+    session = pyani_orm.get_session(dbpath)
+    yield session
+    session.close()
+
+
 @pytest.fixture(autouse=True)
 def skip_by_unavailable_executable(
     request, blastall_available, blastn_available, nucmer_available
@@ -43,15 +43,33 @@ These tests are intended to be run from the repository root using:
 pytest -v
 """
 
+import io
+import json
+import subprocess
+
+from argparse import Namespace
 from pathlib import Path
-from typing import List, NamedTuple
+from typing import Dict, List, NamedTuple
 
+import numpy as np
 import pandas as pd
 import pytest  # noqa: F401  # pylint: disable=unused-import
 
 from pandas.util.testing import assert_frame_equal
 
-from pyani import anib, pyani_files
+from Bio import SeqIO
+
+from pyani import anib, pyani_files, pyani_orm
+from pyani.pyani_orm import BlastDB, Genome
+from pyani.scripts.subcommands.subcmd_anib import (
+    BlastDBJob,
+    ComparisonJob,
+    collect_combined_results,
+    generate_combined_joblist,
+    generate_joblist,
+    update_blastdbs,
+    update_comparison_results,
+)
 
 
 class ANIbOutput(NamedTuple):
@@ -125,10 +143,16 @@ def test_blastall_dbjobdict(path_fna_all, tmp_path):
     blastcmds = anib.make_blastcmd_builder("ANIblastall", tmp_path)
     jobdict = anib.build_db_jobs(path_fna_all, blastcmds)
     expected = [
-        (tmp_path / _.name, f"formatdb -p F -i {tmp_path / _.name} -t {_.stem}")
+        (
+            tmp_path / _.name,
+            "formatdb_wrapper.py --mode ANIblastall --format_exe formatdb "
+            f"{_} {tmp_path}",
+        )
         for _ in path_fna_all
     ]
     assert sorted([(k, v.script) for (k, v) in jobdict.items()]) == sorted(expected)
+    # Input files are linked or copied by the jobs, not as they are built
+    assert not any((tmp_path / _.name).exists() for _ in path_fna_all)
 
 
 def test_blastall_graph(path_fna_all, tmp_path, fragment_length):
@@ -141,7 +165,9 @@ def test_blastall_graph(path_fna_all, tmp_path, fragment_length):
     for job in jobgraph:
         assert job.script.startswith("blastall -p blastn")
         assert len(job.dependencies) == 1
-        assert job.dependencies[0].script.startswith("formatdb")
+        assert job.dependencies[0].script.startswith(
+            "formatdb_wrapper.py --mode ANIblastall"
+        )
 
 
 def test_blastall_multiple(path_fna_two, tmp_path):
@@ -186,7 +212,8 @@ def test_blastn_dbjobdict(path_fna_all, tmp_path):
     expected = [
         (
             tmp_path / _.name,
-            f"makeblastdb -dbtype nucl -in {_} -title {_.stem} -out {tmp_path / _.name}",
+            "formatdb_wrapper.py --mode ANIb --format_exe makeblastdb "
+            f"{_} {tmp_path}",
         )
         for _ in path_fna_all
     ]
@@ -203,7 +230,7 @@ def test_blastn_graph(path_fna_all, tmp_path, fragment_length):
     for job in jobgraph:
         assert job.script.startswith("blastn")
         assert len(job.dependencies) == 1
-        assert job.dependencies[0].script.startswith("makeblastdb")
+        assert job.dependencies[0].script.startswith("formatdb_wrapper.py --mode ANIb")
 
 
 def test_blastn_multiple(path_fna_two, tmp_path):
@@ -270,6 +297,64 @@ def test_formatdb_single(path_fna, tmp_path):
     cmd = anib.construct_formatdb_cmd(path_fna, tmp_path)
     expected = f"formatdb -p F -i {tmp_path / path_fna.name} -t {path_fna.stem}"
     assert cmd[0] == expected
+    assert not (tmp_path / path_fna.name).exists()
+
+
+def write_fake_formatdb(tmp_path: Path) -> Path:
+    """Return path to a formatdb stand-in, writing only an .nsq file."""
+    formatdb = tmp_path / "formatdb"
+    formatdb.write_text(
+        '#!/bin/sh\nif [ "$1" = "-" ]; then echo "formatdb 2.2.26   arguments:"; '
+        'exit 1; fi\nwhile [ "$1" != "-i" ]; do shift; done\n'
+        'test -f "$2" && touch "$2.nsq"\n'
+    )
+    formatdb.chmod(0o755)
+    return formatdb
+
+
+# Test building BLAST databases in the output directory
+def test_format_blastdb(path_fna, tmp_path, monkeypatch):
+    """Link input into place, build a formatdb database, and skip it once current."""
+    formatdb = write_fake_formatdb(tmp_path)
+    outdir = tmp_path / "blastdbs"
+    outdir.mkdir()
+    version = anib.get_blastdb_version(formatdb, "ANIblastall")
+    assert version.endswith("_2.2.26")
+
+    dbname = anib.format_blastdb(path_fna, outdir, formatdb, "ANIblastall")
+    assert dbname == outdir / path_fna.name
+    assert dbname.read_bytes() == path_fna.read_bytes()
+    assert Path(str(dbname) + ".nsq").is_file()
+    assert anib.blastdb_is_current(path_fna, dbname, version)
+    assert not anib.blastdb_is_current(path_fna, dbname, "Linux_2.2.25")
+
+    # A current database is not built again, and gets no job
+    def fail(*args, **kwargs):
+        raise AssertionError("database rebuilt")
+
+    monkeypatch.setattr(anib.subprocess, "run", fail)
+    monkeypatch.setattr(anib, "get_blastdb_version", lambda *args: version)
+    assert anib.format_blastdb(path_fna, outdir, formatdb, "ANIblastall") == dbname
+    blastcmds = anib.make_blastcmd_builder("ANIblastall", outdir, format_exe=formatdb)
+    assert anib.build_db_jobs([path_fna], blastcmds) == {}
+
+
+def test_link_or_copy(path_fna, tmp_path, monkeypatch):
+    """Link a file into place, falling back to a symlink or a copy."""
+    anib.link_or_copy(path_fna, tmp_path / "link.fna")
+    assert (tmp_path / "link.fna").samefile(path_fna)
+
+    def fail(*args, **kwargs):
+        raise OSError("links not supported")
+
+    monkeypatch.setattr(anib.os, "link", fail)
+    anib.link_or_copy(path_fna, tmp_path / "link.fna")
+    assert (tmp_path / "link.fna").is_symlink()
+
+    monkeypatch.setattr(Path, "symlink_to", fail)
+    anib.link_or_copy(path_fna, tmp_path / "link.fna")
+    assert not (tmp_path / "link.fna").is_symlink()
+    assert (tmp_path / "link.fna").read_bytes() == path_fna.read_bytes()
 
 
 # Test FASTA file fragmentation for ANIb methods
@@ -278,9 +363,38 @@ def test_fragment_files(path_fna_all, tmp_path, dir_tgt_fragments, fragment_leng
     result = anib.fragment_fasta_files(path_fna_all, tmp_path, fragment_length)
 
     # # Test fragment lengths are in bounds
-    for _, fragdict in result[-1].items():
-        for _, fraglen in fragdict.items():
-            assert fraglen <= fragment_length
+    for _, fraglengths in result[-1].items():
+        assert fraglengths.max() <= fragment_length
+
+
+def test_fragment_file(path_fna_all, tmp_path, fragment_length):
+    """Streamed fragments are those Bio.SeqIO would write, with their lengths."""
+    for path in path_fna_all:
+        fragpath = tmp_path / f"{path.stem}-fragments.fna"
+        result = anib.fragment_fasta_file(path, fragpath, fragment_length)
+
+        expected = []
+        for seq in SeqIO.parse(path, "fasta"):
+            for idx in range(0, len(seq), fragment_length):
+                expected.append(seq[idx : idx + fragment_length])
+                expected[-1].id = "frag%05d" % len(expected)
+        SeqIO.write(expected, tmp_path / "expected.fna", "fasta")
+        assert fragpath.read_bytes() == (tmp_path / "expected.fna").read_bytes()
+        assert result.tolist() == [len(_) for _ in expected]
+        assert anib.get_fragment_lengths(fragpath).tolist() == result.tolist()
+
+
+def test_fragment_file_multiple_sequences(tmp_path):
+    """Each input sequence's trailing bases form a shorter fragment."""
+    inpath = tmp_path / "genome.fna"
+    inpath.write_text(">seq1 first\nACGTAC\nGT\n>seq2\nAC GT\r\n>empty\n>seq3\nA\n")
+    result = anib.fragment_fasta_file(inpath, tmp_path / "fragments.fna", 3)
+    assert result.tolist() == [3, 3, 2, 3, 1, 1]
+    assert (tmp_path / "fragments.fna").read_text() == (
+        ">frag00001 seq1 first\nACG\n>frag00002 seq1 first\nTAC\n"
+        ">frag00003 seq1 first\nGT\n>frag00004 seq2\nACG\n>frag00005 seq2\nT\n"
+        ">frag00006 seq3\nA\n"
+    )
 
 
 # Test BLAST+ database formatting (makeblastdb) command generation
@@ -316,6 +430,166 @@ def test_makeblastdb_single(path_fna, tmp_path):
     assert cmd[0] == expected
 
 
+def test_blastn_single_outfname(path_fna_two, tmp_path):
+    """Generate BLASTN+ command-line writing to a named output file."""
+    outfname = tmp_path / "query_vs_subject.blast_tab"
+    cmd = anib.construct_blastn_cmdline(
+        path_fna_two[0], path_fna_two[1], tmp_path, outfname=outfname
+    )
+    assert cmd.startswith(f"blastn -out {outfname} -query {path_fna_two[0]} ")
+
+
+# Test the BLAST database store
+def test_build_blastdb(path_fna, tmp_path):
+    """Build a genome's fragments and BLAST+ database in the store, once."""
+    makeblastdb = tmp_path / "makeblastdb"
+    makeblastdb.write_text(
+        '#!/bin/sh\nwhile [ "$1" != "-out" ]; do shift; done\ntouch "$2.nsq"\n'
+    )
+    makeblastdb.chmod(0o755)
+    entry = anib.get_blastdb_entry(tmp_path / "store", "hash", 1020, "Linux_2.9.0+")
+    assert entry == tmp_path / "store" / "Linux_2.9.0+" / "hash_1020"
+
+    marker = anib.build_blastdb(path_fna, entry, 1020, makeblastdb)
+    assert marker == anib.get_blastdb_marker(entry)
+    assert marker.is_file()
+    assert sorted(_.name for _ in entry.parent.iterdir()) == [
+        "hash_1020",
+        "hash_1020.complete",
+    ]
+    paths = anib.get_blastdb_paths(entry)
+    assert Path(str(paths.dbpath) + ".nsq").is_file()
+    fraglengths = np.load(paths.lengthpath)
+    fragments = list(SeqIO.parse(paths.fragpath, "fasta"))
+    assert [_.id for _ in fragments] == [
+        "frag%05d" % _ for _ in range(1, len(fragments) + 1)
+    ]
+    assert fraglengths.tolist() == [len(_) for _ in fragments]
+    assert fraglengths.max() == 1020
+    assert fraglengths.sum() == sum(len(_) for _ in SeqIO.parse(path_fna, "fasta"))
+
+    # A complete entry is not built again
+    assert anib.build_blastdb(path_fna, entry, 1020, Path("false")) == marker
+
+
+def test_generate_joblist_blastdb(tmp_path, path_file_four):
+    """blastn jobs depend on one job building each genome's store entry."""
+    version = "Linux_2.9.0+"
+    store = tmp_path / "store"
+    # The third genome's entry was built by an earlier run in another store,
+    # and the fourth genome's by an earlier run in this store
+    recorded = anib.get_blastdb_entry(tmp_path / "old", "hash2", 1020, version)
+    anib.get_blastdb_marker(recorded).parent.mkdir(parents=True)
+    anib.get_blastdb_marker(recorded).touch()
+    anib.get_blastdb_marker(store / version / "hash3_1020").parent.mkdir(parents=True)
+    anib.get_blastdb_marker(store / version / "hash3_1020").touch()
+    genomes = [
+        Genome(genome_id=_, genome_hash=f"hash{_}", path=str(path_file_four[_]))
+        for _ in range(4)
+    ]
+    genomes[2].blastdbs = [
+        BlastDB(dbpath=str(anib.get_blastdb_paths(recorded).dbpath))
+    ]
+    args = Namespace(
+        outdir=tmp_path,
+        dbpath=tmp_path / "pyanidb",
+        blastdb_dir=store,
+        blastn_exe="blastn",
+        format_exe="makeblastdb",
+        fragsize=1020,
+        recovery=False,
+        jobprefix="test",
+        disable_tqdm=True,
+        threads=1,
+    )
+    comparisons = [(genomes[0], genomes[1]), (genomes[1], genomes[0])]
+    comparisons += [(genomes[2], genomes[3]), (genomes[0], genomes[2])]
+
+    dbjobs = {}
+    joblist = generate_joblist(comparisons, [], dbjobs, version, args)
+    assert [_.job.command.split()[2] for _ in joblist] == [
+        str(tmp_path / "blastn_output" / f"file{_}_vs_file{__}.blast_tab")
+        for _, __ in ((1, 2), (2, 1), (3, 4), (1, 3))
+    ]
+    assert [dbjobs[f"hash{_}"].entry for _ in range(4)] == [
+        store / version / "hash0_1020",
+        store / version / "hash1_1020",
+        recorded,
+        store / version / "hash3_1020",
+    ]
+    dependencies = [_.job.dependencies for _ in joblist]
+    assert [len(_) for _ in dependencies] == [2, 2, 0, 1]
+    assert dependencies[0] == dependencies[1][::-1]
+    assert dependencies[3][0] is dependencies[0][0]
+    assert dependencies[0][0].command == (
+        f"blastdb_wrapper.py --fragsize 1020 --makeblastdb_exe makeblastdb "
+        f"{path_file_four[0]} {store / version / 'hash0_1020'}"
+    )
+    assert f"-db {anib.get_blastdb_paths(recorded).dbpath} " in joblist[3].blastcmd
+
+
+def test_update_comparison_results(tmp_path, pyani_session):
+    """Parse blastn output, and record results and store entries for the run."""
+    run = pyani_orm.add_run(pyani_session, "ANIb", "", None, "started", "test")
+    genomes = []
+    for idx in range(2):
+        genomes.append(
+            Genome(
+                genome_hash=f"hash{idx}",
+                path=f"file{idx}.fna",
+                length=4000,
+                description=f"genome {idx}",
+            )
+        )
+        genomes[-1].runs.append(run)
+    pyani_session.commit()
+
+    # The second hit for frag00001 is not the best, and frag00002's only
+    # hit covers too little of the fragment
+    hits = [
+        "frag00001\tseq1\t1000\t8\t99.0\t990\t1020\t4000\t1\t1000\t1\t1000"
+        "\t990\t99.0\t2",
+        "frag00001\tseq1\t500\t50\t90.0\t450\t1020\t4000\t1\t500\t1\t500"
+        "\t450\t90.0\t0",
+        "frag00002\tseq1\t100\t0\t100.0\t100\t1020\t4000\t1\t100\t1\t100"
+        "\t100\t100.0\t0",
+    ]
+    outfiles = [
+        tmp_path / "file0_vs_file1.blast_tab",
+        tmp_path / "file1_vs_file0.blast_tab",
+    ]
+    outfiles[0].write_text("\n".join(hits) + "\n")
+    outfiles[1].touch()  # no hits
+    joblist = [
+        ComparisonJob(genomes[0], genomes[1], "", outfiles[0], None),
+        ComparisonJob(genomes[1], genomes[0], "", outfiles[1], None),
+    ]
+    args = Namespace(workers=2, disable_tqdm=True, fragsize=1020)
+    update_comparison_results(joblist, run, pyani_session, "test", args)
+
+    comparisons = {(_.query_id, _.subject_id): _ for _ in run.comparisons.all()}
+    cmp = comparisons[(genomes[0].genome_id, genomes[1].genome_id)]
+    assert (cmp.aln_length, cmp.sim_errs) == (998, 10)
+    assert cmp.identity == pytest.approx(0.99)
+    assert cmp.cov_query == pytest.approx(998 / 4000)
+    assert (cmp.program, cmp.version, cmp.fragsize) == ("blastn", "test", 1020)
+    cmp = comparisons[(genomes[1].genome_id, genomes[0].genome_id)]
+    assert (cmp.aln_length, cmp.sim_errs, cmp.identity) == (0, 0, 0)
+
+    # Store entries used by the run are recorded in the BlastDB table
+    entry = tmp_path / "store" / "hash0_1020"
+    entry.mkdir(parents=True)
+    np.save(anib.get_blastdb_paths(entry).lengthpath, np.array([1020, 17]))
+    update_blastdbs(
+        {"hash0": BlastDBJob(genomes[0], entry, "blastdb_wrapper.py", None)},
+        run,
+        pyani_session,
+    )
+    blastdb = genomes[0].blastdbs.one()
+    assert (blastdb.run, blastdb.dbpath) == (run, str(entry / "genome"))
+    assert json.loads(blastdb.fragsizes) == [1020, 17]
+
+
 # Test output file parsing for ANIb methods
 def test_parse_legacy_blastdir(anib_output_dir):
     """Parses directory of legacy BLAST output."""
@@ -359,3 +633,247 @@ def test_parse_legacy_blasttab(anib_output):
     assert (
         a == b for a, b in zip(result, [1_966_922, 406_104, 78.578_978_313_253_018])
     )
+
+
+# Synthetic BLAST+ hits: (qseqid, alnlen, mismatch, pid, qlen, gaps). The
+# first hit for frag00001 is its best; the first hit for frag00002 fails the
+# coverage filter, so its second hit is used.
+BLASTN_HITS = [
+    ("frag00001", 1000, 5, 99.5, 1020, 2),
+    ("frag00001", 900, 50, 94.0, 1020, 5),
+    ("frag00002", 500, 0, 100.0, 1020, 2),
+    ("frag00002", 800, 10, 98.0, 1020, 0),
+    ("frag00003", 1010, 800, 20.0, 1020, 0),
+]
+
+
+def write_blastn_hits(path: Path, hits: List) -> Path:
+    """Write synthetic hits as BLAST+ tabular output, as requested by ANIb."""
+    with path.open("w") as ofh:
+        for qseqid, alnlen, mismatch, pid, qlen, gaps in hits:
+            fields = [qseqid, "s1", alnlen, mismatch, pid, 0, qlen, 5000]
+            fields.extend([1, alnlen, 1, alnlen, 0, 0, gaps])
+            ofh.write("\t".join(str(_) for _ in fields) + "\n")
+    return path
+
+
+def test_parse_blasttab_synthetic(tmp_path):
+    """Parse filtered best hits from synthetic BLAST+ .blast_tab output."""
+    tabfile = write_blastn_hits(tmp_path / "q_vs_s.blast_tab", BLASTN_HITS)
+    result = anib.parse_blast_tab(tabfile, {}, mode="ANIb")
+    assert result == (998 + 800, 5 + 2 + 10, pytest.approx((99.5 + 98.0) / 2))
+    assert [type(_) for _ in result] == [int, int, float]
+    assert not tabfile.with_suffix(".blast_tab.dataframe").exists()
+
+    # Best hits are optionally written alongside the output
+    anib.parse_blast_tab(tabfile, {}, mode="ANIb", write_dataframe=True)
+    data = pd.read_csv(
+        tabfile.with_suffix(".blast_tab.dataframe"), sep="\t", index_col=0
+    )
+    assert list(data.index) == ["frag00001", "frag00002"]
+    assert list(data["ani_alnlen"]) == [998, 800]
+
+
+def test_parse_legacy_blasttab_synthetic(tmp_path):
+    """Parse synthetic blastall .blast_tab output, using fragment lengths."""
+    tabfile = tmp_path / "q_vs_s.blast_tab"
+    with tabfile.open("w") as ofh:
+        for qseqid, alnlen, mismatch, pid, _, gaps in BLASTN_HITS:
+            fields = [qseqid, "s1", pid, alnlen, mismatch, gaps, 1, alnlen]
+            fields.extend([1, alnlen, 0, 0])
+            ofh.write("\t".join(str(_) for _ in fields) + "\n")
+    result = anib.parse_blast_tab(
+        tabfile, {"q": np.array([1020, 1020, 1020])}, mode="ANIblastall"
+    )
+    assert result == (998 + 800, 5 + 2 + 10, pytest.approx((99.5 + 98.0) / 2))
+
+
+def test_parse_blasttab_empty(tmp_path):
+    """Parse empty BLAST+ .blast_tab output, with no hits."""
+    tabfile = tmp_path / "q_vs_s.blast_tab"
+    tabfile.touch()
+    assert anib.parse_blast_tab(tabfile, {}, mode="ANIb") == (0, 0, 0.0)
+
+
+def test_process_blast_workers(tmp_path):
+    """Parse a directory of BLAST+ output with a pool of worker processes."""
+    write_blastn_hits(tmp_path / "q_vs_s.blast_tab", BLASTN_HITS)
+    write_blastn_hits(tmp_path / "s_vs_q.blast_tab", BLASTN_HITS[:1])
+    write_blastn_hits(tmp_path / "q_vs_other.blast_tab", BLASTN_HITS)
+    result = anib.process_blast(tmp_path, {"q": 4000, "s": 2000}, {}, workers=2)
+    assert result.alignment_lengths.loc["q", "s"] == 1798
+    assert result.alignment_lengths.loc["s", "q"] == 998
+    assert result.similarity_errors.loc["q", "s"] == 17
+    assert result.percentage_identity.loc["q", "s"] == pytest.approx(0.9875)
+    assert result.alignment_coverage.loc["q", "s"] == pytest.approx(1798 / 4000)
+
+
+def test_summarise_blast_tab(tmp_path):
+    """Summarise BLAST+ output a line at a time, as parse_blast_tab() does."""
+    tabfile = write_blastn_hits(tmp_path / "q_vs_s.blast_tab", BLASTN_HITS)
+    archive = io.BytesIO()
+    with tabfile.open("rb") as ifh:
+        result = anib.summarise_blast_tab(ifh, archive)
+    assert result == anib.parse_blast_tab(tabfile, {}, mode="ANIb")
+    assert archive.getvalue() == tabfile.read_bytes()
+    assert anib.summarise_blast_tab([]) == (0, 0, 0.0)
+
+
+def test_summarise_blastn_comparison(tmp_path):
+    """Stream blastn output into ANIb results, with an optional archive."""
+    tabfile = write_blastn_hits(tmp_path / "hits.txt", BLASTN_HITS)
+    blastn = tmp_path / "blastn"
+    blastn.write_text(f'#!/bin/sh\ncat "{tabfile}"\n')
+    blastn.chmod(0o755)
+    archive = tmp_path / "q_vs_s.blast_tab.gz"
+    result = anib.summarise_blastn_comparison(
+        Path("q-fragments.fna"), Path("s"), blastn, archive
+    )
+    assert result == (1798, 17, pytest.approx(98.75))
+    assert anib.parse_blast_tab(archive, {}, mode="ANIb") == result
+
+    # A failed blastn run raises an error
+    blastn.write_text("#!/bin/sh\necho failed >&2\nexit 2\n")
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        anib.summarise_blastn_comparison(Path("q.fna"), Path("s"), blastn)
+    assert excinfo.value.stderr == b"failed\n"
+
+
+def write_fake_makeblastdb(tmp_path: Path) -> Path:
+    """Return path to a makeblastdb stand-in, writing only an .nsq file."""
+    makeblastdb = tmp_path / "makeblastdb"
+    makeblastdb.write_text(
+        '#!/bin/sh\nwhile [ "$1" != "-out" ]; do shift; done\ntouch "$2.nsq"\n'
+    )
+    makeblastdb.chmod(0o755)
+    return makeblastdb
+
+
+# Test the combined multi-genome BLAST database
+def test_build_combined_blastdb(path_fna_all, tmp_path):
+    """Build a single database of several genomes, naming sequences by genome."""
+    makeblastdb = write_fake_makeblastdb(tmp_path)
+    genomes = {f"hash{_}": path_fna_all[_] for _ in range(2)}
+    entry = anib.get_combined_blastdb_entry(tmp_path / "store", genomes, "v")
+    assert entry == anib.get_combined_blastdb_entry(
+        tmp_path / "store", ["hash1", "hash0"], "v"
+    )
+    nseqs = anib.build_combined_blastdb(genomes, entry, makeblastdb)
+    assert anib.get_blastdb_marker(entry).read_text() == f"{nseqs}\n"
+    dbpath = anib.get_combined_blastdb_path(entry)
+    assert Path(str(dbpath) + ".nsq").is_file()
+
+    records = list(SeqIO.parse(dbpath.with_suffix(".fna"), "fasta"))
+    expected = [
+        (f"lcl|hash{idx}_{num}", record)
+        for idx in range(2)
+        for num, record in enumerate(SeqIO.parse(path_fna_all[idx], "fasta"), 1)
+    ]
+    assert len(records) == len(expected) == nseqs
+    for record, (seqid, original) in zip(records, expected):
+        assert record.id == seqid
+        assert record.description == f"{seqid} {original.description}"
+        assert record.seq == original.seq
+    assert {anib.get_combined_subject(_.id) for _ in records} == set(genomes)
+    assert anib.get_combined_subject("hash0_12") == "hash0"
+
+    # A complete entry is not built again
+    assert anib.build_combined_blastdb(genomes, entry, Path("false")) == nseqs
+
+
+def write_combined_hits(path: Path, hits: Dict) -> Path:
+    """Write synthetic hits to several subjects as BLAST+ tabular output."""
+    with path.open("w") as ofh:
+        for sseqid, (qseqid, alnlen, mismatch, pid, qlen, gaps) in hits:
+            fields = [qseqid, sseqid, alnlen, mismatch, pid, 0, qlen, 5000]
+            fields.extend([1, alnlen, 1, alnlen, 0, 0, gaps])
+            ofh.write("\t".join(str(_) for _ in fields) + "\n")
+    return path
+
+
+def test_parse_combined_blast_tab(tmp_path):
+    """Split hits against a combined database into per-genome results."""
+    # Hits to each genome are interleaved, and may be to several sequences
+    hits = []
+    for idx, hit in enumerate(BLASTN_HITS):
+        hits.append((f"lcl|hashA_{idx}", hit))
+        hits.append((f"hashB_{idx}", hit))
+    hits.append(("hashC_1", BLASTN_HITS[2]))  # no qualifying hit
+    tabfile = write_combined_hits(tmp_path / "q_vs_combined.blast_tab", hits)
+    expected = anib.parse_blast_tab(
+        write_blastn_hits(tmp_path / "q_vs_s.blast_tab", BLASTN_HITS), {}
+    )
+    result = anib.parse_combined_blast_tab(tabfile)
+    assert result == {"hashA": expected, "hashB": expected}
+    assert [type(_) for _ in result["hashA"]] == [int, int, float]
+
+    tabfile.write_text("")
+    assert anib.parse_combined_blast_tab(tabfile) == {}
+
+
+def test_generate_combined_joblist(path_fna_all, tmp_path):
+    """blastn jobs query each genome once against a combined database."""
+    version = "Linux_2.9.0+"
+    store = tmp_path / "store"
+    paths = path_fna_all[:2] + [tmp_path / "copy.fna"]
+    paths[2].write_bytes(paths[0].read_bytes())
+    genomes = [
+        Genome(genome_id=_, genome_hash=f"hash{_}", path=str(paths[_]))
+        for _ in range(3)
+    ]
+    args = Namespace(
+        outdir=tmp_path,
+        dbpath=tmp_path / "pyanidb",
+        blastdb_dir=store,
+        blastn_exe="blastn",
+        format_exe=write_fake_makeblastdb(tmp_path),
+        fragsize=1020,
+        recovery=False,
+        jobprefix="test",
+        disable_tqdm=True,
+        workers=None,
+        threads=1,
+    )
+    comparisons = [(genomes[0], genomes[1]), (genomes[1], genomes[0])]
+    comparisons += [(genomes[0], genomes[2])]
+
+    dbjobs = {}
+    joblist = generate_combined_joblist(
+        comparisons, genomes, [], dbjobs, version, args
+    )
+    entry = anib.get_combined_blastdb_entry(
+        store, ["hash0", "hash1", "hash2"], version
+    )
+    nseqs = int(anib.get_blastdb_marker(entry).read_text())
+    assert joblist[0].job is joblist[2].job
+    assert len({_.job.name for _ in joblist}) == 2
+    stems = [_.stem for _ in paths]
+    assert [_.outfile.name for _ in joblist] == [
+        f"{stems[_]}_vs_{stems[__]}.blast_tab" for _, __ in ((0, 1), (1, 0), (0, 2))
+    ]
+    outdir = tmp_path / "blastn_output"
+    assert joblist[0].job.command.split()[2] == str(
+        outdir / f"{stems[0]}_vs_combined.blast_tab"
+    )
+    assert f"-db {anib.get_combined_blastdb_path(entry)} " in joblist[0].blastcmd
+    assert f"-max_target_seqs {nseqs} " in joblist[0].blastcmd
+    # Only query genomes need store entries for their fragments
+    assert sorted(dbjobs) == ["hash0", "hash1"]
+    assert joblist[0].job.dependencies == [dbjobs["hash0"].job]
+
+    # Output is split into the results of each comparison
+    outdir.mkdir()
+    write_combined_hits(
+        outdir / f"{stems[0]}_vs_combined.blast_tab",
+        [(f"hash{_}_1", hit) for _ in range(3) for hit in BLASTN_HITS],
+    )
+    write_combined_hits(
+        outdir / f"{stems[1]}_vs_combined.blast_tab", [("hash1_1", BLASTN_HITS[0])]
+    )
+    results = collect_combined_results(joblist, args)
+    expected = (1798, 17, pytest.approx(98.75))
+    assert results == {
+        joblist[0].outfile: expected,
+        joblist[1].outfile: (0, 0, 0.0),
+        joblist[2].outfile: expected,
+    }
@@ -44,17 +44,29 @@ These tests are intended to be run from the repository root using:
 pytest -v
 """
 
+import gzip
 import os
+import subprocess
 
+from argparse import Namespace
+from itertools import combinations
 from pathlib import Path
 from typing import List, NamedTuple, Tuple
 
+import numpy as np
 import pandas as pd
 import pytest
 
 from pandas.util.testing import assert_frame_equal
 
-from pyani import anim, pyani_files, pyani_tools
+from pyani import anim, nucmer, pyani_config, pyani_files, pyani_orm, pyani_tools
+from pyani.pyani_orm import Comparison, Genome
+from pyani.scripts.subcommands.subcmd_anim import (
+    ComparisonJob,
+    generate_joblist,
+    get_nucmer_threads,
+    update_comparison_results,
+)
 
 
 class DeltaDir(NamedTuple):
@@ -165,6 +177,49 @@ def test_deltafile_parsing(deltafile_parsed):
     assert result == deltafile_parsed.data
 
 
+def test_deltafile_parsing_compressed(deltafile_parsed, tmp_path):
+    """Check parsing of gzip-compressed NUCmer .delta/.filter file."""
+    gzfname = tmp_path / "test.delta.gz"
+    with gzip.open(gzfname, "wb") as ofh:
+        ofh.write(deltafile_parsed.filename.read_bytes())
+    result = anim.parse_delta(gzfname)
+    assert result == deltafile_parsed.data
+
+
+def test_merge_intervals():
+    """Merge overlapping and adjacent intervals on each sequence."""
+    seqids, starts, ends = nucmer.merge_intervals(
+        np.array([1, 0, 0, 0, 1, 0]),
+        np.array([5, 50, 1, 101, 1, 10]),
+        np.array([9, 100, 20, 120, 3, 15]),
+    )
+    assert seqids.tolist() == [0, 0, 1, 1]
+    assert starts.tolist() == [1, 50, 1, 5]
+    assert ends.tolist() == [20, 120, 3, 9]
+
+
+def test_deltafile_coverage(deltafile_parsed):
+    """Count covered bases in a .delta file, in the same pass as summation."""
+    aln_length, sim_errs, refcov, qrycov = anim.parse_delta_coverage(
+        deltafile_parsed.filename
+    )
+    assert (aln_length, sim_errs) == deltafile_parsed.data
+    assert 0 < refcov <= aln_length
+    assert 0 < qrycov <= aln_length
+
+
+def test_delta_coverage_overlaps(tmp_path):
+    """Count bases in overlapping alignments once, on both genomes."""
+    deltafile = tmp_path / "overlaps.delta"
+    deltafile.write_text(
+        "ref.fna qry.fna\nNUCMER\n"
+        ">r1 q1 1000 1000\n1 100 1 100 0 0 0\n0\n50 150 200 100 1 1 0\n-3\n0\n"
+        ">r2 q1 500 1000\n10 20 300 310 0 0 0\n0\n"
+        ">r1 q2 1000 50\n140 160 5 25 0 0 0\n0\n"
+    )
+    assert anim.parse_delta_coverage(deltafile) == (234, 1, 171, 232)
+
+
 # Test MUMmer command generation
 def test_maxmatch_single(tmp_path, path_file_two):
     """Generate NUCmer command line with maxmatch."""
@@ -212,6 +267,124 @@ def test_mummer_single(tmp_path, path_file_two):
     assert cmds == expected
 
 
+def test_mummer_single_native_filter(tmp_path, path_file_two):
+    """Generate single wrapped NUCmer command-line, with in-process filtering."""
+    cmds = anim.construct_nucmer_cmdline(
+        path_file_two[0], path_file_two[1], outdir=tmp_path, native_filter=True
+    )
+    dir_nucmer = tmp_path / "nucmer_output"
+    expected = (
+        (
+            "nucmer_filter_wrapper.py nucmer --mum -p "
+            f"{dir_nucmer / str(path_file_two[0].stem + '_vs_' + path_file_two[1].stem)} "
+            f"{path_file_two[0]} {path_file_two[1]}"
+        ),
+        None,
+    )
+    assert cmds == expected
+
+
+def test_mummer_single_compress(tmp_path, path_file_two):
+    """Generate single NUCmer/delta-filter command-line, with compressed output."""
+    _, fcmd = anim.construct_nucmer_cmdline(
+        path_file_two[0], path_file_two[1], outdir=tmp_path, compress=True
+    )
+    stem = f"{path_file_two[0].stem}_vs_{path_file_two[1].stem}"
+    outprefix = str(tmp_path / "nucmer_output" / stem)
+    assert fcmd == (
+        f"delta_filter_wrapper.py delta-filter -1 {outprefix}.delta "
+        f"{outprefix}.filter.gz"
+    )
+
+
+def test_mummer_single_threads(tmp_path, path_file_two):
+    """Generate single NUCmer command-line using several threads."""
+    ncmd, _ = anim.construct_nucmer_cmdline(
+        path_file_two[0], path_file_two[1], outdir=tmp_path, threads=8
+    )
+    stem = f"{path_file_two[0].stem}_vs_{path_file_two[1].stem}"
+    outprefix = tmp_path / "nucmer_output" / stem
+    assert ncmd == (
+        f"nucmer --mum --threads 8 -p {outprefix} {path_file_two[0]} "
+        f"{path_file_two[1]}"
+    )
+
+
+@pytest.mark.parametrize(
+    "stdout,stderr,version,mummer4",
+    [
+        (b"", b"NUCmer (NUCleotide MUMmer) version 3.1\n", "3.1", False),
+        (b"4.0.0rc1\n", b"", "4.0.0rc1", True),
+        (b"4.0.0beta2\n", b"", "4.0.0beta2", True),
+    ],
+)
+def test_get_version(monkeypatch, stdout, stderr, version, mummer4):
+    """Identify MUMmer3 and MUMmer4 NUCmer versions."""
+
+    def mock_run(cmdline, **kwargs):
+        return subprocess.CompletedProcess(cmdline, 0, stdout, stderr)
+
+    monkeypatch.setattr(anim.subprocess, "run", mock_run)
+    nucmer_version = anim.get_version(Path("nucmer"))
+    assert nucmer_version.split("_", 1)[1] == version
+    assert anim.is_mummer4(nucmer_version) is mummer4
+
+
+@pytest.mark.parametrize(
+    "threads,scheduler,expected",
+    [
+        (1, "multiprocessing", [1, 1, 1]),
+        (4, "multiprocessing", [1, 3, 4]),
+        (0, "multiprocessing", [1, 3, 8]),
+        (4, "SGE", [4, 4, 4]),
+        (0, "SGE", [1, 1, 1]),
+    ],
+)
+def test_get_nucmer_threads(threads, scheduler, expected):
+    """Share a budget of cores between NUCmer jobs, by job size."""
+    genomes = [
+        Genome(genome_id=_, path=f"file{_}.fna", length=length)
+        for _, length in enumerate((0, 1, 3, 5))
+    ]
+    comparisons = [(genomes[0], genomes[1]), (genomes[0], genomes[2])]
+    comparisons += [(genomes[2], genomes[3])]
+    args = Namespace(threads=threads, scheduler=scheduler, workers=12)
+    threads = get_nucmer_threads(comparisons, args)
+    assert [threads[(_.path, __.path)] for _, __ in comparisons] == expected
+
+
+def test_mummer_single_index(tmp_path, path_file_two):
+    """Generate single NUCmer command-line loading a saved reference index."""
+    ncmd, _ = anim.construct_nucmer_cmdline(
+        path_file_two[0], path_file_two[1], outdir=tmp_path, index=tmp_path / "idx"
+    )
+    assert ncmd.startswith(f"nucmer --mum --load {tmp_path / 'idx'} -p ")
+
+
+def test_build_nucmer_index(tmp_path, monkeypatch):
+    """Save a NUCmer index under its prefix, marking it complete, only once."""
+    calls = []
+
+    def mock_run(cmdline, **kwargs):
+        calls.append(cmdline)
+        for suffix in (".sa", ".aux"):
+            Path(cmdline[2] + suffix).touch()
+        return subprocess.CompletedProcess(cmdline, 0, b"", b"")
+
+    monkeypatch.setattr(anim.subprocess, "run", mock_run)
+    index = tmp_path / "indices" / "genomehash"
+    for _ in range(2):
+        marker = anim.build_nucmer_index(Path("ref.fna"), index)
+    assert len(calls) == 1
+    assert calls[0][:2] == ["nucmer", "--save"]
+    assert marker == anim.get_index_marker(index)
+    assert sorted(_.name for _ in index.parent.iterdir()) == [
+        "genomehash.aux",
+        "genomehash.complete",
+        "genomehash.sa",
+    ]
+
+
 def test_mummer_job_generation(mummer_cmds_four):
     """Generate dependency tree of NUCmer/delta-filter jobs.
 
@@ -224,3 +397,365 @@ def test_mummer_job_generation(mummer_cmds_four):
         assert job.name == "test_%06d-f" % idx  # filter job name
         assert len(job.dependencies) == 1  # has NUCmer job
         assert job.dependencies[0].name == "test_%06d-n" % idx
+
+
+def test_mummer_job_generation_native_filter(mummer_cmds_four):
+    """Generate a single NUCmer job per comparison, with in-process filtering."""
+    joblist = anim.generate_nucmer_jobs(
+        mummer_cmds_four.infiles, jobprefix="test", native_filter=True
+    )
+    assert len(joblist) == 6
+
+    for idx, job in enumerate(joblist):
+        assert job.name == "test_%06d-n" % idx  # NUCmer job name
+        assert job.dependencies == []
+        assert job.command == (
+            f"nucmer_filter_wrapper.py {mummer_cmds_four.ncmds[idx]}"
+        )
+
+
+@pytest.mark.skip_if_exe_missing("nucmer")
+@pytest.mark.parametrize("native_filter", [False, True])
+def test_summarise_nucmer_comparison(path_fna_two, tmp_path, native_filter):
+    """Stream NUCmer output into alignment length and similarity errors."""
+    archive = tmp_path / "streamed.filter.gz"
+    result = anim.summarise_nucmer_comparison(
+        path_fna_two[0], path_fna_two[1], archive=archive, native_filter=native_filter
+    )
+    assert not list(tmp_path.glob("*.delta"))  # no raw output persisted
+
+    filtered = tmp_path / "streamed.filter"
+    filtered.write_bytes(gzip.decompress(archive.read_bytes()))
+    assert result == anim.parse_delta(filtered)
+
+    # Filtered result should be that from conventional NUCmer and delta-filter
+    # output, as both are stored under the same NUCmer version
+    ncmd, _ = anim.construct_nucmer_cmdline(
+        path_fna_two[0], path_fna_two[1], outdir=tmp_path
+    )
+    (tmp_path / "nucmer_output").mkdir()
+    subprocess.run(ncmd, shell=True, check=True)
+    outprefix = ncmd.split()[3]
+    with Path(outprefix + ".filter").open("wb") as ofh:
+        subprocess.run(
+            ["delta-filter", "-1", outprefix + ".delta"], stdout=ofh, check=True
+        )
+    assert result == anim.parse_delta(Path(outprefix + ".filter"))
+
+
+def test_mummer_batch_commands(tmp_path, path_file_four, mummer_cmds_four):
+    """Generate batched NUCmer commands, and delta-filter commands per pair."""
+    ncmds, fcmds = anim.generate_nucmer_commands(
+        path_file_four, maxmatch=True, batchsize=2
+    )
+    assert ncmds == [
+        "nucmer_batch_wrapper.py --maxmatch --nucmer_exe nucmer --outdir . "
+        "file1.fna file2.fna file3.fna",
+        "nucmer_batch_wrapper.py --maxmatch --nucmer_exe nucmer --outdir . "
+        "file1.fna file4.fna",
+        "nucmer_batch_wrapper.py --maxmatch --nucmer_exe nucmer --outdir . "
+        "file2.fna file3.fna file4.fna",
+        "nucmer_batch_wrapper.py --maxmatch --nucmer_exe nucmer --outdir . "
+        "file3.fna file4.fna",
+    ]
+    assert [cmd for batch in fcmds for cmd in batch] == mummer_cmds_four.fcmds
+
+
+def test_mummer_batch_job_generation(mummer_cmds_four):
+    """Generate delta-filter jobs for each pair, depending on batch NUCmer jobs."""
+    joblist = anim.generate_nucmer_jobs(
+        mummer_cmds_four.infiles, jobprefix="test", maxmatch=True, batchsize=3
+    )
+    assert [_.command for _ in joblist] == mummer_cmds_four.fcmds
+    assert [_.dependencies[0].name for _ in joblist] == [
+        "test_000000-n",
+        "test_000000-n",
+        "test_000000-n",
+        "test_000001-n",
+        "test_000001-n",
+        "test_000002-n",
+    ]
+
+
+def test_mummer_batch_requires_maxmatch(tmp_path, path_file_four):
+    """Batched NUCmer commands and runs are refused without maxmatch."""
+    with pytest.raises(anim.PyaniANImException):
+        anim.generate_nucmer_commands(path_file_four, batchsize=2)
+    with pytest.raises(anim.PyaniANImException):
+        anim.construct_nucmer_batch_cmdline(path_file_four[0], path_file_four[1:])
+    with pytest.raises(anim.PyaniANImException):
+        anim.run_nucmer_batch(path_file_four[0], path_file_four[1:], tmp_path)
+
+
+def test_write_query_batch(dir_seq, tmp_path):
+    """Concatenate query FASTA files, tagging sequence IDs by file."""
+    queries = sorted(dir_seq.glob("*.fna"))[:2]
+    batch = anim.write_query_batch(queries, tmp_path / "batch.fna")
+    headers = [_ for _ in batch.open() if _.startswith(">")]
+    expected = [
+        f">pyani{idx}:{line[1:]}"
+        for idx, query in enumerate(queries)
+        for line in query.open()
+        if line.startswith(">")
+    ]
+    assert headers == expected
+
+
+@pytest.mark.skip_if_exe_missing("nucmer")
+def test_run_nucmer_batch(path_fna_two, dir_seq, tmp_path):
+    """Batched NUCmer output matches pairwise NUCmer output with --maxmatch."""
+    reference, queries = path_fna_two[0], sorted(dir_seq.glob("*.fna"))[1:4]
+    (tmp_path / "batch" / "nucmer_output").mkdir(parents=True)
+    outfnames = anim.run_nucmer_batch(
+        reference, queries, tmp_path / "batch", maxmatch=True, native_filter=True
+    )
+
+    (tmp_path / "pairs" / "nucmer_output").mkdir(parents=True)
+    for query, outfname in zip(queries, outfnames):
+        ncmd, _ = anim.construct_nucmer_cmdline(
+            reference, query, tmp_path / "pairs", maxmatch=True
+        )
+        subprocess.run(ncmd, shell=True, check=True)
+        outprefix = ncmd.split()[3]
+        pairfname = nucmer.filter_delta(
+            Path(outprefix + ".delta"), Path(outprefix + ".filter")
+        )
+        assert anim.parse_delta(outfname) == anim.parse_delta(pairfname)
+
+
+def test_write_query_chunks(tmp_path):
+    """Split a query into chunks of whole sequences, balanced by length."""
+    query = tmp_path / "query.fna"
+    lengths = [100, 60, 50, 40, 30]
+    with query.open("w") as ofh:
+        for idx, length in enumerate(lengths):
+            ofh.write(f">seq{idx} description\n" + "ACGTACGTAC\n" * (length // 10))
+
+    chunks = anim.write_query_chunks(query, tmp_path / "chunks", 100)
+    assert [_.name for _ in chunks] == [f"query_chunk{_:03d}.fna" for _ in range(3)]
+    contents = [anim.get_sequence_lengths(_) for _ in chunks]
+    assert contents == [
+        [(b"seq0", 100)],
+        [(b"seq1", 60), (b"seq4", 30)],
+        [(b"seq2", 50), (b"seq3", 40)],
+    ]
+
+    # Queries within the chunk size, or with a single sequence, are not split
+    assert anim.write_query_chunks(query, tmp_path / "chunks", 280) == []
+    assert anim.write_query_chunks(chunks[0], tmp_path / "chunks", 10) == []
+
+
+@pytest.mark.skip_if_exe_missing("nucmer")
+def test_run_nucmer_split(dir_seq, tmp_path):
+    """NUCmer output merged from query chunks matches unsplit NUCmer output."""
+    reference, query = dir_seq / "NC_011916.fna", dir_seq / "NC_002696.fna"
+    for outdir in ("whole", "split"):
+        (tmp_path / outdir / "nucmer_output").mkdir(parents=True)
+    ncmd, _ = anim.construct_nucmer_cmdline(
+        reference, query, tmp_path / "whole", maxmatch=True
+    )
+    subprocess.run(ncmd, shell=True, check=True)
+    outprefix = ncmd.split()[3]
+    nucmer.filter_delta(Path(outprefix + ".delta"), Path(outprefix + ".filter"))
+
+    chunks = anim.write_query_chunks(query, tmp_path / "chunks", 1000000)
+    assert len(chunks) == 2
+    ncmds, mcmd = anim.construct_nucmer_split_cmdlines(
+        reference, query, chunks, tmp_path / "split", maxmatch=True, native_filter=True
+    )
+    assert mcmd.startswith("nucmer_merge_wrapper.py --native_filter")
+    for cmd in ncmds:
+        subprocess.run(cmd, shell=True, check=True)
+    filterfname = anim.merge_nucmer_chunks(
+        reference, query, chunks, tmp_path / "split", native_filter=True
+    )
+
+    assert sorted(_.name for _ in filterfname.parent.iterdir()) == [
+        f"{reference.stem}_vs_{query.stem}{_}" for _ in (".delta", ".filter")
+    ]
+    for suffix in (".delta", ".filter"):
+        assert (
+            Path(str(filterfname.parent / filterfname.stem) + suffix).read_text()
+            == Path(outprefix + suffix).read_text()
+        )
+
+
+def test_nucmer_split_requires_maxmatch(dir_seq):
+    """Split NUCmer commands are refused without maxmatch."""
+    with pytest.raises(anim.PyaniANImException):
+        anim.construct_nucmer_split_cmdlines(
+            dir_seq / "NC_011916.fna", dir_seq / "NC_002696.fna", []
+        )
+
+
+def test_generate_joblist_split(tmp_path, dir_seq):
+    """Comparisons with a large NUCmer query run as a job per query chunk."""
+    genomes = [
+        Genome(genome_id=idx, path=str(dir_seq / f"{stem}.fna"))
+        for idx, stem in enumerate(("NC_011916", "NC_002696"))
+    ]
+    args = Namespace(
+        outdir=tmp_path,
+        nucmer_exe="nucmer",
+        filter_exe="delta-filter",
+        maxmatch=True,
+        nofilter=False,
+        native_filter=False,
+        compress=False,
+        streaming=False,
+        recovery=False,
+        batchsize=0,
+        split_size=1000000,
+        reuse_index=False,
+        threads=1,
+        jobprefix="test",
+        disable_tqdm=True,
+    )
+    joblist = generate_joblist(
+        [(genomes[0], genomes[1]), (genomes[1], genomes[0])], [], args
+    )
+
+    # Only the multi-sequence genome is split
+    assert [_.job.name for _ in joblist] == ["test_000000-m", "test_000001-f"]
+    assert joblist[0].job.command.startswith(
+        "nucmer_merge_wrapper.py --filter_exe delta-filter"
+    )
+    assert [_.name for _ in joblist[0].job.dependencies] == [
+        "test_000000_000000-n",
+        "test_000000_000001-n",
+    ]
+    chunkdir = tmp_path / "nucmer_output" / "query_chunks"
+    assert sorted(_.name for _ in chunkdir.iterdir()) == [
+        "NC_002696_chunk000.fna",
+        "NC_002696_chunk001.fna",
+    ]
+
+
+def test_generate_joblist_index(tmp_path, path_file_four):
+    """NUCmer jobs depend on one job saving each reference genome's index."""
+    genomes = [
+        Genome(genome_id=_, genome_hash=f"hash{_}", path=str(path_file_four[_]))
+        for _ in range(3)
+    ]
+    args = Namespace(
+        outdir=tmp_path,
+        nucmer_exe="nucmer",
+        filter_exe="delta-filter",
+        maxmatch=False,
+        nofilter=False,
+        native_filter=True,
+        compress=False,
+        streaming=False,
+        recovery=False,
+        batchsize=0,
+        split_size=0,
+        threads=1,
+        reuse_index=True,
+        cache_dir=tmp_path / "cache",
+        jobprefix="test",
+        disable_tqdm=True,
+    )
+    # The index of the third genome was saved by an earlier run
+    indexdir = tmp_path / "cache" / "nucmer_index"
+    indexdir.mkdir(parents=True)
+    (indexdir / "hash2.complete").touch()
+    comparisons = [(genomes[0], genomes[1]), (genomes[0], genomes[2])]
+    comparisons += [(genomes[1], genomes[2]), (genomes[2], genomes[0])]
+
+    joblist = generate_joblist(comparisons, [], args)
+    for job in joblist:
+        assert f"--load {indexdir / job.query.genome_hash} " in job.job.command
+    dependencies = [_.job.dependencies for _ in joblist]
+    assert [len(_) for _ in dependencies] == [1, 1, 1, 0]
+    assert dependencies[0][0] is dependencies[1][0]
+    assert [_[0].command for _ in dependencies[1:3]] == [
+        f"nucmer_index_wrapper.py --nucmer_exe nucmer {genomes[_].path} "
+        f"{indexdir}/hash{_}"
+        for _ in range(2)
+    ]
+
+
+def test_update_comparison_results(dir_anim_in, pyani_session, monkeypatch):
+    """Parse .filter files in a worker pool, and add the results in chunks."""
+    monkeypatch.setattr(pyani_config, "INSERT_CHUNKSIZE", 2)
+    run = pyani_orm.add_run(pyani_session, "ANIm", "", None, "started", "test")
+    genomes = {}
+    for stem in ("NC_002696", "NC_010338", "NC_011916", "NC_014100"):
+        genomes[stem] = Genome(
+            genome_hash=stem, path=f"{stem}.fna", length=4000000, description=stem
+        )
+        genomes[stem].runs.append(run)
+    pyani_session.commit()
+    joblist = [
+        ComparisonJob(
+            genomes[fname.stem.split("_vs_")[0]],
+            genomes[fname.stem.split("_vs_")[1]],
+            None,
+            "",
+            fname,
+            None,
+        )
+        for fname in sorted((dir_anim_in / "deltadir").glob("*.filter"))
+    ]
+    # A streamed result is used as given, rather than parsed again
+    streamed = {joblist[0].outfile: (1000, 10)}
+    args = Namespace(union_coverage=False, workers=2, disable_tqdm=True, maxmatch=False)
+    results = update_comparison_results(
+        joblist, run, pyani_session, "test", args, streamed
+    )
+
+    expected = {_.outfile: anim.parse_delta(_.outfile) for _ in joblist[1:]}
+    expected.update(streamed)
+    assert results == expected
+    comparisons = run.comparisons.all()
+    assert len(comparisons) == len(joblist)
+    for job in joblist:
+        cmp = [
+            _
+            for _ in comparisons
+            if (_.query_id, _.subject_id)
+            == (job.query.genome_id, job.subject.genome_id)
+        ][0]
+        aln_length, sim_errs = expected[job.outfile]
+        assert (cmp.aln_length, cmp.sim_errs) == (aln_length, sim_errs)
+        assert cmp.identity == pytest.approx(1 - sim_errs / aln_length)
+        assert cmp.cov_query == pytest.approx(aln_length / 4000000)
+
+
+@pytest.mark.parametrize("batchsize", [0, 2])
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("existing_suffix", [".filter", ".filter.gz"])
+def test_generate_joblist_recovery(
+    tmp_path, path_file_four, batchsize, compress, existing_suffix
+):
+    """Recovered output, compressed or not, replaces a job to be run."""
+    genomes = [Genome(genome_id=_, path=str(path_file_four[_])) for _ in range(4)]
+    comparisons = list(combinations(genomes, 2))
+    args = Namespace(
+        outdir=tmp_path,
+        nucmer_exe="nucmer",
+        filter_exe="delta-filter",
+        maxmatch=True,
+        nofilter=False,
+        native_filter=False,
+        compress=compress,
+        streaming=False,
+        recovery=True,
+        batchsize=batchsize,
+        split_size=0,
+        reuse_index=False,
+        threads=1,
+        jobprefix="test",
+        disable_tqdm=True,
+    )
+    deltadir = tmp_path / "nucmer_output"
+    deltadir.mkdir()
+    existing = deltadir / f"file1_vs_file2{existing_suffix}"
+    existing.touch()
+    existingfiles = pyani_files.collect_existing_output(deltadir, "nucmer", args)
+
+    joblist = generate_joblist(comparisons, existingfiles, args)
+    assert len(joblist) == len(comparisons)
+    assert [(_.query, _.subject, _.outfile) for _ in joblist if _.job is None] == [
+        (genomes[0], genomes[1], existing)
+    ]
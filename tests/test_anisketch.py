@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Test anisketch.py module.
+
+These tests are intended to be run from the repository root using:
+
+pytest -v
+"""
+
+import random
+
+from argparse import Namespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyani import anisketch, pyani_orm
+from pyani.download import create_hash
+from pyani.pyani_orm import Comparison, Run
+from pyani.scripts.subcommands import subcmd_anisketch
+
+
+COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+@pytest.fixture
+def sketch_seqs():
+    """Random sequence, and a copy with 1% substitutions."""
+    rng = random.Random(1)
+    seq = "".join(rng.choice("ACGT") for _ in range(200000))
+    mutant = list(seq)
+    for pos in rng.sample(range(len(mutant)), 2000):
+        mutant[pos] = rng.choice("ACGT".replace(mutant[pos], ""))
+    return seq, "".join(mutant)
+
+
+def test_hash_kmers():
+    """hash_kmers() hashes canonical k-mers, skipping ambiguous positions."""
+    seq = "ACGTTGCANNACGGTACCAGTAGGACT"
+    ksize = 5
+    expected = []
+    for idx in range(len(seq) - ksize + 1):
+        kmer = seq[idx : idx + ksize]
+        if "N" in kmer:
+            continue
+        canonical = min(kmer, kmer.translate(COMPLEMENT)[::-1])
+        packed = 0
+        for nt in canonical:
+            packed = (packed << 2) | "ACGT".index(nt)
+        expected.append(packed)
+    expected = anisketch.mix64(np.array(expected, dtype=np.uint64))
+    assert (anisketch.hash_kmers(seq.encode(), ksize) == expected).all()
+    assert (
+        anisketch.hash_kmers(seq.lower().encode(), ksize)
+        == anisketch.hash_kmers(seq.encode(), ksize)
+    ).all()
+
+
+def test_hash_kmers_ksize():
+    """hash_kmers() raises ValueError for k-mers that can't be packed."""
+    with pytest.raises(ValueError):
+        anisketch.hash_kmers(b"ACGT", 32)
+
+
+def test_sketch_chunks(sketch_seqs):
+    """Sketches are the same however sequences are split into chunks."""
+    sketch = anisketch.sketch_sequences([sketch_seqs[0].encode()], scaled=10)
+    chunked = anisketch.sketch_sequences(
+        [sketch_seqs[0].encode()], scaled=10, chunksize=1000
+    )
+    assert (sketch.hashes == chunked.hashes).all()
+
+
+def test_compare_sketches(sketch_seqs):
+    """compare_sketches() estimates ANI close to the true identity."""
+    query, subject = [
+        anisketch.sketch_sequences([_.encode()], scaled=10) for _ in sketch_seqs
+    ]
+    assert anisketch.compare_sketches(query, query).identity == 1.0
+    for estimator in anisketch.ESTIMATORS:
+        result = anisketch.compare_sketches(query, subject, estimator)
+        assert result.identity == pytest.approx(0.99, abs=0.002)
+
+
+def test_compare_sketches_parameters(sketch_seqs):
+    """compare_sketches() raises ValueError for incompatible sketches."""
+    query = anisketch.sketch_sequences([sketch_seqs[0].encode()], scaled=10)
+    subject = anisketch.sketch_sequences([sketch_seqs[1].encode()], scaled=20)
+    with pytest.raises(ValueError):
+        anisketch.compare_sketches(query, subject)
+
+
+def test_sketch_cache(sketch_seqs, tmp_path):
+    """load_or_build_sketch() writes a sketch to the cache, and reuses it."""
+    fpath = tmp_path / "genome.fna"
+    fpath.write_text(f">genome\n{sketch_seqs[0]}\n")
+    sketch = anisketch.load_or_build_sketch(fpath, "abc123", tmp_path, scaled=10)
+    sketchpath = anisketch.get_sketch_path(tmp_path, "abc123", scaled=10)
+    assert sketchpath.is_file()
+
+    # The cached sketch is used, even though the genome file has gone
+    fpath.unlink()
+    cached = anisketch.load_or_build_sketch(fpath, "abc123", tmp_path, scaled=10)
+    assert (sketch.hashes == cached.hashes).all()
+
+
+def test_subcmd_anisketch(sketch_seqs, pyani_session, tmp_path):
+    """ANIsketch runs add comparisons and matrices, and reuse earlier results."""
+    indir = tmp_path / "genomes"
+    indir.mkdir()
+    unrelated = "".join(random.Random(2).choice("ACGT") for _ in range(200000))
+    for idx, seq in enumerate(sketch_seqs + (unrelated,)):
+        fpath = indir / f"genome{idx}.fna"
+        fpath.write_text(f">genome{idx}\n{seq}\n")
+        fpath.with_suffix(".md5").write_text(f"{create_hash(fpath)}\t{fpath}\n")
+    args = Namespace(
+        indir=indir,
+        dbpath=tmp_path / "pyanidb",
+        name=None,
+        classes=None,
+        labels=None,
+        cmdline="ANIsketch test suite",
+        ksize=21,
+        scaled=100,
+        estimator="jaccard",
+        sketchdir=tmp_path / "sketches",
+        workers=None,
+        disable_tqdm=True,
+    )
+    subcmd_anisketch(args)
+    assert len(list(args.sketchdir.glob("*.npy"))) == 3
+    subcmd_anisketch(args)
+
+    comparisons = pyani_session.query(Comparison).all()
+    assert len(comparisons) == 3  # second run reuses the first run's results
+    assert {_.program for _ in comparisons} == {"anisketch"}
+    runs = pyani_session.query(Run).all()
+    assert len(runs) == 2
+    for run in runs:
+        assert run.comparisons.count() == 3
+        identity = pd.read_json(run.df_identity)
+        assert not identity.isnull().values.any()
+        genome_ids = {_.description: _.genome_id for _ in run.genomes}
+        gid0, gid1, gid2 = [genome_ids[f"genome{_}"] for _ in range(3)]
+        assert identity.loc[gid0, gid1] == pytest.approx(0.99, abs=0.005)
+        assert identity.loc[gid0, gid2] < 0.8
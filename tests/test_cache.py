@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Test cache.py module.
+
+These tests are intended to be run from the repository root using:
+
+pytest -v
+"""
+
+import gzip
+import os
+
+from argparse import Namespace
+from pathlib import Path
+from typing import NamedTuple
+
+import pytest
+
+from pyani import cache
+from pyani.scripts.subcommands.subcmd_anim import (
+    ComparisonJob,
+    cache_comparison_results,
+    get_cached_comparisons,
+)
+
+
+class MockGenome(NamedTuple):
+
+    """Stand-in for pyani_orm.Genome, with the attributes used in caching."""
+
+    genome_hash: str
+    path: str
+
+
+@pytest.fixture
+def cache_key():
+    """Key for a cached nucmer comparison."""
+    return cache.CacheKey("a" * 32, "b" * 32, "nucmer", "4.0.0", False)
+
+
+@pytest.fixture
+def cache_alignment(tmp_path):
+    """Small (filtered) NUCmer alignment file."""
+    fpath = tmp_path / "query_vs_subject.filter"
+    fpath.write_text(
+        "/query.fna /subject.fna\nNUCMER\n>q s 100 100\n1 50 1 50 0 0 0\n0\n"
+    )
+    return fpath
+
+
+def test_parse_size():
+    """parse_size() reads sizes with or without a binary unit suffix."""
+    assert cache.parse_size("1024") == 1024
+    assert cache.parse_size("500M") == 500 * 1024 ** 2
+    assert cache.parse_size("10GB") == 10 * 1024 ** 3
+    assert cache.parse_size("2k") == 2048
+    with pytest.raises(ValueError):
+        cache.parse_size("ten gigabytes")
+
+
+def test_cache_key_digest(cache_key):
+    """CacheKey digests differ when any part of the key differs."""
+    assert cache_key.digest == cache.CacheKey(*cache_key).digest
+    assert cache_key.digest != cache_key._replace(maxmatch=True).digest
+    assert cache_key.digest != cache_key._replace(version="3.1").digest
+
+
+def test_cache_put_get(cache_key, cache_alignment, tmp_path):
+    """Cached results and alignments are returned by a new cache instance."""
+    cache.ComparisonCache(tmp_path / "cache").put(
+        cache_key, 50, 2, alignment=cache_alignment
+    )
+    comparison_cache = cache.ComparisonCache(tmp_path / "cache")
+    assert comparison_cache.get(cache_key) == cache.CacheEntry(50, 2)
+    assert comparison_cache.get(cache_key._replace(maxmatch=True)) is None
+
+    outfname = tmp_path / "restored.filter"
+    assert comparison_cache.get_alignment(cache_key, outfname)
+    assert outfname.read_bytes() == cache_alignment.read_bytes()
+
+    usage = comparison_cache.usage()
+    assert (usage.entries, usage.alignments) == (1, 1)
+    assert usage.programs == {("nucmer", "4.0.0"): 1}
+
+
+def test_cache_no_alignment(cache_key, tmp_path):
+    """Entries without alignments return summary values only."""
+    comparison_cache = cache.ComparisonCache(tmp_path)
+    comparison_cache.put(cache_key, 50, 2)
+    assert comparison_cache.get(cache_key) == cache.CacheEntry(50, 2)
+    assert not comparison_cache.get_alignment(cache_key, tmp_path / "out.filter")
+
+
+def test_cache_put_replaces_alignment(cache_key, cache_alignment, tmp_path):
+    """Replacing an entry without an alignment removes the cached alignment."""
+    comparison_cache = cache.ComparisonCache(tmp_path / "cache")
+    comparison_cache.put(cache_key, 50, 2, alignment=cache_alignment)
+    comparison_cache.put(cache_key, 60, 3)
+    assert comparison_cache.get(cache_key) == cache.CacheEntry(60, 3)
+    assert not comparison_cache.get_alignment(cache_key, tmp_path / "out.filter")
+    assert not comparison_cache._entry_paths(cache_key)[1].exists()
+    assert comparison_cache.usage().alignments == 0
+
+
+def test_cache_prune(cache_key, cache_alignment, tmp_path):
+    """prune() removes least recently used entries first."""
+    comparison_cache = cache.ComparisonCache(tmp_path / "cache")
+    keys = [cache_key._replace(version=str(_)) for _ in range(4)]
+    for idx, key in enumerate(keys):
+        comparison_cache.put(key, idx, 0, alignment=cache_alignment)
+        summarypath = comparison_cache._entry_paths(key)[0]
+        os.utime(summarypath, (1000 + idx, 1000 + idx))
+
+    # Using the oldest entry makes it the most recently used
+    assert comparison_cache.get(keys[0]) is not None
+    entrysize = comparison_cache.usage().size // 4
+    removed = comparison_cache.prune(2 * entrysize)
+    assert len(removed) == 2
+    assert [comparison_cache.get(_) is not None for _ in keys] == [
+        True,
+        False,
+        False,
+        True,
+    ]
+    assert comparison_cache.clear()
+    assert comparison_cache.usage().entries == 0
+
+
+@pytest.fixture
+def anim_cache_args(tmp_path):
+    """Arguments for caching anim results, and a cached comparison."""
+    args = Namespace(
+        outdir=tmp_path / "output",
+        nofilter=False,
+        compress=False,
+        streaming=False,
+        archive=False,
+        union_coverage=False,
+        maxmatch=False,
+        disable_tqdm=True,
+    )
+    (args.outdir / "nucmer_output").mkdir(parents=True)
+    comparison = (
+        MockGenome("a" * 32, "query.fna"),
+        MockGenome("b" * 32, "subject.fna"),
+    )
+    return args, comparison
+
+
+def test_cache_comparison_results(anim_cache_args, cache_alignment, tmp_path):
+    """anim results are cached, and restored with their alignment output."""
+    args, comparison = anim_cache_args
+    outfname = args.outdir / "nucmer_output" / "query_vs_subject.filter"
+    cache_alignment.replace(outfname)
+    anim_cache = cache.ComparisonCache(tmp_path / "cache")
+    cache_comparison_results(
+        [ComparisonJob(*comparison, None, "", outfname, None)],
+        {outfname: (50, 2)},
+        anim_cache,
+        "4.0.0",
+        args,
+    )
+    alignment = outfname.read_bytes()
+    outfname.unlink()
+
+    to_run, cachedjobs, results = get_cached_comparisons(
+        [comparison], anim_cache, "4.0.0", args
+    )
+    assert to_run == []
+    assert [(_.query, _.subject, _.outfile) for _ in cachedjobs] == [
+        comparison + (outfname,)
+    ]
+    assert results == {outfname: (50, 2)}
+    assert outfname.read_bytes() == alignment
+
+    # Other NUCmer versions or settings are not matched
+    for version, maxmatch in (("3.1", False), ("4.0.0", True)):
+        args.maxmatch = maxmatch
+        assert get_cached_comparisons([comparison], anim_cache, version, args)[0] == [
+            comparison
+        ]
+
+
+@pytest.mark.parametrize("archive", [False, True])
+def test_cache_comparison_results_streaming(
+    anim_cache_args, cache_alignment, tmp_path, archive
+):
+    """Streamed anim results are cached with their alignment only if archived."""
+    args, comparison = anim_cache_args
+    args.streaming, args.archive = True, archive
+    outfname = args.outdir / "nucmer_output" / "query_vs_subject.filter"
+    archived = Path(str(outfname) + ".gz")
+    if archive:
+        archived.write_bytes(gzip.compress(cache_alignment.read_bytes()))
+    anim_cache = cache.ComparisonCache(tmp_path / "cache")
+    cache_comparison_results(
+        [ComparisonJob(*comparison, None, "", outfname, None)],
+        {outfname: (50, 2)},
+        anim_cache,
+        "4.0.0",
+        args,
+    )
+    assert anim_cache.usage().alignments == int(archive)
+
+    # Streamed runs use the cached result, restoring only an archived copy
+    # of the alignment; a non-streamed run restores the alignment if cached
+    if archive:
+        archived.unlink()
+    to_run, _, results = get_cached_comparisons(
+        [comparison], anim_cache, "4.0.0", args
+    )
+    assert (to_run, results) == ([], {outfname: (50, 2)})
+    assert archived.is_file() == archive
+    assert not outfname.exists()
+    args.streaming = False
+    get_cached_comparisons([comparison], anim_cache, "4.0.0", args)
+    assert outfname.is_file() == archive
+
+
+def test_get_cached_comparisons_union_coverage(
+    anim_cache_args, cache_alignment, tmp_path
+):
+    """With union coverage, cached comparisons are reparsed from the alignment."""
+    args, comparison = anim_cache_args
+    args.union_coverage = True
+    outfname = args.outdir / "nucmer_output" / "query_vs_subject.filter"
+    anim_cache = cache.ComparisonCache(tmp_path / "cache")
+    key = cache.CacheKey("a" * 32, "b" * 32, "nucmer", "4.0.0", False)
+
+    # No cached alignment: the comparison must be run
+    anim_cache.put(key, 50, 2)
+    to_run, cachedjobs, results = get_cached_comparisons(
+        [comparison], anim_cache, "4.0.0", args
+    )
+    assert (to_run, cachedjobs, results) == ([comparison], [], {})
+
+    # Cached alignment: restored for parsing, with no summary result given
+    anim_cache.put(key, 50, 2, alignment=cache_alignment)
+    to_run, cachedjobs, results = get_cached_comparisons(
+        [comparison], anim_cache, "4.0.0", args
+    )
+    assert (to_run, results) == ([], {})
+    assert [_.outfile for _ in cachedjobs] == [outfname]
+    assert outfname.read_bytes() == cache_alignment.read_bytes()
+
+    # Streamed runs cannot reparse alignments, so run the comparison
+    args.streaming = True
+    assert get_cached_comparisons([comparison], anim_cache, "4.0.0", args)[0] == [
+        comparison
+    ]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# THE SOFTWARE.
+"""Test core_budget.py module.
+
+These tests are intended to be run from the repository root using:
+
+pytest -v
+"""
+
+import pytest
+
+from pyani import core_budget
+from pyani.core_budget import CoreBudget
+
+
+def test_default_cores(monkeypatch):
+    """CoreBudget uses all available cores by default."""
+    monkeypatch.setattr(core_budget, "get_available_cores", lambda: 6)
+    assert CoreBudget().cores == 6
+    assert CoreBudget(0).cores == 6
+    assert CoreBudget(4).cores == 4
+
+
+@pytest.mark.parametrize(
+    "sizes,max_threads,expected",
+    [
+        ([1, 3, 8], 1, [1, 1, 1]),
+        ([1, 3, 8], 4, [1, 3, 4]),
+        ([1, 3, 8], 0, [1, 3, 8]),
+        ([1, 3, 8], 16, [1, 3, 8]),
+        ([1] * 24, 0, [1] * 24),
+        ([0, 0], 0, [6, 6]),
+        ([], 0, []),
+    ],
+)
+def test_allocate(sizes, max_threads, expected):
+    """Threads are allocated by each job's share of the total size."""
+    assert CoreBudget(12).allocate(sizes, max_threads) == expected
+
+
+@pytest.mark.parametrize(
+    "threads,expected", [([1, 1], 12), ([1, 3, 4], 3), ([16], 1), ([], 12)]
+)
+def test_get_workers(threads, expected):
+    """A worker pool is sized for the job using most threads."""
+    assert CoreBudget(12).get_workers(threads) == expected
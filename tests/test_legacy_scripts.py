@@ -49,10 +49,12 @@ tests are conducted first.
 """
 
 import copy
+import json
+import logging
 
 from argparse import Namespace
-from pathlib import Path
 
+import numpy as np
 import pytest
 
 from pyani.pyani_config import (
@@ -77,7 +79,7 @@ def legacy_ani_namespace(path_fixtures_base, tmp_path):
         debug=False,
         force=True,
         fragsize=1020,
-        logfile=Path("test_ANIm.log"),
+        logfile=tmp_path / "test_ANIm.log",
         skip_nucmer=False,
         skip_blastn=False,
         noclobber=False,
@@ -90,6 +92,7 @@ def legacy_ani_namespace(path_fixtures_base, tmp_path):
         method="ANIm",
         scheduler="multiprocessing",
         workers=None,
+        tetra_cache=None,
         sgeargs=None,
         sgegroupsize=10000,
         maxmatch=False,
@@ -185,7 +188,7 @@ def test_legacy_anim_sns(legacy_anim_sns_namespace):
     r"""Use legacy script to run ANIm (seaborn output).
 
     average_nucleotide_identity.py \
-        -l test_ANIm.log \
+        -l <tmp_path>/test_ANIm.log \
         -i tests/fixtures/legacy/ANI_input \
         -o tests/test_output/legacy_scripts/ANIm_seaborn \
         -g --gmethod seaborn --gformat pdf,png \
@@ -199,7 +202,7 @@ def test_legacy_anim_mpl(legacy_anim_mpl_namespace):
     r"""Use legacy script to run ANIm (mpl output).
 
     average_nucleotide_identity.py \
-        -l test_ANIm.log \
+        -l <tmp_path>/test_ANIm.log \
         -i tests/fixtures/legacy/ANI_input \
         -o tests/test_output/legacy_scripts/ANIm_mpl \
         -g --gmethod mpl --gformat pdf,png \
@@ -213,7 +216,7 @@ def test_legacy_anib_sns(legacy_anib_sns_namespace):
     r"""Use legacy script to run ANIb (seaborn output).
 
     average_nucleotide_identity.py \
-        -l test_ANIb.log \
+        -l <tmp_path>/test_ANIb.log \
         -i tests/test_output/legacy_scripts/C_blochmannia \
         -o tests/test_output/legacy_scripts/ANIb_seaborn \
         -g --gmethod seaborn --gformat pdf,png \
@@ -227,7 +230,7 @@ def test_legacy_anib_mpl(legacy_anib_mpl_namespace):
     r"""Use legacy script to run ANIb (mpl output).
 
     average_nucleotide_identity.py \
-        -l test_ANIb.log \
+        -l <tmp_path>/test_ANIb.log \
         -i tests/test_output/legacy_scripts/C_blochmannia \
         -o tests/test_output/legacy_scripts/ANIb_mpl \
         -g --gmethod mpl --gformat pdf,png \
@@ -236,6 +239,34 @@ def test_legacy_anib_mpl(legacy_anib_mpl_namespace):
     average_nucleotide_identity.run_main(legacy_anib_mpl_namespace)
 
 
+@pytest.mark.parametrize("fragfile", ["fraglengths.npz", "fraglengths.json"])
+def test_legacy_anib_skip_blastn(legacy_ani_namespace, tmp_path, fragfile):
+    """Reload cached fragment lengths when rerunning ANIblastall with --skip_blastn.
+
+    Output directories from earlier versions of pyani cache fragment lengths
+    only as JSON, keyed by fragment ID.
+    """
+    blastdir = tmp_path / "aniblastall_output"
+    blastdir.mkdir()
+    lengths = {"genome": np.array([1020, 1020, 17], dtype=np.int64)}
+    if fragfile.endswith(".npz"):
+        np.savez(blastdir / fragfile, **lengths)
+    else:
+        # Fragment IDs need not be in order
+        fragdict = {"frag00003": 17, "frag00001": 1020, "frag00002": 1020}
+        with (blastdir / fragfile).open("w") as ofh:
+            json.dump({"genome": fragdict}, ofh)
+    args = modify_namespace(
+        legacy_ani_namespace, method="ANIblastall", skip_blastn=True
+    )
+    cumval, fraglengths = average_nucleotide_identity.run_blast(
+        args, logging.getLogger(__name__), [], blastdir
+    )
+    assert cumval == 0
+    assert list(fraglengths) == ["genome"]
+    assert fraglengths["genome"].tolist() == lengths["genome"].tolist()
+
+
 def test_legacy_tetra_sns(legacy_tetra_sns_namespace):
     r"""Use legacy script to run TETRA (seaborn output)."""
     average_nucleotide_identity.run_main(legacy_tetra_sns_namespace)
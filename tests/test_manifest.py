@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Test manifest.py module.
+
+These tests are intended to be run from the repository root using:
+
+pytest -v
+"""
+
+import subprocess
+
+import pytest
+
+from pyani import manifest
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    """Completed output files, recorded in the manifest of their directory."""
+    fnames = []
+    for name in ("a_vs_b.delta", "a_vs_b.filter", "a_vs_c.filter.gz"):
+        fname = tmp_path / name
+        fname.write_bytes(name.encode() * 100)
+        manifest.record_output(fname)
+        fnames.append(fname)
+    return fnames
+
+
+def test_read_manifest(outputs, tmp_path):
+    """Read entries from a manifest, ignoring incomplete and replaced entries."""
+    assert manifest.read_manifest(tmp_path / "missing") is None
+
+    # A replaced file has a new entry, and a killed job may leave a partial one
+    outputs[1].write_bytes(b"replaced")
+    manifest.record_output(outputs[1])
+    with manifest.get_manifest_path(tmp_path).open("a") as ofh:
+        ofh.write('{"name": "a_vs_d.filter", "si')
+
+    entries = manifest.read_manifest(tmp_path)
+    assert sorted(entries) == sorted(_.name for _ in outputs)
+    assert entries[outputs[1].name] == manifest.ManifestEntry(
+        outputs[1].name, 8, manifest.get_checksum(outputs[1])
+    )
+
+
+def test_record_missing_output(tmp_path):
+    """Missing output files cannot be recorded, but are skipped in bulk."""
+    with pytest.raises(manifest.PyaniManifestException):
+        manifest.record_output(tmp_path / "missing.filter")
+    manifest.record_outputs([tmp_path / "missing.filter"])
+    assert not manifest.get_manifest_path(tmp_path).exists()
+
+
+def test_verify_output(outputs, tmp_path):
+    """Reject missing, truncated or changed output files."""
+    entries = manifest.read_manifest(tmp_path)
+    assert manifest.verify_output(outputs[0], entries[outputs[0].name])
+
+    with outputs[0].open("r+b") as ofh:  # truncated by a killed job
+        ofh.truncate(10)
+    assert not manifest.verify_output(outputs[0], entries[outputs[0].name])
+
+    outputs[1].write_bytes(outputs[1].read_bytes().upper())  # same size
+    assert manifest.verify_output(outputs[1], entries[outputs[1].name], False)
+    assert not manifest.verify_output(outputs[1], entries[outputs[1].name])
+
+    outputs[2].unlink()
+    assert not manifest.verify_output(outputs[2], entries[outputs[2].name])
+
+
+def test_collect_completed_output(outputs, tmp_path):
+    """Collect complete output files with a suffix, compressed or not."""
+    assert manifest.collect_completed_output(tmp_path / "missing", ".filter") is None
+    (tmp_path / "a_vs_e.filter").touch()  # not recorded as complete
+    assert sorted(manifest.collect_completed_output(tmp_path, ".filter")) == sorted(
+        outputs[1:]
+    )
+    assert manifest.collect_completed_output(tmp_path, ".delta") == outputs[:1]
+
+    with outputs[2].open("r+b") as ofh:
+        ofh.truncate(10)
+    assert manifest.collect_completed_output(tmp_path, ".filter") == outputs[1:2]
+
+
+@pytest.mark.skip_if_exe_missing("nucmer")
+def test_nucmer_filter_wrapper_manifest(dir_seq, tmp_path):
+    """Output written by nucmer_filter_wrapper.py is recorded in the manifest."""
+    outprefix = tmp_path / "NC_002696_vs_NC_011916"
+    subprocess.run(
+        [
+            "nucmer_filter_wrapper.py",
+            "--compress",
+            "nucmer",
+            "--mum",
+            "-p",
+            str(outprefix),
+            str(dir_seq / "NC_002696.fna"),
+            str(dir_seq / "NC_011916.fna"),
+        ],
+        check=True,
+    )
+    assert manifest.collect_completed_output(tmp_path, ".filter") == [
+        tmp_path / "NC_002696_vs_NC_011916.filter.gz"
+    ]
+    assert manifest.collect_completed_output(tmp_path, ".delta") == [
+        tmp_path / "NC_002696_vs_NC_011916.delta.gz"
+    ]
@@ -54,7 +54,10 @@ import pytest
 from pyani.anib import fragment_fasta_files, make_blastcmd_builder, make_job_graph
 from pyani.pyani_jobs import Job
 from pyani.run_multiprocessing import (
+    multiprocessing_apply,
+    multiprocessing_imap,
     multiprocessing_run,
+    multiprocessing_run_threaded,
     populate_cmdsets,
     run_dependency_graph,
 )
@@ -82,6 +85,19 @@ def test_multiprocessing_run(mp_cmdlist):
     assert 0 == result
 
 
+def test_multiprocessing_apply():
+    """Test that multiprocessing_apply() returns results in order."""
+    argsets = [(_, 3) for _ in range(10)]
+    assert multiprocessing_apply(divmod, argsets) == [divmod(*_) for _ in argsets]
+
+
+def test_multiprocessing_imap():
+    """Test that multiprocessing_imap() yields results in order."""
+    args = list(range(100))
+    results = multiprocessing_imap(abs, [-_ for _ in args], workers=2, chunksize=7)
+    assert list(results) == args
+
+
 def test_cmdsets(mp_dummy_cmds):
     """Test that module builds command sets."""
     job1 = Job("dummy_with_dependency", mp_dummy_cmds[0])
@@ -92,6 +108,33 @@ def test_cmdsets(mp_dummy_cmds):
     assert cmdsets == target
 
 
+def test_cmdsets_threads(mp_dummy_cmds):
+    """Test that module records the threads used by each command."""
+    job1 = Job("dummy_with_dependency", mp_dummy_cmds[0], threads=4)
+    job2 = Job("dummy_dependency", mp_dummy_cmds[1])
+    job1.add_dependency(job2)
+    threads = {}
+    populate_cmdsets(job1, list(), depth=1, threads=threads)
+    assert threads == {mp_dummy_cmds[0]: 4, mp_dummy_cmds[1]: 1}
+
+
+def test_multiprocessing_run_threaded(tmp_path):
+    """Test that multithreaded jobs all run, and their exit codes are summed."""
+    cmdlines = {f"touch {tmp_path / str(_)}": _ for _ in range(1, 6)}
+    cmdlines["exit 3"] = 2
+    assert multiprocessing_run_threaded(cmdlines, workers=4) == 3
+    assert sorted(_.name for _ in tmp_path.iterdir()) == ["1", "2", "3", "4", "5"]
+
+
+def test_dependency_graph_run_threaded(tmp_path):
+    """Test that module runs dependency graph with multithreaded jobs."""
+    job1 = Job("dummy_with_dependency", f"cp {tmp_path / 'a'} {tmp_path / 'b'}")
+    job2 = Job("dummy_dependency", f"touch {tmp_path / 'a'}", threads=2)
+    job1.add_dependency(job2)
+    assert run_dependency_graph([job1], workers=2) == 0
+    assert (tmp_path / "b").is_file()
+
+
 @pytest.mark.skip_if_exe_missing("blastn")
 def test_dependency_graph_run(path_fna_two, fragment_length, tmp_path):
     """Test that module runs dependency graph."""
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Test pyani_orm.py module.
+
+These tests are intended to be run from the repository root using:
+
+pytest -v
+"""
+
+import pandas as pd
+
+from pyani import pyani_orm
+from pyani.pyani_orm import Comparison, Genome
+
+
+def add_test_run(session, ngenomes: int = 3):
+    """Add a run with ngenomes genomes to the database, and return it."""
+    run = pyani_orm.add_run(session, "ANIm", "pyani anim", None, "started", "test")
+    for idx in range(ngenomes):
+        genome = Genome(
+            genome_hash=f"hash{idx}",
+            path=f"genome{idx}.fna",
+            length=1000 * (idx + 1),
+            description=f"genome{idx}",
+        )
+        session.add(genome)
+        genome.runs.append(run)
+    session.commit()
+    return run
+
+
+def test_update_comparison_matrices_skipped(pyani_session):
+    """Test skipped comparisons are filled with zero identity and coverage."""
+    run = add_test_run(pyani_session)
+    genome1, genome2, genome3 = run.genomes.order_by(Genome.genome_id).all()
+    run.comparisons.append(
+        Comparison(
+            query=genome1,
+            subject=genome2,
+            aln_length=500,
+            sim_errs=5,
+            identity=0.99,
+            cov_query=0.5,
+            cov_subject=0.25,
+            program="nucmer",
+            version="test",
+            maxmatch=False,
+        )
+    )
+    for query, subject in ((genome1, genome3), (genome2, genome3)):
+        run.comparisons.append(
+            Comparison(
+                query=query,
+                subject=subject,
+                program="nucmer",
+                version="test_skipped-tetra-0.9",
+                maxmatch=False,
+            )
+        )
+    pyani_session.commit()
+
+    pyani_orm.update_comparison_matrices(pyani_session, run)
+    identity = pd.read_json(run.df_identity)
+    coverage = pd.read_json(run.df_coverage)
+    alnlength = pd.read_json(run.df_alnlength)
+    hadamard = pd.read_json(run.df_hadamard)
+    for dfm in (identity, coverage, alnlength, hadamard):
+        assert not dfm.isnull().values.any()
+    gid1, gid2, gid3 = genome1.genome_id, genome2.genome_id, genome3.genome_id
+    assert identity.loc[gid1, gid2] == identity.loc[gid2, gid1] == 0.99
+    assert coverage.loc[gid1, gid2] == 0.5
+    assert coverage.loc[gid2, gid1] == 0.25
+    assert alnlength.loc[gid3, gid3] == 3000
+    for qid, sid in ((gid1, gid3), (gid3, gid1), (gid2, gid3), (gid3, gid2)):
+        assert identity.loc[qid, sid] == 0
+        assert coverage.loc[qid, sid] == 0
+        assert alnlength.loc[qid, sid] == 0
+        assert hadamard.loc[qid, sid] == 0
+
+
+def test_add_comparisons(pyani_session):
+    """Test comparisons are added in bulk, and linked only to their own run."""
+    runs = [add_test_run(pyani_session), add_test_run(pyani_session, 0)]
+    genomes = runs[0].genomes.order_by(Genome.genome_id).all()
+    for run, version in zip(runs, ("first", "second")):
+        pyani_orm.add_comparisons(
+            pyani_session,
+            run,
+            [
+                {
+                    "query_id": query.genome_id,
+                    "subject_id": subject.genome_id,
+                    "aln_length": 100 * idx,
+                    "sim_errs": idx,
+                    "identity": 1 - idx / 100,
+                    "cov_query": 0.5,
+                    "cov_subject": 0.5,
+                    "program": "nucmer",
+                    "version": version,
+                    "fragsize": None,
+                    "maxmatch": None,
+                }
+                for idx, (query, subject) in enumerate(
+                    ((genomes[0], genomes[1]), (genomes[0], genomes[2])), 1
+                )
+            ],
+        )
+
+    comparisons = pyani_session.query(Comparison).all()
+    assert len({_.comparison_id for _ in comparisons}) == 4
+    for run, version in zip(runs, ("first", "second")):
+        linked = run.comparisons.order_by(Comparison.aln_length).all()
+        assert [_.version for _ in linked] == [version, version]
+        assert [(_.subject_id, _.sim_errs) for _ in linked] == [
+            (genomes[1].genome_id, 1),
+            (genomes[2].genome_id, 2),
+        ]
+
+
+def test_add_comparisons_empty(pyani_session):
+    """Test adding no comparisons leaves the database unchanged."""
+    run = add_test_run(pyani_session)
+    pyani_orm.add_comparisons(pyani_session, run, [])
+    assert not pyani_session.query(Comparison).count()
@@ -45,10 +45,144 @@ These tests are intended to be run from the repository root using:
 pytest -v
 """
 
+from array import array
+from pathlib import Path
+
+import pytest
+
+from pyani import nucmer
 from pyani.anim import parse_delta
 
+from tools import parse_delta_readlines, write_synthetic_delta
+
+
+# Stems of the .delta/.filter files in the deltadir test fixture
+DELTA_STEMS = [
+    "NC_002696_vs_NC_010338",
+    "NC_002696_vs_NC_011916",
+    "NC_002696_vs_NC_014100",
+    "NC_010338_vs_NC_011916",
+    "NC_010338_vs_NC_014100",
+    "NC_011916_vs_NC_014100",
+]
+
+
+@pytest.fixture
+def synthetic_delta(tmp_path):
+    """Path to a small synthetic .delta file."""
+    return write_synthetic_delta(tmp_path / "synthetic.delta", 5, 200)
+
 
 def test_anim_delta(dir_anim_in):
     """Test parsing of NUCmer delta file."""
     aln, sim = parse_delta(dir_anim_in / "NC_002696_vs_NC_011916.delta")
     assert (aln, sim) == (4074148, 2191)
+
+
+@pytest.mark.parametrize("blocksize", [1, 7, 64, nucmer.DELTA_BLOCKSIZE])
+def test_anim_delta_blocksize(dir_anim_in, blocksize):
+    """Test streamed parsing of NUCmer delta file is independent of block size."""
+    with (dir_anim_in / "NC_002696_vs_NC_011916.delta").open("rb") as ifh:
+        assert nucmer.summarise_delta(ifh, blocksize) == (4074148, 2191)
+
+
+def test_delta_iterator(dir_anim_in):
+    """Test DeltaIterator returns every comparison in a multi-sequence .filter file."""
+    with (dir_anim_in / "deltadir" / "NC_002696_vs_NC_011916.filter").open() as ifh:
+        data = nucmer.DeltaData("test", ifh)
+    assert [_.header.reference for _ in data.comparisons] == [
+        "NC_002696_part_1",
+        "NC_002696_part_2",
+    ]
+    assert [len(_) for _ in data.comparisons] == [1, 4]
+
+
+@pytest.mark.parametrize("stem", DELTA_STEMS)
+def test_delta_data_lazy(dir_anim_in, stem):
+    """Test DeltaData read lazily from a path matches DeltaData read from a handle."""
+    fname = dir_anim_in / "deltadir" / f"{stem}.filter"
+    with fname.open() as ifh:
+        eager = nucmer.DeltaData("eager", ifh)
+    lazy = nucmer.DeltaData("lazy", fname)
+    assert isinstance(lazy.comparisons, nucmer.DeltaIndex)
+    assert len(lazy) == len(eager)
+    assert lazy == eager
+    assert [str(_) for _ in lazy.comparisons] == [str(_) for _ in eager.comparisons]
+    assert str(lazy).splitlines() == fname.read_text().splitlines()
+
+
+def test_delta_comparison_compact(dir_anim_in):
+    """Test DeltaComparison holds alignments and indels in compact arrays."""
+    fname = dir_anim_in / "deltadir" / "NC_002696_vs_NC_011916.filter"
+    comparison = nucmer.DeltaData("test", fname).comparisons[-1]
+    assert comparison.coordinates.shape == (4, 4)
+    for aln in comparison.alignments:
+        assert isinstance(aln.indels, array)
+        assert aln.indels[-1] == 0
+    # Equality does not depend on the order of alignments
+    reordered = nucmer.DeltaComparison(
+        comparison.header, reversed(comparison.alignments)
+    )
+    assert reordered == comparison
+    assert str(reordered) != str(comparison)
+
+
+def test_synthetic_delta_parsing(synthetic_delta):
+    """Test streaming .delta parser agrees with the readlines() parser."""
+    assert parse_delta(synthetic_delta) == parse_delta_readlines(synthetic_delta)
+
+
+@pytest.mark.parametrize("stem", DELTA_STEMS)
+def test_filter_delta(dir_anim_in, tmp_path, stem):
+    """Test native one-to-one filter reproduces delta-filter -1 output."""
+    outfname = nucmer.filter_delta(
+        dir_anim_in / "deltadir" / f"{stem}.delta", tmp_path / f"{stem}.filter"
+    )
+    expected = dir_anim_in / "deltadir" / f"{stem}.filter"
+    with outfname.open() as ofh, expected.open() as efh:
+        assert nucmer.DeltaData("native", ofh) == nucmer.DeltaData("mummer", efh)
+    assert outfname.read_bytes() == expected.read_bytes()
+
+
+def test_filter_delta_identity_precision(tmp_path):
+    """Test native one-to-one filter scores identity in single precision.
+
+    The first alignment scores 4 with MUMmer's single-precision identity, but
+    3 in double precision, which would let the second alignment (overlapping
+    it on the reference) be chained before it.
+    """
+    header = b"/a/ref.fna /a/qry.fna\nNUCMER\n>ref1 qry1 100 100\n"
+    kept = b"17 25 23 29 3 3 0\n4\n1\n0\n"
+    dropped = b">ref1 qry2 100 100\n15 19 5 1 2 2 0\n2\n-1\n0\n"
+    infname = tmp_path / "precision.delta"
+    infname.write_bytes(header + kept + dropped)
+    outfname = nucmer.filter_delta(infname, tmp_path / "precision.filter")
+    assert outfname.read_bytes() == header + kept
+
+
+def test_split_delta(dir_anim_in, tmp_path):
+    """Test splitting .delta output for a batch of tagged queries by query."""
+    stems = ["NC_002696_vs_NC_011916", "NC_002696_vs_NC_014100"]
+    sources = [dir_anim_in / "deltadir" / f"{stem}.delta" for stem in stems]
+    queries = [Path(_.open().readline().split()[1]) for _ in sources]
+
+    # Combine the pairwise outputs as NUCmer would for a batch of both queries
+    batch = tmp_path / "batch.delta"
+    with batch.open("w") as ofh:
+        ofh.write("/path/to/NC_002696.fna /path/to/queries.fna\nNUCMER\n")
+        for idx, source in enumerate(sources):
+            for line in source.open().readlines()[2:]:
+                if line.startswith(">"):
+                    refid, qryid, lengths = line.split(" ", 2)
+                    qryid = nucmer.BATCH_TAG.format(idx) + qryid
+                    line = " ".join([refid, qryid, lengths])
+                ofh.write(line)
+
+    outfnames = nucmer.split_delta(
+        batch, [tmp_path / f"{stem}.delta" for stem in stems], queries
+    )
+    for outfname, source, query in zip(outfnames, sources, queries):
+        with outfname.open() as ofh, source.open() as sfh:
+            assert nucmer.DeltaData("split", ofh) == nucmer.DeltaData("pair", sfh)
+        assert outfname.open().readline().split()[1] == str(query)
+        assert parse_delta(outfname) == parse_delta(source)
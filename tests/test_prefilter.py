@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# (c) The James Hutton Institute 2017-2019
+# (c) The University of Strathclude 2019-2020
+# Author: Leighton Pritchard
+#
+# Contact:
+# leighton.pritchard@strath.ac.uk
+#
+# Leighton Pritchard,
+# Strathclyde Institute of Pharmaceutical and Biomedical Sciences
+# The University of Strathclyde
+# 161 Cathedral Street
+# Glasgow
+# G4 0RE
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Copyright (c) 2017-2019 The James Hutton Institute
+# (c) The University of Strathclude 2019-2020
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""Test prefilter.py module.
+
+These tests are intended to be run from the repository root using:
+
+pytest -v
+"""
+
+import random
+
+from argparse import Namespace
+from pathlib import Path
+from typing import NamedTuple
+
+import pytest
+
+from pyani import prefilter, pyani_orm
+from pyani.pyani_orm import Comparison, Genome
+from pyani.scripts.subcommands.subcmd_anim import skip_prefiltered_comparisons
+from pyani.tetra import calculate_correlations, calculate_tetra_zscores
+
+
+class MockGenome(NamedTuple):
+
+    """Stand-in for pyani_orm.Genome, with the attributes used in prefiltering."""
+
+    genome_id: int
+    path: str
+    description: str
+
+
+@pytest.fixture
+def prefilter_genomes(tmp_path):
+    """Three small genomes: two closely-related, and one unrelated."""
+    rng = random.Random(1)
+    seqs = [
+        "".join(rng.choice("ACGT") for _ in range(20000)),
+        "".join(rng.choice("AAATTTGC") for _ in range(20000)),
+    ]
+    mutant = list(seqs[0])
+    for pos in rng.sample(range(len(mutant)), 500):
+        mutant[pos] = rng.choice("ACGT")
+    genomes = []
+    for idx, seq in enumerate([seqs[0], "".join(mutant), seqs[1]], 1):
+        fpath = tmp_path / f"genome{idx}.fna"
+        fpath.write_text(f">genome{idx}\n{seq}\n")
+        genomes.append(MockGenome(idx, str(fpath), f"genome{idx}"))
+    return genomes
+
+
+def test_score_tetra(prefilter_genomes):
+    """Test prefilter TETRA scores match TETRA correlations."""
+    comparisons = [
+        (prefilter_genomes[0], prefilter_genomes[1]),
+        (prefilter_genomes[0], prefilter_genomes[2]),
+        (prefilter_genomes[1], prefilter_genomes[2]),
+    ]
+    corr = calculate_correlations(
+        calculate_tetra_zscores([Path(_.path) for _ in prefilter_genomes])
+    )
+    expected = [
+        corr[Path(query.path).stem][Path(subject.path).stem]
+        for query, subject in comparisons
+    ]
+    assert prefilter.score_tetra(comparisons) == pytest.approx(expected)
+
+
+def test_prefilter_comparisons(prefilter_genomes):
+    """Test comparisons are split at the prefilter cutoff, retaining order."""
+    comparisons = [
+        (prefilter_genomes[0], prefilter_genomes[1]),
+        (prefilter_genomes[0], prefilter_genomes[2]),
+        (prefilter_genomes[1], prefilter_genomes[2]),
+    ]
+    result = prefilter.prefilter_comparisons(comparisons, "tetra", 0.9)
+    assert result.to_run == comparisons[:1]
+    assert result.skipped == comparisons[1:]
+
+
+def test_prefilter_unknown_method(prefilter_genomes):
+    """Test unknown prefilter method raises an exception."""
+    with pytest.raises(prefilter.PyaniPrefilterException):
+        prefilter.score_comparisons([tuple(prefilter_genomes[:2])], "unknown")
+
+
+def test_skip_prefiltered_comparisons(prefilter_genomes, pyani_session):
+    """Test skipped comparisons are recorded, and reused by a later run."""
+    genomes = []
+    for genome in prefilter_genomes:
+        genomes.append(
+            Genome(
+                genome_hash=genome.description,
+                path=genome.path,
+                length=20000,
+                description=genome.description,
+            )
+        )
+        pyani_session.add(genomes[-1])
+    pyani_session.commit()
+    comparisons = [
+        (genomes[0], genomes[1]),
+        (genomes[0], genomes[2]),
+        (genomes[1], genomes[2]),
+    ]
+    args = Namespace(prefilter="tetra", prefilter_cutoff=None, maxmatch=False)
+
+    runs = []
+    for name in ("first", "second"):
+        runs.append(
+            pyani_orm.add_run(pyani_session, "ANIm", "", None, "started", name)
+        )
+        to_run = skip_prefiltered_comparisons(
+            comparisons, runs[-1], pyani_session, "test", args
+        )
+        assert to_run == comparisons[:1]
+
+    skipped = pyani_session.query(Comparison).all()
+    assert len(skipped) == 2  # second run reuses the first run's records
+    assert {(_.query_id, _.subject_id) for _ in skipped} == {
+        (query.genome_id, subject.genome_id) for query, subject in comparisons[1:]
+    }
+    for cmp in skipped:
+        assert cmp.version == "test_skipped-tetra-0.9"
+        assert cmp.identity is None
+        assert {_.name for _ in cmp.runs} == {"first", "second"}
@@ -103,6 +103,19 @@ class TestANImSubcommand(unittest.TestCase):
                 filter_exe=self.exes.filter_exe,
                 maxmatch=False,
                 nofilter=False,
+                native_filter=False,
+                streaming=False,
+                archive=False,
+                batchsize=0,
+                split_size=0,
+                reuse_index=False,
+                threads=1,
+                prefilter=None,
+                prefilter_cutoff=None,
+                cache_dir=None,
+                cache_size=None,
+                compress=False,
+                union_coverage=False,
                 scheduler=self.scheduler,
                 workers=None,
                 disable_tqdm=True,
@@ -77,7 +77,7 @@ DirPaths = namedtuple("DirPaths", "indir outdir")
 LabelPaths = namedtuple("LabelPaths", "classes labels")
 
 
-@pytest.mark.xfail(reason="ANIb is not currently fully implemented")
+@pytest.mark.skip_if_exe_missing("blastn")
 class TestANIbsubcommand(unittest.TestCase):
 
     """Class defining tests of the pyani anib subcommand."""
@@ -112,8 +112,13 @@ class TestANIbsubcommand(unittest.TestCase):
                 recovery=False,
                 cmdline="ANIb test suite",
                 blastn_exe=self.exes.blastn_exe,
-                filter_exe=self.exes.format_exe,
+                format_exe=self.exes.format_exe,
                 fragsize=1020,
+                blastdb_dir=self.dirpaths.outdir / "blastdbs",
+                streaming=False,
+                archive=False,
+                combined_db=False,
+                threads=1,
                 scheduler=self.scheduler,
                 workers=None,
                 disable_tqdm=True,
@@ -48,16 +48,26 @@ pytest -v
 import json
 import unittest
 
+from itertools import product
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pytest
 
 from pandas.util.testing import assert_frame_equal
 
+from pyani import tetra
+from pyani.download import create_hash
 from pyani.tetra import (
+    TETRANUCLEOTIDES,
     calculate_correlations,
     calculate_tetra_zscore,
     calculate_tetra_zscores,
+    count_kmers,
+    get_reverse_complement_index,
+    get_tetra_zscore_vector,
+    get_zscore_cache_path,
     tetra_clean,
 )
 
@@ -79,6 +89,31 @@ def test_tetraclean():
     ) == (False, True)
 
 
+def test_reverse_complement_index():
+    """Map each tetranucleotide to its reverse complement."""
+    index = get_reverse_complement_index(4)
+    complement = str.maketrans("ACGT", "TGCA")
+    assert [TETRANUCLEOTIDES[_] for _ in index] == [
+        _.translate(complement)[::-1] for _ in TETRANUCLEOTIDES
+    ]
+
+
+def test_count_kmers():
+    """Count k-mers on both strands, skipping ambiguous windows."""
+    # AACGT and its reverse complement ACGTT; as for the original
+    # implementation, the last tetranucleotide of each strand is not counted,
+    # and the second sequence has no clean windows
+    counts = count_kmers(["aacgt", "ANT"])
+
+    def observed(kmers, size):
+        names = ["".join(_) for _ in product("ACGT", repeat=size)]
+        return {names[_]: kmers[_] for _ in np.flatnonzero(kmers)}
+
+    assert observed(counts.di, 2) == {"AA": 1, "AC": 2, "CG": 2, "GT": 2, "TT": 1}
+    assert observed(counts.tri, 3) == {"AAC": 1, "ACG": 2, "CGT": 2, "GTT": 1}
+    assert observed(counts.tetra, 4) == {"AACG": 1, "ACGT": 1}
+
+
 def test_zscore(dir_seq, dir_targets):
     """Test that TETRA Z-score calculated correctly."""
     tetra_z = calculate_tetra_zscore(dir_seq / "NC_002696.fna")
@@ -87,6 +122,23 @@ def test_zscore(dir_seq, dir_targets):
     assert ordered(tetra_z) == ordered(target)
 
 
+def test_zscore_cache(dir_seq, tmp_path, monkeypatch):
+    """Test that TETRA Z-scores are cached by genome hash, and reused."""
+    infile = dir_seq / "NC_002696.fna"
+    cachedir = tmp_path / "cache"
+    zscores = calculate_tetra_zscores([infile, infile], workers=2, cachedir=cachedir)
+    assert zscores == {"NC_002696": calculate_tetra_zscore(infile)}
+    cachepath = get_zscore_cache_path(cachedir, create_hash(infile))
+    assert cachepath.is_file()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Z-scores recalculated")
+
+    monkeypatch.setattr(tetra, "count_kmers", fail)
+    cached = get_tetra_zscore_vector(infile, cachedir)
+    np.testing.assert_array_equal(cached, np.load(cachepath))
+
+
 def test_correlations(path_fna_all, dir_targets):
     """Test that TETRA correlation calculated correctly."""
     infiles = ordered(path_fna_all)[:2]  # only test a single correlation
@@ -95,3 +147,29 @@ def test_correlations(path_fna_all, dir_targets):
         dir_targets / "tetra" / "correlation.tab", sep="\t", index_col=0
     )
     assert_frame_equal(corr, target)
+
+
+def test_correlations_matrix():
+    """Test that blocked matrix correlations match pairwise correlations."""
+    rng = np.random.default_rng(0)
+    tetra_z = {
+        f"org{_}": dict(zip(TETRANUCLEOTIDES[:200], rng.normal(size=200)))
+        for _ in range(5)
+    }
+    corr = calculate_correlations(tetra_z, blocksize=2)
+    assert list(corr.index) == list(corr.columns) == sorted(tetra_z)
+    for org1 in tetra_z:
+        for org2 in tetra_z:
+            expected = np.corrcoef(
+                list(tetra_z[org1].values()), list(tetra_z[org2].values())
+            )[0, 1]
+            assert corr.loc[org1, org2] == pytest.approx(expected)
+    assert (corr.values == corr.values.T).all()
+    assert_frame_equal(corr, calculate_correlations(tetra_z), check_exact=False)
+
+
+def test_correlations_mismatched():
+    """Test that Z-scores for different tetranucleotides are not correlated."""
+    tetra_z = {"org1": {"AAAA": 1.0, "AAAC": 2.0}, "org2": {"AAAA": 1.0}}
+    with pytest.raises(AssertionError):
+        calculate_correlations(tetra_z)
@@ -42,8 +42,12 @@
 
 import copy
 import json
+import random
 import unittest
 
+from pathlib import Path
+from typing import Tuple
+
 import pandas as pd
 
 from pyani import blast, nucmer
@@ -249,3 +253,49 @@ def modify_namespace(namespace, **kwargs):
     for argname, argval in kwargs.items():
         setattr(new_namespace, argname, argval)
     return new_namespace
+
+
+def parse_delta_readlines(filename: Path) -> Tuple[int, int]:
+    """Return (alignment length, similarity errors) using the pre-0.3 parser.
+
+    This is the original implementation of anim.parse_delta(), which loads the
+    whole file into memory. It is retained here as a reference for correctness
+    and benchmarking of the streaming parser.
+    """
+    in_aln, aln_length, sim_errors = False, 0, 0
+    for line in [_.strip().split() for _ in filename.open("r").readlines()]:
+        if line[0] == "NUCMER" or line[0].startswith(">"):  # Skip headers
+            continue
+        if len(line) == 7:
+            aln_length += abs(int(line[1]) - int(line[0])) + 1
+            sim_errors += int(line[4])
+            in_aln = True
+        if in_aln and line[0].startswith("0"):
+            in_aln = False
+        elif in_aln:
+            val = int(line[0])
+            if val < 1:
+                aln_length += 1
+            elif val == 0:
+                in_aln = False
+    return aln_length, sim_errors
+
+
+def write_synthetic_delta(
+    path: Path, ncomparisons: int, nalignments: int, seed: int = 1
+) -> Path:
+    """Write a synthetic .delta file with the passed numbers of records."""
+    rng = random.Random(seed)
+    with path.open("w") as ofh:
+        ofh.write("/path/to/reference.fna /path/to/query.fna\nNUCMER\n")
+        for cidx in range(ncomparisons):
+            ofh.write(f">ref_{cidx} qry_{cidx} 5000000 5000000\n")
+            for _ in range(nalignments):
+                start = rng.randint(1, 4000000)
+                end = start + rng.randint(100, 50000)
+                indels = [rng.choice((-1, 1)) * rng.randint(1, 500) for _ in range(5)]
+                ofh.write(
+                    f"{start} {end} {start} {end} {len(indels)} {len(indels)} 0\n"
+                )
+                ofh.write("\n".join(str(_) for _ in indels + [0]) + "\n")
+    return path